@@ -1,14 +1,15 @@
 from collections.abc import AsyncGenerator
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import validate_admin_token, validate_token
 from app.db.session import get_db
-from app.models.user import User
+from app.services import principal_service
+from app.services.principal_service import Principal
+from app.utils.pagination import PageCursor, decode_cursor
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -18,25 +19,50 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+def get_page_cursor(
+    cursor: Annotated[Optional[str], Query(description="X-Next-Cursor from the previous page")] = None
+) -> Optional[PageCursor]:
+    """Decode the keyset pagination cursor query parameter, raising 400 if malformed."""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from None
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
     session: Annotated[AsyncSession, Depends(get_db_session)]
-) -> User:
+) -> Principal:
+    return await authenticate_access_token(token, session)
+
+
+async def authenticate_access_token(token: str, session: AsyncSession) -> Principal:
+    """Resolve an access token to its active principal, raising 401 otherwise."""
     subject = validate_token(token, scope="access")
     if not subject:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    result = await session.execute(select(User).where(User.user_id == int(subject)))
-    user = result.scalars().first()
-    if not user or not user.is_active:
+    principal = await principal_service.get_principal(session, int(subject))
+    if not principal or not principal.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user")
-    return user
+    return principal
+
+
+async def get_current_driver(
+    principal: Annotated[Principal, Depends(get_current_user)]
+) -> Principal:
+    """Resolve the caller as a driver (a principal linked to a tigu_driver row)."""
+    if principal.driver_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Driver not found")
+    return principal
 
 
 async def get_current_admin(
     token: Annotated[str, Depends(oauth2_scheme)],
     session: Annotated[AsyncSession, Depends(get_db_session)]
-) -> User:
+) -> Principal:
     auth_result = validate_admin_token(token, scope="access")
     if not auth_result:
         raise HTTPException(
@@ -45,20 +71,19 @@ async def get_current_admin(
         )
 
     user_id, role = auth_result
-    result = await session.execute(select(User).where(User.user_id == int(user_id)))
-    user = result.scalars().first()
-    if not user or not user.is_active or not user.is_admin:
+    principal = await principal_service.get_principal(session, int(user_id))
+    if not principal or not principal.is_active or not principal.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
         )
-    return user
+    return principal
 
 
 async def get_current_super_admin(
     token: Annotated[str, Depends(oauth2_scheme)],
     session: Annotated[AsyncSession, Depends(get_db_session)]
-) -> User:
+) -> Principal:
     auth_result = validate_admin_token(token, scope="access")
     if not auth_result:
         raise HTTPException(
@@ -73,11 +98,10 @@ async def get_current_super_admin(
             detail="Super admin access required"
         )
 
-    result = await session.execute(select(User).where(User.user_id == int(user_id)))
-    user = result.scalars().first()
-    if not user or not user.is_active or not user.is_super_admin:
+    principal = await principal_service.get_principal(session, int(user_id))
+    if not principal or not principal.is_active or not principal.is_super_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Super admin access required"
         )
-    return user
+    return principal
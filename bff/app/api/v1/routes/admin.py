@@ -3,20 +3,23 @@ from __future__ import annotations
 from datetime import datetime
 from decimal import Decimal
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy import and_, desc, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_admin, get_current_super_admin, get_db_session
-from app.core.security import get_password_hash
+from app.api.deps import get_current_admin, get_current_super_admin, get_db_session, get_page_cursor
+from app.core.security import get_password_hash_async
 from app.models.driver import Driver
 from app.models.driver_performance import DriverAlert, DriverPerformance as DriverPerformanceModel, DriverPerformanceLog
 from app.models.order import Order
 from app.models.user import User
 from app.schemas.admin import (
+    AdminDashboardPoint,
     AdminDashboardStats,
     AdminPrepareGoodsSummary,
     AlertActionRequest,
+    AutoDispatchRequest,
+    AutoDispatchResult,
     BulkActionRequest,
     DispatchDriver,
     DriverAlertResponse,
@@ -27,12 +30,15 @@ from app.schemas.admin import (
     DriverPerformanceMetrics,
     DriverResponse,
     DriverUpdate,
+    NearbyDriver,
     OrderDispatch,
     PerformanceAnalyticsRequest,
     PerformanceComparisonResponse
 )
 from app.models.prepare_goods import PrepareGoods
-from app.services import order_service
+from app.services import dashboard_service, dispatch_service, driver_location_service, event_service, marks_service, order_service, package_detail_service, photo_service, principal_service, search_service
+from app.services.principal_service import Principal
+from app.utils import NEXT_CURSOR_HEADER, PageCursor, apply_keyset, next_cursor
 
 router = APIRouter()
 
@@ -40,89 +46,29 @@ router = APIRouter()
 @router.get("/dashboard", response_model=AdminDashboardStats)
 async def get_dashboard_stats(
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> AdminDashboardStats:
-    """Get admin dashboard statistics from tigu_prepare_goods table"""
+    """Get admin dashboard statistics (cached, refreshed every few seconds in the background)"""
+    return await dashboard_service.get_dashboard_stats(session)
 
-    # Get driver statistics from tigu_driver table
-    total_drivers_result = await session.execute(
-        select(func.count(Driver.id))
-    )
-    total_drivers = total_drivers_result.scalar() or 0
-
-    active_drivers_result = await session.execute(
-        select(func.count(Driver.id)).where(Driver.status == 1)
-    )
-    active_drivers = active_drivers_result.scalar() or 0
-
-    # Get order statistics from tigu_prepare_goods table (exclude merchant self-delivery)
-    total_orders_result = await session.execute(
-        select(func.count(PrepareGoods.id)).where(PrepareGoods.delivery_type != 0)
-    )
-    total_orders = total_orders_result.scalar() or 0
-
-    # Pending: prepare_status is NULL or 0 (waiting to be prepared or just prepared)
-    pending_orders_result = await session.execute(
-        select(func.count(PrepareGoods.id)).where(
-            and_(
-                PrepareGoods.delivery_type != 0,
-                (PrepareGoods.prepare_status.is_(None)) | (PrepareGoods.prepare_status == 0)
-            )
-        )
-    )
-    pending_orders = pending_orders_result.scalar() or 0
-
-    # In transit: prepare_status 1-6 (driver claimed, pickup, to warehouse, etc.)
-    in_transit_orders_result = await session.execute(
-        select(func.count(PrepareGoods.id)).where(
-            and_(
-                PrepareGoods.delivery_type != 0,
-                PrepareGoods.prepare_status.in_([1, 2, 3, 4, 5, 6])
-            )
-        )
-    )
-    in_transit_orders = in_transit_orders_result.scalar() or 0
-
-    # Completed: prepare_status = 7 (delivered)
-    completed_orders_result = await session.execute(
-        select(func.count(PrepareGoods.id)).where(
-            and_(
-                PrepareGoods.delivery_type != 0,
-                PrepareGoods.prepare_status == 7
-            )
-        )
-    )
-    completed_orders = completed_orders_result.scalar() or 0
-
-    completion_rate = (completed_orders / total_orders * 100) if total_orders > 0 else 0
 
-    return AdminDashboardStats(
-        total_drivers=total_drivers,
-        active_drivers=active_drivers,
-        total_orders=total_orders,
-        pending_orders=pending_orders,
-        in_transit_orders=in_transit_orders,
-        completed_orders=completed_orders,
-        completion_rate=completion_rate
-    )
+@router.get("/dashboard/hourly", response_model=List[AdminDashboardPoint])
+async def get_dashboard_hourly(
+    hours: int = Query(default=24, ge=1, le=168),
+    current_admin: Principal = Depends(get_current_admin)
+) -> List[AdminDashboardPoint]:
+    """Get hourly snapshots of the dashboard statistics, oldest first"""
+    return await dashboard_service.get_dashboard_hourly(hours)
 
 
 @router.get("/dispatch/drivers", response_model=List[DispatchDriver])
 async def get_dispatch_drivers(
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> List[DispatchDriver]:
     """Return drivers that are available for manual/auto dispatch."""
 
-    active_loads_subquery = (
-        select(
-            Order.driver_id.label("driver_id"),
-            func.count(Order.id).label("current_load")
-        )
-        .where(Order.shipping_status.in_([0, 1, 2]))
-        .group_by(Order.driver_id)
-        .subquery()
-    )
+    active_loads_subquery = driver_location_service.driver_load_subquery()
 
     query = (
         select(
@@ -139,26 +85,61 @@ async def get_dispatch_drivers(
     result = await session.execute(query)
     rows = result.all()
 
-    dispatch_drivers: List[DispatchDriver] = []
-    for driver, user, current_load in rows:
-        dispatch_drivers.append(DispatchDriver(
-            driver_id=driver.id,
-            user_id=user.user_id if user else None,
-            name=driver.name,
-            nick_name=user.nick_name if user else driver.name,
-            phone=driver.phone,
-            vehicle_type=driver.vehicle_type,
-            vehicle_plate=driver.vehicle_plate,
-            status=driver.status,
-            rating=float(driver.rating or 0),
-            total_deliveries=driver.total_deliveries or 0,
-            current_load=current_load or 0,
-            max_load=10,
-            current_location=None,
-            is_available=driver.status == 1
-        ))
+    locations = await driver_location_service.load_driver_locations(
+        [user.user_id for _, user, _ in rows if user]
+    )
+
+    return [
+        driver_location_service.build_dispatch_driver(
+            driver,
+            user,
+            current_load,
+            current_location=driver_location_service.format_location(
+                locations.get(user.user_id) if user else None
+            )
+        )
+        for driver, user, current_load in rows
+    ]
+
+
+@router.get("/dispatch/drivers/nearest", response_model=List[NearbyDriver])
+async def get_nearest_dispatch_drivers(
+    target_type: Optional[str] = Query(None, description="shop, warehouse or mark"),
+    target_id: Optional[int] = Query(None, ge=1),
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    limit: int = Query(5, ge=1, le=50),
+    radius_km: float = Query(50.0, gt=0, le=500),
+    session: AsyncSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_current_admin)
+) -> List[NearbyDriver]:
+    """
+    Return the nearest available drivers to a shop, warehouse, mark or raw coordinate.
 
-    return dispatch_drivers
+    Drivers are ranked by live position (Redis GEO) and include their current load.
+    """
+    if target_type is not None and target_id is not None:
+        try:
+            location = await driver_location_service.resolve_target_location(
+                session, target_type, target_id
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+        if location is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No coordinates found for {target_type} {target_id}"
+            )
+        latitude, longitude = location
+    elif latitude is None or longitude is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide target_type and target_id, or latitude and longitude"
+        )
+
+    return await driver_location_service.find_nearest_drivers(
+        session, latitude, longitude, limit=limit, radius_km=radius_km
+    )
 
 
 @router.get("/drivers", response_model=List[DriverResponse])
@@ -168,7 +149,7 @@ async def get_all_drivers(
     search: Optional[str] = Query(None, description="Search by name, phone, or vehicle plate"),
     status: Optional[int] = Query(None, description="Filter by status (1=active, 0=inactive)"),
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> List[DriverResponse]:
     """Get list of all drivers with pagination and filtering (with optional user account info)"""
 
@@ -214,7 +195,7 @@ async def get_all_drivers(
 async def get_driver(
     driver_id: int,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> DriverResponse:
     """Get specific driver details (with optional user account info)"""
 
@@ -247,7 +228,7 @@ async def get_driver(
 async def create_driver(
     driver_data: DriverCreate,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> DriverResponse:
     """Create a new driver (creates records in both sys_user and tigu_driver tables)"""
 
@@ -285,7 +266,7 @@ async def create_driver(
         )
 
     # Hash the password
-    hashed_password = get_password_hash(driver_data.password)
+    hashed_password = await get_password_hash_async(driver_data.password)
 
     # Generate new user_id (get max user_id and increment)
     max_user_id_result = await session.execute(
@@ -351,7 +332,7 @@ async def update_driver(
     driver_id: int,
     driver_data: DriverUpdate,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> DriverResponse:
     """Update driver information"""
 
@@ -364,6 +345,7 @@ async def update_driver(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Driver not found")
 
     # Update only provided fields
+    previous_phone = driver.phone
     update_data = driver_data.dict(exclude_unset=True)
     if update_data:
         await session.execute(
@@ -371,6 +353,9 @@ async def update_driver(
         )
         await session.commit()
         await session.refresh(driver)
+        if driver.phone != previous_phone:
+            # The phone links sys_user to tigu_driver, so both users' principals change
+            await principal_service.invalidate_phones(session, [previous_phone, driver.phone])
 
     # Map fields for frontend compatibility (check if sys_user account exists)
     result = await session.execute(
@@ -394,7 +379,7 @@ async def update_driver(
 async def delete_driver(
     driver_id: int,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> dict:
     """Delete a driver"""
 
@@ -415,6 +400,7 @@ async def delete_driver(
     )
     
     await session.commit()
+    await principal_service.invalidate_phones(session, [driver.phone])
 
     return {"message": "Driver deleted successfully"}
 
@@ -423,7 +409,7 @@ async def delete_driver(
 async def activate_driver(
     driver_id: int,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> dict:
     """Activate a driver"""
 
@@ -447,6 +433,7 @@ async def activate_driver(
     )
     
     await session.commit()
+    await principal_service.invalidate_phones(session, [driver.phone])
 
     return {"message": "Driver activated successfully"}
 
@@ -455,7 +442,7 @@ async def activate_driver(
 async def deactivate_driver(
     driver_id: int,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> dict:
     """Deactivate a driver"""
 
@@ -479,6 +466,8 @@ async def deactivate_driver(
     )
     
     await session.commit()
+    # Cached principals would otherwise keep authenticating the driver until they expire
+    await principal_service.invalidate_phones(session, [driver.phone])
 
     return {"message": "Driver deactivated successfully"}
 
@@ -487,7 +476,7 @@ async def deactivate_driver(
 async def get_driver_performance(
     driver_id: int,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> DriverPerformance:
     """Get driver performance metrics"""
 
@@ -530,10 +519,11 @@ async def get_driver_performance(
 async def bulk_driver_action(
     action_data: BulkActionRequest,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> dict:
     """Perform bulk actions on multiple drivers"""
 
+    phone_numbers: List[str] = []
     if action_data.action == "activate":
         # Get phone numbers for the drivers
         drivers_result = await session.execute(
@@ -578,6 +568,7 @@ async def bulk_driver_action(
             )
             driver = result.scalars().first()
             if driver:
+                phone_numbers.append(driver.phone)
                 await session.delete(driver)
                 # Also delete/deactivate associated sys_user account
                 await session.execute(
@@ -590,6 +581,7 @@ async def bulk_driver_action(
         )
 
     await session.commit()
+    await principal_service.invalidate_phones(session, phone_numbers)
 
     return {"message": f"Bulk {action_data.action} completed for {len(action_data.driver_ids)} drivers"}
 
@@ -599,7 +591,7 @@ async def assign_order_to_driver(
     order_sn: str,
     assignment: DriverAssignment,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> dict:
     """Manually assign order to a specific driver"""
 
@@ -633,6 +625,8 @@ async def assign_order_to_driver(
     )
     await session.commit()
 
+    await event_service.publish_orders_assigned({driver.id: [order_sn]})
+
     return {"message": f"Order {order_sn} assigned to driver {driver.name}"}
 
 
@@ -641,7 +635,7 @@ async def assign_package_to_driver(
     prepare_sn: str,
     assignment: DriverAssignment,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> dict:
     """Manually assign a prepare goods package to a specific driver"""
 
@@ -666,6 +660,8 @@ async def assign_package_to_driver(
     if not driver:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Active driver not found")
 
+    before = marks_service.package_state(package)
+
     # Assign package to driver and set status to 6 (司机已认领 - Driver claimed)
     await session.execute(
         update(PrepareGoods).where(PrepareGoods.prepare_sn == prepare_sn).values(
@@ -676,6 +672,12 @@ async def assign_package_to_driver(
     )
     await session.commit()
 
+    await marks_service.record_package_change(before, driver_id=assignment.driver_id, prepare_status=6)
+    await event_service.publish_package_change(
+        prepare_sn, before, driver_id=assignment.driver_id, prepare_status=6
+    )
+    await package_detail_service.invalidate([prepare_sn])
+
     return {"message": f"Package {prepare_sn} assigned to driver {driver.name}"}
 
 
@@ -683,11 +685,12 @@ async def assign_package_to_driver(
 async def dispatch_orders(
     dispatch_data: List[OrderDispatch],
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> dict:
     """Bulk dispatch orders to drivers"""
 
     dispatched_count = 0
+    dispatched_by_driver: dict[int, list[str]] = {}
 
     for dispatch in dispatch_data:
         # Check if order exists and is available for dispatch
@@ -723,12 +726,35 @@ async def dispatch_orders(
             )
         )
         dispatched_count += 1
+        dispatched_by_driver.setdefault(dispatch.driver_id, []).append(dispatch.order_sn)
 
     await session.commit()
 
+    await event_service.publish_orders_assigned(dispatched_by_driver)
+
     return {"message": f"Successfully dispatched {dispatched_count} orders"}
 
 
+@router.post("/orders/dispatch/auto", response_model=AutoDispatchResult)
+async def auto_dispatch_orders(
+    request: AutoDispatchRequest,
+    session: AsyncSession = Depends(get_db_session),
+    current_admin: Principal = Depends(get_current_admin)
+) -> AutoDispatchResult:
+    """
+    Automatically assign all available packages to nearby drivers.
+
+    Solves a cost-minimizing assignment over driver → pickup distance, current
+    load and capacity. With dry_run=true nothing is written.
+    """
+    return await dispatch_service.auto_dispatch(
+        session,
+        dry_run=request.dry_run,
+        max_distance_km=request.max_distance_km,
+        limit=request.limit
+    )
+
+
 # Performance monitoring endpoints
 
 @router.get("/performance/drivers", response_model=List[DriverPerformanceMetrics])
@@ -737,7 +763,7 @@ async def get_drivers_performance(
     end_date: datetime = Query(..., description="End date for performance period"),
     driver_ids: Optional[List[int]] = Query(None, description="Specific driver IDs to analyze"),
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> List[DriverPerformanceMetrics]:
     """Get performance metrics for drivers within a time period"""
 
@@ -791,7 +817,7 @@ async def get_driver_performance_logs(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> List[DriverPerformanceLogEntry]:
     """Get detailed performance logs for a specific driver"""
 
@@ -822,7 +848,7 @@ async def get_performance_alerts(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> List[DriverAlertResponse]:
     """Get performance alerts with filtering options"""
 
@@ -870,7 +896,7 @@ async def handle_alert_action(
     alert_id: int,
     action_request: AlertActionRequest,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> dict:
     """Handle alert actions (acknowledge, resolve, dismiss)"""
 
@@ -920,7 +946,7 @@ async def handle_alert_action(
 async def get_performance_analytics(
     analytics_request: PerformanceAnalyticsRequest,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> List[PerformanceComparisonResponse]:
     """Get comprehensive performance analytics and comparisons"""
 
@@ -987,7 +1013,7 @@ async def log_driver_action(
     distance_km: Optional[float] = None,
     notes: Optional[str] = None,
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> dict:
     """Log a driver action for performance tracking"""
 
@@ -1019,9 +1045,7 @@ async def log_driver_action(
     return {"message": "Driver action logged successfully"}
 
 
-from app.schemas.prepare_goods import PrepareGoodsDetailResponse, PrepareGoodsItemSchema, UploadedFileSchema
-from app.services import prepare_goods_service
-from app.utils import parse_order_id_list
+from app.schemas.prepare_goods import PrepareGoodsDetailResponse
 
 
 # Prepare status labels for admin display
@@ -1047,15 +1071,22 @@ def _parse_order_ids(order_ids_str: str) -> List[int]:
 
 @router.get("/orders", response_model=List[AdminPrepareGoodsSummary])
 async def list_orders(
+    response: Response,
     status: Optional[int] = Query(None, ge=0, le=7, description="Filter by prepare_status"),
     driver_id: Optional[int] = Query(None, ge=1),
     unassigned: bool = Query(False),
     search: Optional[str] = Query(None, min_length=1),
     limit: int = Query(100, ge=1, le=500),
+    after: Optional[PageCursor] = Depends(get_page_cursor),
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> List[AdminPrepareGoodsSummary]:
-    """List prepare goods packages for admin console with optional filtering."""
+    """
+    List prepare goods packages for admin console with optional filtering.
+
+    Newest first. When more rows may follow, the X-Next-Cursor response
+    header holds the cursor to pass as ?cursor= for the next page.
+    """
     from sqlalchemy.orm import selectinload
 
     stmt = (
@@ -1065,9 +1096,9 @@ async def list_orders(
             selectinload(PrepareGoods.driver)
         )
         .where(PrepareGoods.delivery_type != 0)  # Exclude merchant self-delivery
-        .order_by(desc(PrepareGoods.create_time))
         .limit(limit)
     )
+    stmt = apply_keyset(stmt, PrepareGoods.create_time, PrepareGoods.id, after)
 
     if status is not None:
         stmt = stmt.where(PrepareGoods.prepare_status == status)
@@ -1079,19 +1110,15 @@ async def list_orders(
         stmt = stmt.where(PrepareGoods.driver_id.is_(None))
 
     if search:
-        from sqlalchemy import or_
-        pattern = f"%{search}%"
-        stmt = stmt.where(
-            or_(
-                PrepareGoods.prepare_sn.ilike(pattern),
-                PrepareGoods.receiver_name.ilike(pattern),
-                PrepareGoods.receiver_phone.ilike(pattern),
-                PrepareGoods.order_ids.ilike(pattern)
-            )
-        )
+        condition = search_service.prepare_goods_search_condition(search)
+        if condition is not None:
+            stmt = stmt.where(condition)
 
     result = await session.execute(stmt)
     packages = result.scalars().unique().all()
+    cursor = next_cursor(packages, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
 
     summaries = []
     for pkg in packages:
@@ -1124,14 +1151,20 @@ async def list_orders(
 @router.get("/packages/{prepare_sn}", response_model=PrepareGoodsDetailResponse, response_model_by_alias=True)
 async def get_package_detail(
     prepare_sn: str,
+    photo_size: photo_service.PhotoVariant = Query(
+        default=photo_service.DEFAULT_PHOTO_VARIANT,
+        alias="photoSize",
+        description="Photo version returned as fileUrl (originalUrl is always included)"
+    ),
     session: AsyncSession = Depends(get_db_session),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ) -> PrepareGoodsDetailResponse:
     """
     Get prepare package detail by serial number (admin access).
 
     Args:
         prepare_sn: Prepare goods serial number
+        photo_size: thumbnail (default), display or original
         session: Database session
         current_admin: Authenticated admin user
 
@@ -1141,118 +1174,12 @@ async def get_package_detail(
     Raises:
         HTTPException 404: Package not found
     """
-    from app.models.order import UploadedFile
-
-    prepare_goods = await prepare_goods_service.get_prepare_package(session, prepare_sn)
+    detail = await package_detail_service.get_package_detail(session, prepare_sn, photo_size)
 
-    if not prepare_goods:
+    if not detail:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Prepare package not found: {prepare_sn}"
         )
 
-    # Build response with items
-    items = [
-        PrepareGoodsItemSchema(
-            prepare_id=item.prepare_id,
-            order_item_id=item.order_item_id,
-            product_id=item.product_id,
-            sku_id=item.sku_id,
-            quantity=item.quantity
-        )
-        for item in prepare_goods.items
-    ]
-
-    # Fetch order serial numbers
-    order_ids = parse_order_id_list(prepare_goods.order_ids)
-    order_serial_numbers = []
-    if order_ids:
-        result = await session.execute(
-            select(Order.order_sn).where(Order.id.in_(order_ids))
-        )
-        order_serial_numbers = [row[0] for row in result.fetchall()]
-
-    # Fetch pickup photos from prepare_good
-    photos_result = await session.execute(
-        select(UploadedFile)
-        .where(UploadedFile.biz_type == "prepare_good")
-        .where(UploadedFile.biz_id == prepare_goods.id)
-        .order_by(UploadedFile.create_time.desc())
-    )
-    pickup_photos = [
-        UploadedFileSchema(
-            id=photo.id,
-            file_name=photo.file_name,
-            file_url=photo.file_url,
-            file_type=photo.file_type,
-            file_size=photo.file_size,
-            uploader_name=photo.uploader_name,
-            create_time=photo.create_time
-        )
-        for photo in photos_result.scalars().all()
-    ]
-
-    # Fetch photos from order_action for orders in this package
-    if order_ids:
-        from app.models.order_action import OrderAction
-
-        # Determine which action types to fetch based on package type
-        if prepare_goods.type == 1:
-            action_types = [3, 5]
-        else:
-            action_types = [0, 5]
-
-        action_result = await session.execute(
-            select(OrderAction)
-            .where(OrderAction.order_id.in_(order_ids))
-            .where(OrderAction.action_type.in_(action_types))
-            .order_by(OrderAction.create_time.desc())
-        )
-        actions = action_result.scalars().all()
-
-        # Extract file IDs from logistics_voucher_file
-        action_file_ids = []
-        for action in actions:
-            if action.logistics_voucher_file:
-                file_ids = [int(fid.strip()) for fid in action.logistics_voucher_file.split(',') if fid.strip().isdigit()]
-                action_file_ids.extend(file_ids)
-
-        if action_file_ids:
-            action_photos_result = await session.execute(
-                select(UploadedFile)
-                .where(UploadedFile.id.in_(action_file_ids))
-            )
-            action_photos = [
-                UploadedFileSchema(
-                    id=photo.id,
-                    file_name=photo.file_name,
-                    file_url=photo.file_url,
-                    file_type=photo.file_type,
-                    file_size=photo.file_size,
-                    uploader_name=photo.uploader_name,
-                    create_time=photo.create_time
-                )
-                for photo in action_photos_result.scalars().all()
-            ]
-            pickup_photos.extend(action_photos)
-
-    return PrepareGoodsDetailResponse(
-        id=prepare_goods.id,
-        prepare_sn=prepare_goods.prepare_sn,
-        order_ids=prepare_goods.order_ids,
-        delivery_type=prepare_goods.delivery_type,
-        shipping_type=prepare_goods.shipping_type,
-        prepare_status=prepare_goods.prepare_status,
-        shop_id=prepare_goods.shop_id,
-        warehouse_id=prepare_goods.warehouse_id,
-        driver_id=prepare_goods.driver_id,
-        create_time=prepare_goods.create_time,
-        update_time=prepare_goods.update_time,
-        items=items,
-        warehouse_name=prepare_goods.warehouse.name if prepare_goods.warehouse else None,
-        driver_name=prepare_goods.driver.name if prepare_goods.driver else None,
-        receiver_address=prepare_goods.receiver_address,
-        total_value=float(prepare_goods.total_value) if prepare_goods.total_value else None,
-        order_serial_numbers=order_serial_numbers,
-        pickup_photos=pickup_photos
-    )
+    return detail
@@ -4,10 +4,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_db_session
 from app.core.config import get_settings
-from app.core.security import create_access_token, create_refresh_token, get_password_hash, validate_token, verify_password
+from app.core.security import create_access_token, create_refresh_token, get_password_hash_async, validate_token, verify_password_async
 from app.models.user import User
 from app.schemas.admin import AdminLoginRequest
 from app.schemas.auth import LoginRequest, RefreshRequest, TokenResponse
+from app.services import principal_service
 from app.services.cache import get_refresh_token, store_refresh_token
 
 router = APIRouter()
@@ -17,6 +18,24 @@ def _normalize_phone(phone: str) -> str:
     return phone.replace(" ", "")
 
 
+async def _issue_tokens(session: AsyncSession, user_id: int) -> TokenResponse:
+    """Issue an access/refresh pair, re-reading the principal so its claims and cache are fresh."""
+    principal = await principal_service.refresh_principal(session, user_id)
+    if principal is None or not principal.is_active:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+
+    subject = str(principal.user_id)
+    access_token = create_access_token(
+        subject, principal.role, driver_id=principal.driver_id, phone=principal.phonenumber
+    )
+    refresh_token = create_refresh_token(subject, principal.role)
+
+    settings = get_settings()
+    await store_refresh_token(principal.user_id, refresh_token, settings.refresh_token_expire_minutes * 60)
+
+    return TokenResponse(accessToken=access_token, refreshToken=refresh_token)
+
+
 @router.post("/login", response_model=TokenResponse)
 async def login(payload: LoginRequest, session: AsyncSession = Depends(get_db_session)) -> TokenResponse:
     from datetime import datetime
@@ -35,13 +54,7 @@ async def login(payload: LoginRequest, session: AsyncSession = Depends(get_db_se
     user.login_date = datetime.now()
     await session.commit()
 
-    access_token = create_access_token(str(user.user_id), user.effective_role)
-    refresh_token = create_refresh_token(str(user.user_id), user.effective_role)
-
-    settings = get_settings()
-    await store_refresh_token(user.user_id, refresh_token, settings.refresh_token_expire_minutes * 60)
-
-    return TokenResponse(accessToken=access_token, refreshToken=refresh_token)
+    return await _issue_tokens(session, user.user_id)
 
 
 @router.post("/admin/login", response_model=TokenResponse)
@@ -51,7 +64,7 @@ async def admin_login(payload: AdminLoginRequest, session: AsyncSession = Depend
     if not user or not user.is_active or not user.is_admin:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin credentials")
 
-    if not verify_password(payload.password, user.password):
+    if not await verify_password_async(payload.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin credentials")
 
     # Update login date if column exists
@@ -64,13 +77,7 @@ async def admin_login(payload: AdminLoginRequest, session: AsyncSession = Depend
         # Ignore if login_date column doesn't exist
         pass
 
-    access_token = create_access_token(str(user.user_id), user.effective_role)
-    refresh_token = create_refresh_token(str(user.user_id), user.effective_role)
-
-    settings = get_settings()
-    await store_refresh_token(user.user_id, refresh_token, settings.refresh_token_expire_minutes * 60)
-
-    return TokenResponse(accessToken=access_token, refreshToken=refresh_token)
+    return await _issue_tokens(session, user.user_id)
 
 
 @router.post("/refresh", response_model=TokenResponse)
@@ -83,17 +90,8 @@ async def refresh(payload: RefreshRequest, session: AsyncSession = Depends(get_d
     if expected != payload.refresh_token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired")
 
-    # Get user to include role in new tokens
-    result = await session.execute(select(User).where(User.user_id == int(subject)))
-    user = result.scalars().first()
-    if not user or not user.is_active:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-
-    access_token = create_access_token(subject, user.role)
-    refresh_token = create_refresh_token(subject, user.role)
-    settings = get_settings()
-    await store_refresh_token(int(subject), refresh_token, settings.refresh_token_expire_minutes * 60)
-    return TokenResponse(accessToken=access_token, refreshToken=refresh_token)
+    # The principal is re-read so the new tokens carry current role and driver claims
+    return await _issue_tokens(session, int(subject))
 
 
 @router.post("/register-driver")
@@ -149,7 +147,7 @@ async def register_driver(
         )
     
     # Hash password
-    hashed_password = get_password_hash(payload["password"])
+    hashed_password = await get_password_hash_async(payload["password"])
     
     # Generate new user_id
     max_user_id_result = await session.execute(select(func.max(User.user_id)))
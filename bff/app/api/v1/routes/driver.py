@@ -1,26 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db_session
+from app.api.deps import get_current_driver, get_db_session
 from app.models.driver import Driver
 from app.models.user import User
 from app.schemas.driver import DriverProfileResponse, DriverProfileUpdateRequest
+from app.schemas.driver_sync import DriverSyncRequest, DriverSyncResponse
+from app.services import driver_sync_service, principal_service
+from app.services.principal_service import Principal
 
 router = APIRouter()
 
 
 @router.get("/profile", response_model=DriverProfileResponse)
 async def get_driver_profile(
-    current_user: User = Depends(get_current_user),
+    current_driver: Principal = Depends(get_current_driver),
     session: AsyncSession = Depends(get_db_session)
 ) -> DriverProfileResponse:
     """Get the current driver's profile information"""
-    # Find driver by phone number (links sys_user to tigu_driver)
-    result = await session.execute(
-        select(Driver).where(Driver.phone == current_user.phonenumber)
-    )
-    driver = result.scalars().first()
+    driver = await session.get(Driver, current_driver.driver_id)
 
     if not driver:
         raise HTTPException(
@@ -51,15 +50,11 @@ async def get_driver_profile(
 @router.put("/profile", response_model=DriverProfileResponse)
 async def update_driver_profile(
     payload: DriverProfileUpdateRequest,
-    current_user: User = Depends(get_current_user),
+    current_driver: Principal = Depends(get_current_driver),
     session: AsyncSession = Depends(get_db_session)
 ) -> DriverProfileResponse:
     """Update the current driver's profile information"""
-    # Find driver by phone number
-    result = await session.execute(
-        select(Driver).where(Driver.phone == current_user.phonenumber)
-    )
-    driver = result.scalars().first()
+    driver = await session.get(Driver, current_driver.driver_id)
 
     if not driver:
         raise HTTPException(
@@ -74,16 +69,21 @@ async def update_driver_profile(
         if value is not None:
             setattr(driver, field, value)
 
-    # Also update name in sys_user if changed
+    # Also update name and email in sys_user if changed
+    user_values = {}
     if payload.name is not None:
-        current_user.nick_name = payload.name
-
-    # Also update email in sys_user if changed
+        user_values["nick_name"] = payload.name
     if payload.email is not None:
-        current_user.email = payload.email
+        user_values["email"] = payload.email
+    if user_values:
+        await session.execute(
+            update(User).where(User.user_id == current_driver.user_id).values(**user_values)
+        )
 
     await session.commit()
     await session.refresh(driver)
+    if user_values:
+        await principal_service.invalidate([current_driver.user_id])
 
     return DriverProfileResponse(
         id=driver.id,
@@ -103,3 +103,27 @@ async def update_driver_profile(
         stripe_details_submitted=driver.stripe_details_submitted or False,
         stripe_connected_at=driver.stripe_connected_at
     )
+
+
+@router.post("/sync", response_model=DriverSyncResponse, response_model_by_alias=True)
+async def sync_offline_actions(
+    payload: DriverSyncRequest,
+    current_driver: Principal = Depends(get_current_driver),
+    session: AsyncSession = Depends(get_db_session)
+) -> DriverSyncResponse:
+    """
+    Apply the actions the driver app queued while offline, oldest first.
+
+    Supported types: claim, confirm_pickup, confirm_delivery (one transaction
+    per run of actions on the same package), arrive_warehouse and location.
+    Each action gets its own outcome with the status its single endpoint
+    would have returned; a rejected action does not stop the ones after it.
+    Re-sending an idempotencyKey returns the stored outcome (replayed=true)
+    instead of applying the action again.
+    """
+    return await driver_sync_service.sync_actions(
+        session,
+        driver_id=current_driver.driver_id,
+        user_id=current_driver.user_id,
+        actions=payload.actions
+    )
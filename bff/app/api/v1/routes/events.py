@@ -0,0 +1,51 @@
+"""
+Server-push event stream.
+
+Drivers keep one Server-Sent Events connection open and receive package
+availability changes, assignments and notifications as they happen,
+instead of polling the list endpoints.
+"""
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from app.api import deps
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.services import event_service
+
+router = APIRouter()
+
+
+@router.get("/stream")
+async def stream_events(
+    token: str = Query(..., description="Access token (EventSource cannot send headers)")
+) -> StreamingResponse:
+    """
+    Open a Server-Sent Events stream for the authenticated user.
+
+    Every user receives pickup pool events; drivers additionally receive
+    their own assignment, package status and notification events. A
+    packages.changed event is sent on every (re)connect so clients can
+    refetch anything missed while disconnected.
+
+    Args:
+        token: Access token
+
+    Raises:
+        HTTPException 401: Invalid token or inactive user
+    """
+    settings = get_settings()
+
+    # Short-lived session (only used on a principal cache miss): the stream must not hold a DB connection
+    async with AsyncSessionLocal() as session:
+        principal = await deps.authenticate_access_token(token, session)
+
+    return StreamingResponse(
+        event_service.event_stream(
+            principal.driver_id,
+            keepalive_seconds=settings.event_stream_keepalive_seconds,
+            retry_ms=settings.event_stream_retry_ms
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
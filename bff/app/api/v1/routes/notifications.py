@@ -10,9 +10,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.models.driver import Driver
-from app.models.user import User
 from app.services import notification_service
 from app.services.notification_service import NotificationPriority, NotificationType
+from app.services.principal_service import Principal
 
 router = APIRouter()
 
@@ -48,7 +48,7 @@ class SingleNotificationRequest(BaseModel):
 @router.post("/broadcast", response_model=NotificationResponse)
 async def broadcast_notification(
     payload: BroadcastRequest,
-    current_user: Annotated[User, Depends(deps.get_current_admin)],
+    current_user: Annotated[Principal, Depends(deps.get_current_admin)],
     session: Annotated[AsyncSession, Depends(deps.get_db_session)]
 ) -> NotificationResponse:
     """
@@ -101,7 +101,7 @@ async def broadcast_notification(
 async def send_driver_notification(
     driver_id: int,
     payload: SingleNotificationRequest,
-    current_user: Annotated[User, Depends(deps.get_current_admin)],
+    current_user: Annotated[Principal, Depends(deps.get_current_admin)],
     session: Annotated[AsyncSession, Depends(deps.get_db_session)]
 ) -> NotificationResponse:
     """Send notification to a specific driver (admin only)."""
@@ -148,7 +148,7 @@ async def send_driver_notification(
 async def send_urgent_alert(
     driver_id: int,
     payload: SingleNotificationRequest,
-    current_user: Annotated[User, Depends(deps.get_current_admin)],
+    current_user: Annotated[Principal, Depends(deps.get_current_admin)],
     session: Annotated[AsyncSession, Depends(deps.get_db_session)]
 ) -> NotificationResponse:
     """Send urgent alert to a specific driver (admin only)."""
@@ -6,15 +6,17 @@ Endpoints for order workflow audit trail:
 - Get workflow timeline with photos
 - Query specific actions
 """
-from typing import List
+from typing import List, Union
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.schemas.order_action import (
     OrderActionResponse,
     OrderActionWithFilesResponse,
+    WorkflowTimelineCompactItem,
+    WorkflowTimelineCompactResponse,
     WorkflowTimelineItem,
     WorkflowTimelineResponse,
     get_action_type_label,
@@ -86,12 +88,17 @@ async def get_order_actions(
     ]
 
 
-@router.get("/{order_sn}/timeline", response_model=WorkflowTimelineResponse, response_model_by_alias=True)
+@router.get(
+    "/{order_sn}/timeline",
+    response_model=Union[WorkflowTimelineResponse, WorkflowTimelineCompactResponse],
+    response_model_by_alias=True
+)
 async def get_workflow_timeline(
     order_sn: str,
+    compact: bool = Query(False, description="Return only ids and thumbnail URLs (list views)"),
     current_user=Depends(deps.get_current_user),
     session: AsyncSession = Depends(deps.get_db_session)
-) -> WorkflowTimelineResponse:
+) -> Union[WorkflowTimelineResponse, WorkflowTimelineCompactResponse]:
     """
     Get complete workflow timeline for an order with file URLs.
 
@@ -99,6 +106,7 @@ async def get_workflow_timeline(
 
     Args:
         order_sn: Order serial number
+        compact: Return the compact shape (ids, type, time, thumbnails)
         current_user: Authenticated user
         session: Database session
 
@@ -125,9 +133,26 @@ async def get_workflow_timeline(
     # Get timeline
     timeline_data = await order_action_service.get_workflow_timeline(
         session=session,
-        order_id=order.id
+        order_id=order.id,
+        compact=compact
     )
 
+    if compact:
+        return WorkflowTimelineCompactResponse(
+            order_sn=order_sn,
+            timeline=[
+                WorkflowTimelineCompactItem(
+                    action_id=item["action_id"],
+                    action_type=item["action_type"],
+                    action_type_label=get_action_type_label(item["action_type"]),
+                    create_time=item["create_time"],
+                    file_ids=item["file_ids"],
+                    thumbnails=item["thumbnails"]
+                )
+                for item in timeline_data
+            ]
+        )
+
     # Build timeline items
     timeline_items = [
         WorkflowTimelineItem(
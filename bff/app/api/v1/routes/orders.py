@@ -1,9 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.models.driver import Driver
 from app.schemas.order import (
     ArriveWarehouseRequest,
     CompleteDeliveryRequest,
@@ -39,7 +37,7 @@ async def get_order_detail(
 async def arrive_warehouse(
     order_sn: str,
     payload: ArriveWarehouseRequest,
-    current_user=Depends(deps.get_current_user),
+    current_driver=Depends(deps.get_current_driver),
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> None:
     """
@@ -55,22 +53,16 @@ async def arrive_warehouse(
     Args:
         order_sn: Order serial number
         payload: Arrival request with photo IDs
-        current_user: Authenticated user
+        current_driver: Authenticated driver
         session: Database session
 
     Raises:
         HTTPException 404: Driver not found or order not found
     """
-    # Look up driver by phone number to get driver_id
-    result = await session.execute(select(Driver).where(Driver.phone == current_user.phonenumber))
-    driver = result.scalars().first()
-    if not driver:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Driver not found")
-
     arrived = await order_service.arrive_warehouse(
         session=session,
         order_sn=order_sn,
-        driver_id=driver.id,
+        driver_id=current_driver.driver_id,
         photo_ids=payload.photo_ids
     )
 
@@ -186,13 +178,8 @@ async def complete_delivery(
     Raises:
         HTTPException 404: Driver not found or order not found
     """
-    # Look up driver by phone number to get driver_id (for driver deliveries)
-    # Or use current user ID for merchant deliveries
-    result = await session.execute(select(Driver).where(Driver.phone == current_user.phonenumber))
-    driver = result.scalars().first()
-
-    # Use driver ID if driver exists, otherwise use current user ID
-    completer_id = driver.id if driver else current_user.user_id
+    # Use driver ID for driver deliveries, otherwise current user ID (merchant deliveries)
+    completer_id = current_user.driver_id or current_user.user_id
 
     completed = await order_service.complete_delivery(
         session=session,
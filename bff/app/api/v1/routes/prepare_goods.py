@@ -9,13 +9,10 @@ Endpoints for merchant preparation workflow:
 """
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.models.driver import Driver
-from app.models.order import Order
 from app.schemas.prepare_goods import (
     AssignDriverRequest,
     ConfirmPickupRequest,
@@ -25,8 +22,8 @@ from app.schemas.prepare_goods import (
     PrepareGoodsSummary,
     UpdatePrepareStatusRequest,
 )
-from app.services import prepare_goods_service
-from app.utils import parse_order_id_list
+from app.services import package_detail_service, package_workflow_service, photo_service, prepare_goods_service
+from app.utils import NEXT_CURSOR_HEADER, PageCursor, next_cursor, parse_order_id_list
 
 router = APIRouter()
 
@@ -192,7 +189,9 @@ async def create_prepare_package(
 
 @router.get("/available", response_model=List[PrepareGoodsSummary], response_model_by_alias=True)
 async def list_available_packages(
+    response: Response,
     limit: int = Query(default=50, ge=1, le=100),
+    after: Optional[PageCursor] = Depends(deps.get_page_cursor),
     current_user=Depends(deps.get_current_user),
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> List[PrepareGoodsSummary]:
@@ -211,6 +210,7 @@ async def list_available_packages(
 
     Args:
         limit: Maximum number of records (default 50, max 100)
+        after: Cursor from the previous page's X-Next-Cursor header
         current_user: Authenticated user
         session: Database session
 
@@ -219,8 +219,12 @@ async def list_available_packages(
     """
     packages = await prepare_goods_service.get_available_packages(
         session=session,
-        limit=limit
+        limit=limit,
+        after=after
     )
+    cursor = next_cursor(packages, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
 
     # Build summary responses
     summaries = []
@@ -265,7 +269,7 @@ async def list_available_packages(
 @router.get("/driver/me", response_model=List[PrepareGoodsSummary], response_model_by_alias=True)
 async def list_my_driver_packages(
     limit: int = Query(default=50, ge=1, le=100),
-    current_user=Depends(deps.get_current_user),
+    current_driver=Depends(deps.get_current_driver),
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> List[PrepareGoodsSummary]:
     """
@@ -275,24 +279,15 @@ async def list_my_driver_packages(
 
     Args:
         limit: Maximum number of records (default 50, max 100)
-        current_user: Authenticated user
+        current_driver: Authenticated driver
         session: Database session
 
     Returns:
         List of PrepareGoods packages assigned to current driver
     """
-    # Look up driver by phone number
-    result = await session.execute(select(Driver).where(Driver.phone == current_user.phonenumber))
-    driver = result.scalars().first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver not found"
-        )
-
     packages = await prepare_goods_service.get_driver_assigned_packages(
         session=session,
-        driver_id=driver.id,
+        driver_id=current_driver.driver_id,
         limit=limit
     )
 
@@ -389,9 +384,11 @@ async def list_driver_packages(
 
 @router.get("/shop/{shop_id}", response_model=List[PrepareGoodsSummary], response_model_by_alias=True)
 async def list_shop_prepare_packages(
+    response: Response,
     shop_id: int,
     status: Optional[int] = Query(default=None, ge=0, le=6),
     limit: int = Query(default=50, ge=1, le=100),
+    after: Optional[PageCursor] = Depends(deps.get_page_cursor),
     current_user=Depends(deps.get_current_user),
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> List[PrepareGoodsSummary]:
@@ -402,6 +399,7 @@ async def list_shop_prepare_packages(
         shop_id: Merchant shop ID
         status: Optional filter by prepare_status (None = all statuses)
         limit: Maximum number of records (default 50, max 100)
+        after: Cursor from the previous page's X-Next-Cursor header
         current_user: Authenticated user
         session: Database session
 
@@ -412,8 +410,12 @@ async def list_shop_prepare_packages(
         session=session,
         shop_id=shop_id,
         status=status,
-        limit=limit
+        limit=limit,
+        after=after
     )
+    cursor = next_cursor(packages, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
 
     # Build summary responses
     summaries = []
@@ -525,6 +527,11 @@ async def list_packages_by_location(
 @router.get("/{prepare_sn}", response_model=PrepareGoodsDetailResponse, response_model_by_alias=True)
 async def get_prepare_package(
     prepare_sn: str,
+    photo_size: photo_service.PhotoVariant = Query(
+        default=photo_service.DEFAULT_PHOTO_VARIANT,
+        alias="photoSize",
+        description="Photo version returned as fileUrl (originalUrl is always included)"
+    ),
     current_user=Depends(deps.get_current_user),
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> PrepareGoodsDetailResponse:
@@ -533,6 +540,7 @@ async def get_prepare_package(
 
     Args:
         prepare_sn: Prepare goods serial number
+        photo_size: thumbnail (default), display or original
         current_user: Authenticated user
         session: Database session
 
@@ -542,128 +550,15 @@ async def get_prepare_package(
     Raises:
         HTTPException 404: Package not found
     """
-    prepare_goods = await prepare_goods_service.get_prepare_package(session, prepare_sn)
+    detail = await package_detail_service.get_package_detail(session, prepare_sn, photo_size)
 
-    if not prepare_goods:
+    if not detail:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Prepare package not found: {prepare_sn}"
         )
 
-    # Build response with items
-    from app.schemas.prepare_goods import PrepareGoodsItemSchema, UploadedFileSchema
-    from app.models.order import UploadedFile
-
-    items = [
-        PrepareGoodsItemSchema(
-            prepare_id=item.prepare_id,
-            order_item_id=item.order_item_id,
-            product_id=item.product_id,
-            sku_id=item.sku_id,
-            quantity=item.quantity
-        )
-        for item in prepare_goods.items
-    ]
-
-    # Fetch order serial numbers
-    order_ids = parse_order_id_list(prepare_goods.order_ids)
-    order_serial_numbers = []
-    if order_ids:
-        result = await session.execute(
-            select(Order.order_sn).where(Order.id.in_(order_ids))
-        )
-        order_serial_numbers = [row[0] for row in result.fetchall()]
-
-    # Fetch pickup photos from prepare_good
-    photos_result = await session.execute(
-        select(UploadedFile)
-        .where(UploadedFile.biz_type == "prepare_good")
-        .where(UploadedFile.biz_id == prepare_goods.id)
-        .order_by(UploadedFile.create_time.desc())
-    )
-    pickup_photos = [
-        UploadedFileSchema(
-            id=photo.id,
-            file_name=photo.file_name,
-            file_url=photo.file_url,
-            file_type=photo.file_type,
-            file_size=photo.file_size,
-            uploader_name=photo.uploader_name,
-            create_time=photo.create_time
-        )
-        for photo in photos_result.scalars().all()
-    ]
-    
-    # Fetch photos from order_action for orders in this package
-    # For type=1 (Workflow 5 second leg from warehouse): show warehouse receipt photos (action_type=3)
-    # For type=0 or None (first leg from merchant): show shop preparation photos (action_type=0)
-    if order_ids:
-        from app.models.order_action import OrderAction
-        
-        # Determine which action types to fetch based on package type
-        if prepare_goods.type == 1:
-            # Workflow 5 second leg: warehouse receipt photo (action_type=3)
-            action_types = [3, 5]
-        else:
-            # First leg from merchant: shop preparation photo (action_type=0)
-            action_types = [0, 5]
-        
-        action_result = await session.execute(
-            select(OrderAction)
-            .where(OrderAction.order_id.in_(order_ids))
-            .where(OrderAction.action_type.in_(action_types))
-            .order_by(OrderAction.create_time.desc())
-        )
-        actions = action_result.scalars().all()
-        
-        # Extract file IDs from logistics_voucher_file and fetch those photos
-        action_file_ids = []
-        for action in actions:
-            if action.logistics_voucher_file:
-                # logistics_voucher_file contains comma-separated file IDs
-                file_ids = [int(fid.strip()) for fid in action.logistics_voucher_file.split(',') if fid.strip().isdigit()]
-                action_file_ids.extend(file_ids)
-        
-        if action_file_ids:
-            action_photos_result = await session.execute(
-                select(UploadedFile)
-                .where(UploadedFile.id.in_(action_file_ids))
-            )
-            action_photos = [
-                UploadedFileSchema(
-                    id=photo.id,
-                    file_name=photo.file_name,
-                    file_url=photo.file_url,
-                    file_type=photo.file_type,
-                    file_size=photo.file_size,
-                    uploader_name=photo.uploader_name,
-                    create_time=photo.create_time
-                )
-                for photo in action_photos_result.scalars().all()
-            ]
-            # Combine photos: prepare_good photos first, then action photos
-            pickup_photos.extend(action_photos)
-
-    return PrepareGoodsDetailResponse(
-        id=prepare_goods.id,
-        prepare_sn=prepare_goods.prepare_sn,
-        order_ids=prepare_goods.order_ids,
-        delivery_type=prepare_goods.delivery_type,
-        shipping_type=prepare_goods.shipping_type,
-        prepare_status=prepare_goods.prepare_status,
-        shop_id=prepare_goods.shop_id,
-        warehouse_id=prepare_goods.warehouse_id,
-        driver_id=prepare_goods.driver_id,
-        create_time=prepare_goods.create_time,
-        update_time=prepare_goods.update_time,
-        items=items,
-        warehouse_name=prepare_goods.warehouse.name if prepare_goods.warehouse else None,
-        driver_name=prepare_goods.driver.name if prepare_goods.driver else None,
-        receiver_address=prepare_goods.receiver_address,
-        total_value=float(prepare_goods.total_value) if prepare_goods.total_value else None,
-        order_serial_numbers=order_serial_numbers,
-        pickup_photos=pickup_photos
-    )
+    return detail
 
 
 @router.put("/{prepare_sn}/status", status_code=status.HTTP_204_NO_CONTENT)
@@ -728,6 +623,7 @@ async def assign_driver(
 
     Raises:
         HTTPException 404: Package not found
+        HTTPException 409: Package held by another driver or already picked up
     """
     assigned = await prepare_goods_service.assign_driver_to_prepare(
         session=session,
@@ -736,422 +632,124 @@ async def assign_driver(
     )
 
     if not assigned:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Prepare package not found: {prepare_sn}"
-        )
+        await package_workflow_service.raise_package_unavailable(session, prepare_sn)
 
 
 @router.post("/{prepare_sn}/pickup", status_code=status.HTTP_204_NO_CONTENT)
 async def pickup_package(
     prepare_sn: str,
-    current_user=Depends(deps.get_current_user),
+    current_driver=Depends(deps.get_current_driver),
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> None:
     """
     Driver picks up a package.
 
-    This action:
-    1. Assigns the driver to the package
-    2. Updates status to 6 (Driver claimed)
+    Assigns the driver and sets status 6 (Driver claimed) in one conditional
+    update, so when several drivers claim the same package exactly one wins.
 
     Args:
         prepare_sn: Prepare goods serial number
-        current_user: Authenticated driver user
+        current_driver: Authenticated driver
         session: Database session
 
     Raises:
         HTTPException 404: Driver or package not found
+        HTTPException 409: Package already taken
     """
-    # Look up driver by phone number
-    result = await session.execute(select(Driver).where(Driver.phone == current_user.phonenumber))
-    driver = result.scalars().first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver not found"
-        )
-
-    # Assign driver to package
-    assigned = await prepare_goods_service.assign_driver_to_prepare(
+    claimed = await prepare_goods_service.claim_package(
         session=session,
         prepare_sn=prepare_sn,
-        driver_id=driver.id
+        driver_id=current_driver.driver_id
     )
 
-    if not assigned:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Prepare package not found: {prepare_sn}"
-        )
-
-    # Update status to 6 (Driver claimed)
-    await prepare_goods_service.update_prepare_status(
-        session=session,
-        prepare_sn=prepare_sn,
-        new_status=6
-    )
+    if not claimed:
+        await package_workflow_service.raise_package_unavailable(session, prepare_sn)
 
 
 @router.post("/{prepare_sn}/confirm-pickup", status_code=status.HTTP_204_NO_CONTENT)
 async def confirm_pickup(
     prepare_sn: str,
     payload: ConfirmPickupRequest,
-    current_user=Depends(deps.get_current_user),
+    current_driver=Depends(deps.get_current_driver),
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> None:
     """
     Confirm driver picked up package with photo proof.
 
     This action:
-    1. Saves photo to tigu_uploaded_files (biz_type='prepare_good', biz_id=package.id)
-    2. Creates OrderAction records for each order (action_type=1 - Driver Pickup)
+    1. Links the photo in tigu_uploaded_files (biz_type='prepare_good', biz_id=package.id);
+       either the file uploaded via POST /uploads/photos (photoFileId) or the base64 photo
+    2. Updates the package's orders with one UPDATE and records their OrderAction
+       rows (action_type=1 - Driver Pickup) with one multi-row INSERT
     3. Updates package status to 1 (Driver pickup in progress)
 
+    Everything is committed at once.
+
     Args:
         prepare_sn: Prepare goods serial number
         payload: Confirmation request with photo and notes
-        current_user: Authenticated driver user
+        current_driver: Authenticated driver
         session: Database session
 
     Raises:
-        HTTPException 404: Driver or package not found
+        HTTPException 404: Driver, package or uploaded file not found
         HTTPException 400: Invalid photo or package status
+        HTTPException 409: Package held by another driver or confirmed concurrently,
+            or uploaded file already attached elsewhere
     """
-    import base64
-    import os
-    from datetime import datetime
-    from pathlib import Path
-    from app.models.order import UploadedFile
-    from app.models.order_action import OrderAction
-    from app.models.prepare_goods import PrepareGoods
-    from app.utils import generate_snowflake_id
-
-    # Look up driver
-    result = await session.execute(select(Driver).where(Driver.phone == current_user.phonenumber))
-    driver = result.scalars().first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver not found"
-        )
-
-    # Get package
-    result = await session.execute(
-        select(PrepareGoods).where(PrepareGoods.prepare_sn == prepare_sn)
+    change = await package_workflow_service.confirm_pickup(
+        session,
+        prepare_sn,
+        driver_id=current_driver.driver_id,
+        photo_file_id=payload.photo_file_id,
+        photo=payload.photo
     )
-    package = result.scalars().first()
-    if not package:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Package not found: {prepare_sn}"
-        )
-
-    # Verify package is in correct status (should be 6 - Driver claimed)
-    if package.prepare_status != 6:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Package status must be 6 (Driver claimed), current: {package.prepare_status}"
-        )
-
-    # Decode and save photo
-    try:
-        if payload.photo.startswith('data:'):
-            header, encoded = payload.photo.split(',', 1)
-            mime_type = header.split(':')[1].split(';')[0]
-        else:
-            encoded = payload.photo
-            mime_type = 'image/jpeg'
-
-        image_bytes = base64.b64decode(encoded)
-
-        # Validate file size (4MB limit)
-        if len(image_bytes) > 4 * 1024 * 1024:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail="Photo size exceeds 4MB limit"
-            )
-
-        # Create upload directory
-        upload_dir = Path("/var/www/deliveries/photos/pickups")
-        upload_dir.mkdir(parents=True, exist_ok=True)
-
-        # Generate filename
-        timestamp = int(datetime.now().timestamp())
-        extension = mime_type.split('/')[-1]
-        if extension == 'jpg':
-            extension = 'jpeg'
-        filename = f"{prepare_sn}_{timestamp}.{extension}"
-        file_path = upload_dir / filename
-
-        # Save file
-        with open(file_path, 'wb') as f:
-            f.write(image_bytes)
-        os.chmod(file_path, 0o644)
-
-        photo_url = f"/deliveries/photos/pickups/{filename}"
-
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Failed to save photo: {str(e)}"
-        )
-
-    # Create UploadedFile record
-    uploaded_file = UploadedFile(
-        id=generate_snowflake_id(),
-        file_name=filename,
-        file_url=photo_url,
-        file_type=mime_type,
-        file_size=len(image_bytes),
-        biz_type="prepare_good",
-        biz_id=package.id,
-        uploader_id=driver.id,
-        uploader_name=driver.name,
-        create_by=driver.name,
-        create_time=datetime.now()
-    )
-    session.add(uploaded_file)
-
-    # Parse order IDs from package
-    order_ids = parse_order_id_list(package.order_ids)
-
-    # Get orders to fetch their current status
-    orders_result = await session.execute(
-        select(Order).where(Order.id.in_(order_ids))
-    )
-    orders = orders_result.scalars().all()
-
-    # Create OrderAction record for each order AND update tigu_order
-    # Determine action_type based on package type:
-    # type=0 (first leg from merchant): action_type=1 (司机收货 - 到商家收货)
-    # type=1 (second leg from warehouse - Workflow 5): action_type=12 (司机收货 - 到仓库收货)
-    pickup_action_type = 12 if package.type == 1 else 1
-    
-    for order in orders:
-        # Determine new shipping_status based on workflow (shipping_type from package)
-        # shipping_type=0 (Driver->User): shipping_status=4 (司机配送中)
-        # shipping_type=1 (Driver->Warehouse->User): shipping_status=2 (司机收货中)
-        if package.shipping_type == 0:
-            new_shipping_status = 4  # 司机配送中 - Driver delivering to user
-        else:
-            new_shipping_status = 2  # 司机收货中 - Driver picking up (going to warehouse)
-        
-        order_action = OrderAction(
-            id=generate_snowflake_id(),
-            order_id=order.id,
-            action_type=pickup_action_type,  # 1=司机收货(商家), 12=司机收货(仓库)
-            logistics_voucher_file=str(uploaded_file.id),  # Use file ID, not URL
-            create_by=driver.name,
-            create_time=datetime.now(),
-            order_status=order.order_status,
-            shipping_status=new_shipping_status,  # Record the new status
-            shipping_type=order.shipping_type
-        )
-        session.add(order_action)
-        
-        # Update tigu_order
-        order.shipping_status = new_shipping_status
-        order.driver_receive_time = datetime.now()
-        order.driver_id = driver.id
-
-    # Update package status to 1 (Driver pickup in progress)
-    await prepare_goods_service.update_prepare_status(
-        session=session,
-        prepare_sn=prepare_sn,
-        new_status=1
-    )
-
     await session.commit()
+    await package_workflow_service.announce_changes([change])
 
 
 @router.post("/{prepare_sn}/confirm-delivery", status_code=status.HTTP_204_NO_CONTENT)
 async def confirm_delivery(
     prepare_sn: str,
     payload: ConfirmPickupRequest,
-    current_user=Depends(deps.get_current_user),
+    current_driver=Depends(deps.get_current_driver),
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> None:
     """
     Confirm driver delivered package with photo proof.
 
     This action:
-    1. Saves photo to tigu_uploaded_files (biz_type='prepare_good', biz_id=package.id)
-    2. Creates OrderAction records for each order
-       - For warehouse delivery (shipping_type=1): action_type=2 - 司机送达仓库
-       - For user delivery (shipping_type=0): action_type=5 - 完成
+    1. Links the photo in tigu_uploaded_files (biz_type='prepare_good', biz_id=package.id);
+       either the file uploaded via POST /uploads/photos (photoFileId) or the base64 photo
+    2. Updates the package's orders with one UPDATE and records their OrderAction
+       rows with one multi-row INSERT
+       - For warehouse delivery (shipping_type=1): action_type=11 - 司机送达仓库
+       - For user delivery (shipping_type=0): action_type=4 - 司机送达用户
        - logistics_voucher_file contains the file ID from tigu_uploaded_files
     3. Updates package status based on shipping type:
        - shipping_type=1 (Workflow 3): prepare_status to 2 (司机送达仓库 - Driver delivered to warehouse)
-       - shipping_type=0 (Workflow 4): prepare_status to 3 (已送达 - Delivered to user, complete)
+       - shipping_type=0 (Workflow 4): prepare_status to 7 (已送达 - Delivered to user, complete)
+
+    Everything is committed at once.
 
     Args:
         prepare_sn: Prepare goods serial number
         payload: Confirmation request with photo and notes
-        current_user: Authenticated driver user
+        current_driver: Authenticated driver
         session: Database session
 
     Raises:
-        HTTPException 404: Driver or package not found
+        HTTPException 404: Driver, package or uploaded file not found
         HTTPException 400: Invalid photo or package status
+        HTTPException 409: Package held by another driver or confirmed concurrently,
+            or uploaded file already attached elsewhere
     """
-    import base64
-    import os
-    from datetime import datetime
-    from pathlib import Path
-    from app.models.order import UploadedFile
-    from app.models.order_action import OrderAction
-    from app.models.prepare_goods import PrepareGoods
-    from app.utils import generate_snowflake_id
-
-    # Look up driver
-    result = await session.execute(select(Driver).where(Driver.phone == current_user.phonenumber))
-    driver = result.scalars().first()
-    if not driver:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Driver not found"
-        )
-
-    # Get package
-    result = await session.execute(
-        select(PrepareGoods).where(PrepareGoods.prepare_sn == prepare_sn)
-    )
-    package = result.scalars().first()
-    if not package:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Package not found: {prepare_sn}"
-        )
-
-    # Verify package is in transit status (should be 1, 2, 4, or 5)
-    if package.prepare_status not in [1, 2, 4, 5]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Package status must be in transit (1, 2, 4, or 5), current: {package.prepare_status}"
-        )
-
-    # Decode and save photo
-    try:
-        if payload.photo.startswith('data:'):
-            header, encoded = payload.photo.split(',', 1)
-            mime_type = header.split(':')[1].split(';')[0]
-        else:
-            encoded = payload.photo
-            mime_type = 'image/jpeg'
-
-        image_bytes = base64.b64decode(encoded)
-
-        # Validate file size (4MB limit)
-        if len(image_bytes) > 4 * 1024 * 1024:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail="Photo size exceeds 4MB limit"
-            )
-
-        # Create upload directory
-        upload_dir = Path("/var/www/deliveries/photos/deliveries")
-        upload_dir.mkdir(parents=True, exist_ok=True)
-
-        # Generate filename
-        timestamp = int(datetime.now().timestamp())
-        extension = mime_type.split('/')[-1]
-        if extension == 'jpg':
-            extension = 'jpeg'
-        filename = f"{prepare_sn}_{timestamp}.{extension}"
-        file_path = upload_dir / filename
-
-        # Save file
-        with open(file_path, 'wb') as f:
-            f.write(image_bytes)
-        os.chmod(file_path, 0o644)
-
-        photo_url = f"/deliveries/photos/deliveries/{filename}"
-
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Failed to save photo: {str(e)}"
-        )
-
-    # Create UploadedFile record
-    uploaded_file = UploadedFile(
-        id=generate_snowflake_id(),
-        file_name=filename,
-        file_url=photo_url,
-        file_type=mime_type,
-        file_size=len(image_bytes),
-        biz_type="prepare_good",
-        biz_id=package.id,
-        uploader_id=driver.id,
-        uploader_name=driver.name,
-        create_by=driver.name,
-        create_time=datetime.now()
-    )
-    session.add(uploaded_file)
-
-    # Parse order IDs from package
-    order_ids = parse_order_id_list(package.order_ids)
-
-    # Get orders to fetch their current status
-    orders_result = await session.execute(
-        select(Order).where(Order.id.in_(order_ids))
-    )
-    orders = orders_result.scalars().all()
-
-    # Determine action type and new status based on shipping type
-    if package.shipping_type == 1:
-        # To warehouse workflow (Workflow 3)
-        action_type = 11  # 司机送达仓库 - Driver arrives at warehouse (action_type=11)
-        new_status = 2  # 司机送达仓库 (Driver delivered to warehouse)
-        order_shipping_status = 3  # Update tigu_order.shipping_status to 3
-    else:
-        # To user workflow (Workflow 4)
-        action_type = 4  # 司机送达用户 - Driver delivers to user (action_type=4)
-        new_status = 7  # 已送达 - Delivered to user (Workflow 4 complete)
-        order_shipping_status = 5  # Update tigu_order.shipping_status to 5 (司机送达用户)
-
-    # Create OrderAction record for each order AND update tigu_order
-    # Note: logistics_voucher_file should contain file ID from tigu_uploaded_files
-    for order in orders:
-        order_action = OrderAction(
-            id=generate_snowflake_id(),
-            order_id=order.id,
-            action_type=action_type,
-            logistics_voucher_file=str(uploaded_file.id),  # Use file ID, not URL
-            create_by=driver.name,
-            create_time=datetime.now(),
-            order_status=order.order_status,
-            shipping_status=order_shipping_status,  # Record the new status
-            shipping_type=order.shipping_type
-        )
-        session.add(order_action)
-        
-        # Update tigu_order based on shipping type
-        order.shipping_status = order_shipping_status
-        if package.shipping_type == 1:
-            # Driver arrived at warehouse
-            order.arrive_warehouse_time = datetime.now()
-        else:
-            # Delivery completed to user
-            order.finish_time = datetime.now()
-            order.order_status = 3  # Mark order as completed
-
-    # Update package status
-    await prepare_goods_service.update_prepare_status(
-        session=session,
-        prepare_sn=prepare_sn,
-        new_status=new_status
+    change = await package_workflow_service.confirm_delivery(
+        session,
+        prepare_sn,
+        driver_id=current_driver.driver_id,
+        photo_file_id=payload.photo_file_id,
+        photo=payload.photo
     )
-
-    # Update actual_arrival_time for delivery completion
-    package.actual_arrival_time = datetime.now()
-
-    # Increment driver's total_deliveries counter
-    driver.total_deliveries = (driver.total_deliveries or 0) + 1
-
     await session.commit()
+    await package_workflow_service.announce_changes([change])
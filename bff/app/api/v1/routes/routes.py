@@ -1,73 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.api import deps
-from app.models.driver import Driver
 from app.models.prepare_goods import PrepareGoods
 from app.schemas.route import LocationUpdate, RoutePlan, RouteStop
-from app.services.cache import store_driver_location
+from app.services import geocoding_service, route_service
+from app.services.cache import get_driver_location, store_driver_location
 
 router = APIRouter()
 
 
 @router.post("/optimize", response_model=RoutePlan, response_model_by_alias=True)
 async def optimize_route(
-    current_user=Depends(deps.get_current_user),
+    current_driver=Depends(deps.get_current_driver),
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> RoutePlan:
     """
     Build optimized route for driver based on assigned prepare goods packages.
 
     Uses receiver addresses from tigu_prepare_goods table for in-transit packages.
-    
+
     Workflow:
     1. Get all in-transit PrepareGoods packages assigned to driver
-    2. Use receiver address from prepare_goods table
-    3. Build optimized route
+    2. Geocode receiver addresses (cached)
+    3. Sequence stops from the driver's last known location (nearest-neighbour + 2-opt/Or-opt)
+    4. Return stop order, per-stop ETAs and total distance
     """
-    # Look up driver by phone number to get driver_id
-    result = await session.execute(select(Driver).where(Driver.phone == current_user.phonenumber))
-    driver = result.scalars().first()
-    if not driver:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Driver not found")
-
     # Get all prepare goods packages assigned to this driver
     # Only show in-transit packages (prepare_status 2-5)
     packages_result = await session.execute(
         select(PrepareGoods)
-        .where(PrepareGoods.driver_id == driver.id)
+        .where(PrepareGoods.driver_id == current_driver.driver_id)
         .where(PrepareGoods.prepare_status >= 2)  # In-transit
         .where(PrepareGoods.prepare_status < 6)  # Not completed
     )
-    packages = packages_result.scalars().all()
+    packages = [pkg for pkg in packages_result.scalars().all() if pkg.receiver_address]
 
     if not packages:
         # No packages to route
         return RoutePlan(id="empty", stops=[])
 
+    full_addresses = {
+        pkg.prepare_sn: ", ".join(
+            part for part in (
+                pkg.receiver_address,
+                pkg.receiver_city,
+                pkg.receiver_province,
+                pkg.receiver_postal_code
+            ) if part
+        )
+        for pkg in packages
+    }
+    coordinates = await geocoding_service.geocode_addresses(full_addresses.values())
+
     # Build route stops from prepare goods packages
     stops = []
     for idx, pkg in enumerate(packages, start=1):
-        # Use receiver address from prepare_goods table
-        if pkg.receiver_address:
-            stops.append(
-                RouteStop(
-                    order_sn=pkg.prepare_sn,  # Use prepare_sn as identifier
-                    sequence=idx,
-                    address=pkg.receiver_address,
-                    receiver_name=pkg.receiver_name or "Unknown",
-                    eta=None,  # ETA provided by Google Maps
-                    latitude=None,
-                    longitude=None
-                )
+        coords = coordinates.get(full_addresses[pkg.prepare_sn])
+        stops.append(
+            RouteStop(
+                order_sn=pkg.prepare_sn,  # Use prepare_sn as identifier
+                sequence=idx,
+                address=pkg.receiver_address,
+                receiver_name=pkg.receiver_name or "Unknown",
+                eta=None,
+                latitude=coords[0] if coords else None,
+                longitude=coords[1] if coords else None
             )
+        )
+
+    origin = None
+    try:
+        location = await get_driver_location(current_driver.user_id)
+    except Exception:  # noqa: BLE001
+        location = None
+    if location and "lat" in location and "lng" in location:
+        origin = (float(location["lat"]), float(location["lng"]))
 
-    # Generate unique plan ID based on package sequence
-    import hashlib
-    plan_id = hashlib.md5("".join(stop.order_sn for stop in stops).encode()).hexdigest()
-    return RoutePlan(id=plan_id, stops=stops)
+    return await route_service.optimize_stops(stops, origin=origin)
 
 
 @router.patch("/{plan_id}/location")
@@ -1,15 +1,16 @@
 """
 Stripe Connect routes for driver payment onboarding.
 """
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy import select
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user, get_db_session
+from app.api.deps import get_current_driver, get_db_session
 from app.models.driver import Driver
-from app.models.user import User
 from app.schemas.driver import StripeConnectResponse, StripeStatusResponse
-from app.services.stripe_service import StripeService, verify_webhook_signature
+from app.services.principal_service import Principal
+from app.services.stripe_service import StripeService, enqueue_webhook_event, verify_webhook_signature
 from app.core.config import get_settings
 
 router = APIRouter()
@@ -18,18 +19,14 @@ settings = get_settings()
 
 @router.post("/connect", response_model=StripeConnectResponse)
 async def initiate_stripe_connect(
-    current_user: User = Depends(get_current_user),
+    current_driver: Principal = Depends(get_current_driver),
     session: AsyncSession = Depends(get_db_session)
 ) -> StripeConnectResponse:
     """
     Initiate Stripe Connect onboarding for a driver.
     Creates a Stripe Express account and returns the onboarding URL.
     """
-    # Find driver by phone number
-    result = await session.execute(
-        select(Driver).where(Driver.phone == current_user.phonenumber)
-    )
-    driver = result.scalars().first()
+    driver = await session.get(Driver, current_driver.driver_id)
 
     if not driver:
         raise HTTPException(
@@ -61,18 +58,16 @@ async def initiate_stripe_connect(
 
 @router.get("/status", response_model=StripeStatusResponse)
 async def get_stripe_status(
-    current_user: User = Depends(get_current_user),
+    refresh: bool = Query(False, description="Ask Stripe instead of using the cached status"),
+    current_driver: Principal = Depends(get_current_driver),
     session: AsyncSession = Depends(get_db_session)
 ) -> StripeStatusResponse:
     """
     Get the current Stripe Connect status for a driver.
-    Checks with Stripe API and updates local database.
+    Served from the status cache (kept current by webhooks); Stripe is only
+    queried on a cache miss or with refresh=true.
     """
-    # Find driver by phone number
-    result = await session.execute(
-        select(Driver).where(Driver.phone == current_user.phonenumber)
-    )
-    driver = result.scalars().first()
+    driver = await session.get(Driver, current_driver.driver_id)
 
     if not driver:
         raise HTTPException(
@@ -80,31 +75,9 @@ async def get_stripe_status(
             detail="Driver profile not found"
         )
 
-    # If no Stripe account, return pending status
-    if not driver.stripe_account_id:
-        return StripeStatusResponse(
-            stripe_status="pending",
-            stripe_payouts_enabled=False,
-            stripe_details_submitted=False,
-            stripe_connected_at=None,
-            can_receive_payouts=False,
-            requirements_due=None
-        )
-
-    if not settings.stripe_secret_key:
-        # Return cached status if Stripe not configured
-        return StripeStatusResponse(
-            stripe_status=driver.stripe_status or "pending",
-            stripe_payouts_enabled=driver.stripe_payouts_enabled or False,
-            stripe_details_submitted=driver.stripe_details_submitted or False,
-            stripe_connected_at=driver.stripe_connected_at,
-            can_receive_payouts=driver.stripe_payouts_enabled and driver.stripe_status == "verified",
-            requirements_due=None
-        )
-
     try:
         stripe_service = StripeService(session)
-        status_data = await stripe_service.check_account_status(driver)
+        status_data = await stripe_service.get_account_status(driver, refresh=refresh)
 
         return StripeStatusResponse(**status_data)
 
@@ -117,18 +90,14 @@ async def get_stripe_status(
 
 @router.post("/refresh-link", response_model=StripeConnectResponse)
 async def refresh_stripe_link(
-    current_user: User = Depends(get_current_user),
+    current_driver: Principal = Depends(get_current_driver),
     session: AsyncSession = Depends(get_db_session)
 ) -> StripeConnectResponse:
     """
     Generate a new Stripe onboarding link for a driver.
     Used when the previous link has expired.
     """
-    # Find driver by phone number
-    result = await session.execute(
-        select(Driver).where(Driver.phone == current_user.phonenumber)
-    )
-    driver = result.scalars().first()
+    driver = await session.get(Driver, current_driver.driver_id)
 
     if not driver:
         raise HTTPException(
@@ -165,13 +134,11 @@ async def refresh_stripe_link(
 
 
 @router.post("/webhook")
-async def stripe_webhook(
-    request: Request,
-    session: AsyncSession = Depends(get_db_session)
-):
+async def stripe_webhook(request: Request):
     """
     Handle Stripe webhook events.
-    Updates driver payment status based on account changes.
+    Verified events are queued (de-duplicated on event id) and processed in
+    the background, so Stripe gets an immediate acknowledgement.
     """
     payload = await request.body()
     signature = request.headers.get("stripe-signature")
@@ -189,7 +156,7 @@ async def stripe_webhook(
         )
 
     try:
-        event = verify_webhook_signature(payload, signature)
+        verify_webhook_signature(payload, signature)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -197,9 +164,8 @@ async def stripe_webhook(
         )
 
     try:
-        stripe_service = StripeService(session)
-        await stripe_service.handle_webhook_event(event)
-        return {"status": "success"}
+        queued = await enqueue_webhook_event(json.loads(payload))
+        return {"status": "queued" if queued else "duplicate"}
 
     except Exception as e:
         raise HTTPException(
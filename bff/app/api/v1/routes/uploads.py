@@ -0,0 +1,77 @@
+"""
+Upload API Routes
+
+Photos are uploaded ahead of the workflow action that uses them. The raw
+image is sent as the request body (Content-Type image/jpeg or image/png) and
+streamed to disk; the returned id is passed as photoFileId to the confirm
+endpoints.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.models.driver import Driver
+from app.schemas.prepare_goods import UploadedPhotoResponse
+from app.services import photo_service, upload_service
+
+router = APIRouter()
+
+
+@router.post(
+    "/photos",
+    response_model=UploadedPhotoResponse,
+    response_model_by_alias=True,
+    status_code=status.HTTP_201_CREATED
+)
+async def upload_photo(
+    request: Request,
+    content_type: Optional[str] = Header(default=None),
+    content_length: Optional[int] = Header(default=None),
+    current_driver=Depends(deps.get_current_driver),
+    session: AsyncSession = Depends(deps.get_db_session)
+) -> UploadedPhotoResponse:
+    """
+    Stream a photo to disk.
+
+    The body is written chunk by chunk as it arrives and rejected as soon as
+    it exceeds the 4MB limit. Display and thumbnail versions are rendered in
+    the background.
+
+    Args:
+        request: Raw request (body is the image)
+        content_type: image/jpeg or image/png
+        content_length: Declared body size
+        current_driver: Authenticated driver
+        session: Database session
+
+    Returns:
+        UploadedPhotoResponse: Upload id to reference as photoFileId
+
+    Raises:
+        HTTPException 404: Driver not found
+        HTTPException 413: Photo exceeds 4MB
+        HTTPException 400/415: Not a JPEG/PNG image
+    """
+    driver = await session.get(Driver, current_driver.driver_id)
+    if not driver:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Driver not found"
+        )
+
+    uploaded_file = await upload_service.upload_photo_stream(
+        session,
+        request.stream(),
+        uploader=driver,
+        content_length=content_length,
+        content_type=content_type
+    )
+    await photo_service.schedule_processing(uploaded_file.id)
+    return UploadedPhotoResponse(
+        id=str(uploaded_file.id),
+        file_url=uploaded_file.file_url,
+        file_type=uploaded_file.file_type,
+        file_size=uploaded_file.file_size
+    )
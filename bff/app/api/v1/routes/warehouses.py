@@ -1,8 +1,17 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.schemas.order import WarehouseSnapshot
+from app.db.session import AsyncSessionLocal
+from app.schemas.order import (
+    WarehouseBatchRequest,
+    WarehouseBatchResponse,
+    WarehouseScanMessage,
+    WarehouseScanResult,
+    WarehouseSnapshot,
+)
+from app.services import warehouse_scan_service
 from app.services.warehouse_service import fetch_active_warehouses
 
 router = APIRouter()
@@ -14,3 +23,95 @@ async def list_active_warehouses(
     session: AsyncSession = Depends(deps.get_db_session)
 ) -> list[WarehouseSnapshot]:
     return await fetch_active_warehouses(session)
+
+
+@router.post("/receive-batch", response_model=WarehouseBatchResponse, response_model_by_alias=True)
+async def receive_batch(
+    payload: WarehouseBatchRequest,
+    current_user=Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_db_session)
+) -> WarehouseBatchResponse:
+    """
+    Warehouse receives many scanned orders/packages at once (action_type=3).
+
+    Orders move from shipping_status 3 (司机送达仓库) to 4 (仓库已收货) in one
+    transaction; each scan gets its own result (ok, already_done,
+    invalid_status or not_found), so one bad parcel does not fail the batch.
+    """
+    return await warehouse_scan_service.apply_batch(
+        session,
+        "receive",
+        warehouse_staff_id=payload.warehouse_staff_id,
+        order_sns=payload.order_sns,
+        prepare_sns=payload.prepare_sns,
+        photo_ids=payload.photo_ids
+    )
+
+
+@router.post("/ship-batch", response_model=WarehouseBatchResponse, response_model_by_alias=True)
+async def ship_batch(
+    payload: WarehouseBatchRequest,
+    current_user=Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_db_session)
+) -> WarehouseBatchResponse:
+    """
+    Warehouse ships many scanned orders/packages at once (action_type=4).
+
+    Orders move from shipping_status 4 (仓库已收货) to 5 (司机配送用户) and get
+    warehouse_shipping_time; results as for receive-batch.
+    """
+    return await warehouse_scan_service.apply_batch(
+        session,
+        "ship",
+        warehouse_staff_id=payload.warehouse_staff_id,
+        order_sns=payload.order_sns,
+        prepare_sns=payload.prepare_sns,
+        photo_ids=payload.photo_ids
+    )
+
+
+@router.websocket("/scan-stream")
+async def scan_stream(
+    websocket: WebSocket,
+    token: str = Query(..., description="Access token (browsers cannot send WebSocket headers)")
+) -> None:
+    """
+    Stream scans continuously over one connection.
+
+    The token is checked once when connecting. Each text message is a
+    WarehouseScanMessage ({"action": "receive"|"ship", "seq": ..., plus the
+    batch request fields}) and is answered with a WarehouseScanResult
+    echoing seq. Each message runs on a short-lived session, so an idle
+    scanner holds no database connection.
+    """
+    try:
+        async with AsyncSessionLocal() as session:
+            await deps.authenticate_access_token(token, session)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                message = WarehouseScanMessage.model_validate_json(raw)
+            except ValidationError as exc:
+                reply = WarehouseScanResult(applied=0, items=[], error=str(exc))
+            else:
+                async with AsyncSessionLocal() as session:
+                    result = await warehouse_scan_service.apply_batch(
+                        session,
+                        message.action,
+                        warehouse_staff_id=message.warehouse_staff_id,
+                        order_sns=message.order_sns,
+                        prepare_sns=message.prepare_sns,
+                        photo_ids=message.photo_ids
+                    )
+                reply = WarehouseScanResult(
+                    applied=result.applied, items=result.items, action=message.action, seq=message.seq
+                )
+            await websocket.send_text(reply.model_dump_json(by_alias=True))
+    except WebSocketDisconnect:
+        return
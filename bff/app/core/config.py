@@ -48,10 +48,89 @@ class Settings(BaseSettings):
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
     python_bin: str = Field(default="python3", alias="PYTHON_BIN")
 
+    # Product SKU image cache (per-process; images rarely change)
+    sku_image_cache_size: int = Field(default=10000, alias="SKU_IMAGE_CACHE_SIZE")
+    sku_image_cache_ttl_seconds: int = Field(default=3600, alias="SKU_IMAGE_CACHE_TTL_SECONDS")
+
+    # Password hashing pool (bcrypt); requests beyond workers + queue are rejected with 503
+    password_hash_workers: int = Field(default=4, alias="PASSWORD_HASH_WORKERS")
+    password_hash_max_queue: int = Field(default=32, alias="PASSWORD_HASH_MAX_QUEUE")
+
+    # Authenticated principal cache (per-process, then Redis; invalidated over Redis pub/sub)
+    principal_local_cache_size: int = Field(default=10000, alias="PRINCIPAL_LOCAL_CACHE_SIZE")
+    principal_local_ttl_seconds: int = Field(default=30, alias="PRINCIPAL_LOCAL_TTL_SECONDS")
+    principal_cache_ttl_seconds: int = Field(default=300, alias="PRINCIPAL_CACHE_TTL_SECONDS")
+
+    # Map marks cache (Redis); counts are adjusted on package events and recomputed periodically
+    marks_cache_ttl_seconds: int = Field(default=300, alias="MARKS_CACHE_TTL_SECONDS")
+    marks_count_refresh_seconds: int = Field(default=60, alias="MARKS_COUNT_REFRESH_SECONDS")
+
+    # Admin dashboard counters (Redis); one worker recomputes them per refresh interval
+    dashboard_refresh_seconds: int = Field(default=15, alias="DASHBOARD_REFRESH_SECONDS")
+    dashboard_cache_ttl_seconds: int = Field(default=60, alias="DASHBOARD_CACHE_TTL_SECONDS")
+    dashboard_history_hours: int = Field(default=168, alias="DASHBOARD_HISTORY_HOURS")
+
+    # Admin search index: rows created/updated since the last sweep are indexed
+    # every interval; the overlap re-reads rows committed late or stamped by a
+    # skewed clock
+    search_index_interval_seconds: int = Field(default=30, alias="SEARCH_INDEX_INTERVAL_SECONDS")
+    search_index_overlap_seconds: int = Field(default=300, alias="SEARCH_INDEX_OVERLAP_SECONDS")
+    search_index_batch_size: int = Field(default=500, alias="SEARCH_INDEX_BATCH_SIZE")
+
+    # Package detail DTOs (Redis); invalidated on status, driver and photo changes
+    package_detail_cache_ttl_seconds: int = Field(default=300, alias="PACKAGE_DETAIL_CACHE_TTL_SECONDS")
+
+    # Route optimizer
+    route_optimizer_time_budget_ms: int = Field(default=200, alias="ROUTE_OPTIMIZER_TIME_BUDGET_MS")
+    route_average_speed_kmh: float = Field(default=35.0, alias="ROUTE_AVERAGE_SPEED_KMH")
+    route_service_minutes: float = Field(default=5.0, alias="ROUTE_SERVICE_MINUTES")
+    geocode_cache_ttl_seconds: int = Field(default=60 * 60 * 24 * 30, alias="GEOCODE_CACHE_TTL_SECONDS")
+
+    # Dispatch
+    driver_default_max_load: int = Field(default=10, alias="DRIVER_DEFAULT_MAX_LOAD")
+    dispatch_load_penalty_km: float = Field(default=2.0, alias="DISPATCH_LOAD_PENALTY_KM")
+
+    # Server-push events
+    event_stream_keepalive_seconds: int = Field(default=15, alias="EVENT_STREAM_KEEPALIVE_SECONDS")
+    event_stream_retry_ms: int = Field(default=5000, alias="EVENT_STREAM_RETRY_MS")
+
+    # Offline driver sync: outcomes kept per client idempotency key for replays
+    driver_sync_key_ttl_seconds: int = Field(default=604800, alias="DRIVER_SYNC_KEY_TTL_SECONDS")
+
+    # Idempotency-Key replays of mutating requests; an in-progress key expires
+    # after the lock time so a crashed request does not block retries
+    idempotency_key_ttl_seconds: int = Field(default=86400, alias="IDEMPOTENCY_KEY_TTL_SECONDS")
+    idempotency_lock_seconds: int = Field(default=120, alias="IDEMPOTENCY_LOCK_SECONDS")
+
+    # Photo processing (display + thumbnail variants, rendered in a process pool)
+    photo_processing_workers: int = Field(default=2, alias="PHOTO_PROCESSING_WORKERS")
+    photo_display_max_px: int = Field(default=1600, alias="PHOTO_DISPLAY_MAX_PX")
+    photo_thumbnail_max_px: int = Field(default=320, alias="PHOTO_THUMBNAIL_MAX_PX")
+    photo_jpeg_quality: int = Field(default=80, alias="PHOTO_JPEG_QUALITY")
+
+    # Photo storage ("local" filesystem served by nginx, or "s3" for any S3-compatible store)
+    photo_storage_backend: str = Field(default="local", alias="PHOTO_STORAGE_BACKEND")
+    photo_storage_root: str = Field(default="/var/www/deliveries/photos", alias="PHOTO_STORAGE_ROOT")
+    photo_storage_public_url: str = Field(default="/deliveries/photos", alias="PHOTO_STORAGE_PUBLIC_URL")
+    s3_endpoint_url: Optional[str] = Field(default=None, alias="S3_ENDPOINT_URL")
+    s3_bucket: Optional[str] = Field(default=None, alias="S3_BUCKET")
+    s3_access_key: Optional[str] = Field(default=None, alias="S3_ACCESS_KEY")
+    s3_secret_key: Optional[str] = Field(default=None, alias="S3_SECRET_KEY")
+    s3_region: str = Field(default="us-east-1", alias="S3_REGION")
+    # Public base URL of the bucket (default {S3_ENDPOINT_URL}/{S3_BUCKET})
+    s3_public_url: Optional[str] = Field(default=None, alias="S3_PUBLIC_URL")
+
     # Supabase configuration
     supabase_url: Optional[str] = Field(default=None, alias="SUPABASE_URL")
     supabase_service_role_key: Optional[str] = Field(default=None, alias="SUPABASE_SERVICE_ROLE_KEY")
 
+    # Notification outbox ("redis" shares the queue across workers, "local" is in-process)
+    notification_outbox_backend: str = Field(default="redis", alias="NOTIFICATION_OUTBOX_BACKEND")
+    notification_outbox_batch_size: int = Field(default=100, alias="NOTIFICATION_OUTBOX_BATCH_SIZE")
+    notification_outbox_max_attempts: int = Field(default=5, alias="NOTIFICATION_OUTBOX_MAX_ATTEMPTS")
+    notification_outbox_retry_base_seconds: float = Field(default=0.5, alias="NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS")
+    notification_outbox_retry_max_seconds: float = Field(default=30.0, alias="NOTIFICATION_OUTBOX_RETRY_MAX_SECONDS")
+
     # Stripe Connect configuration
     stripe_secret_key: Optional[str] = Field(default=None, alias="STRIPE_SECRET_KEY")
     stripe_webhook_secret: Optional[str] = Field(default=None, alias="STRIPE_WEBHOOK_SECRET")
@@ -63,6 +142,11 @@ class Settings(BaseSettings):
         default="http://localhost:5173/profile?stripe=refresh",
         alias="STRIPE_CONNECT_REFRESH_URL"
     )
+    stripe_max_workers: int = Field(default=4, alias="STRIPE_MAX_WORKERS")
+    stripe_status_cache_ttl_seconds: int = Field(default=60 * 60 * 24, alias="STRIPE_STATUS_CACHE_TTL_SECONDS")
+    # Stripe retries undelivered webhooks for up to 3 days
+    stripe_webhook_dedup_ttl_seconds: int = Field(default=60 * 60 * 24 * 3, alias="STRIPE_WEBHOOK_DEDUP_TTL_SECONDS")
+    stripe_webhook_max_attempts: int = Field(default=5, alias="STRIPE_WEBHOOK_MAX_ATTEMPTS")
 
     model_config = SettingsConfigDict(
         env_file=".env",
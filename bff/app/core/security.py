@@ -1,11 +1,17 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Optional
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from .config import get_settings
 
+logger = logging.getLogger(__name__)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
@@ -17,10 +23,106 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def create_token(subject: str, expires_delta: timedelta, scope: str, role: str = "driver") -> str:
+# bcrypt costs ~200ms of CPU per call, so hashing runs on its own bounded
+# thread pool (PASSWORD_HASH_WORKERS) and never on the event loop. At most
+# PASSWORD_HASH_MAX_QUEUE calls wait for a thread; beyond that callers are
+# rejected immediately with PasswordHasherBusyError instead of queueing for seconds.
+
+class PasswordHasherBusyError(RuntimeError):
+    """The password pool is saturated; the request should be retried later."""
+
+
+_password_executor: ThreadPoolExecutor | None = None
+_password_lock = threading.Lock()
+_password_in_flight = 0
+_password_rejected = 0
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    global _password_executor
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(
+            max_workers=get_settings().password_hash_workers,
+            thread_name_prefix="bcrypt"
+        )
+    return _password_executor
+
+
+def _release_password_slot(_future: Any) -> None:
+    global _password_in_flight
+    with _password_lock:
+        _password_in_flight -= 1
+
+
+async def _run_password_task(fn: Callable[..., Any], *args: Any) -> Any:
+    global _password_in_flight, _password_rejected
+    settings = get_settings()
+    capacity = settings.password_hash_workers + settings.password_hash_max_queue
+    with _password_lock:
+        if _password_in_flight >= capacity:
+            _password_rejected += 1
+            saturated = True
+        else:
+            _password_in_flight += 1
+            saturated = False
+    if saturated:
+        logger.warning("Password pool saturated (%s in flight), rejecting request", capacity)
+        raise PasswordHasherBusyError("Too many concurrent sign-ins, please retry")
+
+    try:
+        future = _get_password_executor().submit(fn, *args)
+    except BaseException:
+        _release_password_slot(None)
+        raise
+    # The slot is released when the thread finishes (or the call is cancelled before
+    # starting), not when the awaiting request goes away
+    future.add_done_callback(_release_password_slot)
+    return await asyncio.wrap_future(future)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the password pool; raises PasswordHasherBusyError when saturated."""
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the password pool; raises PasswordHasherBusyError when saturated."""
+    return await _run_password_task(get_password_hash, password)
+
+
+def password_pool_stats() -> Dict[str, int]:
+    """Current password pool load (queue_depth = calls waiting for a thread)."""
+    workers = get_settings().password_hash_workers
+    with _password_lock:
+        in_flight = _password_in_flight
+        rejected = _password_rejected
+    return {
+        "workers": workers,
+        "in_flight": in_flight,
+        "queue_depth": max(0, in_flight - workers),
+        "rejected_total": rejected
+    }
+
+
+def shutdown_password_executor() -> None:
+    """Release the password thread pool (called on application shutdown)."""
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+
+
+def create_token(
+    subject: str,
+    expires_delta: timedelta,
+    scope: str,
+    role: str = "driver",
+    claims: Optional[Dict[str, Any]] = None
+) -> str:
     settings = get_settings()
     expire = datetime.now(timezone.utc) + expires_delta
     payload: Dict[str, Any] = {
+        **(claims or {}),
         "sub": subject,
         "exp": expire,
         "scope": scope,
@@ -29,9 +131,22 @@ def create_token(subject: str, expires_delta: timedelta, scope: str, role: str =
     return jwt.encode(payload, settings.secret_key, algorithm="HS256")
 
 
-def create_access_token(subject: str, role: str = "driver") -> str:
+def create_access_token(
+    subject: str,
+    role: str = "driver",
+    driver_id: Optional[int] = None,
+    phone: Optional[str] = None
+) -> str:
+    """Access token; driver_id is a string claim so it survives JS number precision."""
     settings = get_settings()
-    return create_token(subject, timedelta(minutes=settings.access_token_expire_minutes), "access", role)
+    claims: Dict[str, Any] = {}
+    if driver_id is not None:
+        claims["driver_id"] = str(driver_id)
+    if phone:
+        claims["phone"] = phone
+    return create_token(
+        subject, timedelta(minutes=settings.access_token_expire_minutes), "access", role, claims
+    )
 
 
 def create_refresh_token(subject: str, role: str = "driver") -> str:
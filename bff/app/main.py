@@ -1,30 +1,87 @@
-from fastapi import Depends, FastAPI
+import asyncio
+import contextlib
+
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.v1.api import api_router
 from app.core.config import get_settings
 from app.core.logging import configure_logging
+from app.core.security import PasswordHasherBusyError, password_pool_stats, shutdown_password_executor
+from app.middleware.idempotency import IDEMPOTENT_REPLAYED_HEADER, IdempotencyMiddleware
 from app.api.deps import get_db_session
 from app.services.cache import redis
+from app.utils import NEXT_CURSOR_HEADER
+from app.workers.dashboard_refresher import run_dashboard_refresher
+from app.workers.marks_count_refresher import run_marks_count_refresher
+from app.workers.notification_outbox_worker import run_notification_outbox_worker
+from app.workers.photo_processing_worker import run_photo_processing_worker
+from app.workers.principal_invalidation_listener import run_principal_invalidation_listener
+from app.workers.search_indexer import run_search_indexer
+from app.workers.stripe_webhook_worker import run_stripe_webhook_worker
+from app.services.photo_service import shutdown_photo_executor
+from app.services.photo_storage import close_photo_store
+from app.services.stripe_service import shutdown_stripe_executor
 
 configure_logging()
 settings = get_settings()
 
 app = FastAPI(title=settings.app_name, version="0.1.0")
 
+# Added before CORS so replayed and rejected responses still get CORS headers
+app.add_middleware(IdempotencyMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins_list,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, IDEMPOTENT_REPLAYED_HEADER],
 )
 
 app.include_router(api_router, prefix=settings.api_v1_prefix)
 
 
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy(request: Request, exc: PasswordHasherBusyError) -> JSONResponse:
+    # Fail fast so a login burst cannot stall every other request
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"}
+    )
+
+_background_tasks: list[asyncio.Task] = []
+
+
+@app.on_event("startup")
+async def start_background_workers() -> None:
+    _background_tasks.append(asyncio.create_task(run_marks_count_refresher()))
+    _background_tasks.append(asyncio.create_task(run_dashboard_refresher()))
+    _background_tasks.append(asyncio.create_task(run_notification_outbox_worker()))
+    _background_tasks.append(asyncio.create_task(run_stripe_webhook_worker()))
+    _background_tasks.append(asyncio.create_task(run_photo_processing_worker()))
+    _background_tasks.append(asyncio.create_task(run_principal_invalidation_listener()))
+    _background_tasks.append(asyncio.create_task(run_search_indexer()))
+
+
+@app.on_event("shutdown")
+async def stop_background_workers() -> None:
+    for task in _background_tasks:
+        task.cancel()
+    for task in _background_tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    _background_tasks.clear()
+    shutdown_stripe_executor()
+    shutdown_photo_executor()
+    shutdown_password_executor()
+    await close_photo_store()
+
+
 @app.get("/health")
 async def health(session: AsyncSession = Depends(get_db_session)) -> dict:
     db_ok = True
@@ -40,5 +97,10 @@ async def health(session: AsyncSession = Depends(get_db_session)) -> dict:
     except Exception:  # noqa: BLE001
         redis_ok = False
 
-    status = "ok" if db_ok and redis_ok else "degraded"
-    return {"status": status, "database": db_ok, "redis": redis_ok}
+    health_status = "ok" if db_ok and redis_ok else "degraded"
+    return {
+        "status": health_status,
+        "database": db_ok,
+        "redis": redis_ok,
+        "password_pool": password_pool_stats()
+    }
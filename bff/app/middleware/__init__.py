@@ -3,6 +3,7 @@ Middleware package for delivery system.
 
 Provides validation, authorization, and request processing middleware.
 """
+from app.middleware.idempotency import IdempotencyMiddleware
 from app.middleware.workflow_validation import (
     WorkflowValidator,
     WorkflowValidationError,
@@ -10,6 +11,7 @@ from app.middleware.workflow_validation import (
 )
 
 __all__ = [
+    "IdempotencyMiddleware",
     "WorkflowValidator",
     "WorkflowValidationError",
     "validate_workflow_transition",
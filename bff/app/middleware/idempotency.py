@@ -0,0 +1,217 @@
+"""
+Idempotency-Key middleware.
+
+Mobile clients retry mutating requests after a timeout without knowing
+whether the first attempt went through. A POST/PUT/PATCH/DELETE sent with
+an Idempotency-Key header runs at most once per key and caller:
+
+- The key is claimed in Redis before the request runs; a concurrent retry
+  gets 409 (Retry-After) until the first attempt finishes.
+- A 2xx response is recorded with a fingerprint of the request (method,
+  path, query and body) and replayed to retries with the same key, marked
+  Idempotent-Replayed: true. Reusing a key for another request gets 422.
+- Any other outcome releases the key, so a corrected retry runs again.
+
+Keys are scoped to the token subject rather than the token, so a retry
+after a token refresh still matches. Bodies over MAX_FINGERPRINT_BODY
+(photo uploads) are not buffered: their fingerprint covers Content-Type
+and Content-Length, and a replay is answered before the body is read, so
+a retried upload writes no second file.
+
+Redis is best effort: when it is unavailable requests run unprotected.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.security import validate_token
+from app.services import cache
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENT_REPLAYED_HEADER = "Idempotent-Replayed"
+MUTATING_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+MAX_KEY_LENGTH = 255
+# Larger request bodies are fingerprinted by their headers instead of buffered
+MAX_FINGERPRINT_BODY = 64 * 1024
+# Larger responses are not recorded (workflow responses are small)
+MAX_RECORDED_BODY = 64 * 1024
+
+
+def _subject(authorization: Optional[str]) -> Optional[str]:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return validate_token(token, scope="access")
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _replay_body(body: bytes, receive: Receive) -> Receive:
+    """Hand the buffered body to the app, then defer to the real channel."""
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+async def fingerprint_request(scope: Scope, headers: Headers, receive: Receive) -> Tuple[str, Receive]:
+    """Hash what identifies the request; returns the receive channel to use afterwards."""
+    digest = hashlib.sha256()
+    query = scope.get("query_string", b"").decode("latin-1")
+    digest.update(f"{scope['method']} {scope['path']}?{query}\n".encode())
+    length = headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) <= MAX_FINGERPRINT_BODY:
+        body = await _read_body(receive)
+        digest.update(body)
+        receive = _replay_body(body, receive)
+    else:
+        digest.update(f"{headers.get('content-type')} {length}".encode())
+    return digest.hexdigest(), receive
+
+
+class _ResponseRecorder:
+    """Passes the response through while keeping a copy small enough to store."""
+
+    def __init__(self, send: Send) -> None:
+        self._send = send
+        self.status_code: Optional[int] = None
+        self.media_type: Optional[str] = None
+        self.body = bytearray()
+        self.oversized = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.status_code = message["status"]
+            self.media_type = Headers(raw=message.get("headers", [])).get("content-type")
+        elif message["type"] == "http.response.body" and not self.oversized:
+            chunk = message.get("body", b"")
+            if len(self.body) + len(chunk) > MAX_RECORDED_BODY:
+                self.oversized = True
+                self.body.clear()
+            else:
+                self.body.extend(chunk)
+        await self._send(message)
+
+    def record(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """The response to replay, or None if it must not be replayed."""
+        if self.status_code is None or not 200 <= self.status_code < 300 or self.oversized:
+            return None
+        return {
+            "fingerprint": fingerprint,
+            "status_code": self.status_code,
+            "media_type": self.media_type,
+            "body": base64.b64encode(bytes(self.body)).decode("ascii"),
+        }
+
+
+def _replay(stored: Dict[str, Any]) -> Response:
+    return Response(
+        content=base64.b64decode(stored["body"]),
+        status_code=stored["status_code"],
+        media_type=stored.get("media_type"),
+        headers={IDEMPOTENT_REPLAYED_HEADER: "true"}
+    )
+
+
+class IdempotencyMiddleware:
+    """Run keyed mutating requests at most once and replay their response."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        key = headers.get(IDEMPOTENCY_KEY_HEADER)
+        # Unauthenticated requests are left to the route, which answers 401
+        subject = _subject(headers.get("authorization")) if key else None
+        if not key or subject is None:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            response = JSONResponse(status_code=400, content={"detail": "Idempotency-Key is too long"})
+            await response(scope, receive, send)
+            return
+
+        settings = get_settings()
+        fingerprint, receive = await fingerprint_request(scope, headers, receive)
+        try:
+            stored = await cache.get_idempotent_response(subject, key)
+            claimed = stored is None and await cache.claim_idempotency_key(
+                subject, key, settings.idempotency_lock_seconds
+            )
+        except Exception:  # noqa: BLE001
+            logger.warning("Idempotency keys unavailable, running request unprotected", exc_info=True)
+            await self.app(scope, receive, send)
+            return
+
+        if isinstance(stored, dict):
+            if stored["fingerprint"] == fingerprint:
+                response = _replay(stored)
+            else:
+                response = JSONResponse(
+                    status_code=422,
+                    content={"detail": "Idempotency-Key was already used for a different request"}
+                )
+            await response(scope, receive, send)
+            return
+        if not claimed:
+            response = JSONResponse(
+                status_code=409,
+                content={"detail": "A request with this Idempotency-Key is in progress"},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+
+        recorder = _ResponseRecorder(send)
+        try:
+            await self.app(scope, receive, recorder.send)
+        except BaseException:
+            await self._release(subject, key)
+            raise
+
+        record = recorder.record(fingerprint)
+        if record is None:
+            await self._release(subject, key)
+            return
+        try:
+            await cache.store_idempotent_response(subject, key, record, settings.idempotency_key_ttl_seconds)
+        except Exception:  # noqa: BLE001
+            logger.warning("Failed to record idempotent response", exc_info=True)
+
+    @staticmethod
+    async def _release(subject: str, key: str) -> None:
+        try:
+            await cache.release_idempotency_key(subject, key)
+        except Exception:  # noqa: BLE001
+            logger.warning("Failed to release idempotency key", exc_info=True)
@@ -61,6 +61,42 @@ class WorkflowValidator:
 
         return True
 
+    # Warehouse order transitions (tigu_order.shipping_status):
+    # target status → statuses it can be reached from
+    WAREHOUSE_SHIPPING_TRANSITIONS = {
+        4: [3],  # 司机送达仓库 → 仓库已收货 (warehouse receive)
+        5: [4],  # 仓库已收货 → 司机配送用户 (warehouse ship)
+    }
+
+    @classmethod
+    def validate_warehouse_transition(
+        cls,
+        current_shipping_status: Optional[int],
+        new_shipping_status: int
+    ) -> bool:
+        """
+        Validate a warehouse receive/ship transition of an order.
+
+        Args:
+            current_shipping_status: Current tigu_order.shipping_status
+            new_shipping_status: 4 (received) or 5 (shipped)
+
+        Returns:
+            True if transition is valid
+
+        Raises:
+            WorkflowValidationError: If transition is invalid
+        """
+        valid_previous_states = cls.WAREHOUSE_SHIPPING_TRANSITIONS.get(new_shipping_status, [])
+
+        if current_shipping_status not in valid_previous_states:
+            raise WorkflowValidationError(
+                f"Invalid shipping status transition: {current_shipping_status} → {new_shipping_status}. "
+                f"Valid previous states: {valid_previous_states}"
+            )
+
+        return True
+
     @classmethod
     def validate_workflow_configuration(
         cls,
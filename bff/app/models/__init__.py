@@ -3,7 +3,8 @@ from app.models.driver import Driver
 from app.models.driver_performance import DriverAlert, DriverPerformance, DriverPerformanceLog
 from app.models.order import Order, OrderItem, UploadedFile, Warehouse
 from app.models.order_action import OrderAction
-from app.models.prepare_goods import PrepareGoods, PrepareGoodsItem
+from app.models.prepare_goods import PrepareGoods, PrepareGoodsItem, PrepareGoodsOrder
+from app.models.search_document import SearchDocument
 from app.models.user import User
 
 __all__ = [
@@ -17,6 +18,8 @@ __all__ = [
     "OrderAction",
     "PrepareGoods",
     "PrepareGoodsItem",
+    "PrepareGoodsOrder",
+    "SearchDocument",
     "UploadedFile",
     "Warehouse",
     "User"
@@ -34,6 +34,7 @@ class Driver(Base):
     status: Mapped[int] = mapped_column(SmallInteger, default=1)  # 1:active, 0:inactive
     rating: Mapped[Decimal] = mapped_column(Numeric(3, 2), default=Decimal("5.00"))
     total_deliveries: Mapped[int] = mapped_column(Integer, default=0)
+    max_load: Mapped[int | None] = mapped_column(Integer, nullable=True)  # NULL: DRIVER_DEFAULT_MAX_LOAD
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     # Stripe Connect fields
@@ -8,6 +8,7 @@ for delivery.
 Tables:
 - tigu_prepare_goods: Main prepare package table
 - tigu_prepare_goods_item: Items in prepare packages
+- tigu_prepare_goods_order: Indexed order → package mapping
 """
 from __future__ import annotations
 
@@ -291,3 +292,37 @@ class PrepareGoodsItem(Base):
         "OrderItem",
         lazy="joined"
     )
+
+
+class PrepareGoodsOrder(Base):
+    """
+    备货订单关联表 (tigu_prepare_goods_order)
+
+    Indexed mapping from order ID to prepare package. Mirrors the CSV in
+    PrepareGoods.order_ids so order → package lookups can use an equality
+    join instead of a LIKE scan over a TEXT column.
+
+    Rows are written by create_prepare_package. Existing packages are
+    backfilled by app.workers.backfill_prepare_goods_orders.
+    """
+    __tablename__ = "tigu_prepare_goods_order"
+
+    prepare_id: Mapped[int] = mapped_column(
+        BIGINT(unsigned=True),
+        ForeignKey("tigu_prepare_goods.id"),
+        primary_key=True,
+        comment="备货单ID"
+    )
+
+    order_id: Mapped[int] = mapped_column(
+        BIGINT(unsigned=True),
+        primary_key=True,
+        index=True,
+        comment="订单ID"
+    )
+
+    # Timestamps
+    create_time: Mapped[datetime] = mapped_column(
+        DateTime(),
+        comment="创建时间"
+    )
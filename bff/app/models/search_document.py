@@ -0,0 +1,64 @@
+"""
+Search document model for admin order/package lookups.
+
+tigu_search_document holds one normalized row per order and per prepare
+package: receiver phone reduced to digits (plus the reversed digits, so
+"last four digits" lookups are index prefix scans) and the receiver name
+under a FULLTEXT ngram index, which tokenizes Chinese names. The rows are
+maintained by app.services.search_service.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String
+from sqlalchemy.dialects.mysql import BIGINT
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class SearchDocument(Base):
+    """
+    搜索索引表 (tigu_search_document)
+
+    entity_type:
+    - 1: tigu_order
+    - 2: tigu_prepare_goods
+    """
+    __tablename__ = "tigu_search_document"
+
+    entity_type: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        comment="实体类型: 1=订单, 2=备货单"
+    )
+
+    entity_id: Mapped[int] = mapped_column(
+        BIGINT(unsigned=True),
+        primary_key=True,
+        comment="订单ID或备货单ID"
+    )
+
+    receiver_name: Mapped[str | None] = mapped_column(
+        String(64),
+        nullable=True,
+        comment="收货人姓名 (FULLTEXT ngram)"
+    )
+
+    phone_digits: Mapped[str | None] = mapped_column(
+        String(32),
+        nullable=True,
+        comment="收货人电话 (仅数字)"
+    )
+
+    phone_digits_rev: Mapped[str | None] = mapped_column(
+        String(32),
+        nullable=True,
+        comment="收货人电话 (数字倒序, 用于尾号查询)"
+    )
+
+    update_time: Mapped[datetime] = mapped_column(
+        DateTime(),
+        comment="更新时间"
+    )
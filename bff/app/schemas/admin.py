@@ -36,6 +36,7 @@ class DriverUpdate(BaseModel):
     vehicle_model: Optional[str] = None
     notes: Optional[str] = None
     status: Optional[int] = None
+    max_load: Optional[int] = Field(None, ge=1, description="Maximum active packages (default DRIVER_DEFAULT_MAX_LOAD)")
 
 
 class DriverResponse(DriverBase):
@@ -43,6 +44,7 @@ class DriverResponse(DriverBase):
     status: int  # 1=active, 0=inactive
     rating: Decimal
     total_deliveries: int
+    max_load: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
@@ -95,6 +97,37 @@ class DispatchDriver(BaseModel):
     is_available: bool
 
 
+class NearbyDriver(DispatchDriver):
+    """Available driver ranked by distance to a pickup location."""
+    distance_km: float
+    latitude: float
+    longitude: float
+
+
+class AutoDispatchRequest(BaseModel):
+    dry_run: bool = Field(False, description="Compute assignments without writing them")
+    max_distance_km: float = Field(50.0, gt=0, le=500, description="Ignore drivers farther than this from a pickup")
+    limit: int = Field(500, ge=1, le=2000, description="Maximum packages considered")
+
+
+class DispatchAssignment(BaseModel):
+    prepare_sn: str
+    driver_id: int
+    driver_name: str
+    distance_km: float
+
+
+class AutoDispatchResult(BaseModel):
+    dry_run: bool
+    package_count: int
+    driver_count: int
+    assigned_count: int
+    written_count: int
+    assignments: list[DispatchAssignment]
+    unassigned: list[str]
+    solve_time_ms: float
+
+
 class DriverAssignment(BaseModel):
     driver_id: int
     order_sn: str
@@ -130,6 +163,19 @@ class AdminDashboardStats(BaseModel):
     completed_orders: int
     completion_rate: float
     average_delivery_time: Optional[float] = None
+    computed_at: Optional[datetime] = None
+
+
+class AdminDashboardPoint(BaseModel):
+    """Dashboard counters as of the end of one hour"""
+    hour: datetime
+    total_drivers: int
+    active_drivers: int
+    total_orders: int
+    pending_orders: int
+    in_transit_orders: int
+    completed_orders: int
+    completion_rate: float
 
 
 class DriverLocation(BaseModel):
@@ -0,0 +1,76 @@
+"""
+Driver Sync API Schemas
+
+Pydantic models for POST /driver/sync, which replays the driver app's
+offline action queue.
+"""
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+
+DriverSyncActionType = Literal["claim", "confirm_pickup", "confirm_delivery", "arrive_warehouse", "location"]
+
+
+class DriverSyncAction(BaseModel):
+    """One queued driver action"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    idempotency_key: str = Field(
+        alias="idempotencyKey",
+        min_length=1,
+        max_length=128,
+        description="Client-generated key; a key is applied at most once"
+    )
+    type: DriverSyncActionType
+    prepare_sn: Optional[str] = Field(
+        default=None,
+        alias="prepareSn",
+        description="Package for claim, confirm_pickup and confirm_delivery"
+    )
+    order_sn: Optional[str] = Field(default=None, alias="orderSn", description="Order for arrive_warehouse")
+    photo: Optional[str] = Field(default=None, description="Base64 encoded photo or data URL (compatibility)")
+    photo_file_id: Optional[int] = Field(
+        default=None,
+        alias="photoFileId",
+        description="File id returned by POST /uploads/photos"
+    )
+    photo_ids: Optional[List[int]] = Field(default=None, alias="photoIds", description="Arrival photo file IDs")
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
+
+    @model_validator(mode="after")
+    def check_fields(self) -> "DriverSyncAction":
+        """Each action type carries the fields of its REST endpoint"""
+        if self.type in ("claim", "confirm_pickup", "confirm_delivery") and not self.prepare_sn:
+            raise ValueError(f"{self.type} requires prepareSn")
+        if self.type in ("confirm_pickup", "confirm_delivery") and (self.photo is None) == (self.photo_file_id is None):
+            raise ValueError("Provide either photo or photoFileId")
+        if self.type == "arrive_warehouse" and (not self.order_sn or not self.photo_ids):
+            raise ValueError("arrive_warehouse requires orderSn and photoIds")
+        if self.type == "location" and (self.latitude is None or self.longitude is None):
+            raise ValueError("location requires latitude and longitude")
+        return self
+
+
+class DriverSyncRequest(BaseModel):
+    """Queued actions, oldest first"""
+    actions: List[DriverSyncAction] = Field(min_length=1, max_length=200)
+
+
+class DriverSyncOutcome(BaseModel):
+    """Result of one queued action"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    idempotency_key: str = Field(alias="idempotencyKey")
+    type: DriverSyncActionType
+    result: Literal["applied", "failed", "superseded", "pending"] = Field(
+        description="superseded: an older location ping; pending: the key is still being applied elsewhere"
+    )
+    status_code: int = Field(alias="statusCode", description="HTTP status the single endpoint would have returned")
+    detail: Optional[str] = None
+    replayed: bool = Field(default=False, description="Outcome recorded by an earlier sync of the same key")
+
+
+class DriverSyncResponse(BaseModel):
+    """One outcome per queued action, in request order"""
+    outcomes: List[DriverSyncOutcome]
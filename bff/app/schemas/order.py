@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class WarehouseSnapshot(BaseModel):
@@ -148,3 +148,63 @@ class CompleteDeliveryRequest(BaseModel):
         description="List of uploaded delivery proof photo file IDs",
         min_length=1
     )
+
+
+class WarehouseBatchRequest(BaseModel):
+    """Scanned orders and/or packages to receive or ship in one batch"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    warehouse_staff_id: int = Field(alias='warehouseStaffId')
+    order_sns: List[str] = Field(default_factory=list, alias='orderSns', max_length=1000)
+    prepare_sns: List[str] = Field(
+        default_factory=list,
+        alias='prepareSns',
+        max_length=200,
+        description="Packages; every order in them is processed"
+    )
+    photo_ids: Optional[List[int]] = Field(
+        default=None,
+        alias='photoIds',
+        description="Optional uploaded photo file IDs, recorded on every action"
+    )
+
+    @model_validator(mode="after")
+    def check_scans(self) -> "WarehouseBatchRequest":
+        """At least one order or package is required"""
+        if not self.order_sns and not self.prepare_sns:
+            raise ValueError("Provide orderSns or prepareSns")
+        return self
+
+
+class WarehouseBatchItem(BaseModel):
+    """Outcome for one scanned order (or an unknown package)"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    scanned_sn: str = Field(alias='scannedSn', description="Order or package serial number as scanned")
+    order_sn: Optional[str] = Field(default=None, alias='orderSn')
+    result: Literal["ok", "already_done", "invalid_status", "not_found"]
+    shipping_status: Optional[int] = Field(default=None, alias='shippingStatus')
+    detail: Optional[str] = None
+
+
+class WarehouseBatchResponse(BaseModel):
+    """Per-item results of a batch receive/ship"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    applied: int = Field(description="Orders transitioned by this batch")
+    items: List[WarehouseBatchItem]
+
+
+class WarehouseScanMessage(WarehouseBatchRequest):
+    """One message on the warehouse scan stream"""
+
+    action: Literal["receive", "ship"]
+    seq: Optional[int] = Field(default=None, description="Echoed back to match results to scans")
+
+
+class WarehouseScanResult(WarehouseBatchResponse):
+    """Reply to a scan stream message"""
+
+    action: Optional[Literal["receive", "ship"]] = None
+    seq: Optional[int] = None
+    error: Optional[str] = None
@@ -86,6 +86,29 @@ class WorkflowTimelineResponse(BaseModel):
     )
 
 
+class WorkflowTimelineCompactItem(BaseModel):
+    """Compact timeline item for list views (ids and thumbnails only)"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    action_id: int = Field(alias="actionId")
+    action_type: int = Field(alias="actionType")
+    action_type_label: str = Field(alias="actionTypeLabel")
+    create_time: str = Field(alias="createTime", description="ISO format timestamp")
+    file_ids: List[int] = Field(default_factory=list, alias="fileIds")
+    thumbnails: List[str] = Field(default_factory=list, description="Thumbnail URLs, same order as fileIds")
+
+
+class WorkflowTimelineCompactResponse(BaseModel):
+    """Compact workflow timeline"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    order_sn: str = Field(alias="orderSn")
+    timeline: List[WorkflowTimelineCompactItem] = Field(
+        default_factory=list,
+        description="Ordered list of workflow actions"
+    )
+
+
 # Action type label mapping
 ACTION_TYPE_LABELS = {
     0: "备货",                    # Goods Prepared
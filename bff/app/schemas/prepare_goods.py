@@ -6,7 +6,7 @@ Pydantic models for PrepareGoods API requests and responses.
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class PrepareGoodsItemSchema(BaseModel):
@@ -65,12 +65,34 @@ class AssignDriverRequest(BaseModel):
 
 
 class ConfirmPickupRequest(BaseModel):
-    """Request to confirm pickup with photo proof"""
+    """Request to confirm pickup with photo proof (uploaded file id or base64)"""
     model_config = ConfigDict(populate_by_name=True)
 
-    photo: str = Field(description="Base64 encoded photo or data URL")
+    photo: Optional[str] = Field(default=None, description="Base64 encoded photo or data URL (compatibility)")
+    photo_file_id: Optional[int] = Field(
+        default=None,
+        alias="photoFileId",
+        description="File id returned by POST /uploads/photos"
+    )
     notes: Optional[str] = Field(default=None, max_length=500, description="Optional pickup notes")
 
+    @model_validator(mode="after")
+    def check_photo(self) -> "ConfirmPickupRequest":
+        """Exactly one of photo / photoFileId is required"""
+        if (self.photo is None) == (self.photo_file_id is None):
+            raise ValueError("Provide either photo or photoFileId")
+        return self
+
+
+class UploadedPhotoResponse(BaseModel):
+    """Photo stored by POST /uploads/photos"""
+    model_config = ConfigDict(populate_by_name=True)
+
+    id: str = Field(description="Uploaded file id (string to preserve bigint precision)")
+    file_url: str = Field(alias="fileUrl")
+    file_type: str = Field(alias="fileType")
+    file_size: int = Field(alias="fileSize")
+
 
 class PrepareGoodsResponse(BaseModel):
     """PrepareGoods package response"""
@@ -96,6 +118,7 @@ class UploadedFileSchema(BaseModel):
     id: int
     file_name: str = Field(alias="fileName")
     file_url: str = Field(alias="fileUrl")
+    original_url: Optional[str] = Field(default=None, alias="originalUrl", description="Full-size photo")
     file_type: str = Field(alias="fileType")
     file_size: int = Field(alias="fileSize")
     uploader_name: Optional[str] = Field(default=None, alias="uploaderName")
@@ -13,11 +13,15 @@ class RouteStop(BaseModel):
     eta: Optional[str] = None
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    distance_from_previous_km: Optional[float] = Field(default=None, alias='distanceFromPreviousKm')
 
 
 class RoutePlan(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
     id: str
     stops: List[RouteStop]
+    total_distance_km: Optional[float] = Field(default=None, alias='totalDistanceKm')
 
 
 class LocationUpdate(BaseModel):
@@ -1,3 +1,5 @@
+import json
+import time
 from datetime import datetime
 from typing import Any
 
@@ -20,6 +22,13 @@ async def get_refresh_token(user_id: int) -> str | None:
     return await redis.get(key)
 
 
+DRIVER_LOCATION_TTL_SECONDS = 900
+# GEO set of driver positions (member = user_id) for radius queries
+DRIVER_GEO_KEY = "drivers:geo"
+# Sorted set of member → last update (epoch seconds) used to prune stale GEO members
+DRIVER_GEO_SEEN_KEY = "drivers:geo:seen"
+
+
 async def store_driver_location(user_id: int, latitude: float, longitude: float) -> None:
     key = f"driver:{user_id}:location"
     payload: dict[str, Any] = {
@@ -27,11 +36,435 @@ async def store_driver_location(user_id: int, latitude: float, longitude: float)
         "lng": longitude,
         "updated_at": datetime.utcnow().isoformat()
     }
-    await redis.hset(key, mapping=payload)
-    await redis.expire(key, 900)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=payload)
+        pipe.expire(key, DRIVER_LOCATION_TTL_SECONDS)
+        pipe.geoadd(DRIVER_GEO_KEY, [longitude, latitude, str(user_id)])
+        pipe.zadd(DRIVER_GEO_SEEN_KEY, {str(user_id): time.time()})
+        await pipe.execute()
 
 
 async def get_driver_location(user_id: int) -> dict[str, Any] | None:
     key = f"driver:{user_id}:location"
     result = await redis.hgetall(key)
     return result or None
+
+
+async def get_driver_locations(user_ids: list[int]) -> dict[int, dict[str, Any]]:
+    """Fetch location hashes for many drivers in one round trip (missing/expired are omitted)."""
+    if not user_ids:
+        return {}
+    async with redis.pipeline(transaction=False) as pipe:
+        for user_id in user_ids:
+            pipe.hgetall(f"driver:{user_id}:location")
+        results = await pipe.execute()
+    return {user_id: result for user_id, result in zip(user_ids, results, strict=True) if result}
+
+
+async def prune_stale_driver_locations(max_age_seconds: int = DRIVER_LOCATION_TTL_SECONDS) -> int:
+    """Remove GEO members whose last update is older than max_age_seconds."""
+    cutoff = time.time() - max_age_seconds
+    stale = await redis.zrangebyscore(DRIVER_GEO_SEEN_KEY, "-inf", cutoff)
+    if not stale:
+        return 0
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.zrem(DRIVER_GEO_KEY, *stale)
+        pipe.zrem(DRIVER_GEO_SEEN_KEY, *stale)
+        await pipe.execute()
+    return len(stale)
+
+
+async def find_nearby_driver_locations(
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    count: int
+) -> list[tuple[int, float, float, float]]:
+    """
+    Nearest drivers by live position.
+
+    Returns:
+        List of (user_id, distance_km, latitude, longitude), nearest first
+    """
+    results = await redis.geosearch(
+        DRIVER_GEO_KEY,
+        longitude=longitude,
+        latitude=latitude,
+        radius=radius_km,
+        unit="km",
+        sort="ASC",
+        count=count,
+        withdist=True,
+        withcoord=True
+    )
+    return [
+        (int(member), float(distance), float(coords[1]), float(coords[0]))
+        for member, distance, coords in results
+    ]
+
+
+MARKS_LIST_KEY = "marks:list"
+MARK_COUNTS_KEY = "marks:order_counts"
+# Present only in a fully recomputed counts hash; a hash without it is treated as missing
+MARK_COUNTS_COMPUTED_FIELD = "_computed_at"
+
+
+async def get_marks_snapshot() -> tuple[list[dict[str, Any]] | None, dict[str, str] | None]:
+    """Read cached mark list and per-location order counts in one round trip."""
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.get(MARKS_LIST_KEY)
+        pipe.hgetall(MARK_COUNTS_KEY)
+        raw_marks, counts = await pipe.execute()
+
+    marks = json.loads(raw_marks) if raw_marks else None
+    if not counts or MARK_COUNTS_COMPUTED_FIELD not in counts:
+        counts = None
+    return marks, counts
+
+
+async def store_marks_list(marks: list[dict[str, Any]], ttl_seconds: int) -> None:
+    await redis.set(MARKS_LIST_KEY, json.dumps(marks), ex=ttl_seconds)
+
+
+async def replace_mark_counts(counts: dict[str, int], ttl_seconds: int) -> None:
+    """Atomically replace the counts hash with a full recompute."""
+    mapping: dict[str, Any] = {**counts, MARK_COUNTS_COMPUTED_FIELD: datetime.utcnow().isoformat()}
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.delete(MARK_COUNTS_KEY)
+        pipe.hset(MARK_COUNTS_KEY, mapping=mapping)
+        pipe.expire(MARK_COUNTS_KEY, ttl_seconds)
+        await pipe.execute()
+
+
+async def adjust_mark_counts(decrement: str | None, increment: str | None) -> None:
+    """Move one package between location counters (either side may be None)."""
+    async with redis.pipeline(transaction=True) as pipe:
+        if decrement:
+            pipe.hincrby(MARK_COUNTS_KEY, decrement, -1)
+        if increment:
+            pipe.hincrby(MARK_COUNTS_KEY, increment, 1)
+        await pipe.execute()
+
+
+# Pub/sub channels for server-push events (see event_service)
+EVENTS_PACKAGES_CHANNEL = "events:packages"
+EVENTS_DRIVER_CHANNEL_PREFIX = "events:driver:"
+
+
+async def publish_messages(messages: list[tuple[str, dict[str, Any]]]) -> None:
+    """Publish (channel, payload) pairs in one round trip."""
+    if not messages:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for channel, payload in messages:
+            pipe.publish(channel, json.dumps(payload, default=str))
+        await pipe.execute()
+
+
+STRIPE_WEBHOOK_QUEUE_KEY = "stripe:webhooks"
+# Webhook events that exhausted their retries
+STRIPE_WEBHOOK_DEAD_LETTER_KEY = "stripe:webhooks:dead"
+
+
+async def get_stripe_status(driver_id: int) -> dict[str, Any] | None:
+    raw = await redis.get(f"driver:{driver_id}:stripe_status")
+    return json.loads(raw) if raw else None
+
+
+async def store_stripe_status(driver_id: int, status: dict[str, Any], ttl_seconds: int) -> None:
+    await redis.set(f"driver:{driver_id}:stripe_status", json.dumps(status, default=str), ex=ttl_seconds)
+
+
+async def claim_stripe_event(event_id: str, ttl_seconds: int) -> bool:
+    """Mark a webhook event as seen; False if it was already claimed."""
+    return bool(await redis.set(f"stripe:event:{event_id}", "1", nx=True, ex=ttl_seconds))
+
+
+async def release_stripe_event(event_id: str) -> None:
+    await redis.delete(f"stripe:event:{event_id}")
+
+
+async def push_stripe_webhook(envelope: dict[str, Any], dead_letter: bool = False) -> None:
+    key = STRIPE_WEBHOOK_DEAD_LETTER_KEY if dead_letter else STRIPE_WEBHOOK_QUEUE_KEY
+    await redis.rpush(key, json.dumps(envelope, default=str))
+
+
+async def pop_stripe_webhook(timeout: float) -> dict[str, Any] | None:
+    """Wait up to timeout seconds for the next queued webhook envelope."""
+    item = await redis.blpop([STRIPE_WEBHOOK_QUEUE_KEY], timeout=timeout)
+    return json.loads(item[1]) if item else None
+
+
+# Offline driver sync (see driver_sync_service): one key per client
+# idempotency key, "pending" while the action runs, then its JSON outcome
+DRIVER_SYNC_PENDING = "pending"
+
+
+def _driver_sync_key(driver_id: int, idempotency_key: str) -> str:
+    return f"driver:{driver_id}:sync:{idempotency_key}"
+
+
+async def get_driver_sync_outcomes(driver_id: int, idempotency_keys: list[str]) -> dict[str, Any]:
+    """Stored outcome (or DRIVER_SYNC_PENDING) per known key, in one round trip."""
+    if not idempotency_keys:
+        return {}
+    raws = await redis.mget([_driver_sync_key(driver_id, key) for key in idempotency_keys])
+    return {
+        key: raw if raw == DRIVER_SYNC_PENDING else json.loads(raw)
+        for key, raw in zip(idempotency_keys, raws, strict=True)
+        if raw
+    }
+
+
+async def claim_driver_sync_action(driver_id: int, idempotency_key: str, ttl_seconds: int) -> bool:
+    """Mark a queued action as running; False if the key was already claimed."""
+    return bool(await redis.set(
+        _driver_sync_key(driver_id, idempotency_key), DRIVER_SYNC_PENDING, nx=True, ex=ttl_seconds
+    ))
+
+
+async def store_driver_sync_outcomes(driver_id: int, outcomes: dict[str, dict[str, Any]], ttl_seconds: int) -> None:
+    if not outcomes:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, outcome in outcomes.items():
+            pipe.set(_driver_sync_key(driver_id, key), json.dumps(outcome), ex=ttl_seconds)
+        await pipe.execute()
+
+
+async def release_driver_sync_actions(driver_id: int, idempotency_keys: list[str]) -> None:
+    if idempotency_keys:
+        await redis.delete(*(_driver_sync_key(driver_id, key) for key in idempotency_keys))
+
+
+# Idempotency-Key replays (see app.middleware.idempotency): "pending" while
+# the first request runs, then its recorded response
+IDEMPOTENCY_PENDING = "pending"
+
+
+def _idempotency_key(subject: str, idempotency_key: str) -> str:
+    return f"idempotency:{subject}:{idempotency_key}"
+
+
+async def get_idempotent_response(subject: str, idempotency_key: str) -> dict[str, Any] | str | None:
+    raw = await redis.get(_idempotency_key(subject, idempotency_key))
+    if not raw or raw == IDEMPOTENCY_PENDING:
+        return raw or None
+    return json.loads(raw)
+
+
+async def claim_idempotency_key(subject: str, idempotency_key: str, ttl_seconds: int) -> bool:
+    """Mark a request as running; False if the key is taken."""
+    return bool(await redis.set(
+        _idempotency_key(subject, idempotency_key), IDEMPOTENCY_PENDING, nx=True, ex=ttl_seconds
+    ))
+
+
+async def store_idempotent_response(
+    subject: str, idempotency_key: str, response: dict[str, Any], ttl_seconds: int
+) -> None:
+    await redis.set(_idempotency_key(subject, idempotency_key), json.dumps(response), ex=ttl_seconds)
+
+
+async def release_idempotency_key(subject: str, idempotency_key: str) -> None:
+    await redis.delete(_idempotency_key(subject, idempotency_key))
+
+
+PHOTO_PROCESSING_QUEUE_KEY = "photos:process"
+
+
+async def push_photo_job(file_id: int) -> None:
+    await redis.rpush(PHOTO_PROCESSING_QUEUE_KEY, str(file_id))
+
+
+async def pop_photo_job(timeout: float) -> int | None:
+    """Wait up to timeout seconds for the next uploaded file id to process."""
+    item = await redis.blpop([PHOTO_PROCESSING_QUEUE_KEY], timeout=timeout)
+    return int(item[1]) if item else None
+
+
+# Authenticated principals (see principal_service); invalidations are broadcast
+# so every worker can drop its in-process copy
+PRINCIPAL_INVALIDATION_CHANNEL = "auth:principal:invalidate"
+
+
+def _principal_key(user_id: int) -> str:
+    return f"auth:principal:{user_id}"
+
+
+async def get_principal(user_id: int) -> dict[str, Any] | None:
+    raw = await redis.get(_principal_key(user_id))
+    return json.loads(raw) if raw else None
+
+
+async def store_principal(user_id: int, principal: dict[str, Any], ttl_seconds: int) -> None:
+    await redis.set(_principal_key(user_id), json.dumps(principal), ex=ttl_seconds)
+
+
+async def invalidate_principals(user_ids: list[int]) -> None:
+    """Delete cached principals and broadcast the ids in one round trip."""
+    if not user_ids:
+        return
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.delete(*(_principal_key(user_id) for user_id in user_ids))
+        pipe.publish(PRINCIPAL_INVALIDATION_CHANNEL, json.dumps(user_ids))
+        await pipe.execute()
+
+
+# Admin dashboard counters (see dashboard_service)
+DASHBOARD_STATS_KEY = "dashboard:stats"
+# Sorted set of hourly snapshots (score = hour start, epoch seconds)
+DASHBOARD_HOURLY_KEY = "dashboard:hourly"
+DASHBOARD_REFRESH_LOCK_KEY = "dashboard:refresh_lock"
+
+
+async def get_dashboard_stats() -> dict[str, Any] | None:
+    raw = await redis.get(DASHBOARD_STATS_KEY)
+    return json.loads(raw) if raw else None
+
+
+async def store_dashboard_stats(
+    stats: dict[str, Any],
+    ttl_seconds: int,
+    hour_start: int,
+    history_seconds: int
+) -> None:
+    """Store the current counters and record them as the snapshot for their hour."""
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.set(DASHBOARD_STATS_KEY, json.dumps(stats), ex=ttl_seconds)
+        # The latest refresh within an hour replaces that hour's snapshot
+        pipe.zremrangebyscore(DASHBOARD_HOURLY_KEY, hour_start, hour_start)
+        pipe.zadd(DASHBOARD_HOURLY_KEY, {json.dumps(stats): hour_start})
+        pipe.zremrangebyscore(DASHBOARD_HOURLY_KEY, "-inf", f"({hour_start - history_seconds}")
+        await pipe.execute()
+
+
+async def get_dashboard_hourly(since: int) -> list[tuple[int, dict[str, Any]]]:
+    """Hourly snapshots from hour start `since` (epoch seconds) onwards, oldest first."""
+    rows = await redis.zrangebyscore(DASHBOARD_HOURLY_KEY, since, "+inf", withscores=True)
+    return [(int(score), json.loads(member)) for member, score in rows]
+
+
+async def claim_dashboard_refresh(ttl_seconds: int) -> bool:
+    """Let one worker per interval recompute the dashboard counters."""
+    return bool(await redis.set(DASHBOARD_REFRESH_LOCK_KEY, "1", nx=True, ex=ttl_seconds))
+
+
+# Search index sweeps (see app.workers.search_indexer): newest timestamp
+# indexed per sweep, plus a lock so one worker sweeps per interval
+SEARCH_INDEX_WATERMARKS_KEY = "search:index:watermarks"
+SEARCH_INDEX_LOCK_KEY = "search:index:lock"
+
+
+async def get_search_index_watermarks() -> dict[str, datetime]:
+    raw = await redis.hgetall(SEARCH_INDEX_WATERMARKS_KEY)
+    return {sweep: datetime.fromisoformat(value) for sweep, value in raw.items()}
+
+
+async def store_search_index_watermark(sweep: str, watermark: datetime) -> None:
+    await redis.hset(SEARCH_INDEX_WATERMARKS_KEY, sweep, watermark.isoformat())
+
+
+async def claim_search_index_run(ttl_seconds: int) -> bool:
+    """Let one worker per interval sweep for search index changes."""
+    return bool(await redis.set(SEARCH_INDEX_LOCK_KEY, "1", nx=True, ex=ttl_seconds))
+
+
+# Assembled package details (see package_detail_service): one hash per
+# prepare_sn with a field per photo variant, reference sets so mutations
+# known only by package or order id can find the prepare_sn, and a version
+# per prepare_sn bumped on every invalidation, so a detail assembled before
+# an invalidation is not stored after it
+PACKAGE_DETAIL_KEY_PREFIX = "package:detail:"
+# Outlives any detail build; an expired version reads as "0" again
+PACKAGE_DETAIL_VERSION_TTL_SECONDS = 86400
+
+_store_package_detail_script = redis.register_script(
+    """
+    if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    return 1
+    """
+)
+
+
+def _package_detail_key(prepare_sn: str) -> str:
+    return f"{PACKAGE_DETAIL_KEY_PREFIX}{prepare_sn}"
+
+
+def _package_detail_ref_key(kind: str, entity_id: int) -> str:
+    return f"{PACKAGE_DETAIL_KEY_PREFIX}ref:{kind}:{entity_id}"
+
+
+def _package_detail_version_key(prepare_sn: str) -> str:
+    return f"{PACKAGE_DETAIL_KEY_PREFIX}version:{prepare_sn}"
+
+
+async def get_package_detail(prepare_sn: str, variant: str) -> dict[str, Any] | None:
+    raw = await redis.hget(_package_detail_key(prepare_sn), variant)
+    return json.loads(raw) if raw else None
+
+
+async def get_package_detail_version(prepare_sn: str) -> str:
+    """Read before assembling a detail; store_package_detail checks it is unchanged."""
+    return await redis.get(_package_detail_version_key(prepare_sn)) or "0"
+
+
+async def register_package_detail_refs(
+    prepare_sn: str,
+    package_id: int,
+    order_ids: list[int],
+    ttl_seconds: int
+) -> None:
+    """Index a prepare_sn by package and order id, so invalidations by id bump its version."""
+    async with redis.pipeline(transaction=False) as pipe:
+        for ref_key in [_package_detail_ref_key("package", package_id)] + [
+            _package_detail_ref_key("order", order_id) for order_id in order_ids
+        ]:
+            pipe.sadd(ref_key, prepare_sn)
+            pipe.expire(ref_key, ttl_seconds)
+        await pipe.execute()
+
+
+async def store_package_detail(
+    prepare_sn: str,
+    variant: str,
+    detail: dict[str, Any],
+    ttl_seconds: int,
+    version: str
+) -> bool:
+    """Store one variant of a package detail unless it was invalidated since `version` was read."""
+    stored = await _store_package_detail_script(
+        keys=[_package_detail_key(prepare_sn), _package_detail_version_key(prepare_sn)],
+        args=[version, variant, json.dumps(detail), ttl_seconds]
+    )
+    return bool(stored)
+
+
+async def invalidate_package_details(
+    prepare_sns: list[str] | None = None,
+    package_ids: list[int] | None = None,
+    order_ids: list[int] | None = None
+) -> None:
+    """Drop every variant of the package details matching any of the given keys."""
+    ref_keys = [_package_detail_ref_key("package", package_id) for package_id in package_ids or []]
+    ref_keys += [_package_detail_ref_key("order", order_id) for order_id in order_ids or []]
+    sns = set(prepare_sns or [])
+    if ref_keys:
+        async with redis.pipeline(transaction=False) as pipe:
+            for ref_key in ref_keys:
+                pipe.smembers(ref_key)
+            for members in await pipe.execute():
+                sns.update(members)
+    keys = [_package_detail_key(sn) for sn in sns] + ref_keys
+    if not keys:
+        return
+    async with redis.pipeline(transaction=True) as pipe:
+        for sn in sns:
+            pipe.incr(_package_detail_version_key(sn))
+            pipe.expire(_package_detail_version_key(sn), PACKAGE_DETAIL_VERSION_TTL_SECONDS)
+        pipe.delete(*keys)
+        await pipe.execute()
@@ -0,0 +1,168 @@
+"""
+Dashboard Service
+
+Admin dashboard counters over tigu_driver and tigu_prepare_goods.
+
+All counters come from one conditional-aggregation query (SUM(CASE ...)).
+The result is cached in Redis for DASHBOARD_CACHE_TTL_SECONDS and
+recomputed every DASHBOARD_REFRESH_SECONDS by
+app.workers.dashboard_refresher (one worker per interval), so any number of
+admins watching the dashboard cost one query per interval. Each refresh is
+also recorded as the snapshot for the current hour, giving an hourly series
+without scanning history.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from sqlalchemy import Select, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.driver import Driver
+from app.models.prepare_goods import PrepareGoods
+from app.schemas.admin import AdminDashboardPoint, AdminDashboardStats
+from app.services import cache
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+SECONDS_PER_HOUR = 3600
+
+# prepare_status groups (merchant self-delivery, delivery_type=0, is excluded)
+PENDING_STATUSES = (0,)  # plus NULL (not prepared yet)
+IN_TRANSIT_STATUSES = (1, 2, 3, 4, 5, 6)
+COMPLETED_STATUS = 7
+
+
+def _count_if(condition: Any) -> Any:
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def dashboard_counters_query() -> Select:
+    """One SELECT returning every dashboard counter (two single-row aggregates, cross joined)."""
+    drivers = select(
+        func.count(Driver.id).label("total_drivers"),
+        _count_if(Driver.status == 1).label("active_drivers")
+    ).subquery()
+
+    status = PrepareGoods.prepare_status
+    packages = select(
+        func.count(PrepareGoods.id).label("total_orders"),
+        _count_if(status.is_(None) | status.in_(PENDING_STATUSES)).label("pending_orders"),
+        _count_if(status.in_(IN_TRANSIT_STATUSES)).label("in_transit_orders"),
+        _count_if(status == COMPLETED_STATUS).label("completed_orders")
+    ).where(PrepareGoods.delivery_type != 0).subquery()
+
+    return select(drivers, packages)
+
+
+def _completion_rate(counters: Dict[str, Any]) -> float:
+    total = counters["total_orders"]
+    return (counters["completed_orders"] / total * 100) if total > 0 else 0
+
+
+async def compute_dashboard_counters(session: AsyncSession) -> Dict[str, Any]:
+    """
+    Compute the dashboard counters from MySQL in a single query.
+
+    Returns:
+        Dict of counter name -> count, plus computed_at (ISO, UTC)
+    """
+    row = (await session.execute(dashboard_counters_query())).one()
+    counters: Dict[str, Any] = {key: int(value or 0) for key, value in row._mapping.items()}
+    counters["computed_at"] = datetime.now(timezone.utc).isoformat()
+    return counters
+
+
+async def _store(counters: Dict[str, Any]) -> None:
+    now = int(time.time())
+    await cache.store_dashboard_stats(
+        counters,
+        ttl_seconds=_settings.dashboard_cache_ttl_seconds,
+        hour_start=now - now % SECONDS_PER_HOUR,
+        history_seconds=_settings.dashboard_history_hours * SECONDS_PER_HOUR
+    )
+
+
+async def refresh_dashboard_stats(session: AsyncSession) -> Dict[str, Any]:
+    """Recompute the counters and store them as the current value and hourly snapshot."""
+    counters = await compute_dashboard_counters(session)
+    await _store(counters)
+    return counters
+
+
+async def get_dashboard_stats(session: AsyncSession) -> AdminDashboardStats:
+    """
+    Get the dashboard counters, from Redis when cached.
+
+    Falls back to computing them (and caching the result) when the cache is
+    empty or Redis is unavailable.
+
+    Args:
+        session: Database session, only used on a cache miss
+
+    Returns:
+        AdminDashboardStats
+    """
+    try:
+        counters = await cache.get_dashboard_stats()
+    except Exception:  # noqa: BLE001
+        logger.warning("Dashboard cache unavailable", exc_info=True)
+        counters = None
+    if counters is not None:
+        return _to_stats(counters)
+
+    counters = await compute_dashboard_counters(session)
+    try:
+        await _store(counters)
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to cache dashboard stats", exc_info=True)
+    return _to_stats(counters)
+
+
+def _to_stats(counters: Dict[str, Any]) -> AdminDashboardStats:
+    return AdminDashboardStats(
+        total_drivers=counters["total_drivers"],
+        active_drivers=counters["active_drivers"],
+        total_orders=counters["total_orders"],
+        pending_orders=counters["pending_orders"],
+        in_transit_orders=counters["in_transit_orders"],
+        completed_orders=counters["completed_orders"],
+        completion_rate=_completion_rate(counters),
+        computed_at=counters.get("computed_at")
+    )
+
+
+async def get_dashboard_hourly(hours: int) -> List[AdminDashboardPoint]:
+    """
+    Hourly dashboard snapshots for the last `hours` hours (current hour included).
+
+    Hours with no refresh (e.g. while the BFF was down) are absent.
+
+    Args:
+        hours: Number of hours to return
+
+    Returns:
+        Points ordered oldest first
+    """
+    now = int(time.time())
+    current_hour = now - now % SECONDS_PER_HOUR
+    snapshots = await cache.get_dashboard_hourly(since=current_hour - (hours - 1) * SECONDS_PER_HOUR)
+    return [
+        AdminDashboardPoint(
+            hour=datetime.fromtimestamp(hour_start, tz=timezone.utc),
+            total_drivers=counters["total_drivers"],
+            active_drivers=counters["active_drivers"],
+            total_orders=counters["total_orders"],
+            pending_orders=counters["pending_orders"],
+            in_transit_orders=counters["in_transit_orders"],
+            completed_orders=counters["completed_orders"],
+            completion_rate=_completion_rate(counters)
+        )
+        for hour_start, counters in snapshots
+    ]
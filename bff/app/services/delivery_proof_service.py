@@ -1,8 +1,7 @@
+import asyncio
 import base64
 import logging
-import os
 from datetime import datetime
-from pathlib import Path
 from typing import Optional
 
 from fastapi import HTTPException, status
@@ -11,25 +10,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.delivery_proof import DeliveryProof
 from app.models.order import Order
+from app.services import photo_storage
 
 # Configuration
-UPLOAD_DIR = Path("/var/www/deliveries/photos")
 MAX_FILE_SIZE = 4 * 1024 * 1024  # 4MB in bytes
 ALLOWED_MIME_TYPES = {"image/jpeg", "image/jpg", "image/png"}
 
 logger = logging.getLogger(__name__)
 
 
-def ensure_upload_directory():
-    """Create upload directory if it doesn't exist"""
-    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-    # Attempt to set permissions, but don't fail if the process lacks rights (e.g. non-root)
-    try:
-        os.chmod(UPLOAD_DIR, 0o755)
-    except PermissionError:
-        logger.warning("Unable to change permissions for %s; continuing anyway", UPLOAD_DIR)
-
-
 def decode_base64_image(data_url: str) -> tuple[bytes, str]:
     """
     Decode base64 image from data URL.
@@ -79,53 +68,44 @@ def decode_base64_image(data_url: str) -> tuple[bytes, str]:
         )
 
 
-def save_photo(image_bytes: bytes, order_sn: str, mime_type: str) -> str:
+async def save_photo(image_bytes: bytes, mime_type: str) -> str:
     """
-    Save photo to local filesystem.
+    Save photo to the photo store.
 
     Returns:
-        str: Relative URL path to the photo
+        str: Public URL of the photo
     """
-    ensure_upload_directory()
-
-    # Generate unique filename
-    timestamp = int(datetime.now().timestamp())
     extension = mime_type.split('/')[-1]
     if extension == 'jpg':
         extension = 'jpeg'
-    filename = f"{order_sn}_{timestamp}.{extension}"
-
-    # Save file
-    file_path = UPLOAD_DIR / filename
-    with open(file_path, 'wb') as f:
-        f.write(image_bytes)
-
-    # Set file permissions
-    os.chmod(file_path, 0o644)
-
-    # Return relative URL (served by nginx)
-    return f"/deliveries/photos/{filename}"
+    stored = await photo_storage.store_bytes(image_bytes, extension, mime_type)
+    return stored.url
 
 
 async def upload_delivery_proof(
     session: AsyncSession,
     order_sn: str,
     driver_id: int,
-    photo_data: str,
-    notes: Optional[str] = None
+    photo_data: Optional[str] = None,
+    notes: Optional[str] = None,
+    photo_file_id: Optional[int] = None
 ) -> DeliveryProof:
     """
     Upload delivery proof photo and create database record.
 
+    An order has one proof: if this driver already uploaded it (a retry after
+    a lost response), the existing record is returned and no photo is saved.
+
     Args:
         session: Database session
         order_sn: Order serial number
         driver_id: Driver ID
-        photo_data: Base64 encoded photo or data URL
+        photo_data: Base64 encoded photo or data URL (compatibility path)
         notes: Optional delivery notes
+        photo_file_id: Photo uploaded beforehand via POST /uploads/photos
 
     Returns:
-        DeliveryProof: Created delivery proof record
+        DeliveryProof: Created (or previously uploaded) delivery proof record
 
     Raises:
         HTTPException: If order not found or validation fails
@@ -147,11 +127,31 @@ async def upload_delivery_proof(
             detail="Order not assigned to this driver"
         )
 
-    # Decode and validate photo
-    image_bytes, mime_type = decode_base64_image(photo_data)
+    # Loaded with the order (joined relationship)
+    existing = order.delivery_proof
+    if existing is not None and existing.driver_id == driver_id:
+        return existing
+
+    if photo_file_id is not None:
+        # Imported lazily: upload_service imports this module
+        from app.services.upload_service import claim_uploaded_file
 
-    # Save photo to filesystem
-    photo_url = save_photo(image_bytes, order_sn, mime_type)
+        uploaded_file = await claim_uploaded_file(
+            session, photo_file_id, driver_id, biz_type="order", biz_id=order.id
+        )
+        photo_url = uploaded_file.file_url
+        file_size = uploaded_file.file_size
+        mime_type = uploaded_file.file_type
+    elif photo_data:
+        # Decode, validate and save off the event loop
+        image_bytes, mime_type = await asyncio.to_thread(decode_base64_image, photo_data)
+        photo_url = await save_photo(image_bytes, mime_type)
+        file_size = len(image_bytes)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Photo is required"
+        )
 
     # Create database record
     delivery_proof = DeliveryProof(
@@ -160,7 +160,7 @@ async def upload_delivery_proof(
         driver_id=driver_id,
         photo_url=photo_url,
         notes=notes,
-        file_size=len(image_bytes),
+        file_size=file_size,
         mime_type=mime_type,
         created_at=datetime.now()
     )
@@ -0,0 +1,273 @@
+"""
+Dispatch Service
+
+Automatic assignment of available prepare packages to drivers.
+
+Every package from prepare_goods_service.get_available_packages is matched to
+an active driver with a known position by solving a min-cost assignment:
+- Each driver is expanded into one slot per free unit of capacity
+  (Driver.max_load or DRIVER_DEFAULT_MAX_LOAD minus current load)
+- Cost of giving a package to a driver's k-th free slot is the distance from
+  the driver to the pickup plus DISPATCH_LOAD_PENALTY_KM per package the
+  driver would already be carrying, so work spreads across drivers
+- Pairs farther apart than max_distance_km are never assigned
+
+Assignments are written with a single UPDATE that only touches packages
+still unclaimed, so concurrent driver claims are never overwritten. Written
+assignments are pushed to drivers through event_service.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.driver import Driver
+from app.models.prepare_goods import PrepareGoods
+from app.models.user import User
+from app.schemas.admin import AutoDispatchResult, DispatchAssignment
+from app.services import driver_location_service, event_service, marks_service, package_detail_service, prepare_goods_service
+from app.services.route_service import haversine_distances
+
+logger = logging.getLogger(__name__)
+
+# Cost assigned to forbidden package/slot pairs
+_FORBIDDEN_COST = 1e9
+
+
+@dataclass
+class DispatchCandidate:
+    """Active driver with a live position and free capacity."""
+    driver_id: int
+    name: str
+    latitude: float
+    longitude: float
+    current_load: int
+    capacity: int
+
+
+def solve_assignment(
+    pickups: np.ndarray,
+    drivers: Sequence[DispatchCandidate],
+    max_distance_km: float,
+    load_penalty_km: float
+) -> List[Tuple[int, int, float]]:
+    """
+    Min-cost assignment of pickups to driver capacity slots.
+
+    Args:
+        pickups: Array of shape (p, 2) with pickup (latitude, longitude)
+        drivers: Candidate drivers
+        max_distance_km: Maximum driver → pickup distance
+        load_penalty_km: Extra cost per package already carried
+
+    Returns:
+        List of (pickup index, driver index, distance_km)
+    """
+    if len(pickups) == 0 or not drivers:
+        return []
+
+    slot_driver: List[int] = []
+    slot_load: List[int] = []
+    for idx, driver in enumerate(drivers):
+        free = min(driver.capacity - driver.current_load, len(pickups))
+        for k in range(max(free, 0)):
+            slot_driver.append(idx)
+            slot_load.append(driver.current_load + k)
+    if not slot_driver:
+        return []
+
+    driver_coords = np.array([[d.latitude, d.longitude] for d in drivers], dtype=float)
+    distances = haversine_distances(driver_coords, pickups).T      # (pickups, drivers)
+
+    slot_idx = np.asarray(slot_driver)
+    slot_distances = distances[:, slot_idx]                         # (pickups, slots)
+    cost = slot_distances + load_penalty_km * np.asarray(slot_load, dtype=float)[None, :]
+    cost = np.where(slot_distances <= max_distance_km, cost, _FORBIDDEN_COST)
+
+    rows, cols = linear_sum_assignment(cost)
+    return [
+        (int(row), int(slot_idx[col]), float(slot_distances[row, col]))
+        for row, col in zip(rows, cols, strict=True)
+        if cost[row, col] < _FORBIDDEN_COST
+    ]
+
+
+async def _load_candidates(session: AsyncSession) -> List[DispatchCandidate]:
+    load_subquery = driver_location_service.driver_load_subquery()
+    result = await session.execute(
+        select(
+            Driver,
+            User.user_id,
+            func.coalesce(load_subquery.c.current_load, 0).label("current_load")
+        )
+        .join(User, Driver.phone == User.phonenumber)
+        .outerjoin(load_subquery, Driver.id == load_subquery.c.driver_id)
+        .where(Driver.status == 1)
+    )
+    rows = result.all()
+
+    locations = await driver_location_service.load_driver_locations([user_id for _, user_id, _ in rows])
+
+    candidates = []
+    for driver, user_id, current_load in rows:
+        location = locations.get(user_id)
+        if not location or "lat" not in location or "lng" not in location:
+            continue
+        capacity = driver_location_service.driver_capacity(driver)
+        if current_load >= capacity:
+            continue
+        candidates.append(DispatchCandidate(
+            driver_id=driver.id,
+            name=driver.name,
+            latitude=float(location["lat"]),
+            longitude=float(location["lng"]),
+            current_load=current_load,
+            capacity=capacity
+        ))
+    return candidates
+
+
+async def _pickup_locations(session: AsyncSession) -> Tuple[Dict[str, Tuple[float, float]], Dict[str, Tuple[float, float]]]:
+    """Shop and warehouse coordinates (by id string) from map marks."""
+    shops: Dict[str, Tuple[float, float]] = {}
+    warehouses: Dict[str, Tuple[float, float]] = {}
+    for mark in await marks_service.fetch_marks(session, active_only=False):
+        if mark.shop_id:
+            shops.setdefault(mark.shop_id, (mark.latitude, mark.longitude))
+        if mark.warehouse_id:
+            warehouses.setdefault(mark.warehouse_id, (mark.latitude, mark.longitude))
+    return shops, warehouses
+
+
+def _pickup_location(
+    package: PrepareGoods,
+    shops: Dict[str, Tuple[float, float]],
+    warehouses: Dict[str, Tuple[float, float]]
+) -> Optional[Tuple[float, float]]:
+    if package.type == 1:
+        warehouse = package.warehouse
+        if warehouse and warehouse.latitude is not None and warehouse.longitude is not None:
+            return float(warehouse.latitude), float(warehouse.longitude)
+        return warehouses.get(str(package.warehouse_id))
+    return shops.get(str(package.shop_id))
+
+
+async def auto_dispatch(
+    session: AsyncSession,
+    dry_run: bool = False,
+    max_distance_km: float = 50.0,
+    limit: int = 500
+) -> AutoDispatchResult:
+    """
+    Assign every available package to the cheapest feasible driver.
+
+    Args:
+        session: Database session
+        dry_run: If True, compute assignments without writing them
+        max_distance_km: Maximum driver → pickup distance
+        limit: Maximum packages considered
+
+    Returns:
+        AutoDispatchResult with assignments, unassigned packages and solve time
+    """
+    settings = get_settings()
+
+    packages = await prepare_goods_service.get_available_packages(session, limit=limit)
+    candidates = await _load_candidates(session)
+    shops, warehouses = await _pickup_locations(session)
+
+    located: List[Tuple[PrepareGoods, Tuple[float, float]]] = []
+    unassigned: List[str] = []
+    for package in packages:
+        location = _pickup_location(package, shops, warehouses)
+        if location is None:
+            unassigned.append(package.prepare_sn)
+        else:
+            located.append((package, location))
+
+    pickups = np.array([location for _, location in located], dtype=float).reshape(-1, 2)
+
+    started = time.perf_counter()
+    matches = await asyncio.to_thread(
+        solve_assignment, pickups, candidates, max_distance_km, settings.dispatch_load_penalty_km
+    )
+    solve_time_ms = (time.perf_counter() - started) * 1000
+
+    matched = {pickup_idx for pickup_idx, _, _ in matches}
+    unassigned.extend(
+        package.prepare_sn for idx, (package, _) in enumerate(located) if idx not in matched
+    )
+
+    assignments = [
+        DispatchAssignment(
+            prepare_sn=located[pickup_idx][0].prepare_sn,
+            driver_id=candidates[driver_idx].driver_id,
+            driver_name=candidates[driver_idx].name,
+            distance_km=round(distance, 3)
+        )
+        for pickup_idx, driver_idx, distance in sorted(matches)
+    ]
+
+    written = 0
+    if assignments and not dry_run:
+        driver_by_package = {
+            located[pickup_idx][0].id: candidates[driver_idx].driver_id
+            for pickup_idx, driver_idx, _ in matches
+        }
+        result = await session.execute(
+            update(PrepareGoods)
+            .where(PrepareGoods.id.in_(list(driver_by_package)))
+            .where(PrepareGoods.driver_id.is_(None))
+            .where(PrepareGoods.prepare_status == 0)
+            .values(
+                driver_id=case(driver_by_package, value=PrepareGoods.id),
+                prepare_status=6,  # 司机已认领 - Driver claimed
+                update_time=datetime.now()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        written = result.rowcount
+
+        sn_by_package = {package.id: package.prepare_sn for package, _ in located}
+        if written < len(driver_by_package):
+            # Some packages were claimed concurrently; only announce the rows we wrote
+            rows = await session.execute(
+                select(PrepareGoods.id, PrepareGoods.driver_id)
+                .where(PrepareGoods.id.in_(list(driver_by_package)))
+            )
+            driver_by_package = {
+                package_id: driver_id for package_id, driver_id in rows.all()
+                if driver_by_package.get(package_id) == driver_id
+            }
+        await event_service.publish_packages_dispatched({
+            sn_by_package[package_id]: driver_id for package_id, driver_id in driver_by_package.items()
+        })
+        await package_detail_service.invalidate([sn_by_package[package_id] for package_id in driver_by_package])
+
+        # Many packages left the pickup pool at once; recompute instead of per-package HINCRBY
+        try:
+            await marks_service.refresh_mark_counts(session)
+        except Exception:  # noqa: BLE001
+            logger.warning("Mark count refresh after dispatch failed", exc_info=True)
+
+    return AutoDispatchResult(
+        dry_run=dry_run,
+        package_count=len(packages),
+        driver_count=len(candidates),
+        assigned_count=len(assignments),
+        written_count=written,
+        assignments=assignments,
+        unassigned=unassigned,
+        solve_time_ms=round(solve_time_ms, 2)
+    )
@@ -0,0 +1,214 @@
+"""
+Driver Location Service
+
+Nearest-driver lookups for dispatch, backed by the Redis GEO set that
+cache.store_driver_location maintains next to the per-driver hashes.
+
+Driver positions are keyed by sys_user.user_id (the id in the access token),
+so results are joined back to tigu_driver through sys_user.phonenumber.
+Load is the number of active packages (claimed, picked up or out for
+delivery) per driver; capacity is Driver.max_load or DRIVER_DEFAULT_MAX_LOAD.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.driver import Driver
+from app.models.order import Warehouse
+from app.models.prepare_goods import PrepareGoods
+from app.models.user import User
+from app.schemas.admin import DispatchDriver, NearbyDriver
+from app.services import cache, marks_service
+
+logger = logging.getLogger(__name__)
+
+# Package statuses that count towards a driver's current load:
+# 6=driver claimed, 1=driver picked up, 4=driver delivering to user
+ACTIVE_PACKAGE_STATUSES = [6, 1, 4]
+
+TARGET_TYPES = ("shop", "warehouse", "mark")
+
+
+def driver_load_subquery():
+    """Subquery of (driver_id, current_load) over active packages."""
+    return (
+        select(
+            PrepareGoods.driver_id.label("driver_id"),
+            func.count(PrepareGoods.id).label("current_load")
+        )
+        .where(PrepareGoods.driver_id.is_not(None))
+        .where(PrepareGoods.prepare_status.in_(ACTIVE_PACKAGE_STATUSES))
+        .group_by(PrepareGoods.driver_id)
+        .subquery()
+    )
+
+
+def driver_capacity(driver: Driver) -> int:
+    """Maximum active packages for a driver."""
+    return driver.max_load or get_settings().driver_default_max_load
+
+
+def format_location(location: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Render a cached location hash as "lat,lng"."""
+    if not location or "lat" not in location or "lng" not in location:
+        return None
+    return f"{float(location['lat']):.6f},{float(location['lng']):.6f}"
+
+
+def build_dispatch_driver(
+    driver: Driver,
+    user: User | None,
+    current_load: int,
+    current_location: Optional[str] = None
+) -> DispatchDriver:
+    """Build the admin dispatch view of a driver."""
+    return DispatchDriver(
+        driver_id=driver.id,
+        user_id=user.user_id if user else None,
+        name=driver.name,
+        nick_name=user.nick_name if user else driver.name,
+        phone=driver.phone,
+        vehicle_type=driver.vehicle_type,
+        vehicle_plate=driver.vehicle_plate,
+        status=driver.status,
+        rating=float(driver.rating or 0),
+        total_deliveries=driver.total_deliveries or 0,
+        current_load=current_load or 0,
+        max_load=driver_capacity(driver),
+        current_location=current_location,
+        is_available=driver.status == 1
+    )
+
+
+async def load_driver_locations(user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    Fetch live locations for many drivers, tolerating Redis outages.
+
+    Returns:
+        Mapping of user_id → location hash (drivers without a fresh location are omitted)
+    """
+    try:
+        return await cache.get_driver_locations(user_ids)
+    except Exception:  # noqa: BLE001
+        logger.warning("Driver locations unavailable", exc_info=True)
+        return {}
+
+
+async def resolve_target_location(
+    session: AsyncSession,
+    target_type: str,
+    target_id: int
+) -> Optional[Tuple[float, float]]:
+    """
+    Resolve coordinates of a shop, warehouse or map mark.
+
+    Shops have no coordinates of their own; they are located through the
+    map mark linked to them (tigu_driver_marks.shop_id).
+
+    Args:
+        session: Database session
+        target_type: "shop", "warehouse" or "mark"
+        target_id: ID of the target
+
+    Returns:
+        (latitude, longitude) or None if the target has no known position
+
+    Raises:
+        ValueError: If target_type is not supported
+    """
+    if target_type not in TARGET_TYPES:
+        raise ValueError(f"target_type must be one of {', '.join(TARGET_TYPES)}")
+
+    if target_type == "warehouse":
+        result = await session.execute(
+            select(Warehouse.latitude, Warehouse.longitude).where(Warehouse.id == target_id)
+        )
+        row = result.first()
+        if row and row.latitude is not None and row.longitude is not None:
+            return float(row.latitude), float(row.longitude)
+
+    marks = await marks_service.fetch_marks(session, active_only=False)
+    for mark in marks:
+        if target_type == "mark" and mark.id == target_id:
+            return mark.latitude, mark.longitude
+        if target_type == "shop" and mark.shop_id == str(target_id):
+            return mark.latitude, mark.longitude
+        if target_type == "warehouse" and mark.warehouse_id == str(target_id):
+            return mark.latitude, mark.longitude
+    return None
+
+
+async def find_nearest_drivers(
+    session: AsyncSession,
+    latitude: float,
+    longitude: float,
+    limit: int = 5,
+    radius_km: float = 50.0
+) -> List[NearbyDriver]:
+    """
+    Find the K nearest available drivers to a coordinate.
+
+    Stale GEO members are pruned first. Candidates are over-fetched from
+    Redis so that inactive or fully loaded drivers can be skipped without a
+    second geo query.
+
+    Args:
+        session: Database session
+        latitude: Target latitude
+        longitude: Target longitude
+        limit: Maximum number of drivers to return
+        radius_km: Search radius in kilometres
+
+    Returns:
+        Available drivers with current load, nearest first
+    """
+    await cache.prune_stale_driver_locations()
+    candidates = await cache.find_nearby_driver_locations(
+        latitude, longitude, radius_km=radius_km, count=limit * 4
+    )
+    if not candidates:
+        return []
+
+    load_subquery = driver_load_subquery()
+    stmt = (
+        select(
+            Driver,
+            User,
+            func.coalesce(load_subquery.c.current_load, 0).label("current_load")
+        )
+        .join(User, Driver.phone == User.phonenumber)
+        .outerjoin(load_subquery, Driver.id == load_subquery.c.driver_id)
+        .where(User.user_id.in_([user_id for user_id, *_ in candidates]))
+        .where(Driver.status == 1)
+    )
+    result = await session.execute(stmt)
+    drivers_by_user = {user.user_id: (driver, user, load) for driver, user, load in result.all()}
+
+    nearby: List[NearbyDriver] = []
+    for user_id, distance_km, driver_lat, driver_lng in candidates:
+        row = drivers_by_user.get(user_id)
+        if row is None:
+            continue
+        driver, user, current_load = row
+        if current_load >= driver_capacity(driver):
+            continue
+
+        base = build_dispatch_driver(
+            driver, user, current_load,
+            current_location=f"{driver_lat:.6f},{driver_lng:.6f}"
+        )
+        nearby.append(NearbyDriver(
+            **base.model_dump(),
+            distance_km=round(distance_km, 3),
+            latitude=driver_lat,
+            longitude=driver_lng
+        ))
+        if len(nearby) >= limit:
+            break
+
+    return nearby
@@ -0,0 +1,233 @@
+"""
+Driver Sync Service
+
+Replays the driver app's offline queue (claims, pickup and delivery
+confirmations, warehouse arrivals and location pings) in one request.
+
+- Actions are applied in request order. Consecutive actions on the same
+  package share one transaction; each runs in a savepoint, so a rejected
+  step (e.g. package already taken) is rolled back alone and the next
+  steps still apply.
+- arrive_warehouse goes through order_service, which commits on its own.
+- Only the newest location ping is stored (after the other actions); older
+  ones are reported as superseded.
+- Every action carries a client idempotency key. Keys are claimed in Redis
+  before the action runs (for IDEMPOTENCY_LOCK_SECONDS, so a crashed sync
+  does not block the key) and replaced by the outcome once committed, so a
+  queue re-sent after a dropped response is answered from the stored
+  outcomes instead of being applied twice.
+
+Redis is best effort here: without it actions still run, and the
+conditional updates underneath keep a replayed claim or confirmation
+from applying twice.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.schemas.driver_sync import DriverSyncAction, DriverSyncOutcome, DriverSyncResponse
+from app.services import cache, order_service, package_workflow_service
+from app.services.package_workflow_service import PackageChange
+
+logger = logging.getLogger(__name__)
+
+PackageStep = Callable[[AsyncSession, DriverSyncAction, int], Awaitable[PackageChange]]
+
+PACKAGE_STEPS: Dict[str, PackageStep] = {
+    "claim": lambda session, action, driver_id: package_workflow_service.claim(
+        session, action.prepare_sn, driver_id
+    ),
+    "confirm_pickup": lambda session, action, driver_id: package_workflow_service.confirm_pickup(
+        session, action.prepare_sn, driver_id, photo_file_id=action.photo_file_id, photo=action.photo
+    ),
+    "confirm_delivery": lambda session, action, driver_id: package_workflow_service.confirm_delivery(
+        session, action.prepare_sn, driver_id, photo_file_id=action.photo_file_id, photo=action.photo
+    ),
+}
+
+Indexed = List[Tuple[int, DriverSyncAction]]
+
+
+def _outcome(
+    action: DriverSyncAction,
+    result: str,
+    status_code: int = status.HTTP_200_OK,
+    detail: Optional[Any] = None
+) -> DriverSyncOutcome:
+    return DriverSyncOutcome(
+        idempotency_key=action.idempotency_key,
+        type=action.type,
+        result=result,
+        status_code=status_code,
+        detail=None if detail is None else str(detail)
+    )
+
+
+def _groups(actions: Sequence[DriverSyncAction]) -> List[Indexed]:
+    """
+    Split the queue into transactions: runs of actions on one package, and
+    each arrive_warehouse alone. Location pings touch no table and do not
+    break a run.
+    """
+    groups: List[Indexed] = []
+    for index, action in enumerate(actions):
+        if action.type == "location":
+            continue
+        previous = groups[-1][-1][1] if groups else None
+        if (
+            action.type in PACKAGE_STEPS
+            and previous is not None
+            and previous.type in PACKAGE_STEPS
+            and previous.prepare_sn == action.prepare_sn
+        ):
+            groups[-1].append((index, action))
+        else:
+            groups.append([(index, action)])
+    return groups
+
+
+async def _stored_outcomes(driver_id: int, keys: List[str]) -> Dict[str, Any]:
+    try:
+        return await cache.get_driver_sync_outcomes(driver_id, keys)
+    except Exception:  # noqa: BLE001
+        logger.warning("Driver sync outcomes unavailable", exc_info=True)
+        return {}
+
+
+async def _claim_key(driver_id: int, key: str, lock_seconds: int) -> bool:
+    try:
+        return await cache.claim_driver_sync_action(driver_id, key, lock_seconds)
+    except Exception:  # noqa: BLE001
+        logger.warning("Driver sync key claim failed, applying without it", exc_info=True)
+        return True
+
+
+async def _store_outcomes(driver_id: int, outcomes: List[DriverSyncOutcome], ttl_seconds: int) -> None:
+    try:
+        await cache.store_driver_sync_outcomes(
+            driver_id, {outcome.idempotency_key: outcome.model_dump(mode="json") for outcome in outcomes}, ttl_seconds
+        )
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to store driver sync outcomes", exc_info=True)
+
+
+async def _release_keys(driver_id: int, keys: List[str]) -> None:
+    try:
+        await cache.release_driver_sync_actions(driver_id, keys)
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to release driver sync keys", exc_info=True)
+
+
+async def _apply_package_steps(
+    session: AsyncSession, driver_id: int, group: Indexed
+) -> Tuple[Dict[int, DriverSyncOutcome], List[PackageChange]]:
+    outcomes: Dict[int, DriverSyncOutcome] = {}
+    changes: List[PackageChange] = []
+    for index, action in group:
+        try:
+            async with session.begin_nested():
+                change = await PACKAGE_STEPS[action.type](session, action, driver_id)
+        except HTTPException as exc:
+            outcomes[index] = _outcome(action, "failed", exc.status_code, exc.detail)
+        else:
+            changes.append(change)
+            outcomes[index] = _outcome(action, "applied")
+    await session.commit()
+    return outcomes, changes
+
+
+async def _arrive_warehouse(session: AsyncSession, driver_id: int, action: DriverSyncAction) -> DriverSyncOutcome:
+    # Commits on its own, like POST /orders/{order_sn}/arrive-warehouse
+    if not await order_service.arrive_warehouse(session, action.order_sn, driver_id, action.photo_ids):
+        return _outcome(action, "failed", status.HTTP_404_NOT_FOUND, "Order not found")
+    return _outcome(action, "applied")
+
+
+async def sync_actions(
+    session: AsyncSession,
+    driver_id: int,
+    user_id: int,
+    actions: Sequence[DriverSyncAction]
+) -> DriverSyncResponse:
+    """
+    Apply a driver's queued actions in order.
+
+    Args:
+        session: Database session
+        driver_id: Authenticated driver (tigu_driver.id)
+        user_id: The driver's sys_user id (location pings are keyed by it)
+        actions: Queued actions, oldest first
+
+    Returns:
+        DriverSyncResponse with one outcome per action, in request order.
+        Business errors (404, 409, 400) become failed outcomes; unexpected
+        errors abort the request after releasing the keys of the
+        uncommitted transaction, so the client can re-send the whole queue.
+    """
+    settings = get_settings()
+    ttl_seconds = settings.driver_sync_key_ttl_seconds
+    stored = await _stored_outcomes(
+        driver_id, [action.idempotency_key for action in actions if action.type != "location"]
+    )
+    outcomes: Dict[int, DriverSyncOutcome] = {}
+    # Keys seen earlier in this request answer like stored ones
+    settled: Dict[str, DriverSyncOutcome] = {}
+    repeats: Indexed = []
+
+    for group in _groups(actions):
+        pending: Indexed = []
+        for index, action in group:
+            key = action.idempotency_key
+            if key in settled or any(key == queued.idempotency_key for _, queued in pending):
+                repeats.append((index, action))
+            elif stored.get(key) == cache.DRIVER_SYNC_PENDING:
+                outcomes[index] = _outcome(action, "pending", status.HTTP_409_CONFLICT, "Action is being applied")
+            elif key in stored:
+                outcomes[index] = DriverSyncOutcome.model_validate(stored[key]).model_copy(update={"replayed": True})
+            elif not await _claim_key(driver_id, key, settings.idempotency_lock_seconds):
+                outcomes[index] = _outcome(action, "pending", status.HTTP_409_CONFLICT, "Action is being applied")
+            else:
+                pending.append((index, action))
+        if not pending:
+            continue
+
+        changes: List[PackageChange] = []
+        try:
+            if pending[0][1].type == "arrive_warehouse":
+                index, action = pending[0]
+                applied = {index: await _arrive_warehouse(session, driver_id, action)}
+            else:
+                applied, changes = await _apply_package_steps(session, driver_id, pending)
+        except BaseException:
+            await _release_keys(driver_id, [action.idempotency_key for _, action in pending])
+            raise
+
+        outcomes.update(applied)
+        for outcome in applied.values():
+            settled[outcome.idempotency_key] = outcome
+        await _store_outcomes(driver_id, list(applied.values()), ttl_seconds)
+        await package_workflow_service.announce_changes(changes)
+
+    for index, action in repeats:
+        outcomes[index] = settled[action.idempotency_key].model_copy(update={"replayed": True})
+
+    # Pings are safe to repeat and only the newest one matters
+    pings = [(index, action) for index, action in enumerate(actions) if action.type == "location"]
+    for index, action in pings[:-1]:
+        outcomes[index] = _outcome(action, "superseded")
+    if pings:
+        index, action = pings[-1]
+        try:
+            await cache.store_driver_location(user_id, action.latitude, action.longitude)
+        except Exception:  # noqa: BLE001
+            logger.warning("Failed to store synced driver location", exc_info=True)
+            outcomes[index] = _outcome(action, "failed", status.HTTP_503_SERVICE_UNAVAILABLE)
+        else:
+            outcomes[index] = _outcome(action, "applied")
+
+    return DriverSyncResponse(outcomes=[outcomes[index] for index in range(len(actions))])
@@ -0,0 +1,228 @@
+"""
+Event Service
+
+Server-push events for drivers, fanned out through Redis pub/sub so that an
+event published by any uvicorn worker reaches streams held by every worker.
+
+Channels:
+- events:packages: pickup pool changes seen by every driver
+  (package.available, package.unavailable, packages.changed)
+- events:driver:{driver_id}: events for a single driver
+  (package.assigned, package.updated, order.assigned, notification)
+
+Publishing is best effort: a Redis outage never fails the mutation that
+triggered the event, and clients keep a slow fallback refetch.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+from app.services import cache, marks_service
+
+logger = logging.getLogger(__name__)
+
+
+class EventType(str, Enum):
+    PACKAGE_AVAILABLE = "package.available"
+    PACKAGE_UNAVAILABLE = "package.unavailable"
+    PACKAGES_CHANGED = "packages.changed"
+    PACKAGE_ASSIGNED = "package.assigned"
+    PACKAGE_UPDATED = "package.updated"
+    ORDER_ASSIGNED = "order.assigned"
+    NOTIFICATION = "notification"
+
+
+Message = Tuple[str, EventType, Dict[str, Any]]
+
+
+def driver_channel(driver_id: int) -> str:
+    """Pub/sub channel carrying events for one driver."""
+    return f"{cache.EVENTS_DRIVER_CHANNEL_PREFIX}{driver_id}"
+
+
+def build_event(event_type: EventType, data: Mapping[str, Any]) -> Dict[str, Any]:
+    """Wrap event data in the envelope sent to clients."""
+    return {"type": event_type.value, "data": dict(data), "ts": datetime.utcnow().isoformat()}
+
+
+async def publish(messages: List[Message]) -> None:
+    """
+    Publish events in one Redis round trip.
+
+    Args:
+        messages: (channel, event type, data) triples
+
+    Note:
+        Best effort: Redis errors are logged and swallowed.
+    """
+    if not messages:
+        return
+    try:
+        await cache.publish_messages([
+            (channel, build_event(event_type, data)) for channel, event_type, data in messages
+        ])
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to publish %s events", len(messages), exc_info=True)
+
+
+def package_change_events(
+    prepare_sn: str,
+    before: Optional[Mapping[str, Any]],
+    **changes: Any
+) -> List[Message]:
+    """
+    Events describing a committed package update.
+
+    Pickup pool membership is decided by marks_service.mark_count_key, so the
+    pushed "available" state always agrees with the map mark counts.
+
+    Args:
+        prepare_sn: Prepare goods serial number
+        before: Package state captured before the update (marks_service.package_state)
+        **changes: Column values written by the update (e.g. prepare_status=6)
+
+    Returns:
+        (channel, event type, data) triples, possibly empty
+    """
+    if not before:
+        return []
+
+    after = {**before, **changes}
+    messages: List[Message] = []
+
+    old_location = marks_service.mark_count_key(before)
+    new_location = marks_service.mark_count_key(after)
+    if old_location != new_location:
+        if new_location:
+            messages.append((cache.EVENTS_PACKAGES_CHANNEL, EventType.PACKAGE_AVAILABLE, {
+                "prepareSn": prepare_sn, "location": new_location
+            }))
+        else:
+            messages.append((cache.EVENTS_PACKAGES_CHANNEL, EventType.PACKAGE_UNAVAILABLE, {
+                "prepareSn": prepare_sn, "location": old_location
+            }))
+
+    old_driver, new_driver = before.get("driver_id"), after.get("driver_id")
+    data = {"prepareSn": prepare_sn, "prepareStatus": after.get("prepare_status"), "driverId": new_driver}
+    if new_driver is not None and new_driver != old_driver:
+        messages.append((driver_channel(new_driver), EventType.PACKAGE_ASSIGNED, data))
+    elif new_driver is not None and before.get("prepare_status") != after.get("prepare_status"):
+        messages.append((driver_channel(new_driver), EventType.PACKAGE_UPDATED, data))
+    if old_driver is not None and old_driver != new_driver:
+        messages.append((driver_channel(old_driver), EventType.PACKAGE_UPDATED, data))
+
+    return messages
+
+
+async def publish_package_change(
+    prepare_sn: str,
+    before: Optional[Mapping[str, Any]],
+    **changes: Any
+) -> None:
+    """Publish the events for a committed package update (see package_change_events)."""
+    await publish(package_change_events(prepare_sn, before, **changes))
+
+
+async def publish_packages_dispatched(driver_by_prepare_sn: Mapping[str, int]) -> None:
+    """
+    Publish a bulk dispatch: one pool refresh plus one assignment per package.
+
+    Args:
+        driver_by_prepare_sn: Mapping of prepare_sn → assigned driver id
+    """
+    if not driver_by_prepare_sn:
+        return
+    messages: List[Message] = [
+        (cache.EVENTS_PACKAGES_CHANNEL, EventType.PACKAGES_CHANGED, {"count": len(driver_by_prepare_sn)})
+    ]
+    messages.extend(
+        (driver_channel(driver_id), EventType.PACKAGE_ASSIGNED, {
+            "prepareSn": prepare_sn, "prepareStatus": 6, "driverId": driver_id
+        })
+        for prepare_sn, driver_id in driver_by_prepare_sn.items()
+    )
+    await publish(messages)
+
+
+async def publish_orders_assigned(order_sns_by_driver: Mapping[int, List[str]]) -> None:
+    """Tell drivers that legacy orders were assigned to them (driver id → order_sns)."""
+    await publish([
+        (driver_channel(driver_id), EventType.ORDER_ASSIGNED, {"orderSns": list(order_sns)})
+        for driver_id, order_sns in order_sns_by_driver.items()
+        if order_sns
+    ])
+
+
+async def publish_notifications(notifications: List[Mapping[str, Any]]) -> None:
+    """Push stored notification rows to their drivers (rows carry driver_id)."""
+    await publish([
+        (driver_channel(notification["driver_id"]), EventType.NOTIFICATION, notification)
+        for notification in notifications
+        if notification.get("driver_id") is not None
+    ])
+
+
+def format_sse(event: Mapping[str, Any]) -> str:
+    """Render an event envelope as a Server-Sent Events frame."""
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def event_stream(
+    driver_id: Optional[int],
+    keepalive_seconds: float,
+    retry_ms: int
+) -> AsyncIterator[str]:
+    """
+    Server-Sent Events frames for one subscriber until the client disconnects.
+
+    Subscribes to the shared package channel and, for drivers, their own
+    channel. A comment frame is sent whenever nothing else was sent for
+    keepalive_seconds so proxies keep the connection open.
+
+    Args:
+        driver_id: Subscriber's driver id (None for non-driver users)
+        keepalive_seconds: Maximum silence between frames
+        retry_ms: Reconnect delay advertised to the browser
+
+    Yields:
+        SSE frames
+    """
+    channels = [cache.EVENTS_PACKAGES_CHANNEL]
+    if driver_id is not None:
+        channels.append(driver_channel(driver_id))
+
+    pubsub = cache.redis.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(*channels)
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        yield format_sse(build_event(EventType.PACKAGES_CHANGED, {"reason": "connected"}))
+        last_sent = time.monotonic()
+
+        while True:
+            message = await pubsub.get_message(timeout=keepalive_seconds)
+            if message is not None:
+                try:
+                    event = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    logger.warning("Dropping malformed event on %s", message.get("channel"))
+                    continue
+                yield format_sse(event)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= keepalive_seconds:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            else:
+                # get_message returns early for ignored subscribe confirmations
+                await asyncio.sleep(0)
+    finally:
+        try:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+        except Exception:  # noqa: BLE001
+            logger.debug("Error closing event subscription", exc_info=True)
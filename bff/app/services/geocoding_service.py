@@ -0,0 +1,111 @@
+"""
+Geocoding Service
+
+Resolves delivery addresses to coordinates for route optimization.
+Packages only store text addresses, so coordinates come from the Google
+Geocoding API (GOOGLE_MAPS_API_KEY) and are cached in Redis, keyed by the
+normalized address. Without an API key only cached results are returned.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from typing import Dict, Iterable, Optional, Tuple
+
+import httpx
+
+from app.core.config import get_settings
+from app.services.cache import redis
+
+logger = logging.getLogger(__name__)
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+# Addresses that could not be geocoded are retried after a day
+_NEGATIVE_CACHE_TTL_SECONDS = 60 * 60 * 24
+_MAX_CONCURRENT_REQUESTS = 5
+_REQUEST_TIMEOUT_SECONDS = 5.0
+
+Coordinates = Tuple[float, float]
+
+
+def _cache_key(address: str) -> str:
+    normalized = " ".join(address.lower().split())
+    return f"geocode:{hashlib.md5(normalized.encode()).hexdigest()}"
+
+
+def _parse_cached(value: str) -> Optional[Coordinates]:
+    if not value:
+        return None
+    lat, lng = value.split(",")
+    return float(lat), float(lng)
+
+
+async def _geocode_remote(client: httpx.AsyncClient, address: str, api_key: str) -> Optional[Coordinates]:
+    response = await client.get(GEOCODE_URL, params={"address": address, "key": api_key})
+    response.raise_for_status()
+    results = response.json().get("results") or []
+    if not results:
+        return None
+    location = results[0]["geometry"]["location"]
+    return float(location["lat"]), float(location["lng"])
+
+
+async def geocode_addresses(addresses: Iterable[str]) -> Dict[str, Optional[Coordinates]]:
+    """
+    Geocode many addresses, serving repeats from Redis.
+
+    Args:
+        addresses: Free-form addresses (duplicates and blanks are ignored)
+
+    Returns:
+        Mapping of address → (latitude, longitude), or None if unresolved
+    """
+    settings = get_settings()
+    unique = list(dict.fromkeys(address for address in addresses if address and address.strip()))
+    if not unique:
+        return {}
+
+    resolved: Dict[str, Optional[Coordinates]] = {address: None for address in unique}
+    try:
+        cached = await redis.mget([_cache_key(address) for address in unique])
+    except Exception:  # noqa: BLE001
+        logger.warning("Geocode cache unavailable", exc_info=True)
+        cached = [None] * len(unique)
+
+    missing = []
+    for address, value in zip(unique, cached, strict=True):
+        if value is None:
+            missing.append(address)
+        else:
+            resolved[address] = _parse_cached(value)
+
+    if not missing or not settings.google_maps_api_key:
+        return resolved
+
+    semaphore = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+
+    async def lookup(client: httpx.AsyncClient, address: str) -> None:
+        async with semaphore:
+            try:
+                coords = await _geocode_remote(client, address, settings.google_maps_api_key)
+            except (httpx.HTTPError, KeyError, ValueError):
+                logger.warning("Geocoding failed for %s", address, exc_info=True)
+                return
+        resolved[address] = coords
+        try:
+            if coords:
+                await redis.set(
+                    _cache_key(address), f"{coords[0]},{coords[1]}",
+                    ex=settings.geocode_cache_ttl_seconds
+                )
+            else:
+                await redis.set(_cache_key(address), "", ex=_NEGATIVE_CACHE_TTL_SECONDS)
+        except Exception:  # noqa: BLE001
+            logger.warning("Failed to cache geocode result", exc_info=True)
+
+    async with httpx.AsyncClient(timeout=_REQUEST_TIMEOUT_SECONDS) as client:
+        await asyncio.gather(*(lookup(client, address) for address in missing))
+
+    return resolved
@@ -1,28 +1,116 @@
 """
 Service layer for map markers.
 Handles business logic for marker retrieval and management.
+
+Marks and their order counts are served from Redis (see app.services.cache):
+- The mark list is cached with a short TTL (marks rarely change)
+- Order counts are kept per pickup location ("shop:{id}" / "warehouse:{id}")
+  and adjusted with HINCRBY whenever a package enters or leaves the
+  "ready for pickup" state (record_package_change)
+- app.workers.marks_count_refresher recomputes all counts periodically to
+  correct drift (e.g. packages changed by the merchant backend)
+
+If Redis is unavailable the same data is loaded straight from MySQL.
 """
-from typing import List, Optional
+import logging
+from typing import Any, Dict, List, Mapping, Optional
+
+from sqlalchemy import select, text
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+
+from app.core.config import get_settings
+from app.models.prepare_goods import PrepareGoods
 from app.schemas.marks import Mark
+from app.services import cache
 
+logger = logging.getLogger(__name__)
 
-async def fetch_marks(session: AsyncSession, active_only: bool = True) -> List[Mark]:
+_settings = get_settings()
+
+# Package columns that decide whether it counts towards a mark
+_PACKAGE_STATE_COLUMNS = (
+    "type", "prepare_status", "driver_id", "delivery_type",
+    "shipping_type", "shop_id", "warehouse_id"
+)
+
+
+def mark_count_key(state: Mapping[str, Any]) -> Optional[str]:
+    """
+    Return the location counter a package contributes to, if any.
+
+    Order count logic:
+        - Shop/vendor marks: type=0, prepare_status=0, no driver, third-party delivery
+        - Warehouse marks: type=1, prepare_status=0, shipping_type=0, no driver, third-party delivery
+
+    Args:
+        state: Package column values (see package_state)
+
+    Returns:
+        "shop:{shop_id}", "warehouse:{warehouse_id}" or None if not available for pickup
     """
-    Fetch all markers from database with order counts.
-    
+    if state.get("prepare_status") != 0 or state.get("driver_id") is not None:
+        return None
+    if state.get("delivery_type") != 1:
+        return None
+
+    if state.get("type") == 0 and state.get("shop_id") is not None:
+        return f"shop:{state['shop_id']}"
+    if state.get("type") == 1 and state.get("shipping_type") == 0 and state.get("warehouse_id") is not None:
+        return f"warehouse:{state['warehouse_id']}"
+    return None
+
+
+def package_state(package: PrepareGoods) -> Dict[str, Any]:
+    """Snapshot the counting columns of a loaded PrepareGoods."""
+    return {column: getattr(package, column) for column in _PACKAGE_STATE_COLUMNS}
+
+
+async def load_package_state(session: AsyncSession, prepare_sn: str) -> Optional[Dict[str, Any]]:
+    """
+    Snapshot the counting columns of a package before mutating it.
+
     Args:
         session: Database session
-        active_only: If True, return only active markers
-    
+        prepare_sn: Prepare goods serial number
+
     Returns:
-        List of Mark objects with order_count for each location
-        
-    Order count logic:
-        - For shop/vendor marks: Count packages with prepare_status=0 (ready for merchant pickup)
-        - For warehouse marks: Count packages with type=1, prepare_status=0, shipping_type=0 (ready for warehouse pickup)
+        Column values, or None if the package does not exist
     """
+    columns = [getattr(PrepareGoods, column) for column in _PACKAGE_STATE_COLUMNS]
+    result = await session.execute(
+        select(*columns).where(PrepareGoods.prepare_sn == prepare_sn)
+    )
+    row = result.mappings().first()
+    return dict(row) if row else None
+
+
+async def record_package_change(before: Optional[Mapping[str, Any]], **changes: Any) -> None:
+    """
+    Adjust cached mark order counts after a package update has been committed.
+
+    Args:
+        before: Package state captured before the update (package_state/load_package_state)
+        **changes: Column values written by the update (e.g. prepare_status=6)
+
+    Note:
+        Best effort: Redis errors are logged and left for the periodic recompute.
+    """
+    if not before:
+        return
+
+    old_key = mark_count_key(before)
+    new_key = mark_count_key({**before, **changes})
+    if old_key == new_key:
+        return
+
+    try:
+        await cache.adjust_mark_counts(decrement=old_key, increment=new_key)
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to adjust mark counts (%s -> %s)", old_key, new_key, exc_info=True)
+
+
+async def _load_marks(session: AsyncSession) -> List[Dict[str, Any]]:
+    """Load all markers (without counts) as JSON-serializable dicts, ordered by name."""
     query = """
         SELECT
             m.id,
@@ -35,32 +123,15 @@ async def fetch_marks(session: AsyncSession, active_only: bool = True) -> List[M
             m.warehouse_id,
             m.is_active,
             m.created_at,
-            m.updated_at,
-            COALESCE(COUNT(pg.id), 0) as order_count
+            m.updated_at
         FROM tigu_driver_marks m
-        LEFT JOIN tigu_prepare_goods pg ON (
-            -- Shop/vendor marks: packages ready for merchant pickup (prepare_status=0)
-            (m.shop_id IS NOT NULL AND pg.shop_id = m.shop_id AND pg.type = 0
-             AND pg.prepare_status = 0 AND pg.driver_id IS NULL AND pg.delivery_type = 1)
-            OR
-            -- Warehouse marks: packages ready for warehouse pickup (type=1, prepare_status=0, shipping_type=0)
-            (m.warehouse_id IS NOT NULL AND pg.warehouse_id = m.warehouse_id
-             AND pg.type = 1 AND pg.prepare_status = 0 AND pg.shipping_type = 0
-             AND pg.driver_id IS NULL AND pg.delivery_type = 1)
-        )
+        ORDER BY m.name ASC
     """
-    
-    if active_only:
-        query += " WHERE m.is_active = 1"
-    
-    query += " GROUP BY m.id ORDER BY m.name ASC"
-    
     result = await session.execute(text(query))
-    rows = result.fetchall()
-    
+
     marks = []
-    for row in rows:
-        marks.append(Mark(
+    for row in result.fetchall():
+        mark = Mark(
             id=row.id,
             name=row.name,
             latitude=float(row.latitude),
@@ -70,77 +141,121 @@ async def fetch_marks(session: AsyncSession, active_only: bool = True) -> List[M
             # Convert bigint IDs to strings to preserve precision in JavaScript
             shop_id=str(row.shop_id) if row.shop_id else None,
             warehouse_id=str(row.warehouse_id) if row.warehouse_id else None,
-            order_count=row.order_count,
             is_active=bool(row.is_active),
             created_at=row.created_at,
             updated_at=row.updated_at
-        ))
-    
+        )
+        marks.append(mark.model_dump(mode="json", exclude={"order_count"}))
     return marks
 
 
+async def compute_location_counts(session: AsyncSession) -> Dict[str, int]:
+    """
+    Count packages available for pickup per location.
+
+    Returns:
+        Mapping of "shop:{id}" / "warehouse:{id}" → package count
+    """
+    shop_query = """
+        SELECT shop_id AS location_id, COUNT(*) AS order_count
+        FROM tigu_prepare_goods
+        WHERE type = 0 AND prepare_status = 0 AND driver_id IS NULL AND delivery_type = 1
+        GROUP BY shop_id
+    """
+    warehouse_query = """
+        SELECT warehouse_id AS location_id, COUNT(*) AS order_count
+        FROM tigu_prepare_goods
+        WHERE type = 1 AND prepare_status = 0 AND shipping_type = 0
+          AND driver_id IS NULL AND delivery_type = 1 AND warehouse_id IS NOT NULL
+        GROUP BY warehouse_id
+    """
+
+    counts: Dict[str, int] = {}
+    for prefix, query in (("shop", shop_query), ("warehouse", warehouse_query)):
+        result = await session.execute(text(query))
+        for row in result.fetchall():
+            counts[f"{prefix}:{row.location_id}"] = int(row.order_count)
+    return counts
+
+
+async def refresh_mark_counts(session: AsyncSession) -> Dict[str, int]:
+    """
+    Recompute all location counts from MySQL and replace the cached hash.
+
+    Returns:
+        The recomputed counts
+    """
+    counts = await compute_location_counts(session)
+    # Keep counts well past the refresh interval so a missed refresh doesn't force DB reads
+    await cache.replace_mark_counts(counts, ttl_seconds=_settings.marks_count_refresh_seconds * 5)
+    return counts
+
+
+def _assemble_marks(
+    marks: List[Dict[str, Any]],
+    counts: Mapping[str, Any],
+    active_only: bool
+) -> List[Mark]:
+    result = []
+    for data in marks:
+        if active_only and not data["is_active"]:
+            continue
+        order_count = 0
+        if data["shop_id"]:
+            order_count += int(counts.get(f"shop:{data['shop_id']}", 0))
+        if data["warehouse_id"]:
+            order_count += int(counts.get(f"warehouse:{data['warehouse_id']}", 0))
+        # Counters may briefly dip below zero on drift; never show that
+        result.append(Mark(**data, order_count=max(order_count, 0)))
+    return result
+
+
+async def fetch_marks(session: AsyncSession, active_only: bool = True) -> List[Mark]:
+    """
+    Fetch all markers with order counts.
+
+    Args:
+        session: Database session
+        active_only: If True, return only active markers
+
+    Returns:
+        List of Mark objects with order_count for each location
+
+    Order count logic:
+        - For shop/vendor marks: Count packages with prepare_status=0 (ready for merchant pickup)
+        - For warehouse marks: Count packages with type=1, prepare_status=0, shipping_type=0 (ready for warehouse pickup)
+
+    Note:
+        Normally a single Redis round trip. Missing entries are rebuilt from MySQL.
+    """
+    try:
+        marks, counts = await cache.get_marks_snapshot()
+    except Exception:  # noqa: BLE001
+        logger.warning("Marks cache unavailable, reading from database", exc_info=True)
+        marks = await _load_marks(session)
+        counts = await compute_location_counts(session)
+        return _assemble_marks(marks, counts, active_only)
+
+    if marks is None:
+        marks = await _load_marks(session)
+        await cache.store_marks_list(marks, ttl_seconds=_settings.marks_cache_ttl_seconds)
+
+    if counts is None:
+        counts = await refresh_mark_counts(session)
+
+    return _assemble_marks(marks, counts, active_only)
+
+
 async def fetch_mark_by_id(session: AsyncSession, mark_id: int) -> Optional[Mark]:
     """
     Fetch a specific marker by ID with order count.
-    
+
     Args:
         session: Database session
         mark_id: Marker ID
-    
+
     Returns:
         Mark object or None if not found
-        
-    Order count logic:
-        - For shop/vendor marks: Count packages with prepare_status=0 (ready for merchant pickup)
-        - For warehouse marks: Count packages with type=1, prepare_status=0, shipping_type=0 (ready for warehouse pickup)
     """
-    query = """
-        SELECT
-            m.id,
-            m.name,
-            m.latitude,
-            m.longitude,
-            m.type,
-            m.description,
-            m.shop_id,
-            m.warehouse_id,
-            m.is_active,
-            m.created_at,
-            m.updated_at,
-            COALESCE(COUNT(pg.id), 0) as order_count
-        FROM tigu_driver_marks m
-        LEFT JOIN tigu_prepare_goods pg ON (
-            -- Shop/vendor marks: packages ready for merchant pickup (prepare_status=0)
-            (m.shop_id IS NOT NULL AND pg.shop_id = m.shop_id AND pg.type = 0
-             AND pg.prepare_status = 0 AND pg.driver_id IS NULL AND pg.delivery_type = 1)
-            OR
-            -- Warehouse marks: packages ready for warehouse pickup (type=1, prepare_status=0, shipping_type=0)
-            (m.warehouse_id IS NOT NULL AND pg.warehouse_id = m.warehouse_id
-             AND pg.type = 1 AND pg.prepare_status = 0 AND pg.shipping_type = 0
-             AND pg.driver_id IS NULL AND pg.delivery_type = 1)
-        )
-        WHERE m.id = :mark_id
-        GROUP BY m.id
-    """
-    
-    result = await session.execute(text(query), {"mark_id": mark_id})
-    row = result.fetchone()
-    
-    if not row:
-        return None
-    
-    return Mark(
-        id=row.id,
-        name=row.name,
-        latitude=float(row.latitude),
-        longitude=float(row.longitude),
-        type=row.type,
-        description=row.description,
-        # Convert bigint IDs to strings to preserve precision in JavaScript
-        shop_id=str(row.shop_id) if row.shop_id else None,
-        warehouse_id=str(row.warehouse_id) if row.warehouse_id else None,
-        order_count=row.order_count,
-        is_active=bool(row.is_active),
-        created_at=row.created_at,
-        updated_at=row.updated_at
-    )
+    marks = await fetch_marks(session, active_only=False)
+    return next((mark for mark in marks if mark.id == mark_id), None)
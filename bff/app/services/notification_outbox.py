@@ -0,0 +1,224 @@
+"""
+Notification Outbox
+
+Decouples creating a notification from storing it. notification_service
+enqueues rows here and returns immediately; the outbox worker
+(app.workers.notification_outbox_worker) drains the queue in batches and
+writes each batch to a sink with a single bulk insert.
+
+Queues:
+- RedisOutboxQueue: Redis list shared by every uvicorn worker (default)
+- LocalOutboxQueue: in-process deque, for tests, benchmarks or single-process runs
+
+Sinks:
+- SupabaseNotificationSink: bulk insert into the Supabase notifications table,
+  run in a thread because the Supabase client is synchronous
+- InMemoryNotificationSink: local stand-in that stores rows in a list
+
+Both are pluggable through set_outbox_queue / set_notification_sink.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Protocol
+
+from app.core.config import get_settings
+from app.services import cache
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_KEY = "notifications:outbox"
+# Batches that exhausted their retries, kept for inspection / manual replay
+OUTBOX_DEAD_LETTER_KEY = "notifications:outbox:dead"
+
+
+class NotificationSink(Protocol):
+    """Destination for drained notification rows."""
+
+    async def insert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Store rows in one bulk write and return the stored rows. Raise on failure."""
+        ...
+
+
+class OutboxQueue(Protocol):
+    """FIFO of pending notification rows."""
+
+    async def put(self, rows: List[Dict[str, Any]]) -> None: ...
+
+    async def take(self, max_items: int, timeout: float) -> List[Dict[str, Any]]:
+        """Wait up to timeout seconds for rows, then return at most max_items."""
+        ...
+
+    async def dead_letter(self, rows: List[Dict[str, Any]]) -> None: ...
+
+    async def size(self) -> int: ...
+
+
+class SupabaseNotificationSink:
+    """Bulk insert into the Supabase notifications table."""
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+
+    async def insert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        result = await asyncio.to_thread(
+            lambda: self._client.table("notifications").insert(rows).execute()
+        )
+        return list(result.data or [])
+
+
+class InMemoryNotificationSink:
+    """
+    Local stand-in for Supabase.
+
+    Args:
+        fail_times: Number of insert calls that raise before succeeding
+        latency_seconds: Simulated round trip per insert
+    """
+
+    def __init__(self, fail_times: int = 0, latency_seconds: float = 0.0) -> None:
+        self.rows: List[Dict[str, Any]] = []
+        self.insert_calls = 0
+        self._fail_times = fail_times
+        self._latency_seconds = latency_seconds
+
+    async def insert(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self.insert_calls += 1
+        if self._latency_seconds:
+            await asyncio.sleep(self._latency_seconds)
+        if self._fail_times > 0:
+            self._fail_times -= 1
+            raise ConnectionError("Simulated sink failure")
+
+        now = datetime.now(timezone.utc).isoformat()
+        stored = [
+            {"id": str(uuid.uuid4()), "is_read": False, "is_dismissed": False, "created_at": now, **row}
+            for row in rows
+        ]
+        self.rows.extend(stored)
+        return stored
+
+
+class RedisOutboxQueue:
+    """Outbox on a Redis list, shared across processes."""
+
+    def __init__(self, key: str = OUTBOX_KEY, dead_letter_key: str = OUTBOX_DEAD_LETTER_KEY) -> None:
+        self._key = key
+        self._dead_letter_key = dead_letter_key
+
+    async def put(self, rows: List[Dict[str, Any]]) -> None:
+        if rows:
+            await cache.redis.rpush(self._key, *(json.dumps(row, default=str) for row in rows))
+
+    async def take(self, max_items: int, timeout: float) -> List[Dict[str, Any]]:
+        first = await cache.redis.blpop([self._key], timeout=timeout)
+        if not first:
+            return []
+        raw = [first[1]]
+        if max_items > 1:
+            raw.extend(await cache.redis.lpop(self._key, max_items - 1) or [])
+        return [json.loads(item) for item in raw]
+
+    async def dead_letter(self, rows: List[Dict[str, Any]]) -> None:
+        if rows:
+            await cache.redis.rpush(self._dead_letter_key, *(json.dumps(row, default=str) for row in rows))
+
+    async def size(self) -> int:
+        return await cache.redis.llen(self._key)
+
+
+class LocalOutboxQueue:
+    """In-process outbox; rows are lost if the process exits before draining."""
+
+    def __init__(self) -> None:
+        self._rows: Deque[Dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+        self.dead_letters: List[Dict[str, Any]] = []
+
+    async def put(self, rows: List[Dict[str, Any]]) -> None:
+        if rows:
+            self._rows.extend(rows)
+            self._ready.set()
+
+    async def take(self, max_items: int, timeout: float) -> List[Dict[str, Any]]:
+        if not self._rows:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except TimeoutError:
+                return []
+        batch = []
+        while self._rows and len(batch) < max_items:
+            batch.append(self._rows.popleft())
+        return batch
+
+    async def dead_letter(self, rows: List[Dict[str, Any]]) -> None:
+        self.dead_letters.extend(rows)
+
+    async def size(self) -> int:
+        return len(self._rows)
+
+
+_queue: Optional[OutboxQueue] = None
+_sink: Optional[NotificationSink] = None
+_sink_configured = False
+
+
+def get_outbox_queue() -> OutboxQueue:
+    """Return the configured outbox queue (NOTIFICATION_OUTBOX_BACKEND)."""
+    global _queue
+    if _queue is None:
+        backend = get_settings().notification_outbox_backend
+        _queue = LocalOutboxQueue() if backend == "local" else RedisOutboxQueue()
+    return _queue
+
+
+def set_outbox_queue(queue: Optional[OutboxQueue]) -> None:
+    """Replace the outbox queue (None restores the configured default)."""
+    global _queue
+    _queue = queue
+
+
+def get_notification_sink() -> Optional[NotificationSink]:
+    """Return the notification sink, or None if Supabase is not configured."""
+    global _sink, _sink_configured
+    if not _sink_configured:
+        # Imported lazily: notification_service imports this module
+        from app.services.notification_service import get_supabase
+
+        client = get_supabase()
+        _sink = SupabaseNotificationSink(client) if client else None
+        _sink_configured = True
+    return _sink
+
+
+def set_notification_sink(sink: Optional[NotificationSink]) -> None:
+    """Replace the notification sink (None restores the configured default)."""
+    global _sink, _sink_configured
+    _sink = sink
+    _sink_configured = sink is not None
+
+
+async def enqueue(rows: List[Dict[str, Any]]) -> int:
+    """
+    Queue notification rows for the outbox worker.
+
+    Args:
+        rows: Rows in the notifications table shape
+
+    Returns:
+        Number of rows queued (0 if the queue is unavailable)
+    """
+    if not rows:
+        return 0
+    try:
+        await get_outbox_queue().put(rows)
+    except Exception:  # noqa: BLE001
+        logger.error("Failed to enqueue %s notifications", len(rows), exc_info=True)
+        return 0
+    return len(rows)
@@ -1,5 +1,9 @@
 """
 Notification service for creating and broadcasting notifications via Supabase.
+
+Notifications are queued in the notification outbox and written to Supabase
+in batches by the outbox worker, so callers never wait on the (synchronous)
+Supabase client.
 """
 from __future__ import annotations
 
@@ -10,6 +14,7 @@ from typing import Any
 from supabase import create_client, Client
 
 from app.core.config import get_settings
+from app.services import notification_outbox
 
 logger = logging.getLogger(__name__)
 
@@ -77,10 +82,9 @@ async def create_notification(
         metadata: Additional JSON metadata (optional)
 
     Returns:
-        Created notification dict or None if failed
+        Queued notification dict or None if failed
     """
-    supabase = get_supabase()
-    if not supabase:
+    if not notification_outbox.get_notification_sink():
         logger.warning("Cannot create notification: Supabase not configured")
         return None
 
@@ -96,20 +100,11 @@ async def create_notification(
         "metadata": metadata or {},
     }
 
-    try:
-        result = supabase.table("notifications").insert(notification_data).execute()
-
-        if result.data:
-            logger.info(
-                f"Created notification for driver {driver_id}: {notification_type.value}"
-            )
-            return result.data[0]
-
+    if not await notification_outbox.enqueue([notification_data]):
         return None
 
-    except Exception as e:
-        logger.error(f"Failed to create notification: {e}")
-        return None
+    logger.info(f"Queued notification for driver {driver_id}: {notification_type.value}")
+    return notification_data
 
 
 async def create_order_assigned_notification(
@@ -240,10 +235,9 @@ async def broadcast_notification(
         metadata: Additional metadata
 
     Returns:
-        Number of successfully created notifications
+        Number of queued notifications
     """
-    supabase = get_supabase()
-    if not supabase:
+    if not notification_outbox.get_notification_sink():
         logger.warning("Cannot broadcast: Supabase not configured")
         return 0
 
@@ -260,12 +254,6 @@ async def broadcast_notification(
         for driver_id, driver_phone in driver_ids
     ]
 
-    try:
-        result = supabase.table("notifications").insert(notifications).execute()
-        count = len(result.data) if result.data else 0
-        logger.info(f"Broadcast notification to {count} drivers")
-        return count
-
-    except Exception as e:
-        logger.error(f"Failed to broadcast notification: {e}")
-        return 0
+    count = await notification_outbox.enqueue(notifications)
+    logger.info(f"Queued broadcast notification for {count} drivers")
+    return count
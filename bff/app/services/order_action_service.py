@@ -15,15 +15,16 @@ This service works with the file linking pattern:
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, List, Sequence
 
-from sqlalchemy import select, update
+from sqlalchemy import and_, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.models.order import Order, UploadedFile
 from app.models.order_action import OrderAction
-from app.utils import generate_snowflake_id
+from app.services import package_detail_service, photo_service
+from app.utils import generate_snowflake_id, parse_file_id_list
 
 
 # Action Type Constants
@@ -94,36 +95,136 @@ async def create_order_action(
     if not order:
         raise ValueError(f"Order not found: {order_id}")
 
-    # Create action record with state snapshot
-    action = OrderAction(
-        id=generate_snowflake_id(),
+    action = await add_order_action(
+        session,
         order_id=order_id,
         order_status=order.order_status,
         shipping_status=order.shipping_status,
         shipping_type=order.shipping_type,
         action_type=action_type,
+        create_by=create_by,
+        file_ids=file_ids,
+        remark=remark
+    )
+
+    await session.commit()
+
+    # Package details show the photos of their orders' actions
+    await package_detail_service.invalidate_orders([order_id])
+
+    return action
+
+
+async def add_order_action(
+    session: AsyncSession,
+    order_id: int,
+    order_status: int | None,
+    shipping_status: int | None,
+    shipping_type: int | None,
+    action_type: int,
+    create_by: int,
+    file_ids: List[int] | None = None,
+    remark: str | None = None
+) -> OrderAction:
+    """
+    Add an order action with a known status snapshot. Does not commit.
+
+    The action ID is a Snowflake ID, so nothing is flushed: the INSERT goes
+    out with the caller's commit, and linking files costs one UPDATE.
+
+    Args:
+        session: Database session
+        order_id: Order ID
+        order_status: Order status to record
+        shipping_status: Shipping status to record (after the transition)
+        shipping_type: Order shipping type
+        action_type: Action type code (see ActionType constants)
+        create_by: Creator identifier (driver_id, merchant_id, etc.)
+        file_ids: Optional list of UploadedFile IDs for photo evidence
+        remark: Optional notes/comments
+
+    Returns:
+        The pending OrderAction instance
+    """
+    action = OrderAction(
+        id=generate_snowflake_id(),
+        order_id=order_id,
+        order_status=order_status,
+        shipping_status=shipping_status,
+        shipping_type=shipping_type,
+        action_type=action_type,
         logistics_voucher_file=",".join(str(fid) for fid in file_ids) if file_ids else None,
         create_by=create_by,
         remark=remark,
         create_time=datetime.now()
     )
-
     session.add(action)
-    await session.flush()  # Get action.id
 
     # Link files to this action if provided
     if file_ids:
-        await link_files_to_action(session, action.id, file_ids)
-
-    await session.commit()
+        await link_files_to_action(session, action.id, file_ids, commit=False)
 
     return action
 
 
+async def add_order_actions(
+    session: AsyncSession,
+    orders: Sequence[Any],
+    action_type: int,
+    shipping_status: int,
+    create_by: str,
+    file_ids: List[int] | None = None,
+    remark: str | None = None
+) -> List[int]:
+    """
+    Insert one action per order with a single multi-row INSERT. Does not commit.
+
+    Used when a whole package moves at once. Files are recorded in
+    logistics_voucher_file only; they are shared by the package's actions,
+    so they are not linked to any single action.
+
+    Args:
+        session: Database session
+        orders: Orders (or rows) with id, order_status and shipping_type,
+            read before the transition
+        action_type: Action type code
+        shipping_status: Shipping status to record (after the transition)
+        create_by: Creator recorded on the actions
+        file_ids: Optional UploadedFile IDs of the photo evidence
+        remark: Optional notes/comments
+
+    Returns:
+        IDs of the inserted actions
+    """
+    if not orders:
+        return []
+
+    now = datetime.now()
+    voucher = ",".join(str(fid) for fid in file_ids) if file_ids else None
+    rows = [
+        {
+            "id": generate_snowflake_id(),
+            "order_id": order.id,
+            "order_status": order.order_status,
+            "shipping_status": shipping_status,
+            "shipping_type": order.shipping_type,
+            "action_type": action_type,
+            "logistics_voucher_file": voucher,
+            "create_by": create_by,
+            "remark": remark,
+            "create_time": now
+        }
+        for order in orders
+    ]
+    await session.execute(insert(OrderAction).values(rows))
+    return [row["id"] for row in rows]
+
+
 async def link_files_to_action(
     session: AsyncSession,
     action_id: int,
-    file_ids: List[int]
+    file_ids: List[int],
+    commit: bool = True
 ) -> int:
     """
     Link uploaded files to an OrderAction record.
@@ -136,6 +237,7 @@ async def link_files_to_action(
         session: Database session
         action_id: OrderAction ID
         file_ids: List of UploadedFile IDs to link
+        commit: Commit the update (False when part of a larger transaction)
 
     Returns:
         Number of files linked
@@ -158,7 +260,8 @@ async def link_files_to_action(
     )
 
     result = await session.execute(stmt)
-    await session.commit()
+    if commit:
+        await session.commit()
 
     return result.rowcount
 
@@ -435,18 +538,68 @@ async def record_delivery_complete(
     )
 
 
+async def get_files_for_actions(
+    session: AsyncSession,
+    actions: Sequence[OrderAction]
+) -> Dict[int, List[UploadedFile]]:
+    """
+    Get the files of many actions in one query.
+
+    A file belongs to an action when it is listed in the action's
+    logistics_voucher_file or linked to it via biz_id/biz_type.
+
+    Args:
+        session: Database session
+        actions: OrderAction records
+
+    Returns:
+        Dict of action ID -> files (voucher order first, then linked files)
+    """
+    if not actions:
+        return {}
+
+    action_ids = [action.id for action in actions]
+    voucher_ids = {action.id: parse_file_id_list(action.logistics_voucher_file) for action in actions}
+    all_voucher_ids = {file_id for ids in voucher_ids.values() for file_id in ids}
+
+    conditions = [
+        and_(UploadedFile.biz_type == "order_action", UploadedFile.biz_id.in_(action_ids))
+    ]
+    if all_voucher_ids:
+        conditions.append(UploadedFile.id.in_(all_voucher_ids))
+
+    result = await session.execute(
+        select(UploadedFile).where(or_(*conditions)).order_by(UploadedFile.id)
+    )
+    files_by_id = {f.id: f for f in result.scalars().all()}
+
+    files_by_action: Dict[int, List[UploadedFile]] = {}
+    for action in actions:
+        files = [files_by_id[fid] for fid in dict.fromkeys(voucher_ids[action.id]) if fid in files_by_id]
+        listed = {f.id for f in files}
+        files.extend(
+            f for f in files_by_id.values()
+            if f.biz_type == "order_action" and f.biz_id == action.id and f.id not in listed
+        )
+        files_by_action[action.id] = files
+    return files_by_action
+
+
 async def get_workflow_timeline(
     session: AsyncSession,
-    order_id: int
+    order_id: int,
+    compact: bool = False
 ) -> List[dict]:
     """
     Get complete workflow timeline for an order with file URLs.
 
-    Returns action history with linked files for display.
+    Returns action history with linked files for display. Uses two queries
+    regardless of the number of actions (actions, then all their files).
 
     Args:
         session: Database session
         order_id: Order ID
+        compact: Return only ids, type, time and thumbnail URLs (list views)
 
     Returns:
         List of dicts containing action details and file URLs
@@ -463,19 +616,34 @@ async def get_workflow_timeline(
         #   },
         #   ...
         # ]
+
+        timeline = await get_workflow_timeline(session, order_id, compact=True)
+        # [{"action_id": ..., "action_type": 0, "create_time": ...,
+        #   "file_ids": [...], "thumbnails": ["https://cdn.../photo1_thumb.jpg"]}, ...]
     """
-    # Get all actions for order
+    # Get all actions for order, then every linked file in one query
     actions = await get_order_actions(session, order_id)
+    files_by_action = await get_files_for_actions(session, actions)
 
     timeline = []
     for action in actions:
-        # Get files for this action
-        files = await get_action_files(session, action.id)
+        files = files_by_action.get(action.id, [])
+        create_time = action.create_time.isoformat() if action.create_time else None
+
+        if compact:
+            timeline.append({
+                "action_id": action.id,
+                "action_type": action.action_type,
+                "create_time": create_time,
+                "file_ids": [f.id for f in files],
+                "thumbnails": [photo_service.photo_url(f, "thumbnail") for f in files]
+            })
+            continue
 
         timeline.append({
             "action_id": action.id,
             "action_type": action.action_type,
-            "create_time": action.create_time.isoformat() if action.create_time else None,
+            "create_time": create_time,
             "create_by": action.create_by,
             "remark": action.remark,
             "order_status": action.order_status,
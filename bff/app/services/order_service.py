@@ -2,18 +2,19 @@ from __future__ import annotations
 
 import json
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from sqlalchemy import or_, select, update
+from sqlalchemy import ColumnElement, Select, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.models.order import Order, OrderItem, UploadedFile, Warehouse
+from app.models.order import Order, OrderItem, Warehouse
 from app.models.delivery_proof import DeliveryProof
-from app.models.prepare_goods import PrepareGoods
+from app.models.prepare_goods import PrepareGoods, PrepareGoodsOrder
 from app.schemas.order import DeliveryProofInfo, OrderDetail, OrderItem as OrderItemSchema, OrderSummary, WarehouseSnapshot
-from app.services import order_action_service
+from app.services import order_action_service, package_detail_service, search_service, sku_image_service
 from app.services.order_action_service import ActionType
+from app.utils.pagination import PageCursor, apply_keyset, next_cursor
 
 # Updated shipping status labels to match 4-workflow system
 SHIPPING_STATUS_LABELS = {
@@ -45,35 +46,22 @@ def _resolve_text(value: str | dict | None) -> str:
     return str(value)
 
 
-async def _build_item(session: AsyncSession, item: OrderItem) -> OrderItemSchema:
-    # Fetch main SKU image from uploaded files
-    sku_image = None
-    stmt = (
-        select(UploadedFile.file_url)
-        .where(UploadedFile.biz_type == 'product_sku')
-        .where(UploadedFile.biz_id == item.sku_id)
-        .where(UploadedFile.is_main == 1)
-        .limit(1)
-    )
-    result = await session.execute(stmt)
-    file_url = result.scalar_one_or_none()
-
-    if file_url:
-        # Prepend base URL if the path is relative
-        if file_url.startswith('/'):
-            sku_image = f"https://api.wetigu.com{file_url}"
-        else:
-            sku_image = file_url
-
+def _build_item(item: OrderItem, sku_images: Dict[int, str | None]) -> OrderItemSchema:
     return OrderItemSchema(
         sku_id=item.sku_id,
         sku_code=item.sku_code,
         product_name=_resolve_text(item.product_name),
         quantity=item.quantity,
-        sku_image=sku_image
+        sku_image=sku_images.get(item.sku_id)
     )
 
 
+async def _load_order_sku_images(session: AsyncSession, orders: Sequence[Order]) -> Dict[int, str | None]:
+    """Resolve main SKU images for every item in a result set with one batched lookup."""
+    sku_ids = [item.sku_id for order in orders for item in order.items]
+    return await sku_image_service.load_sku_images(session, sku_ids)
+
+
 def _build_pickup_location(warehouse: Warehouse | None) -> WarehouseSnapshot | None:
     if not warehouse:
         return None
@@ -97,9 +85,9 @@ def _build_delivery_proof(proof: DeliveryProof | None) -> DeliveryProofInfo | No
     )
 
 
-async def _serialize(session: AsyncSession, order: Order) -> OrderSummary:
+def _serialize(order: Order, sku_images: Dict[int, str | None]) -> OrderSummary:
     pickup = _build_pickup_location(order.warehouse)
-    items = [await _build_item(session, item) for item in order.items]
+    items = [_build_item(item, sku_images) for item in order.items]
     return OrderSummary(
         order_sn=order.order_sn,
         shipping_status=order.shipping_status,
@@ -121,7 +109,8 @@ async def _serialize(session: AsyncSession, order: Order) -> OrderSummary:
 
 
 async def _serialize_detail(session: AsyncSession, order: Order) -> OrderDetail:
-    base = await _serialize(session, order)
+    sku_images = await _load_order_sku_images(session, [order])
+    base = _serialize(order, sku_images)
     proof = _build_delivery_proof(order.delivery_proof)
 
     # Get delivery_type from PrepareGoods (single source of truth)
@@ -140,6 +129,16 @@ async def _serialize_detail(session: AsyncSession, order: Order) -> OrderDetail:
     )
 
 
+def _delivery_type_query(order_id: int | ColumnElement[int]) -> Select:
+    return (
+        select(PrepareGoods.delivery_type)
+        .join(PrepareGoodsOrder, PrepareGoodsOrder.prepare_id == PrepareGoods.id)
+        .where(PrepareGoodsOrder.order_id == order_id)
+        .order_by(PrepareGoods.id)
+        .limit(1)
+    )
+
+
 async def _get_order_delivery_type(session: AsyncSession, order_id: int) -> int | None:
     """
     Get delivery_type for an order from PrepareGoods (single source of truth).
@@ -153,11 +152,7 @@ async def _get_order_delivery_type(session: AsyncSession, order_id: int) -> int
         1 = Third-party driver delivery
         None = Order not yet in any PrepareGoods package
     """
-    stmt = (
-        select(PrepareGoods.delivery_type)
-        .where(PrepareGoods.order_ids.like(f"%{order_id}%"))
-    )
-    result = await session.execute(stmt)
+    result = await session.execute(_delivery_type_query(order_id))
     return result.scalar_one_or_none()
 
 
@@ -186,7 +181,8 @@ async def fetch_assigned_orders(session: AsyncSession, driver_id: int, include_c
     )
     result = await session.execute(stmt)
     orders = result.scalars().unique().all()
-    return [await _serialize(session, order) for order in orders]
+    sku_images = await _load_order_sku_images(session, orders)
+    return [_serialize(order, sku_images) for order in orders]
 
 
 async def fetch_order_detail(session: AsyncSession, order_sn: str, driver_id: int) -> OrderDetail | None:
@@ -218,6 +214,81 @@ async def update_order_shipping_status(
     return result.rowcount > 0
 
 
+async def _transition(
+    session: AsyncSession,
+    order_sn: str,
+    values: Dict[str, Any],
+    action_type: int,
+    create_by: int,
+    file_ids: List[int] | None,
+    remark: str,
+    guard: ColumnElement[bool] | None = None,
+    require_package: bool = False
+) -> bool:
+    """
+    Apply one workflow transition to an order in a single transaction.
+
+    Round trips: one locked read of the columns the action snapshots, the
+    order UPDATE, the file link UPDATE (only when photos are given), and the
+    action INSERT, which goes out with the only commit. MySQL has no
+    RETURNING, so the locked read stands in for it: the row cannot change
+    between the read and the update.
+
+    Args:
+        session: Database session
+        order_sn: Order serial number
+        values: Order columns to set; must include shipping_status
+        action_type: Action type code (see ActionType constants)
+        create_by: Creator identifier recorded on the action
+        file_ids: IDs of uploaded photos to link to the action
+        remark: Action remark
+        guard: Extra condition the order must meet (e.g. driver ownership)
+        require_package: Require the order to be in a PrepareGoods package
+
+    Returns:
+        bool: True if the order was transitioned, False if not found
+            (or the guard did not match)
+
+    Raises:
+        ValueError: If require_package and the order is in no package
+    """
+    stmt = select(Order.id, Order.order_status, Order.shipping_type).where(Order.order_sn == order_sn)
+    if guard is not None:
+        stmt = stmt.where(guard)
+    if require_package:
+        stmt = stmt.add_columns(_delivery_type_query(Order.id).scalar_subquery().label("delivery_type"))
+    result = await session.execute(stmt.with_for_update())
+    order = result.one_or_none()
+
+    if order is None:
+        return False
+    if require_package and order.delivery_type is None:
+        raise ValueError(f"Order {order_sn} not in any PrepareGoods package. Cannot pickup.")
+
+    await session.execute(
+        update(Order)
+        .where(Order.id == order.id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await order_action_service.add_order_action(
+        session,
+        order_id=order.id,
+        order_status=values.get("order_status", order.order_status),
+        shipping_status=values["shipping_status"],
+        shipping_type=order.shipping_type,
+        action_type=action_type,
+        create_by=create_by,
+        file_ids=file_ids,
+        remark=remark
+    )
+    await session.commit()
+
+    # Package details show the photos of their orders' actions
+    await package_detail_service.invalidate_orders([order.id])
+    return True
+
+
 async def pickup_order(
     session: AsyncSession,
     order_sn: str,
@@ -245,43 +316,20 @@ async def pickup_order(
     Raises:
         ValueError: If order not in PrepareGoods package (no delivery_type)
     """
-    # Get order
-    stmt = select(Order).where(Order.order_sn == order_sn)
-    result = await session.execute(stmt)
-    order = result.scalar_one_or_none()
-
-    if not order:
-        return False
-
-    # Verify order is in PrepareGoods package
-    delivery_type = await _get_order_delivery_type(session, order.id)
-    if delivery_type is None:
-        raise ValueError(f"Order {order_sn} not in any PrepareGoods package. Cannot pickup.")
-
-    # Update order status and timestamp
-    stmt = (
-        update(Order)
-        .where(Order.order_sn == order_sn)
-        .values(
-            driver_id=driver_id,
-            shipping_status=2,  # 司机收货中
-            driver_receive_time=datetime.now()
-        )
+    return await _transition(
+        session,
+        order_sn,
+        values={
+            "driver_id": driver_id,
+            "shipping_status": 2,  # 司机收货中
+            "driver_receive_time": datetime.now()
+        },
+        action_type=ActionType.DRIVER_PICKUP,
+        create_by=driver_id,
+        file_ids=photo_ids,
+        remark="Driver picked up goods",
+        require_package=True
     )
-    result = await session.execute(stmt)
-    
-    # Refresh order to get updated state before creating action
-    await session.refresh(order)
-    
-    # Create OrderAction record with updated state
-    await order_action_service.record_driver_pickup(
-        session=session,
-        order_id=order.id,
-        driver_id=driver_id,
-        photo_ids=photo_ids
-    )
-
-    return result.rowcount > 0
 
 
 async def fetch_orders(
@@ -290,14 +338,21 @@ async def fetch_orders(
     driver_id: Optional[int] = None,
     unassigned: bool = False,
     search: Optional[str] = None,
-    limit: int = 100
-) -> List[OrderSummary]:
+    limit: int = 100,
+    after: Optional[PageCursor] = None
+) -> Tuple[List[OrderSummary], Optional[str]]:
+    """
+    List orders newest first, one keyset page at a time.
+
+    Returns:
+        (orders, cursor of the next page or None on the last page)
+    """
     stmt = (
         select(Order)
         .options(selectinload(Order.items), selectinload(Order.warehouse), selectinload(Order.driver))
-        .order_by(Order.create_time.desc())
         .limit(limit)
     )
+    stmt = apply_keyset(stmt, Order.create_time, Order.id, after)
 
     if status is not None:
         stmt = stmt.where(Order.shipping_status == status)
@@ -309,18 +364,14 @@ async def fetch_orders(
         stmt = stmt.where(Order.driver_id.is_(None))
 
     if search:
-        pattern = f"%{search}%"
-        stmt = stmt.where(
-            or_(
-                Order.order_sn.ilike(pattern),
-                Order.receiver_name.ilike(pattern),
-                Order.receiver_phone.ilike(pattern)
-            )
-        )
+        condition = search_service.order_search_condition(search)
+        if condition is not None:
+            stmt = stmt.where(condition)
 
     result = await session.execute(stmt)
     orders = result.scalars().unique().all()
-    return [await _serialize(session, order) for order in orders]
+    sku_images = await _load_order_sku_images(session, orders)
+    return [_serialize(order, sku_images) for order in orders], next_cursor(orders, limit)
 
 
 # New workflow functions for 4-workflow delivery system
@@ -350,38 +401,19 @@ async def arrive_warehouse(
     Returns:
         bool: True if update successful, False if order not found
     """
-    # Get order
-    stmt = select(Order).where(Order.order_sn == order_sn)
-    result = await session.execute(stmt)
-    order = result.scalar_one_or_none()
-
-    if not order:
-        return False
-
-    # Update order status and timestamp
-    stmt = (
-        update(Order)
-        .where(Order.order_sn == order_sn)
-        .where(Order.driver_id == driver_id)  # Verify driver owns this order
-        .values(
-            shipping_status=3,  # 司机送达仓库
-            arrive_warehouse_time=datetime.now()
-        )
+    return await _transition(
+        session,
+        order_sn,
+        values={
+            "shipping_status": 3,  # 司机送达仓库
+            "arrive_warehouse_time": datetime.now()
+        },
+        action_type=ActionType.DRIVER_TO_WAREHOUSE,
+        create_by=driver_id,
+        file_ids=photo_ids,
+        remark="Driver arrived at warehouse",
+        guard=Order.driver_id == driver_id  # Verify driver owns this order
     )
-    result = await session.execute(stmt)
-    
-    # Refresh order to get updated state before creating action
-    await session.refresh(order)
-    
-    # Create OrderAction record with updated state
-    await order_action_service.record_driver_arrive_warehouse(
-        session=session,
-        order_id=order.id,
-        driver_id=driver_id,
-        photo_ids=photo_ids
-    )
-
-    return result.rowcount > 0
 
 
 async def warehouse_receive(
@@ -408,35 +440,16 @@ async def warehouse_receive(
     Returns:
         bool: True if update successful, False if order not found
     """
-    # Get order
-    stmt = select(Order).where(Order.order_sn == order_sn)
-    result = await session.execute(stmt)
-    order = result.scalar_one_or_none()
-
-    if not order:
-        return False
-
-    # Update order status
-    stmt = (
-        update(Order)
-        .where(Order.order_sn == order_sn)
-        .values(shipping_status=4)  # 仓库已收货
-    )
-    result = await session.execute(stmt)
-    
-    # Refresh order to get updated state before creating action
-    await session.refresh(order)
-    
-    # Create OrderAction record with updated state
-    await order_action_service.record_warehouse_receive(
-        session=session,
-        order_id=order.id,
-        warehouse_staff_id=warehouse_staff_id,
-        photo_ids=photo_ids
+    return await _transition(
+        session,
+        order_sn,
+        values={"shipping_status": 4},  # 仓库已收货
+        action_type=ActionType.WAREHOUSE_RECEIVE,
+        create_by=warehouse_staff_id,
+        file_ids=photo_ids,
+        remark="Warehouse received goods"
     )
 
-    return result.rowcount > 0
-
 
 async def warehouse_ship(
     session: AsyncSession,
@@ -463,37 +476,18 @@ async def warehouse_ship(
     Returns:
         bool: True if update successful, False if order not found
     """
-    # Get order
-    stmt = select(Order).where(Order.order_sn == order_sn)
-    result = await session.execute(stmt)
-    order = result.scalar_one_or_none()
-
-    if not order:
-        return False
-
-    # Update order status and timestamp
-    stmt = (
-        update(Order)
-        .where(Order.order_sn == order_sn)
-        .values(
-            shipping_status=5,  # 司机配送用户
-            warehouse_shipping_time=datetime.now()
-        )
+    return await _transition(
+        session,
+        order_sn,
+        values={
+            "shipping_status": 5,  # 司机配送用户
+            "warehouse_shipping_time": datetime.now()
+        },
+        action_type=ActionType.WAREHOUSE_SHIP,
+        create_by=warehouse_staff_id,
+        file_ids=photo_ids,
+        remark="Warehouse shipped to user"
     )
-    result = await session.execute(stmt)
-    
-    # Refresh order to get updated state before creating action
-    await session.refresh(order)
-    
-    # Create OrderAction record with updated state
-    await order_action_service.record_warehouse_ship(
-        session=session,
-        order_id=order.id,
-        warehouse_staff_id=warehouse_staff_id,
-        photo_ids=photo_ids
-    )
-
-    return result.rowcount > 0
 
 
 async def complete_delivery(
@@ -521,34 +515,15 @@ async def complete_delivery(
     Returns:
         bool: True if update successful, False if order not found
     """
-    # Get order
-    stmt = select(Order).where(Order.order_sn == order_sn)
-    result = await session.execute(stmt)
-    order = result.scalar_one_or_none()
-
-    if not order:
-        return False
-
-    # Update order status and timestamp
-    stmt = (
-        update(Order)
-        .where(Order.order_sn == order_sn)
-        .values(
-            shipping_status=6,  # 已送达
-            finish_time=datetime.now()
-        )
+    return await _transition(
+        session,
+        order_sn,
+        values={
+            "shipping_status": 6,  # 已送达
+            "finish_time": datetime.now()
+        },
+        action_type=ActionType.DELIVERY_COMPLETE,
+        create_by=completer_id,
+        file_ids=photo_ids,
+        remark="Delivery completed"
     )
-    result = await session.execute(stmt)
-    
-    # Refresh order to get updated state before creating action
-    await session.refresh(order)
-    
-    # Create OrderAction record with updated state
-    await order_action_service.record_delivery_complete(
-        session=session,
-        order_id=order.id,
-        completer_id=completer_id,
-        photo_ids=photo_ids
-    )
-
-    return result.rowcount > 0
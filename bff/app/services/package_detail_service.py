@@ -0,0 +1,299 @@
+"""
+Package Detail Service
+
+Assembles the prepare package detail (PrepareGoodsDetailResponse) shown by
+the driver app (GET /prepare-goods/{prepare_sn}) and the admin console
+(GET /admin/packages/{prepare_sn}).
+
+On a cache miss the detail costs three sequential round trips instead of
+six or more:
+1. Package with warehouse and driver joined, then its items (selectin)
+2. Concurrently, each on its own pooled session (one AsyncSession cannot
+   run statements concurrently): order serial numbers, prepare_good photos,
+   and the voucher ids of the orders' actions for this leg...
+3. ...followed by those voucher files
+
+Assembled details are cached in Redis per prepare_sn, one entry per photo
+variant, and dropped when the package's status, driver or photos change or
+an order in it records an action (see invalidate*). Every invalidation
+also bumps the prepare_sn's version; a miss reads the version before
+querying MySQL and stores its detail only if the version is unchanged, so
+a detail assembled from rows read before a mutation never overwrites the
+invalidation. Cache errors are logged and never fail a request or a
+mutation.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload
+
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.models.order import Order, UploadedFile
+from app.models.order_action import OrderAction
+from app.models.prepare_goods import PrepareGoods
+from app.schemas.prepare_goods import PrepareGoodsDetailResponse, PrepareGoodsItemSchema, UploadedFileSchema
+from app.services import cache, photo_service
+from app.utils import parse_order_id_list
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+SessionFactory = Callable[[], AsyncSession]
+
+
+def photo_action_types(package_type: Optional[int]) -> List[int]:
+    """
+    Order action types whose photos are shown with a package.
+
+    Second-leg packages (type=1, Workflow 5, from the warehouse) show the
+    warehouse receipt photos; first-leg packages the shop preparation photos.
+    Delivery proof (action_type=5) is shown for both.
+    """
+    return [3, 5] if package_type == 1 else [0, 5]
+
+
+def _voucher_file_ids(vouchers: Sequence[Optional[str]]) -> List[int]:
+    # logistics_voucher_file contains comma-separated file IDs
+    return [
+        int(file_id.strip())
+        for voucher in vouchers if voucher
+        for file_id in voucher.split(",") if file_id.strip().isdigit()
+    ]
+
+
+async def _load_package(session: AsyncSession, prepare_sn: str) -> Optional[PrepareGoods]:
+    # Warehouse and driver are joined and items selectin-loaded by the model
+    # defaults; the shop is not part of the detail
+    result = await session.execute(
+        select(PrepareGoods)
+        .options(noload(PrepareGoods.shop))
+        .where(PrepareGoods.prepare_sn == prepare_sn)
+    )
+    return result.scalars().first()
+
+
+async def _order_serial_numbers(session_factory: SessionFactory, order_ids: List[int]) -> List[str]:
+    if not order_ids:
+        return []
+    async with session_factory() as session:
+        result = await session.execute(select(Order.order_sn).where(Order.id.in_(order_ids)))
+        return list(result.scalars().all())
+
+
+async def _package_photos(session_factory: SessionFactory, package_id: int) -> List[UploadedFile]:
+    async with session_factory() as session:
+        result = await session.execute(
+            select(UploadedFile)
+            .where(UploadedFile.biz_type == "prepare_good")
+            .where(UploadedFile.biz_id == package_id)
+            .order_by(UploadedFile.create_time.desc())
+        )
+        return list(result.scalars().all())
+
+
+async def _action_photos(
+    session_factory: SessionFactory,
+    order_ids: List[int],
+    action_types: List[int]
+) -> List[UploadedFile]:
+    if not order_ids:
+        return []
+    async with session_factory() as session:
+        vouchers = await session.execute(
+            select(OrderAction.logistics_voucher_file)
+            .where(OrderAction.order_id.in_(order_ids))
+            .where(OrderAction.action_type.in_(action_types))
+            .order_by(OrderAction.create_time.desc())
+        )
+        file_ids = _voucher_file_ids(vouchers.scalars().all())
+        if not file_ids:
+            return []
+        result = await session.execute(select(UploadedFile).where(UploadedFile.id.in_(file_ids)))
+        return list(result.scalars().all())
+
+
+def _photo_schema(photo: UploadedFile, photo_size: photo_service.PhotoVariant) -> UploadedFileSchema:
+    return UploadedFileSchema(
+        id=photo.id,
+        file_name=photo.file_name,
+        file_url=photo_service.photo_url(photo, photo_size),
+        original_url=photo.file_url,
+        file_type=photo.file_type,
+        file_size=photo.file_size,
+        uploader_name=photo.uploader_name,
+        create_time=photo.create_time
+    )
+
+
+async def _build_detail(
+    prepare_goods: PrepareGoods,
+    photo_size: photo_service.PhotoVariant,
+    session_factory: SessionFactory
+) -> PrepareGoodsDetailResponse:
+    order_ids = parse_order_id_list(prepare_goods.order_ids)
+    order_serial_numbers, package_photos, action_photos = await asyncio.gather(
+        _order_serial_numbers(session_factory, order_ids),
+        _package_photos(session_factory, prepare_goods.id),
+        _action_photos(session_factory, order_ids, photo_action_types(prepare_goods.type))
+    )
+
+    return PrepareGoodsDetailResponse(
+        id=prepare_goods.id,
+        prepare_sn=prepare_goods.prepare_sn,
+        order_ids=prepare_goods.order_ids,
+        delivery_type=prepare_goods.delivery_type,
+        shipping_type=prepare_goods.shipping_type,
+        prepare_status=prepare_goods.prepare_status,
+        shop_id=prepare_goods.shop_id,
+        warehouse_id=prepare_goods.warehouse_id,
+        driver_id=prepare_goods.driver_id,
+        create_time=prepare_goods.create_time,
+        update_time=prepare_goods.update_time,
+        items=[
+            PrepareGoodsItemSchema(
+                prepare_id=item.prepare_id,
+                order_item_id=item.order_item_id,
+                product_id=item.product_id,
+                sku_id=item.sku_id,
+                quantity=item.quantity
+            )
+            for item in prepare_goods.items
+        ],
+        warehouse_name=prepare_goods.warehouse.name if prepare_goods.warehouse else None,
+        driver_name=prepare_goods.driver.name if prepare_goods.driver else None,
+        receiver_address=prepare_goods.receiver_address,
+        total_value=float(prepare_goods.total_value) if prepare_goods.total_value else None,
+        order_serial_numbers=order_serial_numbers,
+        # prepare_good photos first, then action photos
+        pickup_photos=[_photo_schema(photo, photo_size) for photo in [*package_photos, *action_photos]]
+    )
+
+
+async def assemble_package_detail(
+    session: AsyncSession,
+    prepare_sn: str,
+    photo_size: photo_service.PhotoVariant = photo_service.DEFAULT_PHOTO_VARIANT,
+    session_factory: SessionFactory = AsyncSessionLocal
+) -> Optional[PrepareGoodsDetailResponse]:
+    """
+    Build a package detail from MySQL (no cache).
+
+    Args:
+        session: Database session (package and items)
+        prepare_sn: Prepare goods serial number
+        photo_size: Photo variant returned as fileUrl
+        session_factory: Opens the sessions used for the concurrent queries
+
+    Returns:
+        PrepareGoodsDetailResponse, or None if the package does not exist
+    """
+    prepare_goods = await _load_package(session, prepare_sn)
+    if not prepare_goods:
+        return None
+    return await _build_detail(prepare_goods, photo_size, session_factory)
+
+
+async def _cache_version(prepare_sn: str) -> str | None:
+    try:
+        return await cache.get_package_detail_version(prepare_sn)
+    except Exception:  # noqa: BLE001
+        logger.warning("Package detail cache unavailable", exc_info=True)
+        return None
+
+
+async def _register_refs(prepare_goods: PrepareGoods) -> bool:
+    try:
+        await cache.register_package_detail_refs(
+            prepare_goods.prepare_sn,
+            prepare_goods.id,
+            parse_order_id_list(prepare_goods.order_ids),
+            ttl_seconds=_settings.package_detail_cache_ttl_seconds
+        )
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to index package detail %s", prepare_goods.prepare_sn, exc_info=True)
+        return False
+    return True
+
+
+async def get_package_detail(
+    session: AsyncSession,
+    prepare_sn: str,
+    photo_size: photo_service.PhotoVariant = photo_service.DEFAULT_PHOTO_VARIANT,
+    session_factory: SessionFactory = AsyncSessionLocal
+) -> Optional[PrepareGoodsDetailResponse]:
+    """
+    Get a package detail, from Redis when cached.
+
+    Args:
+        session: Database session, only used on a cache miss
+        prepare_sn: Prepare goods serial number
+        photo_size: Photo variant returned as fileUrl
+        session_factory: Opens the sessions used for the concurrent queries
+
+    Returns:
+        PrepareGoodsDetailResponse, or None if the package does not exist
+    """
+    try:
+        cached = await cache.get_package_detail(prepare_sn, photo_size)
+    except Exception:  # noqa: BLE001
+        logger.warning("Package detail cache unavailable", exc_info=True)
+        cached = None
+    if cached is not None:
+        return PrepareGoodsDetailResponse.model_validate(cached)
+
+    # Read before MySQL: an invalidation from here on changes the version
+    version = await _cache_version(prepare_sn)
+    prepare_goods = await _load_package(session, prepare_sn)
+    if not prepare_goods:
+        return None
+    # Invalidations by package or order id find the prepare_sn through these
+    # refs; the orders and photos are read after they exist
+    if version is not None and not await _register_refs(prepare_goods):
+        version = None
+    detail = await _build_detail(prepare_goods, photo_size, session_factory)
+    if version is None:
+        return detail
+
+    try:
+        stored = await cache.store_package_detail(
+            prepare_sn,
+            photo_size,
+            detail.model_dump(mode="json"),
+            ttl_seconds=_settings.package_detail_cache_ttl_seconds,
+            version=version
+        )
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to cache package detail %s", prepare_sn, exc_info=True)
+    else:
+        if not stored:
+            logger.debug("Package detail %s invalidated while assembled, not cached", prepare_sn)
+    return detail
+
+
+async def _invalidate(**keys: Any) -> None:
+    try:
+        await cache.invalidate_package_details(**keys)
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to invalidate package details %s", keys, exc_info=True)
+
+
+async def invalidate(prepare_sns: Sequence[str]) -> None:
+    """Drop cached details of packages (call after committing a package change)."""
+    await _invalidate(prepare_sns=list(prepare_sns))
+
+
+async def invalidate_packages(package_ids: Sequence[int]) -> None:
+    """Drop cached details of packages known by id (e.g. a package photo changed)."""
+    await _invalidate(package_ids=list(package_ids))
+
+
+async def invalidate_orders(order_ids: Sequence[int]) -> None:
+    """Drop cached details of every package containing the orders (e.g. an order action)."""
+    await _invalidate(order_ids=list(order_ids))
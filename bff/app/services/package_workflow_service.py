@@ -0,0 +1,281 @@
+"""
+Package Workflow Service
+
+Driver steps on a prepare package (claim, confirm pickup, confirm delivery)
+as transaction building blocks. None of them commits: the caller commits
+(one step for the REST endpoints, several steps of one package for the
+offline sync), then passes the returned PackageChange objects to
+announce_changes, which updates mark counts, driver events and the cached
+package detail, and queues the photo for processing.
+
+Errors are raised as HTTPException, like upload_service.attach_photo which
+these steps use.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.driver import Driver
+from app.models.prepare_goods import PrepareGoods
+from app.services import marks_service, photo_service, prepare_goods_service, upload_service
+from app.utils import parse_order_id_list
+
+
+@dataclass
+class PackageChange:
+    """A package update to announce once its transaction has committed."""
+
+    prepare_sn: str
+    before: Optional[Dict[str, Any]]
+    changes: Dict[str, Any]
+    photo_file_id: Optional[int] = None
+
+
+async def announce_changes(changes: Sequence[PackageChange]) -> None:
+    """Propagate committed package changes (see prepare_goods_service.announce_package_change)."""
+    for change in changes:
+        await prepare_goods_service.announce_package_change(change.prepare_sn, change.before, **change.changes)
+        if change.photo_file_id is not None:
+            await photo_service.schedule_processing(change.photo_file_id)
+
+
+async def raise_package_unavailable(session: AsyncSession, prepare_sn: str) -> None:
+    """Explain a failed conditional update: 404 if the package is gone, else 409."""
+    exists = await session.scalar(select(PrepareGoods.id).where(PrepareGoods.prepare_sn == prepare_sn))
+    if exists is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Prepare package not found: {prepare_sn}"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Package already taken: {prepare_sn}"
+    )
+
+
+async def claim(session: AsyncSession, prepare_sn: str, driver_id: int) -> PackageChange:
+    """
+    Claim an available package for a driver (status 0 -> 6).
+
+    Raises:
+        HTTPException 404: Package not found
+        HTTPException 409: Package already taken
+    """
+    before = await prepare_goods_service.reserve_package(session, prepare_sn, driver_id)
+    if before is None:
+        await raise_package_unavailable(session, prepare_sn)
+    return PackageChange(prepare_sn, before, {"driver_id": driver_id, "prepare_status": 6})
+
+
+async def _load(session: AsyncSession, prepare_sn: str, driver_id: int) -> tuple[Driver, PrepareGoods]:
+    # Load the driver row (name is recorded on the actions and upload)
+    driver = await session.get(Driver, driver_id)
+    if not driver:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Driver not found"
+        )
+
+    result = await session.execute(
+        select(PrepareGoods).where(PrepareGoods.prepare_sn == prepare_sn)
+    )
+    package = result.scalars().first()
+    if not package:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Package not found: {prepare_sn}"
+        )
+    return driver, package
+
+
+async def confirm_pickup(
+    session: AsyncSession,
+    prepare_sn: str,
+    driver_id: int,
+    photo_file_id: Optional[int] = None,
+    photo: Optional[str] = None
+) -> PackageChange:
+    """
+    Confirm the driver picked up a claimed package (status 6 -> 1).
+
+    1. Links the photo in tigu_uploaded_files (biz_type='prepare_good', biz_id=package.id);
+       either a file uploaded via POST /uploads/photos (photo_file_id) or the base64 photo
+    2. Updates the package's orders with one UPDATE and records their OrderAction
+       rows (action_type=1 - Driver Pickup, 12 for second-leg packages) with one
+       multi-row INSERT
+    3. Updates package status to 1 (Driver pickup in progress)
+
+    Raises:
+        HTTPException 404: Driver, package or uploaded file not found
+        HTTPException 400: Invalid photo or package status
+        HTTPException 409: Package held by another driver or confirmed concurrently,
+            or uploaded file already attached elsewhere
+    """
+    driver, package = await _load(session, prepare_sn, driver_id)
+
+    # Verify package is in correct status (should be 6 - Driver claimed)
+    if package.prepare_status != 6:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Package status must be 6 (Driver claimed), current: {package.prepare_status}"
+        )
+
+    # Move the package to 1 (Driver pickup in progress) only if it is still
+    # claimed by this driver; the row stays locked until the caller commits
+    before = marks_service.package_state(package)
+    if not await prepare_goods_service.transition_prepare_status(
+        session, prepare_sn, from_statuses=[6], new_status=1, driver_id=driver.id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Package is not claimed by you or was already confirmed: {prepare_sn}"
+        )
+
+    # Link the pre-uploaded photo, or save the base64 photo off the event loop
+    uploaded_file = await upload_service.attach_photo(
+        session,
+        uploader=driver,
+        biz_type="prepare_good",
+        biz_id=package.id,
+        stem=f"{prepare_sn}_{int(datetime.now().timestamp())}",
+        photo_file_id=photo_file_id,
+        photo=photo
+    )
+
+    # Determine action_type based on package type:
+    # type=0 (first leg from merchant): action_type=1 (司机收货 - 到商家收货)
+    # type=1 (second leg from warehouse - Workflow 5): action_type=12 (司机收货 - 到仓库收货)
+    pickup_action_type = 12 if package.type == 1 else 1
+
+    # Determine new shipping_status based on workflow (shipping_type from package)
+    # shipping_type=0 (Driver->User): shipping_status=4 (司机配送中)
+    # shipping_type=1 (Driver->Warehouse->User): shipping_status=2 (司机收货中)
+    if package.shipping_type == 0:
+        new_shipping_status = 4  # 司机配送中 - Driver delivering to user
+    else:
+        new_shipping_status = 2  # 司机收货中 - Driver picking up (going to warehouse)
+
+    # Update all orders of the package and record one OrderAction each
+    # (logistics_voucher_file holds the file ID, not the URL)
+    await prepare_goods_service.transition_package_orders(
+        session,
+        parse_order_id_list(package.order_ids),
+        values={
+            "shipping_status": new_shipping_status,
+            "driver_receive_time": datetime.now(),
+            "driver_id": driver.id
+        },
+        action_type=pickup_action_type,  # 1=司机收货(商家), 12=司机收货(仓库)
+        create_by=driver.name,
+        file_ids=[uploaded_file.id]
+    )
+
+    return PackageChange(prepare_sn, before, {"prepare_status": 1}, photo_file_id=uploaded_file.id)
+
+
+async def confirm_delivery(
+    session: AsyncSession,
+    prepare_sn: str,
+    driver_id: int,
+    photo_file_id: Optional[int] = None,
+    photo: Optional[str] = None
+) -> PackageChange:
+    """
+    Confirm the driver delivered a package in transit.
+
+    1. Links the photo in tigu_uploaded_files (biz_type='prepare_good', biz_id=package.id)
+    2. Updates the package's orders with one UPDATE and records their OrderAction
+       rows with one multi-row INSERT
+       - For warehouse delivery (shipping_type=1): action_type=11 - 司机送达仓库
+       - For user delivery (shipping_type=0): action_type=4 - 司机送达用户
+       - logistics_voucher_file contains the file ID from tigu_uploaded_files
+    3. Updates package status based on shipping type:
+       - shipping_type=1 (Workflow 3): prepare_status to 2 (司机送达仓库 - Driver delivered to warehouse)
+       - shipping_type=0 (Workflow 4): prepare_status to 7 (已送达 - Delivered to user, complete)
+    4. Sets actual_arrival_time and increments the driver's total_deliveries
+
+    Raises:
+        HTTPException 404: Driver, package or uploaded file not found
+        HTTPException 400: Invalid photo or package status
+        HTTPException 409: Package held by another driver or confirmed concurrently,
+            or uploaded file already attached elsewhere
+    """
+    driver, package = await _load(session, prepare_sn, driver_id)
+
+    # Verify package is in transit status (should be 1, 2, 4, or 5)
+    if package.prepare_status not in [1, 2, 4, 5]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Package status must be in transit (1, 2, 4, or 5), current: {package.prepare_status}"
+        )
+
+    # Determine action type and new status based on shipping type
+    if package.shipping_type == 1:
+        # To warehouse workflow (Workflow 3)
+        action_type = 11  # 司机送达仓库 - Driver arrives at warehouse (action_type=11)
+        new_status = 2  # 司机送达仓库 (Driver delivered to warehouse)
+        order_shipping_status = 3  # Update tigu_order.shipping_status to 3
+    else:
+        # To user workflow (Workflow 4)
+        action_type = 4  # 司机送达用户 - Driver delivers to user (action_type=4)
+        new_status = 7  # 已送达 - Delivered to user (Workflow 4 complete)
+        order_shipping_status = 5  # Update tigu_order.shipping_status to 5 (司机送达用户)
+
+    # Only the driver holding the package can deliver it, and only once;
+    # the row stays locked until the caller commits
+    before = marks_service.package_state(package)
+    if not await prepare_goods_service.transition_prepare_status(
+        session, prepare_sn, from_statuses=[1, 2, 4, 5], new_status=new_status, driver_id=driver.id
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Package is not held by you or was already delivered: {prepare_sn}"
+        )
+
+    # Link the pre-uploaded photo, or save the base64 photo off the event loop
+    uploaded_file = await upload_service.attach_photo(
+        session,
+        uploader=driver,
+        biz_type="prepare_good",
+        biz_id=package.id,
+        stem=f"{prepare_sn}_{int(datetime.now().timestamp())}",
+        photo_file_id=photo_file_id,
+        photo=photo
+    )
+
+    # Update tigu_order based on shipping type
+    if package.shipping_type == 1:
+        # Driver arrived at warehouse
+        order_values = {"shipping_status": order_shipping_status, "arrive_warehouse_time": datetime.now()}
+    else:
+        # Delivery completed to user
+        order_values = {
+            "shipping_status": order_shipping_status,
+            "finish_time": datetime.now(),
+            "order_status": 3  # Mark order as completed
+        }
+
+    # Update all orders of the package and record one OrderAction each
+    # Note: logistics_voucher_file should contain file ID from tigu_uploaded_files
+    await prepare_goods_service.transition_package_orders(
+        session,
+        parse_order_id_list(package.order_ids),
+        values=order_values,
+        action_type=action_type,
+        create_by=driver.name,
+        file_ids=[uploaded_file.id]
+    )
+
+    # Update actual_arrival_time for delivery completion
+    package.actual_arrival_time = datetime.now()
+
+    # Increment driver's total_deliveries counter
+    driver.total_deliveries = (driver.total_deliveries or 0) + 1
+
+    return PackageChange(prepare_sn, before, {"prepare_status": new_status}, photo_file_id=uploaded_file.id)
@@ -0,0 +1,202 @@
+"""
+Photo Processing Service
+
+Pickup and delivery photos are stored exactly as uploaded: full-size phone
+images with EXIF (GPS position, device details). This service derives the
+versions that are actually served:
+
+- display: longest side PHOTO_DISPLAY_MAX_PX, recompressed JPEG
+- thumbnail: longest side PHOTO_THUMBNAIL_MAX_PX, recompressed JPEG
+
+EXIF is stripped from the variants and from the original. Variants are
+written to the photo store next to the original, recorded in
+UploadedFile.extra_info["variants"] and served by the detail endpoints
+(thumbnail by default).
+
+Pillow work is CPU bound, so it runs in a process pool rather than on the
+event loop. Upload sites queue the file id (schedule_processing) after
+committing; app.workers.photo_processing_worker drains the queue.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Literal, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.order import UploadedFile
+from app.models.order_action import OrderAction
+from app.services import cache, photo_storage
+from app.utils import render_variants
+
+logger = logging.getLogger(__name__)
+
+# Variants served by the detail endpoints; "original" is the uploaded file
+PhotoVariant = Literal["thumbnail", "display", "original"]
+DEFAULT_PHOTO_VARIANT: PhotoVariant = "thumbnail"
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: forking a process that runs an event loop and thread pools is unsafe
+        _executor = ProcessPoolExecutor(
+            max_workers=get_settings().photo_processing_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_photo_executor() -> None:
+    """Release the photo process pool (called on application shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def photo_url(uploaded_file: UploadedFile, variant: PhotoVariant = DEFAULT_PHOTO_VARIANT) -> str:
+    """
+    Return the URL of a photo variant.
+
+    Falls back to the original while the photo has not been processed yet,
+    and for files stored elsewhere (e.g. uploaded by the merchant system).
+    """
+    variants = (uploaded_file.extra_info or {}).get("variants") or {}
+    return (variants.get(variant) or {}).get("url") or uploaded_file.file_url
+
+
+async def schedule_processing(file_id: int) -> None:
+    """Queue an uploaded file for processing; failures are logged, not raised."""
+    try:
+        await cache.push_photo_job(file_id)
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to queue photo %s for processing", file_id, exc_info=True)
+
+
+async def _render(
+    store: photo_storage.PhotoStore,
+    key: str,
+    metadata_key: str,
+    content_type: str
+) -> Optional[Dict[str, Any]]:
+    """Render the variants of a stored photo and store them next to it."""
+    settings = get_settings()
+    sizes = {
+        "display": settings.photo_display_max_px,
+        "thumbnail": settings.photo_thumbnail_max_px,
+    }
+    async with photo_storage.local_copy(key, store) as source:
+        if source is None:
+            return None
+
+        loop = asyncio.get_running_loop()
+        try:
+            rendered = await loop.run_in_executor(
+                _get_executor(), render_variants, str(source), sizes, settings.photo_jpeg_quality
+            )
+        except BrokenProcessPool:
+            # A worker process died; start a fresh pool for the next photo
+            shutdown_photo_executor()
+            raise
+
+        original = rendered.pop("original")
+        await store.put(key, Path(original["path"]), content_type)
+        variants: Dict[str, Dict[str, Any]] = {}
+        for name, info in rendered.items():
+            variant_key = photo_storage.derived_key(key, f"{name}.jpeg")
+            await store.put(variant_key, Path(info["path"]), "image/jpeg")
+            variants[name] = {
+                "url": store.url(variant_key),
+                "width": info["width"],
+                "height": info["height"],
+                "size": info["size"],
+            }
+
+        metadata = {
+            "variants": variants,
+            "width": original["width"],
+            "height": original["height"],
+            "size": original["size"],
+        }
+        sidecar = source.with_name(posixpath.basename(metadata_key))
+        await asyncio.to_thread(sidecar.write_text, json.dumps(metadata))
+        await store.put(metadata_key, sidecar, "application/json")
+    return metadata
+
+
+async def _invalidate_package_details(session: AsyncSession, uploaded_file: UploadedFile) -> None:
+    # Cached package details hold this photo's URLs (see package_detail_service,
+    # which imports this module, hence the direct cache calls)
+    if uploaded_file.biz_id is None or uploaded_file.biz_type not in ("prepare_good", "order_action"):
+        return
+    try:
+        if uploaded_file.biz_type == "prepare_good":
+            await cache.invalidate_package_details(package_ids=[uploaded_file.biz_id])
+        else:
+            order_id = await session.scalar(
+                select(OrderAction.order_id).where(OrderAction.id == uploaded_file.biz_id)
+            )
+            if order_id is not None:
+                await cache.invalidate_package_details(order_ids=[order_id])
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to invalidate package details for file %s", uploaded_file.id, exc_info=True)
+
+
+async def process_uploaded_file(session: AsyncSession, file_id: int) -> bool:
+    """
+    Render the display and thumbnail variants of an uploaded photo.
+
+    Args:
+        session: Database session
+        file_id: UploadedFile id
+
+    Returns:
+        True if variants were recorded; False if the file is missing, held
+        outside the photo store or already processed
+    """
+    result = await session.execute(select(UploadedFile).where(UploadedFile.id == file_id))
+    uploaded_file = result.scalars().first()
+    if not uploaded_file or (uploaded_file.extra_info or {}).get("variants"):
+        return False
+
+    store = photo_storage.get_photo_store()
+    key = store.key_for_url(uploaded_file.file_url)
+    if key is None:
+        return False
+
+    # Photos are stored by content hash, so the same bytes may back several
+    # uploads; the sidecar lets later uploads reuse the rendered variants
+    metadata_key = photo_storage.derived_key(key, "variants.json")
+    cached = await store.read(metadata_key)
+    if cached:
+        metadata = json.loads(cached)
+    else:
+        metadata = await _render(store, key, metadata_key, uploaded_file.file_type)
+        if metadata is None:
+            return False
+
+    # Reassign (not mutate) so the JSON column is flagged as changed
+    uploaded_file.extra_info = {
+        **(uploaded_file.extra_info or {}),
+        "variants": metadata["variants"],
+        "width": metadata["width"],
+        "height": metadata["height"],
+        "exif_stripped": True,
+    }
+    uploaded_file.file_size = metadata["size"]
+    await session.commit()
+    await _invalidate_package_details(session, uploaded_file)
+    return True
+
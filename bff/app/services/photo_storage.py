@@ -0,0 +1,394 @@
+"""
+Photo Storage
+
+Content-addressed storage for uploaded photos. Every file is stored under
+the SHA-256 of its uploaded bytes, so uploading the same photo twice (e.g. a
+retried request) stores it once, and two uploads can never overwrite each
+other. Keys are sharded on the first two hex byte pairs of the hash:
+
+    ab/cd/abcdef0123....jpeg
+
+so no directory or prefix holds more than a small fraction of the files.
+Derived files (photo variants) are stored next to their source with the
+same stem, e.g. ab/cd/abcdef0123....thumbnail.jpeg.
+
+Backends:
+- LocalPhotoStore: directory served by nginx (default)
+- S3PhotoStore: any S3-compatible object store (AWS S3, MinIO, R2), spoken
+  to directly over HTTP with SigV4 request signing
+
+Selected by PHOTO_STORAGE_BACKEND; replaceable through set_photo_store.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import os
+import posixpath
+import shutil
+import tempfile
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional, Protocol
+from urllib.parse import quote, urlsplit
+
+import httpx
+
+from app.core.config import get_settings
+
+# Hex characters per shard level, and number of levels
+_SHARD_WIDTH = 2
+_SHARD_DEPTH = 2
+
+
+@dataclass
+class StoredObject:
+    """File written to (or found in) the photo store"""
+    key: str
+    url: str
+    size: int
+    sha256: str
+    deduplicated: bool
+
+
+def content_key(sha256: str, extension: str) -> str:
+    """Return the sharded key of a file with the given hash."""
+    shards = [sha256[level * _SHARD_WIDTH:(level + 1) * _SHARD_WIDTH] for level in range(_SHARD_DEPTH)]
+    return posixpath.join(*shards, f"{sha256}.{extension}")
+
+
+def derived_key(key: str, name: str) -> str:
+    """Return the key of a file derived from key, e.g. its thumbnail."""
+    directory, filename = posixpath.split(key)
+    stem = filename.split('.', 1)[0]
+    return posixpath.join(directory, f"{stem}.{name}")
+
+
+class PhotoStore(Protocol):
+    """Backend holding photo files by key."""
+
+    # Local directory for files being assembled before put()
+    staging_dir: Path
+
+    async def exists(self, key: str) -> bool: ...
+
+    async def put(self, key: str, source: Path, content_type: str) -> None:
+        """Store a local file under key, taking ownership of (moving or deleting) source."""
+        ...
+
+    async def read(self, key: str) -> Optional[bytes]:
+        """Return the stored bytes, or None if key does not exist."""
+        ...
+
+    async def fetch(self, key: str, destination: Path) -> bool:
+        """Copy the stored file to a local path; False if key does not exist."""
+        ...
+
+    def url(self, key: str) -> str: ...
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        """Inverse of url(); None for URLs outside this store."""
+        ...
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Path of the stored file if the backend is a local filesystem."""
+        ...
+
+    async def close(self) -> None: ...
+
+
+class LocalPhotoStore:
+    """Photos in a local directory, served under public_url by nginx."""
+
+    def __init__(self, root: Path, public_url: str) -> None:
+        self.root = Path(root)
+        self.public_url = public_url.rstrip('/')
+        self.staging_dir = self.root / ".staging"
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return self.root / key
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread((self.root / key).exists)
+
+    async def put(self, key: str, source: Path, content_type: str) -> None:
+        target = self.root / key
+        if Path(source) == target:
+            return
+
+        def move() -> None:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.chmod(source, 0o644)
+            os.replace(source, target)
+
+        await asyncio.to_thread(move)
+
+    async def read(self, key: str) -> Optional[bytes]:
+        path = self.root / key
+        try:
+            return await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            return None
+
+    async def fetch(self, key: str, destination: Path) -> bool:
+        try:
+            await asyncio.to_thread(shutil.copyfile, self.root / key, destination)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        prefix = f"{self.public_url}/"
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+    async def close(self) -> None:
+        return None
+
+
+class S3PhotoStore:
+    """
+    Photos in an S3-compatible bucket (path-style addressing, SigV4).
+
+    Args:
+        endpoint_url: e.g. https://s3.us-east-1.amazonaws.com or http://minio:9000
+        bucket: Bucket name
+        access_key / secret_key: Credentials
+        region: Signing region
+        public_url: Base URL clients load photos from (default endpoint_url/bucket)
+        transport: Optional httpx transport (e.g. a local stand-in for tests)
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        public_url: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ) -> None:
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.bucket = bucket
+        self.region = region
+        self.public_url = (public_url or f"{self.endpoint_url}/{bucket}").rstrip('/')
+        self.staging_dir = Path(tempfile.gettempdir()) / "photo-staging"
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._host = urlsplit(self.endpoint_url).netloc
+        self._client = httpx.AsyncClient(base_url=self.endpoint_url, transport=transport, timeout=30.0)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return None
+
+    def _signed_headers(self, method: str, path: str, payload_hash: str, headers: Optional[dict] = None) -> dict:
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        headers = {
+            **{name.lower(): value for name, value in (headers or {}).items()},
+            "host": self._host,
+            "x-amz-date": amz_date,
+            "x-amz-content-sha256": payload_hash,
+        }
+        signed_names = sorted(headers)
+        canonical_request = "\n".join([
+            method,
+            path,
+            "",
+            "".join(f"{name}:{str(headers[name]).strip()}\n" for name in signed_names),
+            ";".join(signed_names),
+            payload_hash,
+        ])
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        signing_key = f"AWS4{self._secret_key}".encode()
+        for part in (date, self.region, "s3", "aws4_request"):
+            signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(signing_key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self._access_key}/{scope}, "
+            f"SignedHeaders={';'.join(signed_names)}, Signature={signature}"
+        )
+        del headers["host"]  # set by httpx
+        return headers
+
+    async def _request(self, method: str, key: str, content: bytes = b"", headers: Optional[dict] = None) -> httpx.Response:
+        path = quote(f"/{self.bucket}/{key}", safe="/-_.~")
+        payload_hash = hashlib.sha256(content).hexdigest()
+        return await self._client.request(
+            method, path, content=content or None,
+            headers=self._signed_headers(method, path, payload_hash, headers)
+        )
+
+    async def exists(self, key: str) -> bool:
+        response = await self._request("HEAD", key)
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def put(self, key: str, source: Path, content_type: str) -> None:
+        data = await asyncio.to_thread(Path(source).read_bytes)
+        response = await self._request("PUT", key, data, {"content-type": content_type})
+        response.raise_for_status()
+        await asyncio.to_thread(Path(source).unlink, True)
+
+    async def read(self, key: str) -> Optional[bytes]:
+        response = await self._request("GET", key)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.content
+
+    async def fetch(self, key: str, destination: Path) -> bool:
+        data = await self.read(key)
+        if data is None:
+            return False
+        await asyncio.to_thread(Path(destination).write_bytes, data)
+        return True
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    def key_for_url(self, url: str) -> Optional[str]:
+        prefix = f"{self.public_url}/"
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_store: Optional[PhotoStore] = None
+
+
+def get_photo_store() -> PhotoStore:
+    """Return the configured photo store (PHOTO_STORAGE_BACKEND)."""
+    global _store
+    if _store is None:
+        settings = get_settings()
+        if settings.photo_storage_backend == "s3":
+            _store = S3PhotoStore(
+                endpoint_url=settings.s3_endpoint_url,
+                bucket=settings.s3_bucket,
+                access_key=settings.s3_access_key,
+                secret_key=settings.s3_secret_key,
+                region=settings.s3_region,
+                public_url=settings.s3_public_url
+            )
+        else:
+            _store = LocalPhotoStore(Path(settings.photo_storage_root), settings.photo_storage_public_url)
+    return _store
+
+
+def set_photo_store(store: Optional[PhotoStore]) -> None:
+    """Replace the photo store (None restores the configured default)."""
+    global _store
+    _store = store
+
+
+async def close_photo_store() -> None:
+    """Release backend connections (called on application shutdown)."""
+    if _store is not None:
+        await _store.close()
+
+
+def _open_staging(directory: Path) -> tuple[Path, BinaryIO]:
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{uuid.uuid4().hex}.part"
+    return path, open(path, 'wb')
+
+
+class StagedFile:
+    """
+    Local file assembled chunk by chunk before it is stored.
+
+    Writes and hashing run in a worker thread. Call commit() to move the file
+    into the store under its content key, or discard() to drop it.
+    """
+
+    def __init__(self, store: PhotoStore, path: Path, handle: BinaryIO) -> None:
+        self._store = store
+        self._path = path
+        self._handle = handle
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    @classmethod
+    async def open(cls, store: Optional[PhotoStore] = None) -> "StagedFile":
+        store = store or get_photo_store()
+        path, handle = await asyncio.to_thread(_open_staging, store.staging_dir)
+        return cls(store, path, handle)
+
+    def _write(self, chunk: bytes) -> None:
+        self._handle.write(chunk)
+        self._hash.update(chunk)
+
+    async def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        await asyncio.to_thread(self._write, chunk)
+
+    async def commit(self, extension: str, content_type: str) -> StoredObject:
+        """Store the file by content hash; a file with the same bytes is reused."""
+        await asyncio.to_thread(self._handle.close)
+        digest = self._hash.hexdigest()
+        key = content_key(digest, extension)
+        deduplicated = await self._store.exists(key)
+        if deduplicated:
+            await asyncio.to_thread(self._path.unlink, True)
+        else:
+            await self._store.put(key, self._path, content_type)
+        return StoredObject(key=key, url=self._store.url(key), size=self.size, sha256=digest, deduplicated=deduplicated)
+
+    async def discard(self) -> None:
+        def drop() -> None:
+            self._handle.close()
+            self._path.unlink(missing_ok=True)
+
+        await asyncio.shield(asyncio.to_thread(drop))
+
+
+async def store_bytes(data: bytes, extension: str, content_type: str, store: Optional[PhotoStore] = None) -> StoredObject:
+    """Store an in-memory file by content hash."""
+    staged = await StagedFile.open(store)
+    try:
+        await staged.write(data)
+        return await staged.commit(extension, content_type)
+    except BaseException:
+        await staged.discard()
+        raise
+
+
+@contextlib.asynccontextmanager
+async def local_copy(key: str, store: Optional[PhotoStore] = None) -> AsyncIterator[Optional[Path]]:
+    """
+    Yield a local path holding the stored file, or None if it does not exist.
+
+    Local stores yield the stored file itself; other backends download it to
+    a temporary directory that is removed afterwards.
+    """
+    store = store or get_photo_store()
+    path = store.local_path(key)
+    if path is not None:
+        yield path if await asyncio.to_thread(path.exists) else None
+        return
+
+    await asyncio.to_thread(store.staging_dir.mkdir, parents=True, exist_ok=True)
+    directory = Path(await asyncio.to_thread(tempfile.mkdtemp, dir=store.staging_dir))
+    try:
+        destination = directory / posixpath.basename(key)
+        yield destination if await store.fetch(key, destination) else None
+    finally:
+        await asyncio.to_thread(shutil.rmtree, directory, True)
@@ -6,20 +6,65 @@ Handles merchant preparation workflow including:
 - Updating prepare status
 - Querying prepare goods information
 - Managing the relationship between orders and prepare packages
+  (tigu_prepare_goods_order mapping, kept in sync with PrepareGoods.order_ids)
 
 This service owns the delivery_type configuration (single source of truth).
 """
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, List, Sequence
 
-from sqlalchemy import or_, select, update
+from sqlalchemy import ColumnElement, Select, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.models.order import Order, OrderItem
-from app.models.prepare_goods import PrepareGoods, PrepareGoodsItem
+from app.models.prepare_goods import PrepareGoods, PrepareGoodsItem, PrepareGoodsOrder
+from app.services import event_service, marks_service, order_action_service, package_detail_service, search_service
+from app.utils.pagination import PageCursor, apply_keyset
+
+
+async def link_orders_to_package(
+    session: AsyncSession,
+    prepare_id: int,
+    order_ids: List[int]
+) -> None:
+    """
+    Write order → package mapping rows for a prepare package.
+
+    Mirrors PrepareGoods.order_ids into the indexed tigu_prepare_goods_order
+    table. Does not commit; callers own the transaction.
+
+    Args:
+        session: Database session
+        prepare_id: PrepareGoods ID
+        order_ids: Order IDs contained in the package
+    """
+    unique_ids = list(dict.fromkeys(order_ids))
+    if not unique_ids:
+        return
+
+    now = datetime.now()
+    await session.execute(
+        insert(PrepareGoodsOrder),
+        [
+            {"prepare_id": prepare_id, "order_id": order_id, "create_time": now}
+            for order_id in unique_ids
+        ]
+    )
+
+
+def select_package_ids_for_order(order_id: int) -> Select:
+    """
+    Build an indexed subquery of prepare package IDs containing an order.
+
+    Usage:
+        stmt = select(PrepareGoods).where(
+            PrepareGoods.id.in_(select_package_ids_for_order(order_id))
+        )
+    """
+    return select(PrepareGoodsOrder.prepare_id).where(PrepareGoodsOrder.order_id == order_id)
 
 
 async def create_prepare_package(
@@ -57,7 +102,8 @@ async def create_prepare_package(
         3. Create PrepareGoods record (sets delivery_type)
         4. Fetch order items
         5. Create PrepareGoodsItem records
-        6. Commit transaction
+        6. Write order → package mapping rows and search documents
+        7. Commit transaction
     """
     # Validation
     if shipping_type == 1 and warehouse_id is None:
@@ -112,6 +158,10 @@ async def create_prepare_package(
             )
             session.add(prepare_item)
 
+    await link_orders_to_package(session, prepare_goods.id, order_ids)
+    # The package has no receiver fields of its own; it is found through its orders
+    await search_service.index_orders(session, orders)
+
     await session.commit()
 
     # Refresh to get relationships loaded
@@ -146,6 +196,8 @@ async def update_prepare_status(
     Returns:
         True if update successful, False if prepare_sn not found
     """
+    before = await marks_service.load_package_state(session, prepare_sn)
+
     stmt = (
         update(PrepareGoods)
         .where(PrepareGoods.prepare_sn == prepare_sn)
@@ -154,9 +206,196 @@ async def update_prepare_status(
     result = await session.execute(stmt)
     await session.commit()
 
+    if result.rowcount > 0:
+        await announce_package_change(prepare_sn, before, prepare_status=new_status)
+
+    return result.rowcount > 0
+
+
+async def announce_package_change(
+    prepare_sn: str,
+    before: Dict[str, Any] | None,
+    **changes: Any
+) -> None:
+    """
+    Propagate a committed package update: mark counts, driver events and
+    the cached package detail.
+
+    Args:
+        prepare_sn: Prepare goods serial number
+        before: Package state captured before the update (marks_service.package_state)
+        **changes: Column values written by the update (e.g. prepare_status=6)
+    """
+    await marks_service.record_package_change(before, **changes)
+    await event_service.publish_package_change(prepare_sn, before, **changes)
+    await package_detail_service.invalidate([prepare_sn])
+
+
+def claimable_condition() -> ColumnElement[bool]:
+    """Packages in the driver pickup pool (see get_available_packages)."""
+    return (
+        PrepareGoods.driver_id.is_(None)
+        & (PrepareGoods.prepare_status == 0)
+        & (PrepareGoods.delivery_type == 1)
+    )
+
+
+async def reserve_package(
+    session: AsyncSession,
+    prepare_sn: str,
+    driver_id: int
+) -> Dict[str, Any] | None:
+    """
+    Run the claim UPDATE of claim_package without committing.
+
+    Args:
+        session: Database session
+        prepare_sn: Prepare goods serial number
+        driver_id: Claiming driver ID
+
+    Returns:
+        Package state before the claim (for announce_package_change once
+        committed), or None if the package does not exist or was no longer
+        available
+    """
+    before = await marks_service.load_package_state(session, prepare_sn)
+    if before is None:
+        return None
+
+    result = await session.execute(
+        update(PrepareGoods)
+        .where(PrepareGoods.prepare_sn == prepare_sn)
+        .where(claimable_condition())
+        .values(driver_id=driver_id, prepare_status=6, update_time=datetime.now())
+    )
+    if result.rowcount == 0:
+        return None
+
+    # The UPDATE only matched the unclaimed state, whatever the snapshot read
+    return {**before, "driver_id": None, "prepare_status": 0}
+
+
+async def claim_package(
+    session: AsyncSession,
+    prepare_sn: str,
+    driver_id: int
+) -> bool:
+    """
+    Atomically claim an available package for a driver (status 0 -> 6).
+
+    A single conditional UPDATE (WHERE prepare_status=0 AND driver_id IS NULL)
+    decides the winner: concurrent claims serialize on the row lock and every
+    claim after the first matches zero rows. No lock is held across reads.
+
+    Args:
+        session: Database session
+        prepare_sn: Prepare goods serial number
+        driver_id: Claiming driver ID
+
+    Returns:
+        True if this driver claimed the package; False if it does not exist
+        or was no longer available
+    """
+    before = await reserve_package(session, prepare_sn, driver_id)
+    await session.commit()
+
+    if before is None:
+        return False
+
+    await announce_package_change(prepare_sn, before, driver_id=driver_id, prepare_status=6)
+    return True
+
+
+async def transition_prepare_status(
+    session: AsyncSession,
+    prepare_sn: str,
+    from_statuses: Sequence[int],
+    new_status: int,
+    driver_id: int | None = None
+) -> bool:
+    """
+    Compare-and-set a package status inside the caller's transaction.
+
+    The UPDATE only matches while the package is still in one of
+    from_statuses (and, if given, held by driver_id), so of two concurrent
+    confirmations exactly one succeeds. Does not commit; call
+    announce_package_change after committing.
+
+    Args:
+        session: Database session
+        prepare_sn: Prepare goods serial number
+        from_statuses: Statuses the package must currently have
+        new_status: Status to set
+        driver_id: Driver who must hold the package
+
+    Returns:
+        True if the status was changed
+    """
+    stmt = (
+        update(PrepareGoods)
+        .where(PrepareGoods.prepare_sn == prepare_sn)
+        .where(PrepareGoods.prepare_status.in_(list(from_statuses)))
+        .values(prepare_status=new_status, update_time=datetime.now())
+    )
+    if driver_id is not None:
+        stmt = stmt.where(PrepareGoods.driver_id == driver_id)
+    result = await session.execute(stmt)
     return result.rowcount > 0
 
 
+async def transition_package_orders(
+    session: AsyncSession,
+    order_ids: Sequence[int],
+    values: Dict[str, Any],
+    action_type: int,
+    create_by: str,
+    file_ids: List[int] | None = None
+) -> int:
+    """
+    Move every order of a package in three statements. Does not commit.
+
+    One SELECT of the columns the actions snapshot, one
+    UPDATE tigu_order ... WHERE id IN (...) and one multi-row INSERT of the
+    actions, however many orders the package consolidates.
+
+    Args:
+        session: Database session
+        order_ids: IDs of the package's orders
+        values: Order columns to set; must include shipping_status
+        action_type: Action type recorded for each order
+        create_by: Creator recorded on the actions
+        file_ids: UploadedFile IDs of the photo evidence
+
+    Returns:
+        Number of orders transitioned
+    """
+    if not order_ids:
+        return 0
+
+    result = await session.execute(
+        select(Order.id, Order.order_status, Order.shipping_type).where(Order.id.in_(order_ids))
+    )
+    orders = result.all()
+    if not orders:
+        return 0
+
+    await session.execute(
+        update(Order)
+        .where(Order.id.in_([order.id for order in orders]))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await order_action_service.add_order_actions(
+        session,
+        orders,
+        action_type=action_type,
+        shipping_status=values["shipping_status"],
+        create_by=create_by,
+        file_ids=file_ids
+    )
+    return len(orders)
+
+
 async def get_prepare_package(
     session: AsyncSession,
     prepare_sn: str
@@ -205,17 +444,18 @@ async def get_prepare_package_by_order_id(
         None if order not yet prepared
 
     Note:
-        Uses LIKE query on order_ids CSV field.
-        For better performance, consider adding fulltext index on order_ids.
+        Uses the indexed tigu_prepare_goods_order mapping (equality join).
     """
     stmt = (
         select(PrepareGoods)
+        .join(PrepareGoodsOrder, PrepareGoodsOrder.prepare_id == PrepareGoods.id)
         .options(
             selectinload(PrepareGoods.warehouse),
             selectinload(PrepareGoods.driver),
             selectinload(PrepareGoods.shop)
         )
-        .where(PrepareGoods.order_ids.like(f"%{order_id}%"))
+        .where(PrepareGoodsOrder.order_id == order_id)
+        .order_by(PrepareGoods.id)
     )
     result = await session.execute(stmt)
     return result.scalars().first()
@@ -225,16 +465,18 @@ async def get_shop_prepare_packages(
     session: AsyncSession,
     shop_id: int,
     status: int | None = None,
-    limit: int = 50
+    limit: int = 50,
+    after: PageCursor | None = None
 ) -> List[PrepareGoods]:
     """
-    Get prepare packages for a merchant shop.
+    Get prepare packages for a merchant shop, newest first.
 
     Args:
         session: Database session
         shop_id: Merchant shop ID
         status: Filter by prepare_status (None = all statuses)
         limit: Maximum number of records to return
+        after: Keyset cursor of the previous page
 
     Returns:
         List of PrepareGoods instances
@@ -248,9 +490,9 @@ async def get_shop_prepare_packages(
             selectinload(PrepareGoods.shop)
         )
         .where(PrepareGoods.shop_id == shop_id)
-        .order_by(PrepareGoods.create_time.desc())
         .limit(limit)
     )
+    stmt = apply_keyset(stmt, PrepareGoods.create_time, PrepareGoods.id, after)
 
     if status is not None:
         stmt = stmt.where(PrepareGoods.prepare_status == status)
@@ -275,19 +517,29 @@ async def assign_driver_to_prepare(
         driver_id: Driver ID to assign
 
     Returns:
-        True if assignment successful, False if prepare_sn not found
+        True if assignment successful, False if prepare_sn not found or the
+        package is held by another driver or already picked up
 
     Note:
         Does not validate if delivery_type=1. Caller should check.
     """
+    before = await marks_service.load_package_state(session, prepare_sn)
+
+    # Conditional UPDATE: never take a package from another driver, and only
+    # before pickup (pending, prepared or claimed)
     stmt = (
         update(PrepareGoods)
         .where(PrepareGoods.prepare_sn == prepare_sn)
+        .where(or_(PrepareGoods.driver_id.is_(None), PrepareGoods.driver_id == driver_id))
+        .where(or_(PrepareGoods.prepare_status.is_(None), PrepareGoods.prepare_status.in_([0, 6])))
         .values(driver_id=driver_id, update_time=datetime.now())
     )
     result = await session.execute(stmt)
     await session.commit()
 
+    if result.rowcount > 0:
+        await announce_package_change(prepare_sn, before, driver_id=driver_id)
+
     return result.rowcount > 0
 
 
@@ -328,7 +580,8 @@ async def get_driver_assigned_packages(
 
 async def get_available_packages(
     session: AsyncSession,
-    limit: int = 50
+    limit: int = 50,
+    after: PageCursor | None = None
 ) -> List[PrepareGoods]:
     """
     Get available packages that are ready for driver pickup.
@@ -348,9 +601,10 @@ async def get_available_packages(
     Args:
         session: Database session
         limit: Maximum number of records
+        after: Keyset cursor of the previous page
 
     Returns:
-        List of PrepareGoods instances available for pickup
+        List of PrepareGoods instances available for pickup, newest first
     """
     # Case 1: First leg - Packages ready for pickup from merchant (type=0 or NULL, prepare_status=0, no driver)
     merchant_pickup_condition = (
@@ -377,9 +631,9 @@ async def get_available_packages(
             selectinload(PrepareGoods.shop)
         )
         .where(or_(merchant_pickup_condition, warehouse_to_user_condition))
-        .order_by(PrepareGoods.create_time.desc())
         .limit(limit)
     )
+    stmt = apply_keyset(stmt, PrepareGoods.create_time, PrepareGoods.id, after)
 
     result = await session.execute(stmt)
     return list(result.scalars().unique().all())
@@ -454,7 +708,10 @@ async def get_order_delivery_type(
     """
     stmt = (
         select(PrepareGoods.delivery_type)
-        .where(PrepareGoods.order_ids.like(f"%{order_id}%"))
+        .join(PrepareGoodsOrder, PrepareGoodsOrder.prepare_id == PrepareGoods.id)
+        .where(PrepareGoodsOrder.order_id == order_id)
+        .order_by(PrepareGoods.id)
+        .limit(1)
     )
     result = await session.execute(stmt)
     return result.scalar_one_or_none()
@@ -0,0 +1,177 @@
+"""
+Principal Service
+
+Resolves the caller of an authenticated request without querying MySQL on
+every request. A Principal is the sys_user row plus the linked tigu_driver
+id (sys_user.phonenumber = tigu_driver.phone): everything the auth
+dependencies and driver routes need to know about the caller.
+
+Lookups go through two cache levels:
+1. Per-process TTL cache (PRINCIPAL_LOCAL_TTL_SECONDS)
+2. Redis, shared by all workers (PRINCIPAL_CACHE_TTL_SECONDS)
+and only fall back to MySQL (one joined query) on a miss in both.
+
+Anything that changes a user's status, role, phone or driver link must call
+invalidate() after committing. It deletes the Redis entries and broadcasts
+the user ids so every worker evicts its local copy
+(app.workers.principal_invalidation_listener).
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.driver import Driver
+from app.models.user import User
+from app.services import cache
+from app.utils import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_settings = get_settings()
+
+_local_cache: TTLCache[int, "Principal"] = TTLCache(
+    maxsize=_settings.principal_local_cache_size,
+    ttl_seconds=_settings.principal_local_ttl_seconds
+)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller (sys_user + linked driver)"""
+    user_id: int
+    user_name: str
+    nick_name: Optional[str]
+    phonenumber: Optional[str]
+    email: Optional[str]
+    role: str
+    is_active: bool
+    driver_id: Optional[int] = None
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role in ("admin", "super_admin")
+
+    @property
+    def is_super_admin(self) -> bool:
+        return self.role == "super_admin"
+
+    @classmethod
+    def from_user(cls, user: User, driver_id: Optional[int]) -> "Principal":
+        return cls(
+            user_id=user.user_id,
+            user_name=user.user_name,
+            nick_name=user.nick_name,
+            phonenumber=user.phonenumber,
+            email=user.email,
+            role=user.effective_role,
+            is_active=user.is_active,
+            driver_id=driver_id
+        )
+
+
+async def _load(session: AsyncSession, user_id: int) -> Optional[Principal]:
+    """Load a principal from MySQL (sys_user left-joined to tigu_driver)."""
+    result = await session.execute(
+        select(User, Driver.id)
+        .outerjoin(Driver, Driver.phone == User.phonenumber)
+        .where(User.user_id == user_id)
+        .limit(1)
+    )
+    row = result.first()
+    return Principal.from_user(row[0], row[1]) if row else None
+
+
+async def _store(principal: Principal) -> None:
+    _local_cache.set(principal.user_id, principal)
+    try:
+        await cache.store_principal(
+            principal.user_id, asdict(principal), _settings.principal_cache_ttl_seconds
+        )
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to cache principal %s", principal.user_id, exc_info=True)
+
+
+async def get_principal(session: AsyncSession, user_id: int) -> Optional[Principal]:
+    """
+    Resolve a user id (access token subject) to its principal.
+
+    Args:
+        session: Database session, only used on a cache miss
+        user_id: sys_user.user_id
+
+    Returns:
+        Principal, or None if the user does not exist
+    """
+    principal = _local_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    try:
+        cached = await cache.get_principal(user_id)
+    except Exception:  # noqa: BLE001
+        logger.warning("Principal cache unavailable", exc_info=True)
+        cached = None
+    if cached:
+        principal = Principal(**cached)
+        _local_cache.set(user_id, principal)
+        return principal
+
+    principal = await _load(session, user_id)
+    if principal is not None:
+        await _store(principal)
+    return principal
+
+
+async def refresh_principal(session: AsyncSession, user_id: int) -> Optional[Principal]:
+    """Reload a principal from MySQL and repopulate the cache (used when issuing tokens)."""
+    principal = await _load(session, user_id)
+    if principal is None:
+        await invalidate([user_id])
+    else:
+        await _store(principal)
+    return principal
+
+
+async def invalidate(user_ids: Iterable[int]) -> None:
+    """
+    Drop cached principals in every worker.
+
+    Failures are logged, not raised; entries then expire with their TTL.
+
+    Args:
+        user_ids: sys_user ids whose principal changed
+    """
+    user_ids = sorted({int(user_id) for user_id in user_ids})
+    if not user_ids:
+        return
+    evict_local(user_ids)
+    try:
+        await cache.invalidate_principals(user_ids)
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to invalidate principals %s", user_ids, exc_info=True)
+
+
+async def invalidate_phones(session: AsyncSession, phones: Iterable[Optional[str]]) -> None:
+    """Invalidate the principals of the users with the given phone numbers."""
+    phones = sorted({phone for phone in phones if phone})
+    if not phones:
+        return
+    result = await session.execute(select(User.user_id).where(User.phonenumber.in_(phones)))
+    await invalidate(result.scalars().all())
+
+
+def evict_local(user_ids: Iterable[int]) -> None:
+    """Drop principals from this worker's cache only."""
+    for user_id in user_ids:
+        _local_cache.invalidate(int(user_id))
+
+
+def clear_local() -> None:
+    """Drop every principal from this worker's cache."""
+    _local_cache.clear()
@@ -1,28 +1,292 @@
+"""
+Route Service
+
+Orders a driver's stops to minimise driving distance:
+1. Build a haversine distance matrix (vectorised NumPy) over the driver's
+   start position and every stop with coordinates
+2. Construct a nearest-neighbour tour from the start
+3. Improve it with 2-opt and Or-opt moves until no move helps or the time
+   budget runs out
+
+Routes are open paths: they start at the driver and end at the last stop.
+Stops without coordinates keep their original relative order and are
+appended after the optimised stops (without ETA).
+"""
+from __future__ import annotations
+
+import asyncio
 import hashlib
-from typing import List
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
 
+from app.core.config import get_settings
 from app.schemas.order import OrderSummary
 from app.schemas.route import RoutePlan, RouteStop
 
+EARTH_RADIUS_KM = 6371.0088
+
+# Ignore improvements smaller than this (km) to avoid looping on float noise
+_EPSILON = 1e-9
+
+# Longest segment Or-opt tries to relocate
+_OR_OPT_MAX_SEGMENT = 3
+
+
+def haversine_distances(origins: np.ndarray, destinations: np.ndarray) -> np.ndarray:
+    """
+    Great-circle distances between two sets of points.
+
+    Args:
+        origins: Array of shape (m, 2) with (latitude, longitude) in degrees
+        destinations: Array of shape (n, 2) with (latitude, longitude) in degrees
+
+    Returns:
+        (m, n) matrix of distances in kilometres
+    """
+    a_rad = np.radians(np.asarray(origins, dtype=float))
+    b_rad = np.radians(np.asarray(destinations, dtype=float))
+    lat1, lng1 = a_rad[:, 0][:, None], a_rad[:, 1][:, None]
+    lat2, lng2 = b_rad[:, 0][None, :], b_rad[:, 1][None, :]
+
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def haversine_matrix(coords: np.ndarray) -> np.ndarray:
+    """
+    Pairwise great-circle distances.
+
+    Args:
+        coords: Array of shape (n, 2) with (latitude, longitude) in degrees
+
+    Returns:
+        (n, n) matrix of distances in kilometres
+    """
+    return haversine_distances(coords, coords)
+
+
+def path_length(tour: Sequence[int], matrix: np.ndarray) -> float:
+    """Total length of an open path."""
+    if len(tour) < 2:
+        return 0.0
+    idx = np.asarray(tour)
+    return float(matrix[idx[:-1], idx[1:]].sum())
+
+
+def nearest_neighbour_tour(matrix: np.ndarray, start: int = 0) -> List[int]:
+    """Greedy open path visiting every node, starting at `start`."""
+    n = matrix.shape[0]
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    tour = [start]
+
+    for _ in range(n - 1):
+        distances = np.where(visited, np.inf, matrix[tour[-1]])
+        nxt = int(np.argmin(distances))
+        visited[nxt] = True
+        tour.append(nxt)
+
+    return tour
+
+
+def two_opt(tour: List[int], matrix: np.ndarray, deadline: float) -> List[int]:
+    """
+    Improve an open path (fixed start, free end) by reversing segments.
+
+    For each i all candidate j are evaluated at once with NumPy.
+    """
+    tour = list(tour)
+    n = len(tour)
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            path = np.asarray(tour)
+            a, b = path[i - 1], path[i]
+            c = path[i + 1:]                      # candidate segment ends (j = i+1 .. n-1)
+            d = np.append(path[i + 2:], -1)       # node after each j (-1 = end of path)
+
+            has_next = d >= 0
+            d_safe = np.where(has_next, d, 0)
+            delta = matrix[a, c] - matrix[a, b]
+            delta = delta + np.where(has_next, matrix[b, d_safe] - matrix[c, d_safe], 0.0)
+
+            best = int(np.argmin(delta))
+            if delta[best] < -_EPSILON:
+                j = i + 1 + best
+                tour[i:j + 1] = reversed(tour[i:j + 1])
+                improved = True
+
+            if time.perf_counter() >= deadline:
+                break
+
+    return tour
 
-async def build_route_plan(orders: List[OrderSummary]) -> RoutePlan:
-    """Build a simple route plan from orders. No external API calls needed."""
-    stops: List[RouteStop] = []
-
-    # Create stops from orders in sequence
-    for idx, order in enumerate(orders, start=1):
-        stops.append(
-            RouteStop(
-                order_sn=order.order_sn,
-                sequence=idx,
-                address=order.receiver_address,
-                receiver_name=order.receiver_name,
-                eta=None,  # ETA will be provided by Google Maps when user opens the route
-                latitude=order.pickup_location.latitude if order.pickup_location else None,
-                longitude=order.pickup_location.longitude if order.pickup_location else None
-            )
-        )
 
-    # Generate unique plan ID based on order sequence
-    plan_id = hashlib.md5("".join(stop.order_sn for stop in stops).encode()).hexdigest()
-    return RoutePlan(id=plan_id, stops=stops)
+def or_opt(tour: List[int], matrix: np.ndarray, deadline: float) -> List[int]:
+    """Improve an open path by relocating segments of 1-3 consecutive stops."""
+    tour = list(tour)
+    n = len(tour)
+    improved = True
+
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for length in range(1, _OR_OPT_MAX_SEGMENT + 1):
+            for i in range(1, n - length + 1):
+                segment = tour[i:i + length]
+                prev_node = tour[i - 1]
+                next_node = tour[i + length] if i + length < n else None
+                first, last = segment[0], segment[-1]
+
+                removal_gain = matrix[prev_node, first]
+                if next_node is not None:
+                    removal_gain += matrix[last, next_node] - matrix[prev_node, next_node]
+
+                rest = tour[:i] + tour[i + length:]
+                best_cost, best_pos = removal_gain - _EPSILON, None
+                for k in range(len(rest)):
+                    x = rest[k]
+                    y = rest[k + 1] if k + 1 < len(rest) else None
+                    cost = matrix[x, first]
+                    if y is not None:
+                        cost += matrix[last, y] - matrix[x, y]
+                    if cost < best_cost:
+                        best_cost, best_pos = cost, k
+
+                if best_pos is not None:
+                    tour = rest[:best_pos + 1] + segment + rest[best_pos + 1:]
+                    improved = True
+                    break
+
+                if time.perf_counter() >= deadline:
+                    return tour
+            if improved:
+                break
+
+    return tour
+
+
+def solve_route(matrix: np.ndarray, time_budget_seconds: float) -> List[int]:
+    """
+    Order nodes 1..n-1 starting from node 0.
+
+    Args:
+        matrix: (n, n) distance matrix; node 0 is the start
+        time_budget_seconds: Wall-clock budget for local search
+
+    Returns:
+        Visiting order of node indices, beginning with 0
+    """
+    deadline = time.perf_counter() + time_budget_seconds
+    tour = nearest_neighbour_tour(matrix, start=0)
+    if len(tour) <= 3:
+        return two_opt(tour, matrix, deadline)
+
+    while time.perf_counter() < deadline:
+        before = path_length(tour, matrix)
+        tour = two_opt(tour, matrix, deadline)
+        tour = or_opt(tour, matrix, deadline)
+        if path_length(tour, matrix) >= before - _EPSILON:
+            break
+
+    return tour
+
+
+def _plan_id(stops: Sequence[RouteStop]) -> str:
+    return hashlib.md5("".join(stop.order_sn for stop in stops).encode()).hexdigest()
+
+
+async def optimize_stops(
+    stops: List[RouteStop],
+    origin: Optional[Tuple[float, float]] = None,
+    departure_time: Optional[datetime] = None,
+    average_speed_kmh: Optional[float] = None,
+    service_minutes: Optional[float] = None,
+    time_budget_ms: Optional[int] = None
+) -> RoutePlan:
+    """
+    Sequence stops to minimise driving distance and attach ETAs.
+
+    Args:
+        stops: Stops to visit (latitude/longitude may be None)
+        origin: Driver's (latitude, longitude); if None the route may start at any stop
+        departure_time: Departure time for ETAs (default now)
+        average_speed_kmh: Travel speed for ETAs (default ROUTE_AVERAGE_SPEED_KMH)
+        service_minutes: Time spent at each stop (default ROUTE_SERVICE_MINUTES)
+        time_budget_ms: Local search budget (default ROUTE_OPTIMIZER_TIME_BUDGET_MS)
+
+    Returns:
+        RoutePlan with stops resequenced, per-stop ETAs and total distance
+    """
+    settings = get_settings()
+    speed = average_speed_kmh or settings.route_average_speed_kmh
+    service = settings.route_service_minutes if service_minutes is None else service_minutes
+    budget_ms = time_budget_ms or settings.route_optimizer_time_budget_ms
+    departure = departure_time or datetime.now()
+
+    located = [stop for stop in stops if stop.latitude is not None and stop.longitude is not None]
+    unlocated = [stop for stop in stops if stop.latitude is None or stop.longitude is None]
+
+    ordered: List[RouteStop] = []
+    total_distance = 0.0
+
+    if located:
+        coords = np.array([[stop.latitude, stop.longitude] for stop in located], dtype=float)
+        if origin is not None:
+            matrix = haversine_matrix(np.vstack([np.asarray(origin, dtype=float), coords]))
+        else:
+            # Zero-cost virtual start node lets the solver pick the best first stop
+            matrix = np.zeros((len(located) + 1, len(located) + 1))
+            matrix[1:, 1:] = haversine_matrix(coords)
+
+        tour = await asyncio.to_thread(solve_route, matrix, budget_ms / 1000)
+
+        elapsed_minutes = 0.0
+        previous = tour[0]
+        for node in tour[1:]:
+            leg_km = float(matrix[previous, node])
+            total_distance += leg_km
+            elapsed_minutes += leg_km / speed * 60
+            eta = departure + timedelta(minutes=elapsed_minutes)
+            elapsed_minutes += service
+
+            stop = located[node - 1]
+            ordered.append(stop.model_copy(update={
+                "eta": eta.strftime("%H:%M"),
+                "distance_from_previous_km": round(leg_km, 3)
+            }))
+            previous = node
+
+    ordered.extend(stop.model_copy(update={"eta": None}) for stop in unlocated)
+    for idx, stop in enumerate(ordered, start=1):
+        stop.sequence = idx
+
+    return RoutePlan(
+        id=_plan_id(ordered),
+        stops=ordered,
+        total_distance_km=round(total_distance, 3)
+    )
+
+
+async def build_route_plan(
+    orders: List[OrderSummary],
+    origin: Optional[Tuple[float, float]] = None
+) -> RoutePlan:
+    """Build an optimised route plan from orders. No external API calls needed."""
+    stops = [
+        RouteStop(
+            order_sn=order.order_sn,
+            sequence=idx,
+            address=order.receiver_address,
+            receiver_name=order.receiver_name,
+            eta=None,
+            latitude=order.pickup_location.latitude if order.pickup_location else None,
+            longitude=order.pickup_location.longitude if order.pickup_location else None
+        )
+        for idx, order in enumerate(orders, start=1)
+    ]
+    return await optimize_stops(stops, origin=origin)
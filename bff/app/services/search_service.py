@@ -0,0 +1,255 @@
+"""
+Search Service
+
+Indexed admin search over orders and prepare packages, replacing
+ILIKE '%term%' scans (which can never use an index; on MySQL ilike also wraps
+both sides in lower()).
+
+A search term is matched by whichever of these apply:
+- order_sn / prepare_sn prefix, on the base tables' unique indexes
+- receiver phone, as a digits prefix or suffix ("last four digits"), on
+  tigu_search_document
+- receiver name, via the FULLTEXT ngram index on tigu_search_document
+  (substring match for Chinese and Latin names of 2+ characters, prefix
+  match for single characters)
+- order ID, exactly, via tigu_prepare_goods_order (packages only)
+
+tigu_search_document is kept current by app.workers.search_indexer, which
+sweeps tigu_order and tigu_prepare_goods for rows created or updated since
+its last run (index_changed_rows), so rows written by the shop system become
+searchable within SEARCH_INDEX_INTERVAL_SECONDS. create_prepare_package also
+indexes its orders inside its own transaction. The table can be rebuilt
+with app.workers.backfill_search_documents.
+"""
+from __future__ import annotations
+
+import re
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import ColumnElement, Select, and_, or_, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import Order
+from app.models.prepare_goods import PrepareGoods, PrepareGoodsOrder
+from app.models.search_document import SearchDocument
+
+ENTITY_ORDER = 1
+ENTITY_PREPARE_GOODS = 2
+
+# Shortest digit run treated as a phone lookup
+MIN_PHONE_DIGITS = 3
+# MySQL ngram_token_size (default 2); shorter names fall back to a prefix match
+NGRAM_TOKEN_SIZE = 2
+
+_PHONE_TERM = re.compile(r"^[\d\s+\-().]+$")
+_NON_DIGITS = re.compile(r"\D")
+
+
+def normalize_phone(phone: str | None) -> str | None:
+    """Reduce a phone number to its digits ("+1 (555) 100-1" -> "15551001")."""
+    if not phone:
+        return None
+    return _NON_DIGITS.sub("", phone) or None
+
+
+def _prefix_pattern(term: str) -> str:
+    """LIKE pattern matching values starting with term (wildcards escaped)."""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%"
+
+
+def _document(entity_type: int, row: Any, now: datetime) -> Dict[str, Any]:
+    digits = normalize_phone(row.receiver_phone)
+    return {
+        "entity_type": entity_type,
+        "entity_id": row.id,
+        "receiver_name": (row.receiver_name or "").strip() or None,
+        "phone_digits": digits,
+        "phone_digits_rev": digits[::-1] if digits else None,
+        "update_time": now
+    }
+
+
+async def _upsert(session: AsyncSession, entity_type: int, rows: Sequence[Any]) -> None:
+    if not rows:
+        return
+    now = datetime.now()
+    documents = list({row.id: _document(entity_type, row, now) for row in rows}.values())
+    stmt = mysql_insert(SearchDocument).values(documents)
+    stmt = stmt.on_duplicate_key_update(
+        receiver_name=stmt.inserted.receiver_name,
+        phone_digits=stmt.inserted.phone_digits,
+        phone_digits_rev=stmt.inserted.phone_digits_rev,
+        update_time=stmt.inserted.update_time
+    )
+    await session.execute(stmt)
+
+
+async def index_orders(session: AsyncSession, orders: Sequence[Any]) -> None:
+    """
+    Upsert search documents for orders. Does not commit.
+
+    Args:
+        session: Database session
+        orders: Orders (or rows) with id, receiver_name and receiver_phone
+    """
+    await _upsert(session, ENTITY_ORDER, orders)
+
+
+async def index_prepare_packages(session: AsyncSession, packages: Sequence[Any]) -> None:
+    """
+    Upsert search documents for prepare packages. Does not commit.
+
+    Args:
+        session: Database session
+        packages: Packages (or rows) with id, receiver_name and receiver_phone
+    """
+    await _upsert(session, ENTITY_PREPARE_GOODS, packages)
+
+
+# Incremental sweeps: name -> (table, timestamp column, indexer). New rows are
+# found by create_time (the shop system may leave update_time NULL on
+# insert), edited rows by update_time; both columns are indexed with id.
+SWEEPS: Dict[str, Tuple[Any, str, Callable[[AsyncSession, Sequence[Any]], Awaitable[None]]]] = {
+    "order:create_time": (Order, "create_time", index_orders),
+    "order:update_time": (Order, "update_time", index_orders),
+    "prepare_goods:create_time": (PrepareGoods, "create_time", index_prepare_packages),
+    "prepare_goods:update_time": (PrepareGoods, "update_time", index_prepare_packages),
+}
+
+
+async def index_changed_rows(
+    session: AsyncSession,
+    sweep: str,
+    since: Optional[datetime],
+    batch_size: int = 500
+) -> Tuple[int, Optional[datetime]]:
+    """
+    Upsert documents for rows whose sweep column is at or after since.
+
+    Walks (column, id) in ascending keyset batches, committing each batch.
+
+    Args:
+        session: Database session
+        sweep: Key of SWEEPS
+        since: Lower bound (inclusive); None indexes every row with a timestamp
+        batch_size: Rows per transaction
+
+    Returns:
+        (rows indexed, newest column value seen or None)
+    """
+    model, column_name, index = SWEEPS[sweep]
+    column = getattr(model, column_name)
+    indexed = 0
+    last: Optional[Tuple[datetime, int]] = None
+
+    while True:
+        stmt = select(model.id, model.receiver_name, model.receiver_phone, column.label("changed_at"))
+        if last is not None:
+            stmt = stmt.where(or_(column > last[0], and_(column == last[0], model.id > last[1])))
+        elif since is not None:
+            stmt = stmt.where(column >= since)
+        else:
+            stmt = stmt.where(column.is_not(None))
+        result = await session.execute(stmt.order_by(column, model.id).limit(batch_size))
+        rows = result.all()
+        if not rows:
+            break
+
+        await index(session, rows)
+        await session.commit()
+        indexed += len(rows)
+        last = (rows[-1].changed_at, rows[-1].id)
+        if len(rows) < batch_size:
+            break
+
+    return indexed, last[0] if last else None
+
+
+def _phone_term(term: str) -> Optional[str]:
+    if not _PHONE_TERM.match(term):
+        return None
+    digits = normalize_phone(term)
+    if digits is None or len(digits) < MIN_PHONE_DIGITS:
+        return None
+    return digits
+
+
+def _document_ids(entity_type: int, term: str) -> Select:
+    """Subquery of entity IDs whose receiver phone or name matches term."""
+    digits = _phone_term(term)
+    if digits is not None:
+        # Phone-like terms never match names, so only the phone indexes are used
+        condition = or_(
+            SearchDocument.phone_digits.like(_prefix_pattern(digits)),
+            SearchDocument.phone_digits_rev.like(_prefix_pattern(digits[::-1]))
+        )
+    elif len(term) >= NGRAM_TOKEN_SIZE:
+        # Quoted phrase: with the ngram parser this is a substring match
+        phrase = '"' + term.replace('"', " ") + '"'
+        condition = SearchDocument.receiver_name.match(phrase)
+    else:
+        condition = SearchDocument.receiver_name.like(_prefix_pattern(term))
+
+    return (
+        select(SearchDocument.entity_id)
+        .where(SearchDocument.entity_type == entity_type)
+        .where(condition)
+    )
+
+
+def order_search_condition(term: str) -> Optional[ColumnElement[bool]]:
+    """
+    WHERE condition matching orders by order_sn prefix, receiver phone or name.
+
+    Args:
+        term: Raw search term
+
+    Returns:
+        Condition on Order, or None for a blank term
+    """
+    term = term.strip()
+    if not term:
+        return None
+
+    conditions: List[ColumnElement[bool]] = [
+        Order.order_sn.like(_prefix_pattern(term)),
+        Order.id.in_(_document_ids(ENTITY_ORDER, term))
+    ]
+    return or_(*conditions)
+
+
+def prepare_goods_search_condition(term: str) -> Optional[ColumnElement[bool]]:
+    """
+    WHERE condition matching prepare packages.
+
+    A package matches on its prepare_sn prefix, its own receiver phone/name,
+    those of any order it contains, or an exact contained order ID.
+
+    Args:
+        term: Raw search term
+
+    Returns:
+        Condition on PrepareGoods, or None for a blank term
+    """
+    term = term.strip()
+    if not term:
+        return None
+
+    conditions: List[ColumnElement[bool]] = [
+        PrepareGoods.prepare_sn.like(_prefix_pattern(term)),
+        PrepareGoods.id.in_(_document_ids(ENTITY_PREPARE_GOODS, term)),
+        PrepareGoods.id.in_(
+            select(PrepareGoodsOrder.prepare_id)
+            .where(PrepareGoodsOrder.order_id.in_(_document_ids(ENTITY_ORDER, term)))
+        )
+    ]
+    if term.isdigit():
+        conditions.append(
+            PrepareGoods.id.in_(
+                select(PrepareGoodsOrder.prepare_id).where(PrepareGoodsOrder.order_id == int(term))
+            )
+        )
+    return or_(*conditions)
@@ -0,0 +1,105 @@
+"""
+SKU Image Service
+
+Batched loader for product SKU main images (tigu_uploaded_files with
+biz_type='product_sku' and is_main=1).
+
+Order serialization needs one image per order item. Instead of one SELECT per
+item, callers collect every sku_id in a result set and resolve them together:
+1. Serve what we can from the per-process TTL/LRU cache
+2. Fetch the remaining SKUs with a single IN query
+3. Cache the results, including SKUs without an image, so repeat misses are free
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.order import UploadedFile
+from app.utils import TTLCache
+
+# Relative file URLs are served from the main Tigu API host
+SKU_IMAGE_BASE_URL = "https://api.wetigu.com"
+
+_settings = get_settings()
+
+_sku_image_cache: TTLCache[int, str | None] = TTLCache(
+    maxsize=_settings.sku_image_cache_size,
+    ttl_seconds=_settings.sku_image_cache_ttl_seconds
+)
+
+
+def resolve_sku_image_url(file_url: str | None) -> str | None:
+    """
+    Turn a stored file_url into an absolute image URL.
+
+    Args:
+        file_url: Value of UploadedFile.file_url (absolute or server-relative)
+
+    Returns:
+        Absolute URL, or None if no file
+    """
+    if not file_url:
+        return None
+    if file_url.startswith('/'):
+        return f"{SKU_IMAGE_BASE_URL}{file_url}"
+    return file_url
+
+
+async def load_sku_images(
+    session: AsyncSession,
+    sku_ids: Iterable[int]
+) -> Dict[int, str | None]:
+    """
+    Resolve main images for many SKUs with at most one database round trip.
+
+    Args:
+        session: Database session
+        sku_ids: SKU IDs to resolve (duplicates and None are ignored)
+
+    Returns:
+        Mapping of sku_id → absolute image URL (None when the SKU has no main image)
+
+    Example:
+        images = await load_sku_images(session, [item.sku_id for item in items])
+        url = images.get(item.sku_id)
+    """
+    unique_ids = list(dict.fromkeys(sid for sid in sku_ids if sid is not None))
+    if not unique_ids:
+        return {}
+
+    images, missing = _sku_image_cache.get_many(unique_ids)
+    if not missing:
+        return images
+
+    stmt = (
+        select(UploadedFile.biz_id, UploadedFile.file_url)
+        .where(UploadedFile.biz_type == 'product_sku')
+        .where(UploadedFile.biz_id.in_(missing))
+        .where(UploadedFile.is_main == 1)
+        .order_by(UploadedFile.id)
+    )
+    result = await session.execute(stmt)
+
+    fetched: Dict[int, str | None] = {sku_id: None for sku_id in missing}
+    for biz_id, file_url in result.all():
+        # Keep the first main image per SKU, matching the old LIMIT 1 lookup
+        if fetched.get(biz_id) is None:
+            fetched[biz_id] = resolve_sku_image_url(file_url)
+
+    _sku_image_cache.set_many(fetched)
+    images.update(fetched)
+    return images
+
+
+def invalidate_sku_image(sku_id: int) -> None:
+    """Drop a cached SKU image (e.g. after the product's main image changes)."""
+    _sku_image_cache.invalidate(sku_id)
+
+
+def clear_sku_image_cache() -> None:
+    """Drop all cached SKU images."""
+    _sku_image_cache.clear()
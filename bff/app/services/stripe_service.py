@@ -1,11 +1,22 @@
 """
 Stripe Connect service for driver payment onboarding.
+
+The Stripe SDK is synchronous, so every SDK call runs on a dedicated bounded
+thread pool (STRIPE_MAX_WORKERS) instead of blocking the event loop.
+
+Account status is cached per driver in Redis and kept current by
+account.updated webhooks; Stripe is only asked directly on a cache miss or
+an explicit refresh. Webhooks are acknowledged immediately and processed by
+app.workers.stripe_webhook_worker from a queue de-duplicated on event id.
 """
 from __future__ import annotations
 
+import asyncio
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Any, Callable, Optional, Sequence
 
 import stripe
 from sqlalchemy import select
@@ -13,6 +24,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import get_settings
 from app.models.driver import Driver
+from app.services import cache
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -22,6 +34,103 @@ if settings.stripe_secret_key:
     stripe.api_key = settings.stripe_secret_key
 
 
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.stripe_max_workers,
+            thread_name_prefix="stripe"
+        )
+    return _executor
+
+
+async def run_stripe_call(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking Stripe SDK call on the bounded Stripe thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_stripe_executor() -> None:
+    """Release the Stripe thread pool (called on application shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def apply_account_state(
+    driver: Driver,
+    details_submitted: bool,
+    payouts_enabled: bool,
+    currently_due: Optional[Sequence[str]]
+) -> None:
+    """Update a driver's Stripe columns from Stripe account state."""
+    driver.stripe_details_submitted = details_submitted
+    driver.stripe_payouts_enabled = payouts_enabled
+
+    if payouts_enabled and details_submitted:
+        driver.stripe_status = "verified"
+        if not driver.stripe_connected_at:
+            driver.stripe_connected_at = datetime.utcnow()
+    elif details_submitted:
+        # Details submitted but payouts not enabled - might need verification
+        driver.stripe_status = "restricted" if currently_due else "onboarding"
+    else:
+        driver.stripe_status = "onboarding"
+
+
+def build_account_status(driver: Driver, requirements_due: Optional[Sequence[str]] = None) -> dict:
+    """Status payload (StripeStatusResponse fields) from a driver's Stripe columns."""
+    return {
+        "stripe_status": driver.stripe_status or "pending",
+        "stripe_payouts_enabled": bool(driver.stripe_payouts_enabled),
+        "stripe_details_submitted": bool(driver.stripe_details_submitted),
+        "stripe_connected_at": driver.stripe_connected_at,
+        "can_receive_payouts": bool(driver.stripe_payouts_enabled) and driver.stripe_status == "verified",
+        "requirements_due": list(requirements_due) if requirements_due else None,
+    }
+
+
+async def _store_cached_status(driver_id: int, status: dict) -> None:
+    try:
+        await cache.store_stripe_status(driver_id, status, settings.stripe_status_cache_ttl_seconds)
+    except Exception:  # noqa: BLE001
+        logger.warning("Failed to cache Stripe status for driver %s", driver_id, exc_info=True)
+
+
+async def enqueue_webhook_event(event: dict) -> bool:
+    """
+    Queue a verified webhook event for background processing.
+
+    Args:
+        event: Verified Stripe event
+
+    Returns:
+        True if queued, False if this event id was already received
+
+    Raises:
+        Exception: If the queue is unavailable (Stripe will redeliver)
+    """
+    event_id = event.get("id")
+    if not event_id:
+        raise ValueError("Stripe event has no id")
+
+    if not await cache.claim_stripe_event(event_id, settings.stripe_webhook_dedup_ttl_seconds):
+        logger.info(f"Ignoring duplicate Stripe webhook {event_id}")
+        return False
+
+    try:
+        await cache.push_stripe_webhook({"id": event_id, "attempts": 0, "event": event})
+    except Exception:
+        # Let Stripe's redelivery claim the id again
+        await cache.release_stripe_event(event_id)
+        raise
+    return True
+
+
 class StripeService:
     """Service for handling Stripe Connect operations"""
 
@@ -49,7 +158,8 @@ class StripeService:
 
         try:
             # Create new Express account
-            account = stripe.Account.create(
+            account = await run_stripe_call(
+                stripe.Account.create,
                 type="express",
                 country="CA",
                 email=driver.email,
@@ -68,7 +178,8 @@ class StripeService:
             driver.stripe_status = "onboarding"
 
             # Create onboarding link
-            account_link = stripe.AccountLink.create(
+            account_link = await run_stripe_call(
+                stripe.AccountLink.create,
                 account=account.id,
                 refresh_url=settings.stripe_connect_refresh_url,
                 return_url=settings.stripe_connect_return_url,
@@ -77,6 +188,7 @@ class StripeService:
 
             driver.stripe_onboarding_url = account_link.url
             await self.session.commit()
+            await _store_cached_status(driver.id, build_account_status(driver))
 
             logger.info(f"Created Stripe account {account.id} for driver {driver.id}")
 
@@ -95,7 +207,8 @@ class StripeService:
             raise ValueError("Stripe is not configured. Please set STRIPE_SECRET_KEY.")
 
         try:
-            account_link = stripe.AccountLink.create(
+            account_link = await run_stripe_call(
+                stripe.AccountLink.create,
                 account=stripe_account_id,
                 refresh_url=settings.stripe_connect_refresh_url,
                 return_url=settings.stripe_connect_return_url,
@@ -111,10 +224,39 @@ class StripeService:
             logger.error(f"Stripe error creating account link: {e}")
             raise
 
+    async def get_account_status(self, driver: Driver, refresh: bool = False) -> dict:
+        """
+        Get a driver's Stripe Connect status, preferring the cached copy.
+
+        Args:
+            driver: Driver to check
+            refresh: Ask Stripe even if a cached status exists
+
+        Returns:
+            Status payload (see build_account_status)
+        """
+        if not driver.stripe_account_id:
+            return build_account_status(driver)
+
+        if not refresh:
+            try:
+                cached = await cache.get_stripe_status(driver.id)
+            except Exception:  # noqa: BLE001
+                logger.warning("Stripe status cache unavailable", exc_info=True)
+                cached = None
+            if cached:
+                return cached
+
+        if not settings.stripe_secret_key:
+            # Last known status from the database
+            return build_account_status(driver)
+
+        return await self.check_account_status(driver)
+
     async def check_account_status(self, driver: Driver) -> dict:
         """
         Check the status of a driver's Stripe Connect account.
-        Updates the local database with current status.
+        Updates the local database and the status cache with current status.
         """
         if not settings.stripe_secret_key:
             raise ValueError("Stripe is not configured. Please set STRIPE_SECRET_KEY.")
@@ -130,41 +272,25 @@ class StripeService:
             }
 
         try:
-            account = stripe.Account.retrieve(driver.stripe_account_id)
-
-            # Update driver record
-            driver.stripe_details_submitted = account.details_submitted
-            driver.stripe_payouts_enabled = account.payouts_enabled
-
-            # Determine status
-            if account.payouts_enabled and account.details_submitted:
-                driver.stripe_status = "verified"
-                if not driver.stripe_connected_at:
-                    driver.stripe_connected_at = datetime.utcnow()
-            elif account.details_submitted:
-                # Details submitted but payouts not enabled - might need verification
-                if account.requirements and account.requirements.currently_due:
-                    driver.stripe_status = "restricted"
-                else:
-                    driver.stripe_status = "onboarding"
-            else:
-                driver.stripe_status = "onboarding"
-
-            await self.session.commit()
+            account = await run_stripe_call(stripe.Account.retrieve, driver.stripe_account_id)
 
             # Get requirements if any
             requirements_due = None
             if account.requirements and account.requirements.currently_due:
                 requirements_due = list(account.requirements.currently_due)
 
-            return {
-                "stripe_status": driver.stripe_status,
-                "stripe_payouts_enabled": driver.stripe_payouts_enabled,
-                "stripe_details_submitted": driver.stripe_details_submitted,
-                "stripe_connected_at": driver.stripe_connected_at,
-                "can_receive_payouts": driver.stripe_payouts_enabled and driver.stripe_status == "verified",
-                "requirements_due": requirements_due,
-            }
+            # Update driver record
+            apply_account_state(
+                driver,
+                details_submitted=account.details_submitted,
+                payouts_enabled=account.payouts_enabled,
+                currently_due=requirements_due
+            )
+            await self.session.commit()
+
+            status = build_account_status(driver, requirements_due)
+            await _store_cached_status(driver.id, status)
+            return status
 
         except stripe.error.StripeError as e:
             logger.error(f"Stripe error checking account status: {e}")
@@ -191,23 +317,16 @@ class StripeService:
 
                 if driver:
                     # Update driver status based on account data
-                    driver.stripe_details_submitted = data.get("details_submitted", False)
-                    driver.stripe_payouts_enabled = data.get("payouts_enabled", False)
-
-                    if driver.stripe_payouts_enabled and driver.stripe_details_submitted:
-                        driver.stripe_status = "verified"
-                        if not driver.stripe_connected_at:
-                            driver.stripe_connected_at = datetime.utcnow()
-                    elif driver.stripe_details_submitted:
-                        requirements = data.get("requirements", {})
-                        if requirements.get("currently_due"):
-                            driver.stripe_status = "restricted"
-                        else:
-                            driver.stripe_status = "onboarding"
-                    else:
-                        driver.stripe_status = "onboarding"
+                    requirements_due = (data.get("requirements") or {}).get("currently_due") or None
+                    apply_account_state(
+                        driver,
+                        details_submitted=data.get("details_submitted", False),
+                        payouts_enabled=data.get("payouts_enabled", False),
+                        currently_due=requirements_due
+                    )
 
                     await self.session.commit()
+                    await _store_cached_status(driver.id, build_account_status(driver, requirements_due))
                     logger.info(f"Updated driver {driver.id} Stripe status to {driver.stripe_status}")
                     return True
 
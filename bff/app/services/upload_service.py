@@ -0,0 +1,306 @@
+"""
+Photo Upload Service
+
+Streams photo uploads into the photo store without blocking the event loop
+and links them to business entities through tigu_uploaded_files.
+
+Flow:
+1. POST /uploads/photos streams the raw request body into the store chunk by
+   chunk (stream_to_store); the size limit is enforced while streaming
+2. An unlinked UploadedFile row (biz_type/biz_id NULL) is created and its id
+   returned to the client
+3. The confirm endpoints reference that id; claim_uploaded_file links it to
+   the package
+
+Base64 photos in the JSON body are still accepted (save_base64_photo); they
+are decoded in a worker thread.
+
+Files are stored by content hash (see photo_storage), so a retried upload of
+the same bytes reuses the stored file.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.driver import Driver
+from app.models.order import UploadedFile
+from app.services import photo_storage
+from app.services.delivery_proof_service import (
+    ALLOWED_MIME_TYPES,
+    MAX_FILE_SIZE,
+    decode_base64_image,
+)
+from app.utils import generate_snowflake_id
+
+# Magic numbers of the accepted image formats
+_SIGNATURES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+}
+_SIGNATURE_LENGTH = max(len(signature) for signature in _SIGNATURES)
+
+
+@dataclass
+class StoredPhoto:
+    """Photo written to the photo store"""
+    file_name: str
+    file_url: str
+    file_type: str
+    file_size: int
+    sha256: str
+
+
+def file_extension(mime_type: str) -> str:
+    """Return the file extension used for a MIME type (image/jpg -> jpeg)."""
+    extension = mime_type.split('/')[-1]
+    return 'jpeg' if extension == 'jpg' else extension
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Return the MIME type matching the leading bytes, or None."""
+    for signature, mime_type in _SIGNATURES.items():
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+async def stream_to_store(
+    chunks: AsyncIterator[bytes],
+    stem: str,
+    max_size: int = MAX_FILE_SIZE
+) -> StoredPhoto:
+    """
+    Write an image stream to the photo store.
+
+    Chunks are written (and hashed) in a worker thread as they arrive, so at
+    most one chunk is held in memory. The stream is abandoned as soon as it
+    exceeds max_size. Data is staged in a temporary file and only stored
+    once the whole image has been received.
+
+    Args:
+        chunks: Async iterator of body chunks (e.g. Request.stream())
+        stem: File name without extension (recorded as UploadedFile.file_name)
+        max_size: Size limit in bytes
+
+    Returns:
+        StoredPhoto: Location, type and size of the saved file
+
+    Raises:
+        HTTPException 413: Stream exceeds max_size
+        HTTPException 400: Empty stream or not a JPEG/PNG image
+    """
+    staged = await photo_storage.StagedFile.open()
+    head = b""
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if staged.size + len(chunk) > max_size:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Photo exceeds {max_size // (1024 * 1024)}MB limit"
+                )
+            if len(head) < _SIGNATURE_LENGTH:
+                head += chunk[:_SIGNATURE_LENGTH]
+                if len(head) >= _SIGNATURE_LENGTH and sniff_image_type(head) is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Invalid image format"
+                    )
+            await staged.write(chunk)
+
+        mime_type = sniff_image_type(head)
+        if mime_type is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid image format" if staged.size else "Empty upload"
+            )
+        stored = await staged.commit(file_extension(mime_type), mime_type)
+    except BaseException:
+        await staged.discard()
+        raise
+
+    return StoredPhoto(
+        file_name=f"{stem}.{file_extension(mime_type)}",
+        file_url=stored.url,
+        file_type=mime_type,
+        file_size=stored.size,
+        sha256=stored.sha256
+    )
+
+
+async def save_base64_photo(data_url: str, stem: str) -> StoredPhoto:
+    """
+    Decode a base64 photo or data URL and write it to the photo store.
+
+    Compatibility path for clients that still embed the photo in the JSON
+    body. Decoding runs in a worker thread.
+
+    Raises:
+        HTTPException: If format is invalid or size exceeds limit
+    """
+    image_bytes, mime_type = await asyncio.to_thread(decode_base64_image, data_url)
+    extension = file_extension(mime_type)
+    stored = await photo_storage.store_bytes(image_bytes, extension, mime_type)
+    return StoredPhoto(
+        file_name=f"{stem}.{extension}",
+        file_url=stored.url,
+        file_type=mime_type,
+        file_size=stored.size,
+        sha256=stored.sha256
+    )
+
+
+def build_uploaded_file(
+    photo: StoredPhoto,
+    uploader: Driver,
+    biz_type: Optional[str] = None,
+    biz_id: Optional[int] = None,
+    file_id: Optional[int] = None
+) -> UploadedFile:
+    """Create (but do not add) the UploadedFile row for a stored photo."""
+    return UploadedFile(
+        id=file_id or generate_snowflake_id(),
+        file_name=photo.file_name,
+        file_url=photo.file_url,
+        file_type=photo.file_type,
+        file_size=photo.file_size,
+        biz_type=biz_type,
+        biz_id=biz_id,
+        uploader_id=uploader.id,
+        uploader_name=uploader.name,
+        create_by=uploader.name,
+        create_time=datetime.now()
+    )
+
+
+async def upload_photo_stream(
+    session: AsyncSession,
+    chunks: AsyncIterator[bytes],
+    uploader: Driver,
+    content_length: Optional[int] = None,
+    content_type: Optional[str] = None
+) -> UploadedFile:
+    """
+    Stream a photo to disk and record it as an unlinked upload.
+
+    Args:
+        session: Database session
+        chunks: Async iterator of body chunks
+        uploader: Uploading driver
+        content_length: Declared body size, rejected early if over the limit
+        content_type: Declared MIME type, must be an allowed image type if given
+
+    Returns:
+        UploadedFile: Committed row; its id is referenced by the confirm endpoints
+
+    Raises:
+        HTTPException 413: Photo exceeds MAX_FILE_SIZE
+        HTTPException 400/415: Not a JPEG/PNG image
+    """
+    if content_length is not None and content_length > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Photo exceeds {MAX_FILE_SIZE // (1024 * 1024)}MB limit"
+        )
+    if content_type and content_type.split(';')[0].strip().lower() not in ALLOWED_MIME_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Invalid image type. Allowed: {', '.join(sorted(ALLOWED_MIME_TYPES))}"
+        )
+
+    file_id = generate_snowflake_id()
+    photo = await stream_to_store(chunks, str(file_id))
+    uploaded_file = build_uploaded_file(photo, uploader, file_id=file_id)
+    session.add(uploaded_file)
+    await session.commit()
+    return uploaded_file
+
+
+async def claim_uploaded_file(
+    session: AsyncSession,
+    file_id: int,
+    uploader_id: int,
+    biz_type: str,
+    biz_id: int
+) -> UploadedFile:
+    """
+    Link an unlinked upload to a business entity.
+
+    The caller commits.
+
+    Args:
+        session: Database session
+        file_id: UploadedFile id returned by the upload endpoint
+        uploader_id: Driver that must own the upload
+        biz_type: Business entity type (e.g. "prepare_good")
+        biz_id: Business entity id
+
+    Returns:
+        UploadedFile: The linked row
+
+    Raises:
+        HTTPException 404: Upload not found
+        HTTPException 403: Upload belongs to another driver
+        HTTPException 409: Upload already linked to something else
+    """
+    result = await session.execute(select(UploadedFile).where(UploadedFile.id == file_id))
+    uploaded_file = result.scalars().first()
+    if not uploaded_file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Uploaded file not found: {file_id}"
+        )
+    if uploaded_file.uploader_id != uploader_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Uploaded file belongs to another user"
+        )
+    if uploaded_file.biz_id is not None and (uploaded_file.biz_type, uploaded_file.biz_id) != (biz_type, biz_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Uploaded file is already attached"
+        )
+
+    uploaded_file.biz_type = biz_type
+    uploaded_file.biz_id = biz_id
+    return uploaded_file
+
+
+async def attach_photo(
+    session: AsyncSession,
+    uploader: Driver,
+    biz_type: str,
+    biz_id: int,
+    stem: str,
+    photo_file_id: Optional[int] = None,
+    photo: Optional[str] = None
+) -> UploadedFile:
+    """
+    Resolve the photo of a confirm request to a linked UploadedFile.
+
+    Uses the pre-uploaded file if photo_file_id is given, otherwise saves the
+    base64 photo. The row is added to the session; the caller commits.
+
+    Raises:
+        HTTPException 400: Neither photo_file_id nor photo given
+    """
+    if photo_file_id is not None:
+        return await claim_uploaded_file(session, photo_file_id, uploader.id, biz_type, biz_id)
+    if not photo:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Photo is required"
+        )
+
+    stored = await save_base64_photo(photo, stem)
+    uploaded_file = build_uploaded_file(stored, uploader, biz_type=biz_type, biz_id=biz_id)
+    session.add(uploaded_file)
+    return uploaded_file
@@ -0,0 +1,176 @@
+"""
+Warehouse Scan Service
+
+Batch receive/ship for warehouse scan stations. When a truck unloads, staff
+scan hundreds of parcels; instead of one request (and several queries) per
+order, a batch of scanned order_sns and/or prepare_sns is processed as:
+
+1. One lookup of the orders in the scanned packages
+2. One locked read of every scanned order
+3. In-memory validation of each transition (WorkflowValidator)
+4. One UPDATE tigu_order ... WHERE id IN (...) and one multi-row INSERT of
+   the actions, committed together
+
+Every scan gets its own result. Orders already in the target status are
+reported as already_done, so re-scanning a parcel is harmless.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Literal, Optional, Sequence
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.middleware.workflow_validation import WorkflowValidationError, WorkflowValidator
+from app.models.order import Order
+from app.models.prepare_goods import PrepareGoods, PrepareGoodsOrder
+from app.schemas.order import WarehouseBatchItem, WarehouseBatchResponse
+from app.services import order_action_service, package_detail_service
+from app.services.order_action_service import ActionType
+
+WarehouseAction = Literal["receive", "ship"]
+
+
+@dataclass(frozen=True)
+class _Transition:
+    action_type: int
+    shipping_status: int
+    remark: str
+    time_column: Optional[str] = None
+
+
+TRANSITIONS: Dict[str, _Transition] = {
+    "receive": _Transition(ActionType.WAREHOUSE_RECEIVE, 4, "Warehouse received goods"),  # 仓库已收货
+    "ship": _Transition(
+        ActionType.WAREHOUSE_SHIP, 5, "Warehouse shipped to user", "warehouse_shipping_time"
+    ),  # 司机配送用户
+}
+
+
+async def _package_orders(session: AsyncSession, prepare_sns: Sequence[str]) -> Dict[str, List[int]]:
+    if not prepare_sns:
+        return {}
+    result = await session.execute(
+        select(PrepareGoods.prepare_sn, PrepareGoodsOrder.order_id)
+        .join(PrepareGoodsOrder, PrepareGoodsOrder.prepare_id == PrepareGoods.id)
+        .where(PrepareGoods.prepare_sn.in_(list(prepare_sns)))
+        .order_by(PrepareGoodsOrder.order_id)
+    )
+    orders: Dict[str, List[int]] = {}
+    for prepare_sn, order_id in result.all():
+        orders.setdefault(prepare_sn, []).append(order_id)
+    return orders
+
+
+async def apply_batch(
+    session: AsyncSession,
+    action: WarehouseAction,
+    warehouse_staff_id: int,
+    order_sns: Sequence[str] = (),
+    prepare_sns: Sequence[str] = (),
+    photo_ids: List[int] | None = None
+) -> WarehouseBatchResponse:
+    """
+    Receive or ship every scanned order in one transaction.
+
+    Args:
+        session: Database session
+        action: "receive" (shipping_status 3 → 4) or "ship" (4 → 5)
+        warehouse_staff_id: Warehouse staff recorded on the actions
+        order_sns: Scanned order serial numbers
+        prepare_sns: Scanned packages (all their orders are processed)
+        photo_ids: Optional photo evidence recorded on every action
+
+    Returns:
+        WarehouseBatchResponse with one item per scanned order, in scan
+        order (an unknown serial number yields a single not_found item)
+    """
+    transition = TRANSITIONS[action]
+    package_orders = await _package_orders(session, prepare_sns)
+    package_order_ids = [order_id for ids in package_orders.values() for order_id in ids]
+
+    conditions = []
+    if order_sns:
+        conditions.append(Order.order_sn.in_(list(order_sns)))
+    if package_order_ids:
+        conditions.append(Order.id.in_(package_order_ids))
+
+    rows = []
+    if conditions:
+        # Lock in primary key order so concurrent batches cannot deadlock
+        result = await session.execute(
+            select(Order.id, Order.order_sn, Order.order_status, Order.shipping_status, Order.shipping_type)
+            .where(or_(*conditions))
+            .order_by(Order.id)
+            .with_for_update()
+        )
+        rows = result.all()
+    by_id = {row.id: row for row in rows}
+    by_sn = {row.order_sn: row for row in rows}
+
+    # Validate each order once, however often it was scanned
+    outcomes: Dict[int, WarehouseBatchItem] = {}
+    to_apply = []
+    for row in rows:
+        if row.shipping_status == transition.shipping_status:
+            outcomes[row.id] = WarehouseBatchItem(
+                scanned_sn=row.order_sn, order_sn=row.order_sn, result="already_done",
+                shipping_status=row.shipping_status
+            )
+            continue
+        try:
+            WorkflowValidator.validate_warehouse_transition(row.shipping_status, transition.shipping_status)
+        except WorkflowValidationError as exc:
+            outcomes[row.id] = WarehouseBatchItem(
+                scanned_sn=row.order_sn, order_sn=row.order_sn, result="invalid_status",
+                shipping_status=row.shipping_status, detail=str(exc)
+            )
+            continue
+        outcomes[row.id] = WarehouseBatchItem(
+            scanned_sn=row.order_sn, order_sn=row.order_sn, result="ok",
+            shipping_status=transition.shipping_status
+        )
+        to_apply.append(row)
+
+    if to_apply:
+        values: Dict[str, object] = {"shipping_status": transition.shipping_status}
+        if transition.time_column:
+            values[transition.time_column] = datetime.now()
+        await session.execute(
+            update(Order)
+            .where(Order.id.in_([row.id for row in to_apply]))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        await order_action_service.add_order_actions(
+            session,
+            to_apply,
+            action_type=transition.action_type,
+            shipping_status=transition.shipping_status,
+            create_by=str(warehouse_staff_id),
+            file_ids=photo_ids,
+            remark=transition.remark
+        )
+    await session.commit()
+
+    if to_apply:
+        await package_detail_service.invalidate_orders([row.id for row in to_apply])
+
+    items: List[WarehouseBatchItem] = []
+    for order_sn in order_sns:
+        row = by_sn.get(order_sn)
+        if row is None:
+            items.append(WarehouseBatchItem(scanned_sn=order_sn, result="not_found"))
+        else:
+            items.append(outcomes[row.id].model_copy(update={"scanned_sn": order_sn}))
+    for prepare_sn in prepare_sns:
+        order_ids = [order_id for order_id in package_orders.get(prepare_sn, []) if order_id in by_id]
+        if not order_ids:
+            items.append(WarehouseBatchItem(scanned_sn=prepare_sn, result="not_found"))
+        items.extend(
+            outcomes[order_id].model_copy(update={"scanned_sn": prepare_sn}) for order_id in order_ids
+        )
+
+    return WarehouseBatchResponse(applied=len(to_apply), items=items)
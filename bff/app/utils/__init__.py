@@ -6,6 +6,10 @@ Provides helper utilities for the delivery system:
 - File ID parsing and formatting
 - Status validation
 - Workflow type detection
+- In-process TTL caching
+- Retry backoff
+- Image variant rendering
+- Keyset pagination cursors
 """
 
 from app.utils.helpers import (
@@ -33,6 +37,10 @@ from app.utils.helpers import (
     get_workflow_description,
     get_expected_statuses_for_workflow,
 )
+from app.utils.images import render_variants
+from app.utils.pagination import NEXT_CURSOR_HEADER, PageCursor, apply_keyset, decode_cursor, encode_cursor, next_cursor
+from app.utils.retry import retry_delay
+from app.utils.ttl_cache import TTLCache
 
 __all__ = [
     # Snowflake ID
@@ -58,4 +66,21 @@ __all__ = [
     "get_workflow_type",
     "get_workflow_description",
     "get_expected_statuses_for_workflow",
+
+    # Caching
+    "TTLCache",
+
+    # Retries
+    "retry_delay",
+
+    # Images
+    "render_variants",
+
+    # Pagination
+    "NEXT_CURSOR_HEADER",
+    "PageCursor",
+    "apply_keyset",
+    "decode_cursor",
+    "encode_cursor",
+    "next_cursor",
 ]
@@ -0,0 +1,68 @@
+"""
+Image variant rendering.
+
+CPU-bound Pillow work, kept free of application imports so it can run in a
+process pool (see app.services.photo_service).
+"""
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict
+
+from PIL import Image, ImageOps
+
+_FORMATS = {".jpeg": "JPEG", ".jpg": "JPEG", ".png": "PNG"}
+
+
+def _save(image: Image.Image, target: Path, image_format: str, **params) -> int:
+    """Write via a temporary file so readers never see a partial image."""
+    temp = target.with_name(f".{target.name}.part")
+    image.save(temp, image_format, **params)
+    os.chmod(temp, 0o644)
+    os.replace(temp, target)
+    return target.stat().st_size
+
+
+def render_variants(source_path: str, sizes: Dict[str, int], quality: int) -> Dict[str, dict]:
+    """
+    Render downscaled JPEG variants of an image and strip its metadata.
+
+    The EXIF orientation is applied first, so variants display upright once
+    the EXIF block (GPS position, device details) is gone. The source file
+    is rewritten in place without metadata.
+
+    Args:
+        source_path: Image to process (JPEG or PNG)
+        sizes: Variant name -> maximum width/height in pixels
+        quality: JPEG quality of the variants
+
+    Returns:
+        Variant name -> {"path", "width", "height", "size"}, plus "original"
+        with the rewritten source
+    """
+    source = Path(source_path)
+    with Image.open(source) as opened:
+        icc_profile = opened.info.get("icc_profile")
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+
+    rendered: Dict[str, dict] = {}
+    rgb = image if image.mode in ("RGB", "L") else image.convert("RGB")
+    for name, max_px in sizes.items():
+        variant = rgb.copy()
+        variant.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+        target = source.with_name(f"{source.stem}.{name}.jpeg")
+        size = _save(
+            variant, target, "JPEG",
+            quality=quality, optimize=True, progressive=True, icc_profile=icc_profile
+        )
+        rendered[name] = {"path": str(target), "width": variant.width, "height": variant.height, "size": size}
+
+    # Metadata is only written when passed explicitly, so re-saving drops it
+    image_format = _FORMATS.get(source.suffix.lower(), "JPEG")
+    params = {"quality": 95, "icc_profile": icc_profile} if image_format == "JPEG" else {}
+    original = rgb if image_format == "JPEG" else image
+    size = _save(original, source, image_format, **params)
+    rendered["original"] = {"path": str(source), "width": image.width, "height": image.height, "size": size}
+    return rendered
@@ -0,0 +1,75 @@
+"""
+Keyset (cursor) pagination on (create_time, id), newest first.
+
+A page is `WHERE (create_time, id) < cursor ORDER BY create_time DESC, id
+DESC LIMIT n`, which an index ending in (create_time, id) serves by seeking
+straight to the cursor, so page 1000 costs the same as page 1. Cursors are
+opaque to clients: URL-safe base64 of the last row's create_time and id.
+
+create_time is nullable. MySQL sorts NULLs last in DESC order, so rows
+without a create_time come after all others (by id), and a cursor taken on
+one of them carries an empty create_time.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import Select, and_, or_
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass(frozen=True)
+class PageCursor:
+    """Position after the last row of a page"""
+    create_time: datetime | None
+    id: int
+
+
+def encode_cursor(create_time: datetime | None, row_id: int) -> str:
+    raw = f"{create_time.isoformat() if create_time else ''}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> PageCursor:
+    """Parse a cursor from encode_cursor, raising ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        create_time, row_id = raw.split("|")
+        return PageCursor(
+            create_time=datetime.fromisoformat(create_time) if create_time else None,
+            id=int(row_id)
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def apply_keyset(stmt: Select, create_time_column: Any, id_column: Any, after: Optional[PageCursor]) -> Select:
+    """Order newest first and, given a cursor, start after it."""
+    if after is not None and after.create_time is None:
+        # Already among the NULL create_time rows, which sort last
+        stmt = stmt.where(create_time_column.is_(None), id_column < after.id)
+    elif after is not None:
+        # Expanded row comparison; MySQL turns this into a range seek on the
+        # index (IS NULL is one more range on the same index)
+        stmt = stmt.where(
+            or_(
+                create_time_column < after.create_time,
+                and_(create_time_column == after.create_time, id_column < after.id),
+                create_time_column.is_(None)
+            )
+        )
+    return stmt.order_by(create_time_column.desc(), id_column.desc())
+
+
+def next_cursor(rows: Sequence[Any], limit: int) -> Optional[str]:
+    """Cursor for the page after `rows` (rows with create_time/id), None on the last page."""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.create_time, last.id)
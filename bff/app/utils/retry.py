@@ -0,0 +1,8 @@
+"""
+Retry backoff helper shared by the background queue workers.
+"""
+
+
+def retry_delay(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    """Backoff before retry number `attempt` (1-based): base * 2^(attempt-1), capped."""
+    return min(base_seconds * (2 ** (attempt - 1)), max_seconds)
@@ -0,0 +1,112 @@
+"""
+In-process TTL Cache
+
+Small LRU cache with per-entry expiry for values that are read far more often
+than they change (e.g. product SKU images). Each worker process keeps its own
+copy, so entries must be safe to serve slightly stale until their TTL expires.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Iterable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Thread-safe LRU cache whose entries expire after ``ttl_seconds``.
+
+    Usage:
+        cache: TTLCache[int, str | None] = TTLCache(maxsize=10_000, ttl_seconds=3600)
+        cache.set(42, "/img/42.png")
+        hits, misses = cache.get_many([42, 43])  # ({42: "/img/42.png"}, [43])
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_seconds: float = 300.0):
+        """
+        Initialize cache.
+
+        Args:
+            maxsize: Maximum number of entries kept before evicting least recently used
+            ttl_seconds: Lifetime of each entry in seconds
+
+        Raises:
+            ValueError: If maxsize or ttl_seconds is not positive
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        """Return cached value for key, or default if missing/expired."""
+        value = self._get(key)
+        return default if value is _MISSING else value  # type: ignore[return-value]
+
+    def get_many(self, keys: Iterable[K]) -> tuple[dict[K, V], list[K]]:
+        """
+        Look up several keys at once.
+
+        Returns:
+            Tuple of (hits mapping, list of missing keys in input order)
+        """
+        hits: dict[K, V] = {}
+        misses: list[K] = []
+        for key in keys:
+            value = self._get(key)
+            if value is _MISSING:
+                misses.append(key)
+            else:
+                hits[key] = value  # type: ignore[assignment]
+        return hits, misses
+
+    def set(self, key: K, value: V) -> None:
+        """Store value, evicting the least recently used entry when full."""
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def set_many(self, items: dict[K, V]) -> None:
+        """Store several values at once."""
+        for key, value in items.items():
+            self.set(key, value)
+
+    def invalidate(self, key: K) -> None:
+        """Drop a single entry if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def _get(self, key: K) -> V | object:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
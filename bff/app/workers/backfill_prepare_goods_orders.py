@@ -0,0 +1,92 @@
+"""
+Backfill tigu_prepare_goods_order from PrepareGoods.order_ids
+
+Packages created before the order → package mapping table existed only
+store their orders in the CSV column. This job walks tigu_prepare_goods in
+primary-key batches, parses each CSV with parse_order_id_list and inserts
+any mapping rows that are missing. Safe to re-run.
+
+Usage:
+    python -m app.workers.backfill_prepare_goods_orders [--batch-size 1000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.models.prepare_goods import PrepareGoods, PrepareGoodsOrder
+from app.utils import parse_order_id_list
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_prepare_goods_orders(session: AsyncSession, batch_size: int = 1000) -> int:
+    """
+    Insert missing order → package mapping rows for all prepare packages.
+
+    Args:
+        session: Database session
+        batch_size: Number of packages processed per transaction
+
+    Returns:
+        Number of mapping rows inserted
+    """
+    inserted = 0
+    last_id = 0
+
+    while True:
+        result = await session.execute(
+            select(PrepareGoods.id, PrepareGoods.order_ids)
+            .where(PrepareGoods.id > last_id)
+            .order_by(PrepareGoods.id)
+            .limit(batch_size)
+        )
+        packages = result.all()
+        if not packages:
+            break
+
+        last_id = packages[-1].id
+        prepare_ids = [pkg.id for pkg in packages]
+
+        existing_result = await session.execute(
+            select(PrepareGoodsOrder.prepare_id, PrepareGoodsOrder.order_id)
+            .where(PrepareGoodsOrder.prepare_id.in_(prepare_ids))
+        )
+        existing = set(existing_result.all())
+
+        now = datetime.now()
+        rows = []
+        for pkg in packages:
+            for order_id in dict.fromkeys(parse_order_id_list(pkg.order_ids or "")):
+                if (pkg.id, order_id) not in existing:
+                    rows.append({"prepare_id": pkg.id, "order_id": order_id, "create_time": now})
+
+        if rows:
+            await session.execute(insert(PrepareGoodsOrder), rows)
+            await session.commit()
+            inserted += len(rows)
+
+        logger.info("Backfilled packages up to id %s (%s rows so far)", last_id, inserted)
+
+    return inserted
+
+
+async def main(batch_size: int) -> None:
+    async with AsyncSessionLocal() as session:
+        inserted = await backfill_prepare_goods_orders(session, batch_size=batch_size)
+    logger.info("Backfill complete: %s mapping rows inserted", inserted)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill tigu_prepare_goods_order")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.batch_size))
@@ -0,0 +1,84 @@
+"""
+Backfill tigu_search_document from tigu_order and tigu_prepare_goods
+
+Orders and packages written before the search table existed (or by the
+shop system, outside the BFF workflow functions) have no search document.
+This job walks both tables in primary-key batches and upserts a document
+for every row, including rows without create_time/update_time, which the
+periodic app.workers.search_indexer cannot see. Safe to re-run.
+
+Usage:
+    python -m app.workers.backfill_search_documents [--batch-size 1000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.models.order import Order
+from app.models.prepare_goods import PrepareGoods
+from app.services import search_service
+
+logger = logging.getLogger(__name__)
+
+
+async def _backfill_table(session: AsyncSession, model: Any, index: Any, batch_size: int) -> int:
+    indexed = 0
+    last_id = 0
+
+    while True:
+        result = await session.execute(
+            select(model.id, model.receiver_name, model.receiver_phone)
+            .where(model.id > last_id)
+            .order_by(model.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        last_id = rows[-1].id
+        await index(session, rows)
+        await session.commit()
+        indexed += len(rows)
+
+        logger.info("Indexed %s up to id %s (%s rows so far)", model.__tablename__, last_id, indexed)
+
+    return indexed
+
+
+async def backfill_search_documents(session: AsyncSession, batch_size: int = 1000) -> int:
+    """
+    Upsert search documents for all orders and prepare packages.
+
+    Args:
+        session: Database session
+        batch_size: Number of rows processed per transaction
+
+    Returns:
+        Number of documents written
+    """
+    orders = await _backfill_table(session, Order, search_service.index_orders, batch_size)
+    packages = await _backfill_table(session, PrepareGoods, search_service.index_prepare_packages, batch_size)
+    return orders + packages
+
+
+async def main(batch_size: int) -> None:
+    async with AsyncSessionLocal() as session:
+        indexed = await backfill_search_documents(session, batch_size=batch_size)
+    logger.info("Backfill complete: %s search documents written", indexed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill tigu_search_document")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.batch_size))
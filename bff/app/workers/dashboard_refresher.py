@@ -0,0 +1,41 @@
+"""
+Periodic recompute of the cached admin dashboard counters.
+
+Every worker runs this loop, but a short Redis lock lets only one of them
+query MySQL per DASHBOARD_REFRESH_SECONDS. Each refresh also updates the
+current hour's snapshot (dashboard_service.get_dashboard_hourly). Started
+from app.main on startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.services import cache, dashboard_service
+
+logger = logging.getLogger(__name__)
+
+
+async def run_dashboard_refresher(interval_seconds: int | None = None) -> None:
+    """
+    Recompute dashboard counters every interval until cancelled.
+
+    Args:
+        interval_seconds: Seconds between runs (default DASHBOARD_REFRESH_SECONDS)
+    """
+    interval = interval_seconds or get_settings().dashboard_refresh_seconds
+
+    while True:
+        try:
+            # Lock expires just before the next tick so the next run can claim it
+            if await cache.claim_dashboard_refresh(ttl_seconds=max(1, interval - 1)):
+                async with AsyncSessionLocal() as session:
+                    await dashboard_service.refresh_dashboard_stats(session)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.warning("Dashboard refresh failed", exc_info=True)
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,39 @@
+"""
+Periodic full recompute of cached map mark order counts.
+
+Event-driven HINCRBY adjustments (marks_service.record_package_change) keep
+counts current between runs; this loop corrects any drift, e.g. from
+packages updated outside the BFF. Started from app.main on startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.services import marks_service
+
+logger = logging.getLogger(__name__)
+
+
+async def run_marks_count_refresher(interval_seconds: int | None = None) -> None:
+    """
+    Recompute mark order counts every interval until cancelled.
+
+    Args:
+        interval_seconds: Seconds between runs (default MARKS_COUNT_REFRESH_SECONDS)
+    """
+    interval = interval_seconds or get_settings().marks_count_refresh_seconds
+
+    while True:
+        try:
+            async with AsyncSessionLocal() as session:
+                counts = await marks_service.refresh_mark_counts(session)
+            logger.debug("Recomputed mark counts for %s locations", len(counts))
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.warning("Mark count refresh failed", exc_info=True)
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,129 @@
+"""
+Drain the notification outbox into the notification sink.
+
+Rows queued by notification_service are taken in batches of up to
+NOTIFICATION_OUTBOX_BATCH_SIZE and written with one bulk insert per batch.
+Failed batches are retried with exponential backoff; after
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS they are moved to the dead-letter list.
+Stored rows are pushed to their drivers through event_service.
+Started from app.main on startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.services import event_service, notification_outbox
+from app.services.notification_outbox import NotificationSink, OutboxQueue
+from app.utils import retry_delay
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for new rows before checking for cancellation again
+_TAKE_TIMEOUT_SECONDS = 1.0
+
+
+async def deliver_batch(
+    rows: List[Dict[str, Any]],
+    sink: NotificationSink,
+    queue: OutboxQueue,
+    max_attempts: int,
+    retry_base_seconds: float,
+    retry_max_seconds: float
+) -> List[Dict[str, Any]]:
+    """
+    Write one batch to the sink, retrying with backoff.
+
+    Args:
+        rows: Notification rows
+        sink: Destination
+        queue: Outbox queue (for dead-lettering)
+        max_attempts: Insert attempts before giving up
+        retry_base_seconds: First retry delay
+        retry_max_seconds: Retry delay cap
+
+    Returns:
+        Stored rows (empty if the batch was dead-lettered)
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            stored = await sink.insert(rows)
+        except asyncio.CancelledError:
+            await queue.put(rows)
+            raise
+        except Exception:  # noqa: BLE001
+            if attempt == max_attempts:
+                break
+            delay = retry_delay(attempt, retry_base_seconds, retry_max_seconds)
+            logger.warning(
+                "Notification batch of %s failed (attempt %s/%s), retrying in %.1fs",
+                len(rows), attempt, max_attempts, delay, exc_info=True
+            )
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                await queue.put(rows)
+                raise
+        else:
+            await event_service.publish_notifications(stored)
+            return stored
+
+    logger.error("Dead-lettering notification batch of %s after %s attempts", len(rows), max_attempts)
+    await queue.dead_letter(rows)
+    return []
+
+
+async def drain_once(
+    queue: OutboxQueue,
+    sink: NotificationSink,
+    batch_size: int,
+    timeout: float = 0.0
+) -> int:
+    """
+    Take and deliver a single batch.
+
+    Returns:
+        Number of rows taken from the queue
+    """
+    settings = get_settings()
+    rows = await queue.take(batch_size, timeout)
+    if rows:
+        await deliver_batch(
+            rows, sink, queue,
+            max_attempts=settings.notification_outbox_max_attempts,
+            retry_base_seconds=settings.notification_outbox_retry_base_seconds,
+            retry_max_seconds=settings.notification_outbox_retry_max_seconds
+        )
+    return len(rows)
+
+
+async def run_notification_outbox_worker(
+    queue: Optional[OutboxQueue] = None,
+    sink: Optional[NotificationSink] = None,
+    batch_size: int | None = None
+) -> None:
+    """
+    Drain the outbox until cancelled.
+
+    Args:
+        queue: Outbox queue (default notification_outbox.get_outbox_queue())
+        sink: Destination (default notification_outbox.get_notification_sink())
+        batch_size: Maximum rows per bulk insert (default NOTIFICATION_OUTBOX_BATCH_SIZE)
+    """
+    queue = queue or notification_outbox.get_outbox_queue()
+    sink = sink or notification_outbox.get_notification_sink()
+    if sink is None:
+        logger.info("Notification sink not configured; outbox worker not started")
+        return
+    batch_size = batch_size or get_settings().notification_outbox_batch_size
+
+    while True:
+        try:
+            await drain_once(queue, sink, batch_size, timeout=_TAKE_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.warning("Notification outbox drain failed", exc_info=True)
+            await asyncio.sleep(_TAKE_TIMEOUT_SECONDS)
@@ -0,0 +1,45 @@
+"""
+Process queued photo uploads.
+
+Upload sites queue the UploadedFile id after committing
+(photo_service.schedule_processing). This loop renders the display and
+thumbnail variants in the photo process pool. A photo that fails to process
+is logged and skipped; it keeps being served at its original URL. Started
+from app.main on startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.db.session import AsyncSessionLocal
+from app.services import cache, photo_service
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for new jobs before checking for cancellation again
+_POP_TIMEOUT_SECONDS = 1.0
+
+
+async def run_photo_processing_worker() -> None:
+    """Process queued photos until cancelled."""
+    while True:
+        try:
+            file_id = await cache.pop_photo_job(_POP_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.warning("Photo processing queue unavailable", exc_info=True)
+            await asyncio.sleep(_POP_TIMEOUT_SECONDS)
+            continue
+        if file_id is None:
+            continue
+
+        try:
+            async with AsyncSessionLocal() as session:
+                await photo_service.process_uploaded_file(session, file_id)
+        except asyncio.CancelledError:
+            await cache.push_photo_job(file_id)
+            raise
+        except Exception:  # noqa: BLE001
+            logger.error("Failed to process photo %s", file_id, exc_info=True)
@@ -0,0 +1,48 @@
+"""
+Evict invalidated principals from this worker's cache.
+
+principal_service.invalidate() deletes the shared Redis entries and
+publishes the user ids; this loop drops the matching in-process entries so a
+deactivated driver is rejected by every worker immediately. If the
+subscription drops, the whole local cache is cleared since invalidations may
+have been missed. Started from app.main on startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+
+from app.services import cache, principal_service
+
+logger = logging.getLogger(__name__)
+
+_RECONNECT_DELAY_SECONDS = 1.0
+
+
+async def run_principal_invalidation_listener() -> None:
+    """Apply principal invalidations until cancelled."""
+    while True:
+        pubsub = cache.redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(cache.PRINCIPAL_INVALIDATION_CHANNEL)
+            # Anything cached before the subscription was live may be stale
+            principal_service.clear_local()
+            async for message in pubsub.listen():
+                try:
+                    user_ids = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    logger.warning("Dropping malformed principal invalidation")
+                    continue
+                principal_service.evict_local(user_ids)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.warning("Principal invalidation subscription lost", exc_info=True)
+            principal_service.clear_local()
+            await asyncio.sleep(_RECONNECT_DELAY_SECONDS)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:  # noqa: BLE001
+                logger.debug("Error closing principal subscription", exc_info=True)
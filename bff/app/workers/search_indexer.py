@@ -0,0 +1,81 @@
+"""
+Periodic incremental indexing of tigu_search_document.
+
+Orders and packages are also written by the shop system, outside the BFF,
+so admin search cannot rely on the BFF's own writes. Every
+SEARCH_INDEX_INTERVAL_SECONDS one worker (short Redis lock) runs each
+search_service.SWEEPS sweep from its watermark minus
+SEARCH_INDEX_OVERLAP_SECONDS and stores the newest timestamp it indexed as
+the next watermark. Re-indexing the overlap is harmless (upserts).
+
+Without a watermark (first run) a sweep indexes every row that has the
+timestamp. Started from app.main on startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.services import cache, search_service
+
+logger = logging.getLogger(__name__)
+
+
+async def index_recent_changes(session: AsyncSession, overlap_seconds: int, batch_size: int) -> int:
+    """
+    Run every sweep once from its stored watermark.
+
+    Args:
+        session: Database session
+        overlap_seconds: How far before each watermark to start
+        batch_size: Rows per transaction
+
+    Returns:
+        Number of documents written
+    """
+    watermarks = await cache.get_search_index_watermarks()
+    overlap = timedelta(seconds=overlap_seconds)
+    total = 0
+
+    for sweep in search_service.SWEEPS:
+        watermark = watermarks.get(sweep)
+        indexed, newest = await search_service.index_changed_rows(
+            session, sweep, watermark - overlap if watermark else None, batch_size
+        )
+        if newest is not None and (watermark is None or newest > watermark):
+            await cache.store_search_index_watermark(sweep, newest)
+        total += indexed
+
+    return total
+
+
+async def run_search_indexer(interval_seconds: int | None = None) -> None:
+    """
+    Index created/updated orders and packages every interval until cancelled.
+
+    Args:
+        interval_seconds: Seconds between runs (default SEARCH_INDEX_INTERVAL_SECONDS)
+    """
+    settings = get_settings()
+    interval = interval_seconds or settings.search_index_interval_seconds
+
+    while True:
+        try:
+            # Lock expires just before the next tick so the next run can claim it
+            if await cache.claim_search_index_run(ttl_seconds=max(1, interval - 1)):
+                async with AsyncSessionLocal() as session:
+                    indexed = await index_recent_changes(
+                        session, settings.search_index_overlap_seconds, settings.search_index_batch_size
+                    )
+                logger.debug("Indexed %s search documents", indexed)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.warning("Search index sweep failed", exc_info=True)
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,76 @@
+"""
+Process queued Stripe webhook events.
+
+The webhook route verifies the signature, de-duplicates on the Stripe event
+id and queues the event (stripe_service.enqueue_webhook_event). This loop
+applies each event with StripeService.handle_webhook_event. Failures are
+requeued with exponential backoff; after STRIPE_WEBHOOK_MAX_ATTEMPTS the
+event is moved to the dead-letter list. Started from app.main on startup.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Dict
+
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal
+from app.services import cache
+from app.services.stripe_service import StripeService
+from app.utils import retry_delay
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for new events before checking for cancellation again
+_POP_TIMEOUT_SECONDS = 1.0
+_RETRY_BASE_SECONDS = 1.0
+_RETRY_MAX_SECONDS = 60.0
+
+
+async def process_webhook_envelope(envelope: Dict[str, Any]) -> bool:
+    """
+    Apply one queued event, requeueing or dead-lettering it on failure.
+
+    Args:
+        envelope: {"id": event id, "attempts": previous failures, "event": Stripe event}
+
+    Returns:
+        True if the event was applied
+    """
+    try:
+        async with AsyncSessionLocal() as session:
+            await StripeService(session).handle_webhook_event(envelope["event"])
+        return True
+    except asyncio.CancelledError:
+        await cache.push_stripe_webhook(envelope)
+        raise
+    except Exception:  # noqa: BLE001
+        attempts = envelope.get("attempts", 0) + 1
+        failed = {**envelope, "attempts": attempts}
+        if attempts >= get_settings().stripe_webhook_max_attempts:
+            logger.error("Dead-lettering Stripe webhook %s after %s attempts", envelope.get("id"), attempts, exc_info=True)
+            await cache.push_stripe_webhook(failed, dead_letter=True)
+            return False
+
+        delay = retry_delay(attempts, _RETRY_BASE_SECONDS, _RETRY_MAX_SECONDS)
+        logger.warning("Stripe webhook %s failed, retrying in %.0fs", envelope.get("id"), delay, exc_info=True)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            # Requeue even when cancelled mid-backoff so the event is not lost
+            await cache.push_stripe_webhook(failed)
+        return False
+
+
+async def run_stripe_webhook_worker() -> None:
+    """Process queued webhook events until cancelled."""
+    while True:
+        try:
+            envelope = await cache.pop_stripe_webhook(_POP_TIMEOUT_SECONDS)
+            if envelope:
+                await process_webhook_envelope(envelope)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # noqa: BLE001
+            logger.warning("Stripe webhook queue unavailable", exc_info=True)
+            await asyncio.sleep(_POP_TIMEOUT_SECONDS)
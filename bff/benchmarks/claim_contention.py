@@ -0,0 +1,144 @@
+"""
+Claim contention benchmark
+
+Fires N simultaneous claims for the same available package, each on its
+own connection, and checks that exactly one driver wins while the others
+are told the package is taken - without deadlocks, lock wait timeouts or
+latency piling up behind the winner's row lock.
+
+Runs against the MySQL at DATABASE_URL. A throwaway package is inserted per
+round and deleted afterwards; claiming drivers are taken from tigu_driver
+(driver_id is a foreign key), reused round-robin when N exceeds them.
+
+Usage:
+    python -m benchmarks.claim_contention [--claims 50] [--rounds 5]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import get_settings
+from app.models.driver import Driver
+from app.models.prepare_goods import PrepareGoods
+from app.services import prepare_goods_service
+from app.utils import generate_snowflake_id
+
+logger = logging.getLogger(__name__)
+
+
+async def _claim(
+    sessions: async_sessionmaker[AsyncSession],
+    start: asyncio.Event,
+    prepare_sn: str,
+    driver_id: int
+) -> Tuple[bool | None, float]:
+    async with sessions() as session:
+        # Check out the connection before the start signal
+        await session.connection()
+        await start.wait()
+        started = time.perf_counter()
+        try:
+            won: bool | None = await prepare_goods_service.claim_package(session, prepare_sn, driver_id)
+        except Exception:  # noqa: BLE001
+            logger.warning("Claim by driver %s failed", driver_id, exc_info=True)
+            won = None
+        return won, time.perf_counter() - started
+
+
+async def run_round(
+    sessions: async_sessionmaker[AsyncSession],
+    driver_ids: List[int],
+    claims: int
+) -> Tuple[int, int, List[float]]:
+    """
+    Race `claims` drivers for one fresh package.
+
+    Returns:
+        (winners, errors, per-claim latencies in seconds)
+    """
+    prepare_sn = f"BENCH{generate_snowflake_id()}"
+    async with sessions() as session:
+        session.add(PrepareGoods(
+            id=generate_snowflake_id(),
+            prepare_sn=prepare_sn,
+            order_ids="",
+            delivery_type=1,
+            shipping_type=0,
+            prepare_status=0,
+            shop_id=0,
+            create_time=datetime.now()
+        ))
+        await session.commit()
+
+    start = asyncio.Event()
+    tasks = [
+        asyncio.create_task(_claim(sessions, start, prepare_sn, driver_ids[i % len(driver_ids)]))
+        for i in range(claims)
+    ]
+    # Let every task check out its connection, then release them together
+    await asyncio.sleep(0.5)
+    start.set()
+    results = await asyncio.gather(*tasks)
+
+    async with sessions() as session:
+        await session.execute(delete(PrepareGoods).where(PrepareGoods.prepare_sn == prepare_sn))
+        await session.commit()
+
+    winners = sum(1 for won, _ in results if won)
+    errors = sum(1 for won, _ in results if won is None)
+    return winners, errors, [latency for _, latency in results]
+
+
+def _percentile(values: List[float], percentile: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[percentile - 1]
+
+
+async def main(claims: int, rounds: int) -> bool:
+    engine = create_async_engine(
+        get_settings().database_url, pool_size=claims, max_overflow=0, pool_pre_ping=True
+    )
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    ok = True
+
+    try:
+        async with sessions() as session:
+            driver_ids = list((await session.execute(select(Driver.id).limit(claims))).scalars().all())
+        if not driver_ids:
+            logger.error("tigu_driver is empty; create at least one driver first")
+            return False
+
+        for round_number in range(1, rounds + 1):
+            winners, errors, latencies = await run_round(sessions, driver_ids, claims)
+            ok = ok and winners == 1 and errors == 0
+            logger.info(
+                "Round %s: %s claims, %s winner(s), %s error(s), "
+                "latency p50 %.1f ms, p95 %.1f ms, max %.1f ms",
+                round_number, claims, winners, errors,
+                _percentile(latencies, 50) * 1000,
+                _percentile(latencies, 95) * 1000,
+                max(latencies) * 1000
+            )
+    finally:
+        await engine.dispose()
+
+    logger.info("%s", "PASS: exactly one winner per round" if ok else "FAIL")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent package claims")
+    parser.add_argument("--claims", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(0 if asyncio.run(main(args.claims, args.rounds)) else 1)
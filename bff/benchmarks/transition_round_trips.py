@@ -0,0 +1,121 @@
+"""
+Workflow transition round-trip benchmark
+
+Runs every order_service workflow transition (pickup, arrive at warehouse,
+warehouse receive, warehouse ship, complete delivery) against one existing
+order and reports, per transition, the statements sent to MySQL, the
+commits and the latency.
+
+Everything runs inside an outer transaction that is rolled back at the
+end: the service's commits only release savepoints, so the order and its
+actions are left untouched. Each release is reported as the commit round
+trip it stands for.
+
+Usage:
+    python -m benchmarks.transition_round_trips --order-sn ORD123 --driver-id 7 [--photo-id 99] [--repeat 20]
+
+The order must be in a PrepareGoods package; --photo-id (an uploaded file)
+adds the file link UPDATE to each transition.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import get_settings
+from app.services import order_service
+
+logger = logging.getLogger(__name__)
+
+Transition = Callable[[AsyncSession], Awaitable[bool]]
+
+
+class RoundTripCounter:
+    """Counts statements and savepoint releases (commits) on an engine."""
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+    def __call__(self, conn: Any, cursor: Any, statement: str, *args: Any) -> None:
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if verb == "RELEASE":
+            self.commits += 1
+        elif verb not in ("SAVEPOINT", "ROLLBACK"):
+            self.statements += 1
+
+
+def _transitions(order_sn: str, driver_id: int, photo_ids: List[int]) -> Dict[str, Transition]:
+    return {
+        "pickup_order": lambda s: order_service.pickup_order(s, order_sn, driver_id, photo_ids),
+        "arrive_warehouse": lambda s: order_service.arrive_warehouse(s, order_sn, driver_id, photo_ids),
+        "warehouse_receive": lambda s: order_service.warehouse_receive(s, order_sn, driver_id, photo_ids),
+        "warehouse_ship": lambda s: order_service.warehouse_ship(s, order_sn, driver_id, photo_ids),
+        "complete_delivery": lambda s: order_service.complete_delivery(s, order_sn, driver_id, photo_ids),
+    }
+
+
+async def main(order_sn: str, driver_id: int, photo_ids: List[int], repeat: int) -> bool:
+    engine = create_async_engine(get_settings().database_url, pool_size=1, max_overflow=0)
+    counter = RoundTripCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    ok = True
+
+    try:
+        async with engine.connect() as connection:
+            outer = await connection.begin()
+            session = AsyncSession(
+                bind=connection, expire_on_commit=False, join_transaction_mode="create_savepoint"
+            )
+            try:
+                for name, transition in _transitions(order_sn, driver_id, photo_ids).items():
+                    statements: List[int] = []
+                    commits: List[int] = []
+                    latencies: List[float] = []
+                    for _ in range(repeat):
+                        counter.reset()
+                        started = time.perf_counter()
+                        if not await transition(session):
+                            logger.error("%s: order %s not found or not held by driver %s",
+                                         name, order_sn, driver_id)
+                            return False
+                        latencies.append(time.perf_counter() - started)
+                        statements.append(counter.statements)
+                        commits.append(counter.commits)
+
+                    ok = ok and max(commits) == 1
+                    logger.info(
+                        "%-18s %s statements + %s commit(s) = %s round trips, mean %.2f ms",
+                        name, max(statements), max(commits), max(statements) + max(commits),
+                        statistics.mean(latencies) * 1000
+                    )
+            finally:
+                await session.close()
+                await outer.rollback()
+    finally:
+        await engine.dispose()
+
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count round trips per workflow transition")
+    parser.add_argument("--order-sn", required=True)
+    parser.add_argument("--driver-id", type=int, required=True)
+    parser.add_argument("--photo-id", type=int, action="append", default=[])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    raise SystemExit(0 if asyncio.run(main(args.order_sn, args.driver_id, args.photo_id, args.repeat)) else 1)
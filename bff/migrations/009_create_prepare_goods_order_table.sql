@@ -0,0 +1,18 @@
+-- Migration: Create order → prepare package mapping table
+-- Description: Indexed replacement for LIKE scans over tigu_prepare_goods.order_ids
+--              (CSV TEXT column; '%11%' also matched packages containing order 111).
+--              Populate existing rows with: python -m app.workers.backfill_prepare_goods_orders
+-- Author: System
+-- Date: 2025-12-01
+
+CREATE TABLE IF NOT EXISTS tigu_prepare_goods_order (
+    prepare_id BIGINT UNSIGNED NOT NULL COMMENT '备货单ID',
+    order_id BIGINT UNSIGNED NOT NULL COMMENT '订单ID',
+    create_time DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+
+    PRIMARY KEY (prepare_id, order_id),
+    INDEX idx_order_id (order_id),
+
+    FOREIGN KEY (prepare_id) REFERENCES tigu_prepare_goods(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='备货单订单关联表 (order → prepare package)';
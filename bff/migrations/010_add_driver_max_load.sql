@@ -0,0 +1,8 @@
+-- Migration: Add per-driver package capacity
+-- Description: Capacity used by auto-dispatch and the dispatch driver list.
+--              NULL falls back to DRIVER_DEFAULT_MAX_LOAD (10).
+-- Author: System
+-- Date: 2025-12-01
+
+ALTER TABLE tigu_driver
+    ADD COLUMN max_load INT NULL COMMENT 'Maximum active packages (NULL = default)' AFTER total_deliveries;
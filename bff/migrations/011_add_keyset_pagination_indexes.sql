@@ -0,0 +1,23 @@
+-- Migration: Composite indexes for keyset (cursor) pagination
+-- Description: Listings page with WHERE (create_time, id) < cursor
+--              ORDER BY create_time DESC, id DESC LIMIT n. Each index ends in
+--              (create_time, id) after the listing's equality filters, so any
+--              page is an index seek instead of a scan from the newest row.
+-- Author: System
+-- Date: 2025-12-01
+
+-- Admin package list (all / by status / by driver) and driver assigned list
+ALTER TABLE tigu_prepare_goods
+    ADD INDEX idx_create_time_id (create_time, id),
+    ADD INDEX idx_status_create_time_id (prepare_status, create_time, id),
+    ADD INDEX idx_driver_create_time_id (driver_id, create_time, id),
+    -- Merchant shop packages
+    ADD INDEX idx_shop_create_time_id (shop_id, create_time, id),
+    -- Driver pickup pool (prepare_status=0, delivery_type=1, driver_id IS NULL)
+    ADD INDEX idx_available_create_time_id (prepare_status, delivery_type, driver_id, create_time, id);
+
+-- Order listings (order_service.fetch_orders)
+ALTER TABLE tigu_order
+    ADD INDEX idx_create_time_id (create_time, id),
+    ADD INDEX idx_shipping_status_create_time_id (shipping_status, create_time, id),
+    ADD INDEX idx_driver_create_time_id (driver_id, create_time, id);
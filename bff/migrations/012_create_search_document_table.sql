@@ -0,0 +1,25 @@
+-- Migration: Create search document table for admin order/package lookups
+-- Description: Replaces ILIKE '%term%' scans over tigu_order / tigu_prepare_goods.
+--              Phones are stored as digits (and reversed digits for "last N digits"
+--              lookups) behind B-tree indexes; receiver names behind a FULLTEXT
+--              ngram index so Chinese names tokenize. order_sn / prepare_sn
+--              prefixes use the existing unique indexes on the base tables.
+--              Populate existing rows with: python -m app.workers.backfill_search_documents
+-- Author: System
+-- Date: 2025-12-01
+
+CREATE TABLE IF NOT EXISTS tigu_search_document (
+    entity_type INT NOT NULL COMMENT '实体类型: 1=订单, 2=备货单',
+    entity_id BIGINT UNSIGNED NOT NULL COMMENT '订单ID或备货单ID',
+    receiver_name VARCHAR(64) NULL COMMENT '收货人姓名 (FULLTEXT ngram)',
+    phone_digits VARCHAR(32) NULL COMMENT '收货人电话 (仅数字)',
+    phone_digits_rev VARCHAR(32) NULL COMMENT '收货人电话 (数字倒序, 用于尾号查询)',
+    update_time DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '更新时间',
+
+    PRIMARY KEY (entity_type, entity_id),
+    INDEX idx_phone_digits (entity_type, phone_digits),
+    INDEX idx_phone_digits_rev (entity_type, phone_digits_rev),
+    INDEX idx_receiver_name (entity_type, receiver_name),
+    FULLTEXT INDEX ft_receiver_name (receiver_name) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='订单/备货单搜索索引表';
@@ -0,0 +1,12 @@
+-- Migration: Indexes for the incremental search index sweeps
+-- Description: app.workers.search_indexer reads rows WHERE update_time >= watermark
+--              ORDER BY update_time, id in batches. create_time sweeps use the
+--              idx_create_time_id indexes from 011.
+-- Author: System
+-- Date: 2025-12-01
+
+ALTER TABLE tigu_order
+    ADD INDEX idx_update_time_id (update_time, id);
+
+ALTER TABLE tigu_prepare_goods
+    ADD INDEX idx_update_time_id (update_time, id);
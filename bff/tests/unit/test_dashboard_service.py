@@ -0,0 +1,98 @@
+"""
+Unit tests for dashboard_service
+
+Tests the admin dashboard counters:
+- All counters come from one conditional-aggregation query
+- Cached counters are served without touching MySQL
+- A cache miss computes once and records the hourly snapshot
+- Hourly snapshots are returned as points
+"""
+import time
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import dashboard_service
+
+COUNTERS = {
+    "total_drivers": 10,
+    "active_drivers": 7,
+    "total_orders": 40,
+    "pending_orders": 5,
+    "in_transit_orders": 15,
+    "completed_orders": 20,
+}
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session returning one counters row"""
+    session = AsyncMock(spec=AsyncSession)
+    row = MagicMock()
+    row._mapping = dict(COUNTERS)
+    result = MagicMock()
+    result.one.return_value = row
+    session.execute = AsyncMock(return_value=result)
+    return session
+
+
+@pytest.fixture
+def redis_cache(monkeypatch):
+    """Replace the Redis dashboard helpers"""
+    fake = MagicMock()
+    fake.get_dashboard_stats = AsyncMock(return_value=None)
+    fake.store_dashboard_stats = AsyncMock()
+    fake.get_dashboard_hourly = AsyncMock(return_value=[])
+    monkeypatch.setattr(dashboard_service, "cache", fake)
+    return fake
+
+
+def test_counters_query_is_single_conditional_aggregate():
+    """Every counter is a column of one SELECT using SUM(CASE ...)"""
+    sql = str(dashboard_service.dashboard_counters_query().compile(dialect=mysql.dialect()))
+
+    assert sql.count("SELECT") == 3  # outer select over two single-row aggregates
+    assert sql.count("CASE WHEN") == 4
+    for column in COUNTERS:
+        assert f"AS {column}" in sql
+
+
+@pytest.mark.asyncio
+async def test_cached_counters_skip_database(mock_session, redis_cache):
+    """Admins read the cached rollup"""
+    redis_cache.get_dashboard_stats.return_value = dict(COUNTERS, computed_at="2026-01-01T00:00:00+00:00")
+
+    stats = await dashboard_service.get_dashboard_stats(mock_session)
+
+    assert stats.completed_orders == 20
+    assert stats.completion_rate == 50
+    mock_session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cache_miss_computes_and_stores(mock_session, redis_cache):
+    """A miss runs the query once and stores current value and hourly snapshot"""
+    stats = await dashboard_service.get_dashboard_stats(mock_session)
+
+    assert stats.total_drivers == 10
+    assert stats.computed_at is not None
+    mock_session.execute.assert_awaited_once()
+    kwargs = redis_cache.store_dashboard_stats.await_args.kwargs
+    assert kwargs["hour_start"] % 3600 == 0
+
+
+@pytest.mark.asyncio
+async def test_hourly_points(redis_cache):
+    """Snapshots become points with their hour and completion rate"""
+    now = int(time.time())
+    hour = now - now % 3600
+    redis_cache.get_dashboard_hourly.return_value = [(hour - 3600, COUNTERS), (hour, COUNTERS)]
+
+    points = await dashboard_service.get_dashboard_hourly(hours=2)
+
+    assert redis_cache.get_dashboard_hourly.await_args.kwargs["since"] == hour - 3600
+    assert [int(point.hour.timestamp()) for point in points] == [hour - 3600, hour]
+    assert points[0].completion_rate == 50
@@ -0,0 +1,158 @@
+"""
+Unit tests for DispatchService
+
+Tests automatic package dispatch:
+- Min-cost assignment respects capacity and distance limits
+- Load penalty spreads packages across drivers
+- Dry run computes assignments without writing
+- Bulk write uses a single guarded UPDATE
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.prepare_goods import PrepareGoods
+from app.services import dispatch_service
+from app.services.dispatch_service import DispatchCandidate, solve_assignment
+
+
+def _driver(driver_id, lat, lng, load=0, capacity=10):
+    return DispatchCandidate(
+        driver_id=driver_id,
+        name=f"Driver {driver_id}",
+        latitude=lat,
+        longitude=lng,
+        current_load=load,
+        capacity=capacity
+    )
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock()
+    session.commit = AsyncMock()
+    return session
+
+
+def test_solve_assignment_nearest_driver():
+    """Each pickup goes to the closest driver when capacity allows"""
+    pickups = np.array([[43.70, -79.40], [43.80, -79.20]])
+    drivers = [_driver(1, 43.80, -79.21), _driver(2, 43.70, -79.41)]
+
+    matches = solve_assignment(pickups, drivers, max_distance_km=50, load_penalty_km=0)
+
+    assert sorted((p, d) for p, d, _ in matches) == [(0, 1), (1, 0)]
+
+
+def test_solve_assignment_respects_capacity():
+    """Drivers never receive more packages than their free capacity"""
+    pickups = np.array([[43.70, -79.40]] * 3)
+    drivers = [_driver(1, 43.70, -79.40, load=9, capacity=10), _driver(2, 43.75, -79.40)]
+
+    matches = solve_assignment(pickups, drivers, max_distance_km=50, load_penalty_km=0)
+
+    assigned = [d for _, d, _ in matches]
+    assert len(matches) == 3
+    assert assigned.count(0) == 1
+    assert assigned.count(1) == 2
+
+
+def test_solve_assignment_max_distance():
+    """Pickups beyond max distance stay unassigned"""
+    pickups = np.array([[43.70, -79.40], [45.50, -73.57]])  # Toronto, Montreal
+    drivers = [_driver(1, 43.70, -79.41)]
+
+    matches = solve_assignment(pickups, drivers, max_distance_km=50, load_penalty_km=0)
+
+    assert [(p, d) for p, d, _ in matches] == [(0, 0)]
+
+
+def test_solve_assignment_load_penalty_spreads_work():
+    """Load penalty moves work to a slightly farther idle driver"""
+    pickups = np.array([[43.70, -79.40]] * 2)
+    drivers = [_driver(1, 43.70, -79.40), _driver(2, 43.70, -79.41)]  # ~0.8 km apart
+
+    without_penalty = solve_assignment(pickups, drivers, max_distance_km=50, load_penalty_km=0)
+    with_penalty = solve_assignment(pickups, drivers, max_distance_km=50, load_penalty_km=2)
+
+    assert sorted(d for _, d, _ in without_penalty) == [0, 0]
+    assert sorted(d for _, d, _ in with_penalty) == [0, 1]
+
+
+def _package(package_id, shop_id):
+    return PrepareGoods(id=package_id, prepare_sn=f"PREP{package_id}", shop_id=shop_id, type=0)
+
+
+@pytest.fixture
+def dispatch_inputs(monkeypatch):
+    """Two packages at a known shop, one at an unknown shop, one nearby driver"""
+    monkeypatch.setattr(
+        dispatch_service.prepare_goods_service, "get_available_packages",
+        AsyncMock(return_value=[_package(1, 7), _package(2, 7), _package(3, 99)])
+    )
+    monkeypatch.setattr(
+        dispatch_service, "_load_candidates", AsyncMock(return_value=[_driver(5, 43.70, -79.41)])
+    )
+    monkeypatch.setattr(
+        dispatch_service, "_pickup_locations", AsyncMock(return_value=({"7": (43.70, -79.40)}, {}))
+    )
+    refresh = AsyncMock()
+    monkeypatch.setattr(dispatch_service.marks_service, "refresh_mark_counts", refresh)
+    monkeypatch.setattr(dispatch_service.event_service, "publish_packages_dispatched", AsyncMock())
+    return refresh
+
+
+@pytest.mark.asyncio
+async def test_auto_dispatch_dry_run(mock_session, dispatch_inputs):
+    """Dry run reports assignments and solve time without writing"""
+    result = await dispatch_service.auto_dispatch(mock_session, dry_run=True)
+
+    assert result.dry_run is True
+    assert result.package_count == 3
+    assert result.assigned_count == 2
+    assert result.written_count == 0
+    assert result.unassigned == ["PREP3"]
+    assert result.solve_time_ms >= 0
+    mock_session.execute.assert_not_called()
+    mock_session.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_auto_dispatch_bulk_write(mock_session, dispatch_inputs):
+    """Assignments are written with one UPDATE and one commit"""
+    mock_result = MagicMock()
+    mock_result.rowcount = 2
+    mock_session.execute.return_value = mock_result
+
+    result = await dispatch_service.auto_dispatch(mock_session)
+
+    assert result.written_count == 2
+    assert {a.prepare_sn for a in result.assignments} == {"PREP1", "PREP2"}
+    assert mock_session.execute.await_count == 1
+    sql = str(mock_session.execute.call_args[0][0])
+    assert sql.startswith("UPDATE tigu_prepare_goods")
+    assert "driver_id IS NULL" in sql
+    mock_session.commit.assert_awaited_once()
+    dispatch_inputs.assert_awaited_once()
+    dispatch_service.event_service.publish_packages_dispatched.assert_awaited_once_with(
+        {"PREP1": 5, "PREP2": 5}
+    )
+
+
+@pytest.mark.asyncio
+async def test_auto_dispatch_announces_only_written_rows(mock_session, dispatch_inputs):
+    """Packages claimed concurrently are not announced as dispatched"""
+    update_result = MagicMock()
+    update_result.rowcount = 1
+    rows = MagicMock()
+    rows.all.return_value = [(1, 5), (2, 8)]  # PREP2 was claimed by driver 8 meanwhile
+    mock_session.execute.side_effect = [update_result, rows]
+
+    result = await dispatch_service.auto_dispatch(mock_session)
+
+    assert result.written_count == 1
+    dispatch_service.event_service.publish_packages_dispatched.assert_awaited_once_with({"PREP1": 5})
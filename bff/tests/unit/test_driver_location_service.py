@@ -0,0 +1,106 @@
+"""
+Unit tests for driver location service
+
+Tests nearest-driver lookups for dispatch:
+- Ranking by GEO distance with current load
+- Skipping inactive/unknown and fully loaded drivers
+- Target coordinate resolution
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.driver import Driver
+from app.models.user import User
+from app.services import driver_location_service
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock()
+    return session
+
+
+def _driver(driver_id, user_id, name):
+    driver = Driver(
+        id=driver_id,
+        name=name,
+        phone=f"555{driver_id}",
+        status=1,
+        rating=4.5,
+        total_deliveries=10
+    )
+    user = User(user_id=user_id, nick_name=name)
+    return driver, user
+
+
+@pytest.fixture
+def geo_cache(monkeypatch):
+    """Patch Redis GEO helpers"""
+    monkeypatch.setattr(driver_location_service.cache, "prune_stale_driver_locations", AsyncMock(return_value=0))
+    nearby = AsyncMock()
+    monkeypatch.setattr(driver_location_service.cache, "find_nearby_driver_locations", nearby)
+    return nearby
+
+
+@pytest.mark.asyncio
+async def test_find_nearest_drivers_ranks_by_distance(mock_session, geo_cache):
+    """Drivers come back nearest first, skipping unknown and fully loaded ones"""
+    geo_cache.return_value = [
+        (11, 0.5, 43.70, -79.40),   # fully loaded
+        (99, 0.8, 43.71, -79.41),   # no active driver record
+        (12, 1.2, 43.72, -79.42),
+        (13, 3.4, 43.73, -79.43),
+    ]
+    rows = MagicMock()
+    rows.all.return_value = [
+        (*_driver(1, 11, "Busy"), 10),
+        (*_driver(2, 12, "Near"), 3),
+        (*_driver(3, 13, "Far"), 0),
+    ]
+    mock_session.execute.return_value = rows
+
+    drivers = await driver_location_service.find_nearest_drivers(mock_session, 43.7, -79.4, limit=5)
+
+    assert [(d.driver_id, d.distance_km, d.current_load) for d in drivers] == [(2, 1.2, 3), (3, 3.4, 0)]
+    assert drivers[0].current_location == "43.720000,-79.420000"
+    assert mock_session.execute.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_find_nearest_drivers_respects_limit(mock_session, geo_cache):
+    """Only the K nearest available drivers are returned"""
+    geo_cache.return_value = [(12, 1.2, 43.72, -79.42), (13, 3.4, 43.73, -79.43)]
+    rows = MagicMock()
+    rows.all.return_value = [(*_driver(2, 12, "Near"), 0), (*_driver(3, 13, "Far"), 0)]
+    mock_session.execute.return_value = rows
+
+    drivers = await driver_location_service.find_nearest_drivers(mock_session, 43.7, -79.4, limit=1)
+
+    assert [d.driver_id for d in drivers] == [2]
+    assert geo_cache.call_args.kwargs["count"] == 4
+
+
+@pytest.mark.asyncio
+async def test_find_nearest_drivers_no_positions(mock_session, geo_cache):
+    """No live positions means no database query"""
+    geo_cache.return_value = []
+
+    assert await driver_location_service.find_nearest_drivers(mock_session, 43.7, -79.4) == []
+    mock_session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_resolve_target_location_invalid_type(mock_session):
+    """Unknown target types are rejected"""
+    with pytest.raises(ValueError):
+        await driver_location_service.resolve_target_location(mock_session, "depot", 1)
+
+
+def test_format_location():
+    """Location hashes render as lat,lng"""
+    assert driver_location_service.format_location({"lat": "43.7", "lng": "-79.4"}) == "43.700000,-79.400000"
+    assert driver_location_service.format_location(None) is None
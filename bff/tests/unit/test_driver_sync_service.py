@@ -0,0 +1,184 @@
+"""
+Unit tests for driver_sync_service
+
+Tests the offline action sync:
+- One transaction per run of actions on the same package, one savepoint per action
+- Rejected actions become failed outcomes without stopping the queue
+- Idempotency keys: stored outcomes are replayed, running keys are pending
+- Only the newest location ping is stored
+- Keys are released when the transaction fails unexpectedly
+"""
+import pytest
+from unittest.mock import AsyncMock
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.driver_sync import DriverSyncAction
+from app.services import driver_sync_service
+from app.services.package_workflow_service import PackageChange
+
+
+def _action(key, type_, **fields):
+    return DriverSyncAction(idempotency_key=key, type=type_, **fields)
+
+
+def _change(prepare_sn, status):
+    return PackageChange(prepare_sn, {"driver_id": None, "prepare_status": 0}, {"prepare_status": status})
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.commit = AsyncMock()
+    return session
+
+
+@pytest.fixture
+def sync_cache(monkeypatch):
+    """Replace the Redis helpers used by the sync"""
+    cache = driver_sync_service.cache
+    mocks = {
+        "get_driver_sync_outcomes": AsyncMock(return_value={}),
+        "claim_driver_sync_action": AsyncMock(return_value=True),
+        "store_driver_sync_outcomes": AsyncMock(),
+        "release_driver_sync_actions": AsyncMock(),
+        "store_driver_location": AsyncMock(),
+    }
+    for name, mock in mocks.items():
+        monkeypatch.setattr(cache, name, mock)
+    return mocks
+
+
+@pytest.fixture
+def workflow(monkeypatch):
+    """Replace the package steps and post-commit announcements"""
+    service = driver_sync_service.package_workflow_service
+    mocks = {
+        "claim": AsyncMock(side_effect=lambda session, sn, driver_id: _change(sn, 6)),
+        "confirm_pickup": AsyncMock(side_effect=lambda session, sn, driver_id, **kw: _change(sn, 1)),
+        "confirm_delivery": AsyncMock(side_effect=lambda session, sn, driver_id, **kw: _change(sn, 7)),
+        "announce_changes": AsyncMock(),
+    }
+    for name, mock in mocks.items():
+        monkeypatch.setattr(service, name, mock)
+    return mocks
+
+
+@pytest.mark.asyncio
+async def test_applies_queue_per_package(mock_session, sync_cache, workflow):
+    """Actions on one package share a commit; a rejected step fails alone"""
+    workflow["confirm_delivery"].side_effect = HTTPException(status_code=409, detail="Package already delivered")
+    actions = [
+        _action("k1", "claim", prepare_sn="P1"),
+        _action("k2", "location", latitude=43.6, longitude=-79.3),
+        _action("k3", "confirm_pickup", prepare_sn="P1", photo_file_id=5),
+        _action("k4", "confirm_delivery", prepare_sn="P1", photo_file_id=6),
+        _action("k5", "location", latitude=43.7, longitude=-79.4),
+        _action("k6", "claim", prepare_sn="P2"),
+    ]
+
+    response = await driver_sync_service.sync_actions(mock_session, driver_id=7, user_id=70, actions=actions)
+
+    assert [(o.idempotency_key, o.result, o.status_code) for o in response.outcomes] == [
+        ("k1", "applied", 200),
+        ("k2", "superseded", 200),
+        ("k3", "applied", 200),
+        ("k4", "failed", 409),
+        ("k5", "applied", 200),
+        ("k6", "applied", 200),
+    ]
+    assert response.outcomes[3].detail == "Package already delivered"
+    assert mock_session.commit.await_count == 2
+    assert mock_session.begin_nested.call_count == 4
+    workflow["confirm_pickup"].assert_awaited_once_with(mock_session, "P1", 7, photo_file_id=5, photo=None)
+    assert [[c.prepare_sn for c in call.args[0]] for call in workflow["announce_changes"].await_args_list] == [
+        ["P1", "P1"], ["P2"]
+    ]
+    sync_cache["store_driver_location"].assert_awaited_once_with(70, 43.7, -79.4)
+    stored = sync_cache["store_driver_sync_outcomes"].await_args_list[0].args[1]
+    assert stored["k4"]["result"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_replays_stored_outcomes(mock_session, sync_cache, workflow):
+    """Known keys are answered without running the action again"""
+    sync_cache["get_driver_sync_outcomes"].return_value = {
+        "k1": {"idempotency_key": "k1", "type": "claim", "result": "applied", "status_code": 200},
+        "k2": driver_sync_service.cache.DRIVER_SYNC_PENDING,
+    }
+    actions = [
+        _action("k1", "claim", prepare_sn="P1"),
+        _action("k2", "confirm_pickup", prepare_sn="P1", photo_file_id=5),
+        _action("k3", "confirm_delivery", prepare_sn="P1", photo_file_id=6),
+        _action("k3", "confirm_delivery", prepare_sn="P1", photo_file_id=6),
+    ]
+
+    response = await driver_sync_service.sync_actions(mock_session, driver_id=7, user_id=70, actions=actions)
+
+    assert [(o.result, o.replayed) for o in response.outcomes] == [
+        ("applied", True), ("pending", False), ("applied", False), ("applied", True)
+    ]
+    workflow["claim"].assert_not_awaited()
+    workflow["confirm_pickup"].assert_not_awaited()
+    workflow["confirm_delivery"].assert_awaited_once()
+    sync_cache["claim_driver_sync_action"].assert_awaited_once_with(7, "k3", 120)
+
+
+@pytest.mark.asyncio
+async def test_arrive_warehouse_runs_alone(mock_session, sync_cache, workflow, monkeypatch):
+    """arrive_warehouse commits through order_service; a missing order fails"""
+    arrive = AsyncMock(return_value=False)
+    monkeypatch.setattr(driver_sync_service.order_service, "arrive_warehouse", arrive)
+
+    response = await driver_sync_service.sync_actions(
+        mock_session, driver_id=7, user_id=70,
+        actions=[_action("k1", "arrive_warehouse", order_sn="ORD1", photo_ids=[3])]
+    )
+
+    assert (response.outcomes[0].result, response.outcomes[0].status_code) == ("failed", 404)
+    arrive.assert_awaited_once_with(mock_session, "ORD1", 7, [3])
+    mock_session.commit.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_releases_keys(mock_session, sync_cache, workflow):
+    """Keys of the failed transaction are released so the queue can be re-sent"""
+    mock_session.commit.side_effect = RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError):
+        await driver_sync_service.sync_actions(
+            mock_session, driver_id=7, user_id=70,
+            actions=[_action("k1", "claim", prepare_sn="P1"), _action("k2", "claim", prepare_sn="P1")]
+        )
+
+    sync_cache["release_driver_sync_actions"].assert_awaited_once_with(7, ["k1", "k2"])
+    sync_cache["store_driver_sync_outcomes"].assert_not_awaited()
+    workflow["announce_changes"].assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_applies_without_redis(mock_session, sync_cache, workflow):
+    """Redis errors do not block the sync"""
+    sync_cache["get_driver_sync_outcomes"].side_effect = ConnectionError("redis down")
+    sync_cache["claim_driver_sync_action"].side_effect = ConnectionError("redis down")
+    sync_cache["store_driver_sync_outcomes"].side_effect = ConnectionError("redis down")
+
+    response = await driver_sync_service.sync_actions(
+        mock_session, driver_id=7, user_id=70, actions=[_action("k1", "claim", prepare_sn="P1")]
+    )
+
+    assert response.outcomes[0].result == "applied"
+    mock_session.commit.assert_awaited_once()
+
+
+def test_action_requires_type_fields():
+    """Each action type is validated like its single endpoint"""
+    with pytest.raises(ValidationError):
+        DriverSyncAction(idempotencyKey="k1", type="confirm_pickup", prepareSn="P1")
+    with pytest.raises(ValidationError):
+        DriverSyncAction(idempotencyKey="k1", type="location", latitude=43.6)
+    action = DriverSyncAction(idempotencyKey="k1", type="arrive_warehouse", orderSn="ORD1", photoIds=[3])
+    assert action.order_sn == "ORD1"
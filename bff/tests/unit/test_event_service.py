@@ -0,0 +1,136 @@
+"""
+Unit tests for EventService
+
+Tests server-push events:
+- Package updates map to pool and per-driver events
+- Publishing is batched and never raises
+- SSE stream framing and keepalives
+"""
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services import event_service
+from app.services.event_service import EventType
+
+
+def _state(**overrides):
+    state = {
+        "type": 0,
+        "prepare_status": 0,
+        "driver_id": None,
+        "delivery_type": 1,
+        "shipping_type": 0,
+        "shop_id": 7,
+        "warehouse_id": None,
+    }
+    state.update(overrides)
+    return state
+
+
+def _summary(messages):
+    return [(channel, event_type) for channel, event_type, _ in messages]
+
+
+def test_claim_removes_from_pool_and_notifies_driver():
+    """A claimed package leaves the pool and is announced to its driver"""
+    messages = event_service.package_change_events("PREP1", _state(), driver_id=5)
+
+    assert _summary(messages) == [
+        ("events:packages", EventType.PACKAGE_UNAVAILABLE),
+        ("events:driver:5", EventType.PACKAGE_ASSIGNED),
+    ]
+    assert messages[0][2] == {"prepareSn": "PREP1", "location": "shop:7"}
+
+
+def test_prepared_package_becomes_available():
+    """Merchant marking a package prepared announces it to every driver"""
+    messages = event_service.package_change_events("PREP1", _state(prepare_status=None), prepare_status=0)
+
+    assert _summary(messages) == [("events:packages", EventType.PACKAGE_AVAILABLE)]
+
+
+def test_status_change_goes_to_assigned_driver_only():
+    """Status changes of a claimed package only reach its driver"""
+    messages = event_service.package_change_events(
+        "PREP1", _state(prepare_status=6, driver_id=5), prepare_status=1
+    )
+
+    assert _summary(messages) == [("events:driver:5", EventType.PACKAGE_UPDATED)]
+    assert messages[0][2]["prepareStatus"] == 1
+
+
+def test_reassignment_notifies_both_drivers():
+    """Moving a package between drivers tells the previous driver too"""
+    messages = event_service.package_change_events(
+        "PREP1", _state(prepare_status=6, driver_id=5), driver_id=6
+    )
+
+    assert _summary(messages) == [
+        ("events:driver:6", EventType.PACKAGE_ASSIGNED),
+        ("events:driver:5", EventType.PACKAGE_UPDATED),
+    ]
+
+
+def test_unknown_package_has_no_events():
+    """Missing before-state produces nothing"""
+    assert event_service.package_change_events("PREP1", None, prepare_status=0) == []
+
+
+@pytest.mark.asyncio
+async def test_publish_batches_and_swallows_errors(monkeypatch):
+    """Events go out in one call and Redis failures never propagate"""
+    publish_messages = AsyncMock(side_effect=ConnectionError("redis down"))
+    monkeypatch.setattr(event_service.cache, "publish_messages", publish_messages)
+
+    await event_service.publish_notifications([
+        {"id": 1, "driver_id": 5, "title": "Hi"},
+        {"id": 2, "driver_id": None, "title": "Skipped"},
+        {"id": 3, "driver_id": 6, "title": "Hi"},
+    ])
+
+    publish_messages.assert_awaited_once()
+    sent = publish_messages.call_args[0][0]
+    assert [channel for channel, _ in sent] == ["events:driver:5", "events:driver:6"]
+    assert sent[0][1]["type"] == "notification"
+    assert sent[0][1]["data"]["id"] == 1
+
+
+@pytest.mark.asyncio
+async def test_publish_nothing_skips_redis(monkeypatch):
+    """Empty batches do not touch Redis"""
+    publish_messages = AsyncMock()
+    monkeypatch.setattr(event_service.cache, "publish_messages", publish_messages)
+
+    await event_service.publish_orders_assigned({5: []})
+
+    publish_messages.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_event_stream_frames(monkeypatch):
+    """Stream sends retry, a connect event, published events and keepalives"""
+    published = event_service.build_event(EventType.PACKAGE_ASSIGNED, {"prepareSn": "PREP1"})
+    pubsub = MagicMock()
+    pubsub.subscribe = AsyncMock()
+    pubsub.unsubscribe = AsyncMock()
+    pubsub.aclose = AsyncMock()
+    pubsub.get_message = AsyncMock(side_effect=[
+        {"channel": "events:driver:5", "data": json.dumps(published)},
+        {"channel": "events:driver:5", "data": "not json"},
+        None,
+    ])
+    monkeypatch.setattr(event_service.cache.redis, "pubsub", MagicMock(return_value=pubsub))
+
+    stream = event_service.event_stream(5, keepalive_seconds=0, retry_ms=3000)
+    frames = [await stream.__anext__() for _ in range(4)]
+    await stream.aclose()
+
+    assert frames[0] == "retry: 3000\n\n"
+    assert frames[1].startswith("event: packages.changed\n")
+    assert frames[2].startswith("event: package.assigned\n")
+    assert json.loads(frames[2].split("data: ", 1)[1])["data"] == {"prepareSn": "PREP1"}
+    assert frames[3] == ": keepalive\n\n"
+    pubsub.subscribe.assert_awaited_once_with("events:packages", "events:driver:5")
+    pubsub.aclose.assert_awaited_once()
@@ -0,0 +1,148 @@
+"""
+Unit tests for the Idempotency-Key middleware
+
+Tests replaying keyed mutating requests:
+- A retried request runs once and gets the recorded response
+- Reusing a key for a different request is rejected
+- A running key answers 409; failed requests release the key
+- Large (upload) bodies are not read when replaying
+- Requests without a key or token pass through
+"""
+import pytest
+from unittest.mock import AsyncMock
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, status
+
+from app.core.security import create_access_token
+from app.middleware import idempotency
+from app.middleware.idempotency import IdempotencyMiddleware
+
+
+class FakeRedis:
+    """In-memory stand-in for the idempotency cache helpers"""
+
+    def __init__(self):
+        self.keys = {}
+
+    async def get(self, subject, key):
+        return self.keys.get((subject, key))
+
+    async def claim(self, subject, key, ttl_seconds):
+        if (subject, key) in self.keys:
+            return False
+        self.keys[(subject, key)] = idempotency.cache.IDEMPOTENCY_PENDING
+        return True
+
+    async def store(self, subject, key, response, ttl_seconds):
+        self.keys[(subject, key)] = response
+
+    async def release(self, subject, key):
+        self.keys.pop((subject, key), None)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(idempotency.cache, "get_idempotent_response", fake.get)
+    monkeypatch.setattr(idempotency.cache, "claim_idempotency_key", fake.claim)
+    monkeypatch.setattr(idempotency.cache, "store_idempotent_response", fake.store)
+    monkeypatch.setattr(idempotency.cache, "release_idempotency_key", fake.release)
+    return fake
+
+
+@pytest.fixture
+def handler():
+    return AsyncMock(return_value={"id": "42"})
+
+
+@pytest.fixture
+def client(handler):
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware)
+
+    @app.post("/confirm", status_code=status.HTTP_201_CREATED)
+    async def confirm(request: Request):
+        body = await request.body()
+        return await handler(body)
+
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def _headers(key="key-1", subject="5"):
+    return {"Authorization": f"Bearer {create_access_token(subject)}", "Idempotency-Key": key}
+
+
+@pytest.mark.asyncio
+async def test_retry_replays_recorded_response(client, store, handler):
+    """The second attempt is answered from the store"""
+    first = await client.post("/confirm", json={"photoFileId": 1}, headers=_headers())
+    second = await client.post("/confirm", json={"photoFileId": 1}, headers=_headers())
+
+    assert (first.status_code, second.status_code) == (201, 201)
+    assert second.json() == {"id": "42"}
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    handler.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_key_scoped_to_request_and_subject(client, store, handler):
+    """A different body is rejected; another user's key is independent"""
+    await client.post("/confirm", json={"photoFileId": 1}, headers=_headers())
+
+    reused = await client.post("/confirm", json={"photoFileId": 2}, headers=_headers())
+    other_user = await client.post("/confirm", json={"photoFileId": 2}, headers=_headers(subject="6"))
+
+    assert reused.status_code == 422
+    assert other_user.status_code == 201
+    assert handler.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_running_key_conflicts(client, store, handler):
+    """A retry while the first attempt runs gets 409"""
+    store.keys[("5", "key-1")] = idempotency.cache.IDEMPOTENCY_PENDING
+
+    response = await client.post("/confirm", json={}, headers=_headers())
+
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "1"
+    handler.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_failure_releases_key(client, store, handler):
+    """Non-2xx responses are not recorded, so the retry runs again"""
+    handler.side_effect = [HTTPException(status_code=409, detail="Package already taken"), {"id": "42"}]
+
+    first = await client.post("/confirm", json={}, headers=_headers())
+    second = await client.post("/confirm", json={}, headers=_headers())
+
+    assert (first.status_code, second.status_code) == (409, 201)
+    assert handler.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_large_body_not_read_on_replay(client, store, handler):
+    """Uploads are fingerprinted by their headers and not re-read"""
+    photo = b"\xff\xd8" + b"0" * (idempotency.MAX_FINGERPRINT_BODY + 1)
+    headers = {**_headers(), "Content-Type": "image/jpeg"}
+
+    await client.post("/confirm", content=photo, headers=headers)
+    replay = await client.post("/confirm", content=photo, headers=headers)
+
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    handler.assert_awaited_once_with(photo)
+
+
+@pytest.mark.asyncio
+async def test_passes_through_without_key_or_token(client, store, handler):
+    """Only authenticated requests with a key are tracked"""
+    await client.post("/confirm", json={}, headers={"Authorization": _headers()["Authorization"]})
+    await client.post("/confirm", json={}, headers={"Idempotency-Key": "key-1"})
+    await client.post("/confirm", json={}, headers={"Idempotency-Key": "key-1"})
+
+    assert handler.await_count == 3
+    assert store.keys == {}
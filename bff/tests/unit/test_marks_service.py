@@ -0,0 +1,161 @@
+"""
+Unit tests for marks service
+
+Tests the Redis-backed map marks cache:
+- Which packages count towards shop/warehouse marks
+- Event-driven counter adjustments
+- Serving marks from the cache snapshot
+- Falling back to MySQL when Redis is unavailable
+"""
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import marks_service
+
+
+READY_SHOP_PACKAGE = {
+    "type": 0,
+    "prepare_status": 0,
+    "driver_id": None,
+    "delivery_type": 1,
+    "shipping_type": 1,
+    "shop_id": 7,
+    "warehouse_id": 3,
+}
+
+CACHED_MARKS = [
+    {
+        "id": 1,
+        "name": "Shop A",
+        "latitude": 43.7,
+        "longitude": -79.4,
+        "type": "Vendor",
+        "description": None,
+        "shop_id": "7",
+        "warehouse_id": None,
+        "is_active": True,
+        "created_at": "2025-11-01T00:00:00",
+        "updated_at": "2025-11-01T00:00:00",
+    },
+    {
+        "id": 2,
+        "name": "Warehouse B",
+        "latitude": 43.8,
+        "longitude": -79.5,
+        "type": "Warehouse",
+        "description": None,
+        "shop_id": None,
+        "warehouse_id": "3",
+        "is_active": False,
+        "created_at": "2025-11-01T00:00:00",
+        "updated_at": "2025-11-01T00:00:00",
+    },
+]
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock()
+    return session
+
+
+def test_mark_count_key_shop_package():
+    """Ready first-leg package counts towards its shop"""
+    assert marks_service.mark_count_key(READY_SHOP_PACKAGE) == "shop:7"
+
+
+def test_mark_count_key_warehouse_package():
+    """Ready second-leg package counts towards its warehouse"""
+    state = {**READY_SHOP_PACKAGE, "type": 1, "shipping_type": 0}
+    assert marks_service.mark_count_key(state) == "warehouse:3"
+
+
+@pytest.mark.parametrize("changes", [
+    {"driver_id": 5},
+    {"prepare_status": 6},
+    {"prepare_status": None},
+    {"delivery_type": 0},
+    {"type": 1, "shipping_type": 1},
+])
+def test_mark_count_key_not_available(changes):
+    """Claimed, unprepared or self-delivery packages don't count"""
+    assert marks_service.mark_count_key({**READY_SHOP_PACKAGE, **changes}) is None
+
+
+@pytest.mark.asyncio
+async def test_record_package_change_claim(monkeypatch):
+    """Driver claim decrements the shop counter"""
+    adjust = AsyncMock()
+    monkeypatch.setattr(marks_service.cache, "adjust_mark_counts", adjust)
+
+    await marks_service.record_package_change(READY_SHOP_PACKAGE, driver_id=5, prepare_status=6)
+
+    adjust.assert_awaited_once_with(decrement="shop:7", increment=None)
+
+
+@pytest.mark.asyncio
+async def test_record_package_change_prepared(monkeypatch):
+    """Package becoming ready increments the shop counter"""
+    adjust = AsyncMock()
+    monkeypatch.setattr(marks_service.cache, "adjust_mark_counts", adjust)
+
+    before = {**READY_SHOP_PACKAGE, "prepare_status": None}
+    await marks_service.record_package_change(before, prepare_status=0)
+
+    adjust.assert_awaited_once_with(decrement=None, increment="shop:7")
+
+
+@pytest.mark.asyncio
+async def test_record_package_change_no_op(monkeypatch):
+    """Changes that don't move a package between counters skip Redis"""
+    adjust = AsyncMock()
+    monkeypatch.setattr(marks_service.cache, "adjust_mark_counts", adjust)
+
+    await marks_service.record_package_change({**READY_SHOP_PACKAGE, "driver_id": 5}, prepare_status=1)
+    await marks_service.record_package_change(None, prepare_status=0)
+
+    adjust.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fetch_marks_from_cache(monkeypatch, mock_session):
+    """Cached snapshot is served without touching the database"""
+    snapshot = AsyncMock(return_value=(CACHED_MARKS, {"shop:7": "4", "_computed_at": "x"}))
+    monkeypatch.setattr(marks_service.cache, "get_marks_snapshot", snapshot)
+
+    marks = await marks_service.fetch_marks(mock_session, active_only=True)
+
+    assert [(m.id, m.order_count) for m in marks] == [(1, 4)]
+    assert marks[0].created_at == datetime(2025, 11, 1)
+    mock_session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_fetch_marks_redis_unavailable(monkeypatch, mock_session):
+    """Redis errors fall back to MySQL"""
+    monkeypatch.setattr(
+        marks_service.cache, "get_marks_snapshot", AsyncMock(side_effect=ConnectionError("down"))
+    )
+
+    mark_row = SimpleNamespace(
+        id=2, name="Warehouse B", latitude=43.8, longitude=-79.5, type="Warehouse",
+        description=None, shop_id=None, warehouse_id=3, is_active=1,
+        created_at=datetime(2025, 11, 1), updated_at=datetime(2025, 11, 1)
+    )
+    marks_result = MagicMock()
+    marks_result.fetchall.return_value = [mark_row]
+    shop_counts = MagicMock()
+    shop_counts.fetchall.return_value = []
+    warehouse_counts = MagicMock()
+    warehouse_counts.fetchall.return_value = [SimpleNamespace(location_id=3, order_count=2)]
+    mock_session.execute.side_effect = [marks_result, shop_counts, warehouse_counts]
+
+    marks = await marks_service.fetch_marks(mock_session)
+
+    assert [(m.id, m.warehouse_id, m.order_count) for m in marks] == [(2, "3", 2)]
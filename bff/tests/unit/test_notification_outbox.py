@@ -0,0 +1,137 @@
+"""
+Unit tests for the notification outbox
+
+Tests non-blocking notification delivery:
+- Creating notifications only enqueues
+- Worker drains in bulk batches
+- Retries with backoff and dead-lettering
+"""
+import pytest
+from unittest.mock import AsyncMock
+
+from app.services import notification_outbox, notification_service
+from app.services.notification_outbox import InMemoryNotificationSink, LocalOutboxQueue
+from app.services.notification_service import NotificationType
+from app.utils import retry_delay
+from app.workers import notification_outbox_worker
+from app.workers.notification_outbox_worker import deliver_batch, drain_once
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    """Local queue + in-memory sink in place of Redis and Supabase"""
+    queue = LocalOutboxQueue()
+    sink = InMemoryNotificationSink()
+    notification_outbox.set_outbox_queue(queue)
+    notification_outbox.set_notification_sink(sink)
+    publish = AsyncMock()
+    monkeypatch.setattr(notification_outbox_worker.event_service, "publish_notifications", publish)
+    yield queue, sink, publish
+    notification_outbox.set_outbox_queue(None)
+    notification_outbox.set_notification_sink(None)
+
+
+def _rows(count):
+    return [{"driver_id": idx, "driver_phone": f"555{idx}", "title": "Hi"} for idx in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_create_notification_only_enqueues(outbox):
+    """Callers return before anything reaches the sink"""
+    queue, sink, _ = outbox
+
+    notification = await notification_service.create_notification(
+        driver_id=5,
+        driver_phone="5555",
+        notification_type=NotificationType.ORDER_ASSIGNED,
+        title="New Order",
+        message="Deliver it"
+    )
+
+    assert notification["driver_id"] == 5
+    assert await queue.size() == 1
+    assert sink.insert_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_broadcast_enqueues_every_driver(outbox):
+    """Broadcast queues one row per driver"""
+    queue, _, _ = outbox
+
+    count = await notification_service.broadcast_notification(
+        driver_ids=[(1, "5551"), (2, "5552"), (3, "5553")],
+        notification_type=NotificationType.SYSTEM_ANNOUNCEMENT,
+        title="Notice",
+        message="Hello"
+    )
+
+    assert count == 3
+    assert await queue.size() == 3
+
+
+@pytest.mark.asyncio
+async def test_drain_writes_bulk_batches(outbox):
+    """Queued rows are written in batches and pushed to drivers"""
+    queue, sink, publish = outbox
+    await queue.put(_rows(250))
+
+    taken = [await drain_once(queue, sink, batch_size=100) for _ in range(3)]
+
+    assert taken == [100, 100, 50]
+    assert sink.insert_calls == 3
+    assert len(sink.rows) == 250
+    assert all("id" in row for row in sink.rows)
+    assert publish.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_deliver_batch_retries_then_succeeds(outbox):
+    """Transient sink failures are retried"""
+    queue, _, publish = outbox
+    sink = InMemoryNotificationSink(fail_times=2)
+
+    stored = await deliver_batch(
+        _rows(3), sink, queue, max_attempts=3, retry_base_seconds=0, retry_max_seconds=0
+    )
+
+    assert len(stored) == 3
+    assert sink.insert_calls == 3
+    assert queue.dead_letters == []
+    publish.assert_awaited_once_with(stored)
+
+
+@pytest.mark.asyncio
+async def test_deliver_batch_dead_letters_after_max_attempts(outbox):
+    """Batches that keep failing are moved aside instead of blocking the queue"""
+    queue, _, publish = outbox
+    sink = InMemoryNotificationSink(fail_times=5)
+
+    stored = await deliver_batch(
+        _rows(2), sink, queue, max_attempts=3, retry_base_seconds=0, retry_max_seconds=0
+    )
+
+    assert stored == []
+    assert sink.insert_calls == 3
+    assert len(queue.dead_letters) == 2
+    publish.assert_not_called()
+
+
+def test_retry_delay_backoff():
+    """Backoff doubles per attempt up to the cap"""
+    assert [retry_delay(attempt, 0.5, 3.0) for attempt in range(1, 6)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+@pytest.mark.asyncio
+async def test_create_notification_without_sink(monkeypatch):
+    """Without Supabase nothing is queued"""
+    monkeypatch.setattr(notification_outbox, "get_notification_sink", lambda: None)
+
+    notification = await notification_service.create_notification(
+        driver_id=5,
+        driver_phone="5555",
+        notification_type=NotificationType.SYSTEM_ALERT,
+        title="Alert",
+        message="Hello"
+    )
+
+    assert notification is None
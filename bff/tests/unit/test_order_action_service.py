@@ -327,13 +327,11 @@ async def test_get_workflow_timeline_success(mock_session):
         ),
     ]
 
-    # Mock files
-    mock_files1 = [
-        UploadedFile(id=1001, file_url="/uploads/photo1.jpg"),
-    ]
-    mock_files2 = [
-        UploadedFile(id=1002, file_url="/uploads/photo2.jpg"),
-        UploadedFile(id=1003, file_url="/uploads/photo3.jpg"),
+    # Mock files linked to the actions
+    mock_files = [
+        UploadedFile(id=1001, file_url="/uploads/photo1.jpg", biz_type="order_action", biz_id=5001),
+        UploadedFile(id=1002, file_url="/uploads/photo2.jpg", biz_type="order_action", biz_id=5002),
+        UploadedFile(id=1003, file_url="/uploads/photo3.jpg", biz_type="order_action", biz_id=5002),
     ]
 
     # Mock database queries
@@ -343,12 +341,9 @@ async def test_get_workflow_timeline_success(mock_session):
         if call_count[0] == 0:
             # First call: get_order_actions
             result.scalars().all.return_value = mock_actions
-        elif call_count[0] == 1:
-            # Second call: get_action_files for first action
-            result.scalars().all.return_value = mock_files1
         else:
-            # Third call: get_action_files for second action
-            result.scalars().all.return_value = mock_files2
+            # Second call: files of all actions at once
+            result.scalars().all.return_value = mock_files
         call_count[0] += 1
         return result
 
@@ -366,6 +361,50 @@ async def test_get_workflow_timeline_success(mock_session):
     assert len(result[0]["files"]) == 1
     assert result[1]["action_type"] == ActionType.DRIVER_PICKUP
     assert len(result[1]["files"]) == 2
+    assert mock_session.execute.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_get_workflow_timeline_compact(mock_session):
+    """Compact timeline lists voucher files in order with thumbnail URLs"""
+    mock_actions = [
+        OrderAction(
+            id=5001,
+            order_id=101,
+            action_type=ActionType.DRIVER_PICKUP,
+            logistics_voucher_file="1002,1001",
+            create_by=10,
+            create_time=datetime(2025, 11, 9, 11, 0, 0)
+        ),
+    ]
+    mock_files = [
+        UploadedFile(
+            id=1001,
+            file_url="/uploads/photo1.jpg",
+            extra_info={"variants": {"thumbnail": {"url": "/uploads/photo1_thumb.jpg"}}}
+        ),
+        UploadedFile(id=1002, file_url="/uploads/photo2.jpg"),
+    ]
+
+    actions_result = MagicMock()
+    actions_result.scalars().all.return_value = mock_actions
+    files_result = MagicMock()
+    files_result.scalars().all.return_value = mock_files
+    mock_session.execute.side_effect = [actions_result, files_result]
+
+    result = await order_action_service.get_workflow_timeline(
+        session=mock_session,
+        order_id=101,
+        compact=True
+    )
+
+    assert result == [{
+        "action_id": 5001,
+        "action_type": ActionType.DRIVER_PICKUP,
+        "create_time": "2025-11-09T11:00:00",
+        "file_ids": [1002, 1001],
+        "thumbnails": ["/uploads/photo2.jpg", "/uploads/photo1_thumb.jpg"]
+    }]
 
 
 @pytest.mark.asyncio
@@ -7,16 +7,17 @@ Tests the 4-workflow delivery system functions including:
 - warehouse_receive
 - warehouse_ship
 - complete_delivery
+- One transaction per transition: locked read, order UPDATE, file link, one commit
 """
 import pytest
-from datetime import datetime
-from unittest.mock import AsyncMock, MagicMock, call
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
 
+from sqlalchemy.dialects import mysql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services import order_service
-from app.models.order import Order
-from app.models.prepare_goods import PrepareGoods
+from app.models.order_action import OrderAction
 
 
 @pytest.fixture
@@ -25,61 +26,47 @@ def mock_session():
     session = AsyncMock(spec=AsyncSession)
     session.execute = AsyncMock()
     session.commit = AsyncMock()
+    session.add = MagicMock()
     return session
 
 
-@pytest.fixture
-def sample_order():
-    """Sample order"""
-    return Order(
-        id=101,
-        order_sn="ORD101",
-        shop_id=1,
-        shipping_type=0,
-        shipping_status=1,
-        order_status=1,
-        driver_id=None
-    )
+@pytest.fixture(autouse=True)
+def detail_cache(monkeypatch):
+    """Replace package detail invalidation (Redis)"""
+    invalidate = AsyncMock()
+    monkeypatch.setattr(order_service.package_detail_service, "invalidate_orders", invalidate)
+    return invalidate
 
 
-@pytest.fixture
-def sample_prepare_goods():
-    """Sample PrepareGoods package"""
-    return PrepareGoods(
-        id=1,
-        prepare_sn="PREP123456",
-        order_ids="101,102",
-        delivery_type=1,  # Third-party
-        shipping_type=0,  # To warehouse
-        shop_id=1,
-        warehouse_id=5
-    )
+def _order_row(shipping_type=0, order_status=1, **columns):
+    """Locked read result for order 101"""
+    row = SimpleNamespace(id=101, order_status=order_status, shipping_type=shipping_type, **columns)
+    result = MagicMock()
+    result.one_or_none.return_value = row
+    return result
 
 
-@pytest.mark.asyncio
-async def test_pickup_order_success(mock_session, sample_order, sample_prepare_goods):
-    """Test driver pickup order successfully"""
-    # Mock queries
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = sample_order
+def _not_found():
+    result = MagicMock()
+    result.one_or_none.return_value = None
+    return result
+
 
-    delivery_type_result = MagicMock()
-    delivery_type_result.scalar_one_or_none.return_value = 1  # Third-party
+def _sql(mock_session, index):
+    stmt = mock_session.execute.call_args_list[index].args[0]
+    return str(stmt.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
 
-    update_result = MagicMock()
-    update_result.rowcount = 1
 
-    action_order_result = MagicMock()
-    action_order_result.scalar_one_or_none.return_value = sample_order
+def _added_action(mock_session) -> OrderAction:
+    action = mock_session.add.call_args.args[0]
+    assert isinstance(action, OrderAction)
+    return action
 
-    # Set up side effects
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, delivery_type_result, update_result, action_order_result][call_count[0]]
-        call_count[0] += 1
-        return result
 
-    mock_session.execute.side_effect = side_effect
+@pytest.mark.asyncio
+async def test_pickup_order_success(mock_session, detail_cache):
+    """Test driver pickup order successfully"""
+    mock_session.execute.side_effect = [_order_row(delivery_type=1), MagicMock(), MagicMock()]
 
     # Pickup order
     result = await order_service.pickup_order(
@@ -91,27 +78,25 @@ async def test_pickup_order_success(mock_session, sample_order, sample_prepare_g
 
     # Verify result
     assert result is True
-    assert mock_session.commit.call_count >= 1
+    read = _sql(mock_session, 0)
+    assert "FOR UPDATE" in read
+    assert "tigu_prepare_goods.delivery_type" in read
+    update = _sql(mock_session, 1)
+    assert "driver_id=10" in update
+    assert "WHERE tigu_order.id = 101" in update
+    assert "tigu_uploaded_files" in _sql(mock_session, 2)
+
+    action = _added_action(mock_session)
+    assert (action.order_id, action.action_type, action.shipping_status) == (101, 1, 2)
+    assert action.logistics_voucher_file == "1001,1002"
+    mock_session.commit.assert_awaited_once()
+    detail_cache.assert_awaited_once_with([101])
 
 
 @pytest.mark.asyncio
-async def test_pickup_order_not_in_prepare_goods(mock_session, sample_order):
+async def test_pickup_order_not_in_prepare_goods(mock_session):
     """Test pickup order fails if not in PrepareGoods package"""
-    # Mock order query
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = sample_order
-
-    # Mock delivery_type query returning None (not in package)
-    delivery_type_result = MagicMock()
-    delivery_type_result.scalar_one_or_none.return_value = None
-
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, delivery_type_result][call_count[0]]
-        call_count[0] += 1
-        return result
-
-    mock_session.execute.side_effect = side_effect
+    mock_session.execute.side_effect = [_order_row(delivery_type=None)]
 
     # Pickup order should raise ValueError
     with pytest.raises(ValueError, match="not in any PrepareGoods package"):
@@ -122,14 +107,14 @@ async def test_pickup_order_not_in_prepare_goods(mock_session, sample_order):
             photo_ids=[1001]
         )
 
+    mock_session.add.assert_not_called()
+    mock_session.commit.assert_not_called()
+
 
 @pytest.mark.asyncio
 async def test_pickup_order_not_found(mock_session):
     """Test pickup order when order not found"""
-    # Mock order query returning None
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = None
-    mock_session.execute.return_value = order_result
+    mock_session.execute.return_value = _not_found()
 
     # Pickup order
     result = await order_service.pickup_order(
@@ -144,28 +129,9 @@ async def test_pickup_order_not_found(mock_session):
 
 
 @pytest.mark.asyncio
-async def test_arrive_warehouse_success(mock_session, sample_order):
+async def test_arrive_warehouse_success(mock_session):
     """Test driver arrives at warehouse successfully"""
-    # Update order to have driver assigned
-    sample_order.driver_id = 10
-
-    # Mock queries
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = sample_order
-
-    update_result = MagicMock()
-    update_result.rowcount = 1
-
-    action_order_result = MagicMock()
-    action_order_result.scalar_one_or_none.return_value = sample_order
-
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, update_result, action_order_result][call_count[0]]
-        call_count[0] += 1
-        return result
-
-    mock_session.execute.side_effect = side_effect
+    mock_session.execute.side_effect = [_order_row(), MagicMock(), MagicMock()]
 
     # Arrive at warehouse
     result = await order_service.arrive_warehouse(
@@ -177,16 +143,15 @@ async def test_arrive_warehouse_success(mock_session, sample_order):
 
     # Verify result
     assert result is True
-    assert mock_session.commit.call_count >= 1
+    assert "tigu_order.driver_id = 10" in _sql(mock_session, 0)
+    assert _added_action(mock_session).shipping_status == 3
+    mock_session.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
 async def test_arrive_warehouse_not_found(mock_session):
-    """Test arrive warehouse when order not found"""
-    # Mock order query returning None
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = None
-    mock_session.execute.return_value = order_result
+    """Test arrive warehouse when order not found (or held by another driver)"""
+    mock_session.execute.return_value = _not_found()
 
     # Arrive at warehouse
     result = await order_service.arrive_warehouse(
@@ -198,28 +163,14 @@ async def test_arrive_warehouse_not_found(mock_session):
 
     # Verify result
     assert result is False
+    mock_session.add.assert_not_called()
+    mock_session.commit.assert_not_called()
 
 
 @pytest.mark.asyncio
-async def test_warehouse_receive_success(mock_session, sample_order):
+async def test_warehouse_receive_success(mock_session):
     """Test warehouse receives goods successfully"""
-    # Mock queries
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = sample_order
-
-    update_result = MagicMock()
-    update_result.rowcount = 1
-
-    action_order_result = MagicMock()
-    action_order_result.scalar_one_or_none.return_value = sample_order
-
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, update_result, action_order_result][call_count[0]]
-        call_count[0] += 1
-        return result
-
-    mock_session.execute.side_effect = side_effect
+    mock_session.execute.side_effect = [_order_row(), MagicMock()]
 
     # Warehouse receive
     result = await order_service.warehouse_receive(
@@ -229,31 +180,19 @@ async def test_warehouse_receive_success(mock_session, sample_order):
         photo_ids=None  # Optional photos
     )
 
-    # Verify result
+    # Verify result: no photos, no file link UPDATE
     assert result is True
-    assert mock_session.commit.call_count >= 1
+    assert mock_session.execute.await_count == 2
+    action = _added_action(mock_session)
+    assert action.logistics_voucher_file is None
+    assert action.create_by == 20
+    mock_session.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
-async def test_warehouse_ship_success(mock_session, sample_order):
+async def test_warehouse_ship_success(mock_session):
     """Test warehouse ships to user successfully"""
-    # Mock queries
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = sample_order
-
-    update_result = MagicMock()
-    update_result.rowcount = 1
-
-    action_order_result = MagicMock()
-    action_order_result.scalar_one_or_none.return_value = sample_order
-
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, update_result, action_order_result][call_count[0]]
-        call_count[0] += 1
-        return result
-
-    mock_session.execute.side_effect = side_effect
+    mock_session.execute.side_effect = [_order_row(), MagicMock(), MagicMock()]
 
     # Warehouse ship
     result = await order_service.warehouse_ship(
@@ -265,29 +204,15 @@ async def test_warehouse_ship_success(mock_session, sample_order):
 
     # Verify result
     assert result is True
-    assert mock_session.commit.call_count >= 1
+    assert "warehouse_shipping_time" in _sql(mock_session, 1)
+    assert _added_action(mock_session).shipping_status == 5
+    mock_session.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
-async def test_complete_delivery_success(mock_session, sample_order):
+async def test_complete_delivery_success(mock_session):
     """Test complete delivery successfully"""
-    # Mock queries
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = sample_order
-
-    update_result = MagicMock()
-    update_result.rowcount = 1
-
-    action_order_result = MagicMock()
-    action_order_result.scalar_one_or_none.return_value = sample_order
-
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, update_result, action_order_result][call_count[0]]
-        call_count[0] += 1
-        return result
-
-    mock_session.execute.side_effect = side_effect
+    mock_session.execute.side_effect = [_order_row(), MagicMock(), MagicMock()]
 
     # Complete delivery
     result = await order_service.complete_delivery(
@@ -299,16 +224,15 @@ async def test_complete_delivery_success(mock_session, sample_order):
 
     # Verify result
     assert result is True
-    assert mock_session.commit.call_count >= 1
+    action = _added_action(mock_session)
+    assert (action.action_type, action.shipping_status) == (5, 6)
+    mock_session.commit.assert_awaited_once()
 
 
 @pytest.mark.asyncio
 async def test_complete_delivery_not_found(mock_session):
     """Test complete delivery when order not found"""
-    # Mock order query returning None
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = None
-    mock_session.execute.return_value = order_result
+    mock_session.execute.return_value = _not_found()
 
     # Complete delivery
     result = await order_service.complete_delivery(
@@ -329,36 +253,9 @@ async def test_workflow_1_merchant_to_user(mock_session):
     # Status flow: 0 → 1 → 6 → 7
     # Functions used: pickup_order (merchant), complete_delivery
 
-    order = Order(
-        id=101,
-        order_sn="ORD101",
-        shop_id=1,
-        shipping_type=1,  # To user
-        shipping_status=0,
-        order_status=1
-    )
-
-    # Mock for pickup (merchant self-delivery)
     # Note: In this workflow, merchant delivers, so "pickup" might be different
     # But for testing, we'll test complete_delivery which works for all workflows
-
-    # Mock complete delivery
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = order
-
-    update_result = MagicMock()
-    update_result.rowcount = 1
-
-    action_order_result = MagicMock()
-    action_order_result.scalar_one_or_none.return_value = order
-
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, update_result, action_order_result][call_count[0]]
-        call_count[0] += 1
-        return result
-
-    mock_session.execute.side_effect = side_effect
+    mock_session.execute.side_effect = [_order_row(shipping_type=1), MagicMock(), MagicMock()]
 
     # Complete delivery (final step for workflow 1)
     result = await order_service.complete_delivery(
@@ -369,6 +266,7 @@ async def test_workflow_1_merchant_to_user(mock_session):
     )
 
     assert result is True
+    assert _added_action(mock_session).shipping_type == 1
 
 
 @pytest.mark.asyncio
@@ -378,33 +276,8 @@ async def test_workflow_2_full_chain(mock_session):
     # Status flow: 0 → 1 → 2 → 3 → 4 → 5 → 6 → 7
     # All workflow functions used
 
-    order = Order(
-        id=101,
-        order_sn="ORD101",
-        shop_id=1,
-        shipping_type=0,  # To warehouse
-        shipping_status=2,
-        order_status=1,
-        driver_id=10
-    )
-
     # Test arrive_warehouse (step in workflow 2)
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = order
-
-    update_result = MagicMock()
-    update_result.rowcount = 1
-
-    action_order_result = MagicMock()
-    action_order_result.scalar_one_or_none.return_value = order
-
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, update_result, action_order_result][call_count[0]]
-        call_count[0] += 1
-        return result
-
-    mock_session.execute.side_effect = side_effect
+    mock_session.execute.side_effect = [_order_row(shipping_type=0), MagicMock(), MagicMock()]
 
     result = await order_service.arrive_warehouse(
         session=mock_session,
@@ -423,33 +296,8 @@ async def test_workflow_3_direct_delivery(mock_session):
     # Status flow: 0 → 1 → 2 → 6 → 7
     # Functions used: pickup_order, complete_delivery
 
-    order = Order(
-        id=101,
-        order_sn="ORD101",
-        shop_id=1,
-        shipping_type=1,  # To user
-        shipping_status=2,
-        order_status=1,
-        driver_id=10
-    )
-
     # Test complete_delivery (final step for workflow 3)
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = order
-
-    update_result = MagicMock()
-    update_result.rowcount = 1
-
-    action_order_result = MagicMock()
-    action_order_result.scalar_one_or_none.return_value = order
-
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, update_result, action_order_result][call_count[0]]
-        call_count[0] += 1
-        return result
-
-    mock_session.execute.side_effect = side_effect
+    mock_session.execute.side_effect = [_order_row(shipping_type=1), MagicMock(), MagicMock()]
 
     result = await order_service.complete_delivery(
         session=mock_session,
@@ -468,32 +316,8 @@ async def test_workflow_4_warehouse_only(mock_session):
     # Status flow: 0 → 1 → 2 → 3 → 4
     # Functions used: arrive_warehouse, warehouse_receive
 
-    order = Order(
-        id=101,
-        order_sn="ORD101",
-        shop_id=1,
-        shipping_type=0,  # To warehouse
-        shipping_status=3,
-        order_status=1
-    )
-
     # Test warehouse_receive (final step for workflow 4)
-    order_result = MagicMock()
-    order_result.scalar_one_or_none.return_value = order
-
-    update_result = MagicMock()
-    update_result.rowcount = 1
-
-    action_order_result = MagicMock()
-    action_order_result.scalar_one_or_none.return_value = order
-
-    call_count = [0]
-    def side_effect(stmt):
-        result = [order_result, update_result, action_order_result][call_count[0]]
-        call_count[0] += 1
-        return result
-
-    mock_session.execute.side_effect = side_effect
+    mock_session.execute.side_effect = [_order_row(shipping_type=0), MagicMock()]
 
     result = await order_service.warehouse_receive(
         session=mock_session,
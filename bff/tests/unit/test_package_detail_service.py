@@ -0,0 +1,235 @@
+"""
+Unit tests for package_detail_service
+
+Tests the shared package detail assembler:
+- Independent queries run on their own sessions, photos keep their order
+- Second-leg packages show warehouse receipt photos
+- Cached details skip MySQL; misses are stored with their package/order refs
+- A detail invalidated while it is assembled is not stored
+- Invalidation failures never reach the caller
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import UploadedFile
+from app.models.prepare_goods import PrepareGoods, PrepareGoodsItem
+from app.services import package_detail_service
+
+CREATED = datetime(2025, 11, 30, 18, 0, 0)
+
+
+def _photo(file_id, url):
+    return UploadedFile(
+        id=file_id, file_name=f"{file_id}.jpeg", file_url=url, file_type="image/jpeg",
+        file_size=10, uploader_name="Driver", create_time=CREATED, extra_info=None
+    )
+
+
+def _package(package_type=0):
+    package = PrepareGoods(
+        id=1, prepare_sn="PREP1", order_ids="101,102", delivery_type=1, shipping_type=0,
+        prepare_status=0, shop_id=7, type=package_type, create_time=CREATED
+    )
+    package.items = [PrepareGoodsItem(prepare_id=1, order_item_id=11, product_id=21, sku_id=31, quantity=2)]
+    package.warehouse = None
+    package.driver = None
+    return package
+
+
+def _result(rows):
+    result = MagicMock()
+    result.scalars.return_value.first.return_value = rows[0] if rows else None
+    result.scalars.return_value.all.return_value = rows
+    return result
+
+
+@pytest.fixture
+def mock_session():
+    """Session returning the package"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock(return_value=_result([_package()]))
+    return session
+
+
+@pytest.fixture
+def query_sessions():
+    """Session factory answering the concurrent queries by statement"""
+    statements = []
+
+    async def execute(stmt):
+        sql = str(stmt)
+        statements.append(sql)
+        if "tigu_order.order_sn" in sql:
+            return _result(["ORD101", "ORD102"])
+        if "logistics_voucher_file" in sql:
+            return _result(["902", "901,x"])
+        if "WHERE tigu_uploaded_files.biz_type" in sql:
+            return _result([_photo(900, "/p/900.jpeg")])
+        return _result([_photo(901, "/p/901.jpeg"), _photo(902, "/p/902.jpeg")])
+
+    @asynccontextmanager
+    async def factory():
+        session = AsyncMock(spec=AsyncSession)
+        session.execute = AsyncMock(side_effect=execute)
+        yield session
+
+    factory.statements = statements
+    return factory
+
+
+class FakePackageCache:
+    """In-memory stand-in for the package detail cache helpers"""
+
+    def __init__(self):
+        self.details = {}
+        self.versions = {}
+        self.refs = {}
+
+    async def get_package_detail(self, prepare_sn, variant):
+        return self.details.get((prepare_sn, variant))
+
+    async def get_package_detail_version(self, prepare_sn):
+        return str(self.versions.get(prepare_sn, 0))
+
+    async def register_package_detail_refs(self, prepare_sn, package_id, order_ids, ttl_seconds):
+        for ref in [("package", package_id)] + [("order", order_id) for order_id in order_ids]:
+            self.refs.setdefault(ref, set()).add(prepare_sn)
+
+    async def store_package_detail(self, prepare_sn, variant, detail, ttl_seconds, version):
+        if str(self.versions.get(prepare_sn, 0)) != version:
+            return False
+        self.details[(prepare_sn, variant)] = detail
+        return True
+
+    async def invalidate_package_details(self, prepare_sns=None, package_ids=None, order_ids=None):
+        refs = [("package", package_id) for package_id in package_ids or []]
+        refs += [("order", order_id) for order_id in order_ids or []]
+        sns = set(prepare_sns or [])
+        for ref in refs:
+            sns.update(self.refs.pop(ref, set()))
+        for sn in sns:
+            self.versions[sn] = self.versions.get(sn, 0) + 1
+        self.details = {key: value for key, value in self.details.items() if key[0] not in sns}
+
+
+@pytest.fixture
+def redis_cache(monkeypatch):
+    """Replace the Redis package detail helpers"""
+    fake = MagicMock()
+    fake.get_package_detail = AsyncMock(return_value=None)
+    fake.get_package_detail_version = AsyncMock(return_value="3")
+    fake.register_package_detail_refs = AsyncMock()
+    fake.store_package_detail = AsyncMock(return_value=True)
+    fake.invalidate_package_details = AsyncMock()
+    monkeypatch.setattr(package_detail_service, "cache", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_assemble_detail(mock_session, query_sessions):
+    """Package photos come first, then the vouchers of the orders' actions"""
+    detail = await package_detail_service.assemble_package_detail(
+        mock_session, "PREP1", session_factory=query_sessions
+    )
+
+    assert detail.order_serial_numbers == ["ORD101", "ORD102"]
+    assert [photo.id for photo in detail.pickup_photos] == [900, 901, 902]
+    assert detail.items[0].quantity == 2
+    mock_session.execute.assert_awaited_once()
+    assert len(query_sessions.statements) == 4
+
+
+@pytest.mark.asyncio
+async def test_missing_package(mock_session, query_sessions):
+    """Unknown serial numbers return None without further queries"""
+    mock_session.execute.return_value = _result([])
+
+    assert await package_detail_service.assemble_package_detail(
+        mock_session, "NOPE", session_factory=query_sessions
+    ) is None
+    assert query_sessions.statements == []
+
+
+def test_photo_action_types():
+    """Second-leg packages show warehouse receipt photos, first-leg shop photos"""
+    assert package_detail_service.photo_action_types(1) == [3, 5]
+    assert package_detail_service.photo_action_types(0) == [0, 5]
+    assert package_detail_service.photo_action_types(None) == [0, 5]
+
+
+@pytest.mark.asyncio
+async def test_cached_detail_skips_database(mock_session, query_sessions, redis_cache):
+    """A cached detail is served as is"""
+    detail = await package_detail_service.assemble_package_detail(
+        mock_session, "PREP1", session_factory=query_sessions
+    )
+    redis_cache.get_package_detail.return_value = detail.model_dump(mode="json")
+    mock_session.execute.reset_mock()
+
+    cached = await package_detail_service.get_package_detail(mock_session, "PREP1", "display")
+
+    assert cached == detail
+    redis_cache.get_package_detail.assert_awaited_once_with("PREP1", "display")
+    mock_session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cache_miss_stores_with_refs(mock_session, query_sessions, redis_cache):
+    """A miss is indexed by package and order ids, then stored against the version read first"""
+    detail = await package_detail_service.get_package_detail(
+        mock_session, "PREP1", session_factory=query_sessions
+    )
+
+    assert detail.prepare_sn == "PREP1"
+    assert redis_cache.register_package_detail_refs.await_args.args == ("PREP1", 1, [101, 102])
+    args, kwargs = redis_cache.store_package_detail.await_args
+    assert args[:2] == ("PREP1", "thumbnail")
+    assert args[2]["prepare_sn"] == "PREP1"
+    assert kwargs["version"] == "3"
+
+
+@pytest.mark.asyncio
+async def test_invalidation_during_assembly_is_not_overwritten(
+    mock_session, query_sessions, monkeypatch
+):
+    """An order action committed between building and storing the detail wins"""
+    fake = FakePackageCache()
+    monkeypatch.setattr(package_detail_service, "cache", fake)
+    invalidated = []
+
+    @asynccontextmanager
+    async def racing_sessions():
+        # The order action commits while the related rows are being read
+        if not invalidated:
+            invalidated.append(True)
+            await package_detail_service.invalidate_orders([101])
+        async with query_sessions() as session:
+            yield session
+
+    detail = await package_detail_service.get_package_detail(
+        mock_session, "PREP1", session_factory=racing_sessions
+    )
+
+    assert detail.prepare_sn == "PREP1"
+    assert fake.versions == {"PREP1": 1}
+    assert fake.details == {}
+
+    await package_detail_service.get_package_detail(mock_session, "PREP1", session_factory=query_sessions)
+
+    assert list(fake.details) == [("PREP1", "thumbnail")]
+
+
+@pytest.mark.asyncio
+async def test_invalidation_errors_are_swallowed(redis_cache):
+    """Redis outages never fail the mutation that invalidates"""
+    redis_cache.invalidate_package_details.side_effect = ConnectionError("down")
+
+    await package_detail_service.invalidate(["PREP1"])
+    await package_detail_service.invalidate_orders([101])
+
+    assert redis_cache.invalidate_package_details.await_args.kwargs == {"order_ids": [101]}
@@ -0,0 +1,82 @@
+"""
+Unit tests for keyset pagination
+
+Tests the (create_time, id) cursor helpers:
+- Cursors round-trip and reject tampering
+- Pages seek past the cursor in index order
+- The next cursor is only issued for full pages
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql
+
+from app.api import deps
+from app.models.prepare_goods import PrepareGoods
+from app.utils import PageCursor, apply_keyset, decode_cursor, encode_cursor, next_cursor
+
+CREATED = datetime(2025, 11, 30, 18, 5, 7)
+
+
+def test_cursor_round_trip():
+    """Encoded cursors decode to the same position"""
+    cursor = encode_cursor(CREATED, 1234567890123456789)
+
+    assert decode_cursor(cursor) == PageCursor(create_time=CREATED, id=1234567890123456789)
+    assert "=" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", encode_cursor(CREATED, 1)[:-3] + "@@@"])
+def test_malformed_cursor_rejected(cursor):
+    """Malformed cursors raise ValueError, surfaced as 400 by the dependency"""
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+    if cursor:
+        with pytest.raises(HTTPException) as exc_info:
+            deps.get_page_cursor(cursor)
+        assert exc_info.value.status_code == 400
+
+
+def test_apply_keyset_seeks_after_cursor():
+    """The page starts strictly after the cursor, newest first with id as tie-breaker"""
+    stmt = apply_keyset(
+        select(PrepareGoods.id), PrepareGoods.create_time, PrepareGoods.id, PageCursor(CREATED, 42)
+    )
+
+    sql = str(stmt.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    assert "tigu_prepare_goods.create_time < '2025-11-30 18:05:07'" in sql
+    assert "tigu_prepare_goods.create_time = '2025-11-30 18:05:07' AND tigu_prepare_goods.id < 42" in sql
+    assert "tigu_prepare_goods.create_time IS NULL" in sql
+    assert sql.endswith("ORDER BY tigu_prepare_goods.create_time DESC, tigu_prepare_goods.id DESC")
+
+
+def test_first_page_has_no_filter():
+    """Without a cursor only the ordering is applied"""
+    stmt = apply_keyset(select(PrepareGoods.id), PrepareGoods.create_time, PrepareGoods.id, None)
+
+    assert "WHERE" not in str(stmt)
+
+
+def test_next_cursor_only_for_full_pages():
+    """A short page is the last page"""
+    rows = [SimpleNamespace(create_time=CREATED, id=i) for i in (3, 2)]
+
+    assert next_cursor(rows, limit=3) is None
+    assert next_cursor([], limit=0) is None
+    assert decode_cursor(next_cursor(rows, limit=2)) == PageCursor(CREATED, 2)
+
+
+def test_null_create_time_pages():
+    """Rows without create_time get a cursor and are paged after all others"""
+    cursor = next_cursor([SimpleNamespace(create_time=None, id=7)], limit=1)
+
+    assert decode_cursor(cursor) == PageCursor(None, 7)
+
+    stmt = apply_keyset(select(PrepareGoods.id), PrepareGoods.create_time, PrepareGoods.id, PageCursor(None, 7))
+    sql = str(stmt.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+    assert "tigu_prepare_goods.create_time IS NULL AND tigu_prepare_goods.id < 7" in sql
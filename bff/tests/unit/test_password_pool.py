@@ -0,0 +1,78 @@
+"""
+Unit tests for the password hashing pool
+
+Tests that bcrypt runs off the event loop:
+- Hash and verify run on the bounded pool threads
+- Calls beyond workers + queue are rejected immediately
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.core import security
+
+
+class _Settings:
+    password_hash_workers = 1
+    password_hash_max_queue = 1
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    """One worker thread and one queue slot"""
+    monkeypatch.setattr(security, "get_settings", lambda: _Settings())
+    security.shutdown_password_executor()
+    yield
+    security.shutdown_password_executor()
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_run_on_pool(small_pool, monkeypatch):
+    """Async helpers run the bcrypt calls on the password threads"""
+    threads = []
+
+    def fake_hash(password):
+        threads.append(threading.current_thread().name)
+        return f"hashed:{password}"
+
+    def fake_verify(password, hashed):
+        threads.append(threading.current_thread().name)
+        return hashed == f"hashed:{password}"
+
+    monkeypatch.setattr(security, "get_password_hash", fake_hash)
+    monkeypatch.setattr(security, "verify_password", fake_verify)
+
+    hashed = await security.get_password_hash_async("s3cret")
+
+    assert await security.verify_password_async("s3cret", hashed) is True
+    assert await security.verify_password_async("wrong", hashed) is False
+    assert all(name.startswith("bcrypt") for name in threads)
+    assert security.password_pool_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_rejects_fast(small_pool, monkeypatch):
+    """The third concurrent call fails at once instead of waiting"""
+    release = threading.Event()
+
+    def slow_hash(password):
+        release.wait(5)
+        return "hash"
+
+    monkeypatch.setattr(security, "get_password_hash", slow_hash)
+
+    running = asyncio.ensure_future(security.get_password_hash_async("a"))
+    queued = asyncio.ensure_future(security.get_password_hash_async("b"))
+    await asyncio.sleep(0.05)
+
+    stats = security.password_pool_stats()
+    assert (stats["in_flight"], stats["queue_depth"]) == (2, 1)
+    with pytest.raises(security.PasswordHasherBusyError):
+        await security.get_password_hash_async("c")
+    assert security.password_pool_stats()["rejected_total"] >= 1
+
+    release.set()
+    assert await asyncio.gather(running, queued) == ["hash", "hash"]
+    await asyncio.sleep(0)
+    assert security.password_pool_stats()["in_flight"] == 0
@@ -0,0 +1,134 @@
+"""
+Unit tests for photo_service
+
+Tests photo processing:
+- Display and thumbnail variants are rendered in the process pool
+- EXIF is stripped and orientation applied
+- Variants are recorded in UploadedFile.extra_info and served by photo_url
+"""
+import pytest
+from PIL import Image
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.order import UploadedFile
+from app.services import photo_service, photo_storage
+from app.services.photo_storage import LocalPhotoStore
+from app.utils import render_variants
+
+ORIENTATION_TAG = 0x0112
+GPS_TAG = 0x8825
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    """Store photos in a temporary directory"""
+    photo_storage.set_photo_store(LocalPhotoStore(tmp_path, "/deliveries/photos"))
+    (tmp_path / "pickups").mkdir()
+    yield tmp_path
+    photo_storage.set_photo_store(None)
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock()
+    session.commit = AsyncMock()
+    return session
+
+
+def _phone_photo(path, width=2000, height=1000):
+    """JPEG with GPS EXIF and 'rotate 90' orientation, like a phone camera"""
+    exif = Image.Exif()
+    exif[ORIENTATION_TAG] = 6
+    exif[GPS_TAG] = {1: "N"}
+    Image.new("RGB", (width, height), "red").save(path, "JPEG", exif=exif.tobytes())
+
+
+def test_render_variants_resizes_and_strips_exif(tmp_path):
+    """Variants fit their bounds and no file keeps EXIF"""
+    source = tmp_path / "PG1_1.jpeg"
+    _phone_photo(source)
+
+    rendered = render_variants(str(source), {"display": 800, "thumbnail": 100}, quality=80)
+
+    # Orientation 6 turns the 2000x1000 landscape into a 1000x2000 portrait
+    assert (rendered["original"]["width"], rendered["original"]["height"]) == (1000, 2000)
+    assert (rendered["display"]["width"], rendered["display"]["height"]) == (400, 800)
+    assert (rendered["thumbnail"]["width"], rendered["thumbnail"]["height"]) == (50, 100)
+    assert rendered["thumbnail"]["size"] < rendered["original"]["size"]
+    for info in rendered.values():
+        with Image.open(info["path"]) as image:
+            assert not image.getexif()
+
+
+def _lookup(mock_session, uploaded_file):
+    result = MagicMock()
+    result.scalars.return_value.first.return_value = uploaded_file
+    mock_session.execute.return_value = result
+
+
+@pytest.mark.asyncio
+async def test_process_records_variants(upload_dir, mock_session):
+    """Processing runs in the pool and stores variant URLs in extra_info"""
+    _phone_photo(upload_dir / "pickups" / "PG1_1.jpeg", width=1200, height=900)
+    uploaded_file = UploadedFile(id=1, file_url="/deliveries/photos/pickups/PG1_1.jpeg", file_size=1, extra_info=None)
+    _lookup(mock_session, uploaded_file)
+
+    try:
+        processed = await photo_service.process_uploaded_file(mock_session, 1)
+    finally:
+        photo_service.shutdown_photo_executor()
+
+    assert processed is True
+    variants = uploaded_file.extra_info["variants"]
+    assert variants["thumbnail"]["url"] == "/deliveries/photos/pickups/PG1_1.thumbnail.jpeg"
+    assert (upload_dir / "pickups" / "PG1_1.display.jpeg").exists()
+    assert (upload_dir / "pickups" / "PG1_1.variants.json").exists()
+    assert uploaded_file.extra_info["exif_stripped"] is True
+    assert uploaded_file.file_size > 1
+    mock_session.commit.assert_awaited_once()
+    assert photo_service.photo_url(uploaded_file) == variants["thumbnail"]["url"]
+    assert photo_service.photo_url(uploaded_file, "original") == uploaded_file.file_url
+
+
+@pytest.mark.asyncio
+async def test_process_skips_processed_and_remote_files(upload_dir, mock_session):
+    """Already processed files and files stored elsewhere are left alone"""
+    processed_file = UploadedFile(id=1, file_url="/deliveries/photos/pickups/a.jpeg", extra_info={"variants": {"thumbnail": {}}})
+    remote_file = UploadedFile(id=2, file_url="https://cdn.example.com/a.jpeg", extra_info=None)
+
+    for uploaded_file in (processed_file, remote_file):
+        _lookup(mock_session, uploaded_file)
+        assert await photo_service.process_uploaded_file(mock_session, uploaded_file.id) is False
+
+    mock_session.commit.assert_not_called()
+
+
+def test_photo_url_falls_back_to_original():
+    """Unprocessed photos are served at their original URL"""
+    uploaded_file = UploadedFile(id=1, file_url="https://cdn.example.com/a.jpeg", extra_info=None)
+
+    assert photo_service.photo_url(uploaded_file) == "https://cdn.example.com/a.jpeg"
+
+
+@pytest.mark.asyncio
+async def test_process_reuses_variants_of_same_content(upload_dir, mock_session, monkeypatch):
+    """A second upload of the same bytes reuses the stored variants"""
+    _phone_photo(upload_dir / "pickups" / "PG1_1.jpeg", width=600, height=400)
+    url = "/deliveries/photos/pickups/PG1_1.jpeg"
+    first = UploadedFile(id=1, file_url=url, file_size=1, extra_info=None)
+    second = UploadedFile(id=2, file_url=url, file_size=1, extra_info=None)
+
+    _lookup(mock_session, first)
+    try:
+        await photo_service.process_uploaded_file(mock_session, 1)
+    finally:
+        photo_service.shutdown_photo_executor()
+    monkeypatch.setattr(photo_service, "_get_executor", lambda: pytest.fail("rendered twice"))
+    _lookup(mock_session, second)
+    assert await photo_service.process_uploaded_file(mock_session, 2) is True
+
+    assert second.extra_info["variants"] == first.extra_info["variants"]
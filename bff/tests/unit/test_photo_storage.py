@@ -0,0 +1,116 @@
+"""
+Unit tests for photo_storage
+
+Tests the content-addressed photo store:
+- Keys are derived from the content hash and sharded
+- Duplicate bytes are stored once
+- The S3 backend against a local S3-compatible stand-in
+"""
+import hashlib
+
+import httpx
+import pytest
+
+from app.services import photo_storage
+from app.services.photo_storage import LocalPhotoStore, S3PhotoStore
+
+DATA = b"\xff\xd8\xff\xe0photo bytes"
+
+
+class FakeS3:
+    """Minimal S3-compatible object store (path-style PUT/GET/HEAD)"""
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = 0
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        authorization = request.headers.get("authorization", "")
+        if not authorization.startswith("AWS4-HMAC-SHA256 Credential=key/"):
+            return httpx.Response(403)
+        body = request.content
+        if request.headers["x-amz-content-sha256"] != hashlib.sha256(body).hexdigest():
+            return httpx.Response(400)
+
+        path = request.url.path
+        if request.method == "PUT":
+            self.puts += 1
+            self.objects[path] = (body, request.headers.get("content-type"))
+            return httpx.Response(200)
+        if path not in self.objects:
+            return httpx.Response(404)
+        if request.method == "HEAD":
+            return httpx.Response(200)
+        return httpx.Response(200, content=self.objects[path][0])
+
+
+@pytest.fixture
+def fake_s3():
+    return FakeS3()
+
+
+@pytest.fixture
+def s3_store(fake_s3, tmp_path):
+    store = S3PhotoStore(
+        endpoint_url="http://minio:9000",
+        bucket="photos",
+        access_key="key",
+        secret_key="secret",
+        transport=httpx.MockTransport(fake_s3.handle)
+    )
+    store.staging_dir = tmp_path / "staging"
+    return store
+
+
+def test_content_key_is_sharded():
+    """Keys nest under two levels of hash-prefix directories"""
+    digest = hashlib.sha256(DATA).hexdigest()
+
+    key = photo_storage.content_key(digest, "jpeg")
+
+    assert key == f"{digest[:2]}/{digest[2:4]}/{digest}.jpeg"
+    assert photo_storage.derived_key(key, "thumbnail.jpeg") == f"{digest[:2]}/{digest[2:4]}/{digest}.thumbnail.jpeg"
+
+
+@pytest.mark.asyncio
+async def test_local_store_deduplicates(tmp_path):
+    """The same bytes are written once and share a URL"""
+    store = LocalPhotoStore(tmp_path, "/deliveries/photos")
+
+    first = await photo_storage.store_bytes(DATA, "jpeg", "image/jpeg", store)
+    second = await photo_storage.store_bytes(DATA, "jpeg", "image/jpeg", store)
+
+    assert first.url == second.url == f"/deliveries/photos/{first.key}"
+    assert (first.deduplicated, second.deduplicated) == (False, True)
+    assert (tmp_path / first.key).read_bytes() == DATA
+    assert store.key_for_url(first.url) == first.key
+    assert not list(store.staging_dir.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_s3_store_round_trip(s3_store, fake_s3):
+    """Objects are uploaded once, read back and addressed by public URL"""
+    first = await photo_storage.store_bytes(DATA, "jpeg", "image/jpeg", s3_store)
+    second = await photo_storage.store_bytes(DATA, "jpeg", "image/jpeg", s3_store)
+
+    assert fake_s3.puts == 1
+    assert second.deduplicated is True
+    assert fake_s3.objects[f"/photos/{first.key}"] == (DATA, "image/jpeg")
+    assert first.url == f"http://minio:9000/photos/{first.key}"
+    assert await s3_store.read(first.key) == DATA
+    assert await s3_store.read("missing.jpeg") is None
+    await s3_store.close()
+
+
+@pytest.mark.asyncio
+async def test_s3_local_copy_downloads_and_cleans_up(s3_store):
+    """Non-local backends are processed from a temporary download"""
+    stored = await photo_storage.store_bytes(DATA, "jpeg", "image/jpeg", s3_store)
+
+    async with photo_storage.local_copy(stored.key, s3_store) as path:
+        assert path.read_bytes() == DATA
+    async with photo_storage.local_copy("missing.jpeg", s3_store) as missing:
+        assert missing is None
+
+    assert not path.exists()
+    await s3_store.close()
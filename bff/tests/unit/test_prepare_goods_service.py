@@ -6,12 +6,15 @@ Tests the merchant preparation workflow service including:
 - Updating prepare status
 - Querying prepare packages
 - Assigning drivers
+- Compare-and-set claims and status transitions
+- Set-based order updates and action inserts for whole packages
 - Single source of truth for delivery_type
 """
 import pytest
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
+from sqlalchemy.dialects import mysql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services import prepare_goods_service
@@ -274,6 +277,53 @@ async def test_get_order_delivery_type_not_prepared(mock_session):
     assert result is None
 
 
+@pytest.mark.asyncio
+async def test_get_order_delivery_type_uses_mapping_table(mock_session):
+    """Order lookups join the indexed mapping instead of LIKE over order_ids"""
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = 1
+    mock_session.execute.return_value = mock_result
+
+    await prepare_goods_service.get_order_delivery_type(session=mock_session, order_id=11)
+
+    sql = str(mock_session.execute.call_args[0][0])
+    assert "tigu_prepare_goods_order.order_id = " in sql
+    assert "LIKE" not in sql.upper()
+
+
+@pytest.mark.asyncio
+async def test_link_orders_to_package(mock_session):
+    """Mapping rows are written once per distinct order"""
+    await prepare_goods_service.link_orders_to_package(mock_session, 1, [101, 102, 101])
+
+    rows = mock_session.execute.call_args[0][1]
+    assert [(r["prepare_id"], r["order_id"]) for r in rows] == [(1, 101), (1, 102)]
+
+
+@pytest.mark.asyncio
+async def test_backfill_prepare_goods_orders(mock_session):
+    """Backfill parses order_ids CSV and skips existing mapping rows"""
+    from app.workers.backfill_prepare_goods_orders import backfill_prepare_goods_orders
+
+    packages = MagicMock()
+    packages.all.return_value = [
+        MagicMock(id=1, order_ids="11,111"),
+        MagicMock(id=2, order_ids="12"),
+    ]
+    existing = MagicMock()
+    existing.all.return_value = [(1, 11)]
+    empty = MagicMock()
+    empty.all.return_value = []
+    mock_session.execute.side_effect = [packages, existing, None, empty]
+
+    inserted = await backfill_prepare_goods_orders(mock_session, batch_size=2)
+
+    assert inserted == 2
+    rows = mock_session.execute.call_args_list[2][0][1]
+    assert [(r["prepare_id"], r["order_id"]) for r in rows] == [(1, 111), (2, 12)]
+    mock_session.commit.assert_called_once()
+
+
 @pytest.mark.asyncio
 async def test_assign_driver_to_prepare_success(mock_session):
     """Test assigning driver to prepare package"""
@@ -295,6 +345,118 @@ async def test_assign_driver_to_prepare_success(mock_session):
     assert mock_session.commit.called
 
 
+def _update_sql(mock_session) -> str:
+    stmt = mock_session.execute.await_args.args[0]
+    return str(stmt.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.asyncio
+async def test_claim_package_conditional_update(mock_session):
+    """The claim is one UPDATE guarded by the available-pool condition"""
+    mock_session.execute.return_value = MagicMock(rowcount=1)
+    before = {"driver_id": 3, "prepare_status": 0}
+
+    with patch.object(prepare_goods_service.marks_service, "load_package_state",
+                      AsyncMock(return_value=before)), \
+         patch.object(prepare_goods_service, "announce_package_change", AsyncMock()) as announce:
+        claimed = await prepare_goods_service.claim_package(mock_session, "PREP123456", 10)
+
+    assert claimed is True
+    sql = _update_sql(mock_session)
+    assert "tigu_prepare_goods.driver_id IS NULL" in sql
+    assert "tigu_prepare_goods.prepare_status = 0" in sql
+    assert "tigu_prepare_goods.delivery_type = 1" in sql
+    mock_session.commit.assert_awaited_once()
+    announce.assert_awaited_once_with(
+        "PREP123456", {"driver_id": None, "prepare_status": 0}, driver_id=10, prepare_status=6
+    )
+
+
+@pytest.mark.asyncio
+async def test_claim_package_already_taken(mock_session):
+    """A claim matching no row loses and announces nothing"""
+    mock_session.execute.return_value = MagicMock(rowcount=0)
+
+    with patch.object(prepare_goods_service.marks_service, "load_package_state",
+                      AsyncMock(return_value={"driver_id": 11, "prepare_status": 6})), \
+         patch.object(prepare_goods_service, "announce_package_change", AsyncMock()) as announce:
+        claimed = await prepare_goods_service.claim_package(mock_session, "PREP123456", 10)
+
+    assert claimed is False
+    announce.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_claim_package_not_found(mock_session):
+    """Unknown packages are not updated"""
+    with patch.object(prepare_goods_service.marks_service, "load_package_state",
+                      AsyncMock(return_value=None)):
+        claimed = await prepare_goods_service.claim_package(mock_session, "NOPE", 10)
+
+    assert claimed is False
+    mock_session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_transition_prepare_status_compare_and_set(mock_session):
+    """Transitions are guarded by the current status and driver, without committing"""
+    mock_session.execute.return_value = MagicMock(rowcount=0)
+
+    changed = await prepare_goods_service.transition_prepare_status(
+        mock_session, "PREP123456", from_statuses=[6], new_status=1, driver_id=10
+    )
+
+    assert changed is False
+    sql = _update_sql(mock_session)
+    assert "tigu_prepare_goods.prepare_status IN (6)" in sql
+    assert "tigu_prepare_goods.driver_id = 10" in sql
+    mock_session.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_transition_package_orders_is_set_based(mock_session):
+    """A package's orders move with one SELECT, one UPDATE and one multi-row INSERT"""
+    rows = MagicMock()
+    rows.all.return_value = [
+        MagicMock(id=101, order_status=1, shipping_type=0),
+        MagicMock(id=102, order_status=1, shipping_type=1),
+    ]
+    mock_session.execute.side_effect = [rows, MagicMock(), MagicMock()]
+
+    moved = await prepare_goods_service.transition_package_orders(
+        mock_session,
+        [101, 102],
+        values={"shipping_status": 4, "driver_id": 10},
+        action_type=1,
+        create_by="Driver",
+        file_ids=[900]
+    )
+
+    assert moved == 2
+    assert mock_session.execute.await_count == 3
+    update = mock_session.execute.call_args_list[1].args[0]
+    assert "tigu_order.id IN (101, 102)" in str(
+        update.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True})
+    )
+    insert = mock_session.execute.call_args_list[2].args[0].compile(dialect=mysql.dialect())
+    assert str(insert).count("INSERT INTO tigu_order_action") == 1
+    assert (insert.params["order_id_m0"], insert.params["order_id_m1"]) == (101, 102)
+    assert insert.params["shipping_status_m1"] == 4
+    assert insert.params["shipping_type_m1"] == 1
+    assert insert.params["logistics_voucher_file_m0"] == "900"
+    assert insert.params["id_m0"] != insert.params["id_m1"]
+    mock_session.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_transition_package_orders_empty(mock_session):
+    """Packages without orders issue no statement"""
+    assert await prepare_goods_service.transition_package_orders(
+        mock_session, [], values={"shipping_status": 4}, action_type=1, create_by="Driver"
+    ) == 0
+    mock_session.execute.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_get_shop_prepare_packages(mock_session):
     """Test getting prepare packages for a shop"""
@@ -0,0 +1,141 @@
+"""
+Unit tests for principal_service
+
+Tests resolving the authenticated caller:
+- Access tokens carry driver_id, phone and role claims
+- Principals are served from the local cache, then Redis, then MySQL
+- Invalidation evicts every cache level
+- get_current_driver rejects users without a driver profile
+"""
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core.security import create_access_token, get_token_payload
+from app.models.user import User
+from app.services import principal_service
+from app.services.principal_service import Principal
+
+
+@pytest.fixture(autouse=True)
+def redis_cache(monkeypatch):
+    """Replace the Redis principal helpers and start from an empty local cache"""
+    principal_service.clear_local()
+    fake = MagicMock()
+    fake.get_principal = AsyncMock(return_value=None)
+    fake.store_principal = AsyncMock()
+    fake.invalidate_principals = AsyncMock()
+    monkeypatch.setattr(principal_service, "cache", fake)
+    yield fake
+    principal_service.clear_local()
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock()
+    return session
+
+
+def _user(status="0"):
+    return User(
+        user_id=5,
+        user_name="driver_5557",
+        nick_name="Dan",
+        phonenumber="5557",
+        email=None,
+        status=status,
+        del_flag="0"
+    )
+
+
+def _db_row(mock_session, user, driver_id):
+    result = MagicMock()
+    result.first.return_value = (user, driver_id)
+    mock_session.execute.return_value = result
+
+
+def test_access_token_carries_driver_claims():
+    """driver_id (as a string), phone and role are embedded in the token"""
+    token = create_access_token("5", "driver", driver_id=1234567890123456789, phone="5557")
+
+    payload = get_token_payload(token)
+
+    assert payload["sub"] == "5"
+    assert payload["role"] == "driver"
+    assert payload["driver_id"] == "1234567890123456789"
+    assert payload["phone"] == "5557"
+    assert payload["scope"] == "access"
+
+
+@pytest.mark.asyncio
+async def test_miss_loads_once_then_serves_from_cache(mock_session, redis_cache):
+    """A miss runs one joined query; later lookups do not touch MySQL"""
+    _db_row(mock_session, _user(), 42)
+
+    first = await principal_service.get_principal(mock_session, 5)
+    second = await principal_service.get_principal(mock_session, 5)
+
+    assert first == second
+    assert (first.driver_id, first.role, first.is_active) == (42, "driver", True)
+    assert mock_session.execute.await_count == 1
+    redis_cache.store_principal.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_redis_hit_skips_database(mock_session, redis_cache):
+    """Principals cached by another worker are used as-is"""
+    redis_cache.get_principal.return_value = {
+        "user_id": 5, "user_name": "admin", "nick_name": None, "phonenumber": None,
+        "email": None, "role": "super_admin", "is_active": True, "driver_id": None
+    }
+
+    principal = await principal_service.get_principal(mock_session, 5)
+
+    assert principal.is_super_admin
+    mock_session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_evicts_all_levels(mock_session, redis_cache):
+    """After invalidation the next lookup goes back to MySQL"""
+    _db_row(mock_session, _user(), 42)
+    await principal_service.get_principal(mock_session, 5)
+
+    await principal_service.invalidate([5, 5])
+    _db_row(mock_session, _user(status="1"), 42)
+    principal = await principal_service.get_principal(mock_session, 5)
+
+    redis_cache.invalidate_principals.assert_awaited_once_with([5])
+    assert principal.is_active is False
+    assert mock_session.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_deactivated_user_is_rejected(mock_session, monkeypatch):
+    """authenticate_access_token raises 401 for an inactive principal"""
+    monkeypatch.setattr(deps, "validate_token", lambda token, scope: "5")
+    _db_row(mock_session, _user(status="1"), 42)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await deps.authenticate_access_token("token", mock_session)
+
+    assert exc_info.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_get_current_driver_requires_driver_profile():
+    """Users without a linked tigu_driver row are not drivers"""
+    principal = Principal(
+        user_id=5, user_name="u", nick_name=None, phonenumber="5557",
+        email=None, role="driver", is_active=True, driver_id=None
+    )
+
+    with pytest.raises(HTTPException) as exc_info:
+        await deps.get_current_driver(principal)
+
+    assert exc_info.value.status_code == 404
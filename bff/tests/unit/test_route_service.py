@@ -1,7 +1,11 @@
+from datetime import datetime
+
+import numpy as np
 import pytest
 
 from app.schemas.order import OrderItem, OrderSummary, WarehouseSnapshot
-from app.services.route_service import build_route_plan
+from app.schemas.route import RouteStop
+from app.services.route_service import build_route_plan, haversine_matrix, optimize_stops, path_length, solve_route
 
 
 @pytest.mark.asyncio
@@ -37,3 +41,51 @@ async def test_build_route_plan_generates_sequence():
     assert plan.id
     assert plan.stops[0].sequence == 1
     assert plan.stops[0].order_sn == "TOD1"
+
+
+def test_haversine_matrix_known_distance():
+    """Toronto → Montreal is roughly 504 km"""
+    matrix = haversine_matrix(np.array([[43.6532, -79.3832], [45.5019, -73.5674]]))
+
+    assert matrix.shape == (2, 2)
+    assert matrix[0, 0] == 0
+    assert matrix[0, 1] == pytest.approx(504, abs=5)
+    assert matrix[0, 1] == pytest.approx(matrix[1, 0])
+
+
+def test_solve_route_removes_crossing():
+    """Local search finds the straight-line order along a street"""
+    # Start at 0, then stops along one line given in a zig-zag order
+    coords = np.array([[43.70, -79.40], [43.70, -79.30], [43.70, -79.38], [43.70, -79.32], [43.70, -79.36]])
+    matrix = haversine_matrix(coords)
+
+    tour = solve_route(matrix, time_budget_seconds=1.0)
+
+    assert tour[0] == 0
+    assert sorted(tour) == [0, 1, 2, 3, 4]
+    assert tour == [0, 2, 4, 3, 1]
+    assert path_length(tour, matrix) < path_length([0, 1, 2, 3, 4], matrix)
+
+
+@pytest.mark.asyncio
+async def test_optimize_stops_sequences_from_origin():
+    """Stops are ordered from the driver's position with ETAs and total distance"""
+    stops = [
+        RouteStop(order_sn="FAR", sequence=1, address="far", receiver_name="A", latitude=43.70, longitude=-79.30),
+        RouteStop(order_sn="NOGEO", sequence=2, address="unknown", receiver_name="B"),
+        RouteStop(order_sn="NEAR", sequence=3, address="near", receiver_name="C", latitude=43.70, longitude=-79.38),
+    ]
+
+    plan = await optimize_stops(
+        stops,
+        origin=(43.70, -79.40),
+        departure_time=datetime(2025, 1, 1, 9, 0),
+        average_speed_kmh=60,
+        service_minutes=0
+    )
+
+    assert [stop.order_sn for stop in plan.stops] == ["NEAR", "FAR", "NOGEO"]
+    assert [stop.sequence for stop in plan.stops] == [1, 2, 3]
+    assert plan.total_distance_km == pytest.approx(8.04, abs=0.1)
+    assert plan.stops[0].eta == "09:01"
+    assert plan.stops[2].eta is None
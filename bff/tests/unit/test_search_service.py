@@ -0,0 +1,167 @@
+"""
+Unit tests for search_service
+
+Tests the indexed admin search:
+- Phone terms use the digit prefix/suffix indexes only
+- Name terms use the FULLTEXT ngram index
+- Serial numbers match by escaped prefix, never lower() or a leading wildcard
+- Search documents are upserted with normalized phones
+- Incremental sweeps walk (timestamp, id) keyset batches from a watermark
+"""
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import search_service
+
+
+def _sql(clause) -> str:
+    return str(clause.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_normalize_phone():
+    """Formatting is stripped down to digits"""
+    assert search_service.normalize_phone("+1 (555) 100-1") == "15551001"
+    assert search_service.normalize_phone("n/a") is None
+    assert search_service.normalize_phone(None) is None
+
+
+def test_phone_term_uses_digit_indexes():
+    """A phone-like term matches digit prefixes or suffixes, not names"""
+    sql = _sql(search_service.order_search_condition(" 555-1001 "))
+
+    assert "tigu_search_document.phone_digits LIKE '5551001%%'" in sql
+    assert "tigu_search_document.phone_digits_rev LIKE '1001555%%'" in sql
+    assert "MATCH" not in sql
+    assert "lower(" not in sql
+    assert "tigu_order.order_sn LIKE '555-1001%%'" in sql
+
+
+def test_name_term_uses_fulltext():
+    """Names of two or more characters go through the ngram index"""
+    sql = _sql(search_service.order_search_condition("张三"))
+
+    assert "MATCH (tigu_search_document.receiver_name) AGAINST ('\"张三\"' IN BOOLEAN MODE)" in sql
+    assert "phone_digits" not in sql
+
+
+def test_single_character_name_is_prefix_match():
+    """Terms shorter than an ngram token fall back to an indexed prefix"""
+    sql = _sql(search_service.order_search_condition("王"))
+
+    assert "tigu_search_document.receiver_name LIKE '王%%'" in sql
+    assert "MATCH" not in sql
+
+
+def test_serial_prefix_escapes_wildcards():
+    """LIKE wildcards in the term are literal"""
+    sql = _sql(search_service.prepare_goods_search_condition("PREP_1%"))
+
+    assert "tigu_prepare_goods.prepare_sn LIKE 'PREP\\\\_1\\\\%%%%'" in sql
+    assert "'%%PREP" not in sql
+
+
+def test_package_search_covers_contained_orders():
+    """Packages match through their orders' documents and exact order IDs"""
+    sql = _sql(search_service.prepare_goods_search_condition("123456"))
+
+    assert "tigu_prepare_goods_order.order_id = 123456" in sql
+    assert "tigu_search_document.entity_type = 1" in sql
+    assert "tigu_search_document.entity_type = 2" in sql
+
+
+def test_blank_term_has_no_condition():
+    """Whitespace-only searches do not filter"""
+    assert search_service.order_search_condition("   ") is None
+    assert search_service.prepare_goods_search_condition("") is None
+
+
+@pytest.mark.asyncio
+async def test_index_orders_upserts_documents():
+    """One upsert statement per batch with normalized fields"""
+    session = AsyncMock(spec=AsyncSession)
+    orders = [
+        SimpleNamespace(id=1, receiver_name=" Alice ", receiver_phone="+1-555-1001"),
+        SimpleNamespace(id=2, receiver_name=None, receiver_phone=None)
+    ]
+
+    await search_service.index_orders(session, orders)
+
+    stmt = session.execute.await_args.args[0]
+    sql = str(stmt.compile(dialect=mysql.dialect()))
+    params = stmt.compile(dialect=mysql.dialect()).params
+    assert "ON DUPLICATE KEY UPDATE" in sql
+    assert params["phone_digits_m0"] == "15551001"
+    assert params["phone_digits_rev_m0"] == "10015551"
+    assert params["receiver_name_m0"] == "Alice"
+    assert params["phone_digits_m1"] is None
+
+
+@pytest.mark.asyncio
+async def test_index_nothing_skips_database():
+    """Empty batches issue no statement"""
+    session = AsyncMock(spec=AsyncSession)
+
+    await search_service.index_prepare_packages(session, [])
+
+    session.execute.assert_not_called()
+
+
+def _rows(rows):
+    result = MagicMock()
+    result.all.return_value = rows
+    return result
+
+
+@pytest.mark.asyncio
+async def test_index_changed_rows_walks_keyset(monkeypatch):
+    """Batches continue after the last (update_time, id); each batch commits"""
+    session = AsyncMock(spec=AsyncSession)
+    index = AsyncMock()
+    monkeypatch.setitem(
+        search_service.SWEEPS, "order:update_time", (search_service.Order, "update_time", index)
+    )
+    first = datetime(2025, 12, 1, 9, 0, 0)
+    last = datetime(2025, 12, 1, 9, 5, 0)
+    session.execute.side_effect = [
+        _rows([SimpleNamespace(id=4, changed_at=first), SimpleNamespace(id=9, changed_at=last)]),
+        _rows([]),
+    ]
+
+    indexed, newest = await search_service.index_changed_rows(session, "order:update_time", first, batch_size=2)
+
+    assert (indexed, newest) == (2, last)
+    assert "tigu_order.update_time >= '2025-12-01 09:00:00'" in _sql(session.execute.await_args_list[0].args[0])
+    second = _sql(session.execute.await_args_list[1].args[0])
+    assert "tigu_order.update_time = '2025-12-01 09:05:00' AND tigu_order.id > 9" in second
+    assert "ORDER BY tigu_order.update_time, tigu_order.id" in second
+    index.assert_awaited_once()
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_search_indexer_advances_watermarks(monkeypatch):
+    """Sweeps start an overlap before the watermark and store the newest timestamp"""
+    from app.workers import search_indexer
+
+    watermark = datetime(2025, 12, 1, 9, 0, 0)
+    newest = datetime(2025, 12, 1, 9, 5, 0)
+    monkeypatch.setattr(
+        search_indexer.cache, "get_search_index_watermarks", AsyncMock(return_value={"order:update_time": watermark})
+    )
+    store = AsyncMock()
+    monkeypatch.setattr(search_indexer.cache, "store_search_index_watermark", store)
+    sweep = AsyncMock(side_effect=lambda session, name, since, batch: (3, newest) if since else (0, None))
+    monkeypatch.setattr(search_indexer.search_service, "index_changed_rows", sweep)
+
+    indexed = await search_indexer.index_recent_changes(AsyncMock(spec=AsyncSession), 300, 500)
+
+    assert indexed == 3
+    since = {call.args[1]: call.args[2] for call in sweep.await_args_list}
+    assert since["order:update_time"] == datetime(2025, 12, 1, 8, 55, 0)
+    assert since["order:create_time"] is None
+    store.assert_awaited_once_with("order:update_time", newest)
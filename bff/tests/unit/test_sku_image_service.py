@@ -0,0 +1,100 @@
+"""
+Unit tests for SKU image batch loading
+
+Tests:
+- One IN query resolves every SKU in a result set
+- Relative file URLs are made absolute
+- Cache hits (including SKUs without images) skip the database
+- TTLCache expiry and LRU eviction
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import sku_image_service
+from app.utils import TTLCache
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock()
+    return session
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start each test with an empty SKU image cache"""
+    sku_image_service.clear_sku_image_cache()
+    yield
+    sku_image_service.clear_sku_image_cache()
+
+
+def _rows(*rows):
+    result = MagicMock()
+    result.all.return_value = list(rows)
+    return result
+
+
+@pytest.mark.asyncio
+async def test_load_sku_images_single_query(mock_session):
+    """Duplicate SKUs across items are resolved with one query"""
+    mock_session.execute.return_value = _rows(
+        (1, "/upload/sku1.png"),
+        (1, "/upload/sku1-second.png"),
+        (2, "https://cdn.example.com/sku2.png"),
+    )
+
+    images = await sku_image_service.load_sku_images(mock_session, [1, 2, 1, 3, None])
+
+    assert mock_session.execute.await_count == 1
+    assert images == {
+        1: "https://api.wetigu.com/upload/sku1.png",
+        2: "https://cdn.example.com/sku2.png",
+        3: None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_load_sku_images_uses_cache(mock_session):
+    """Second lookup (including negative results) is served from cache"""
+    mock_session.execute.return_value = _rows((1, "/upload/sku1.png"))
+
+    await sku_image_service.load_sku_images(mock_session, [1, 2])
+    images = await sku_image_service.load_sku_images(mock_session, [2, 1])
+
+    assert mock_session.execute.await_count == 1
+    assert images == {1: "https://api.wetigu.com/upload/sku1.png", 2: None}
+
+
+@pytest.mark.asyncio
+async def test_load_sku_images_empty(mock_session):
+    """No SKUs means no query"""
+    assert await sku_image_service.load_sku_images(mock_session, []) == {}
+    mock_session.execute.assert_not_called()
+
+
+def test_ttl_cache_expiry_and_eviction(monkeypatch):
+    """Entries expire after TTL and least recently used entries are evicted"""
+    now = [1000.0]
+    monkeypatch.setattr("app.utils.ttl_cache.time.monotonic", lambda: now[0])
+
+    cache: TTLCache[int, str] = TTLCache(maxsize=2, ttl_seconds=10)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.get(1)
+    cache.set(3, "c")  # evicts 2 (least recently used)
+
+    assert cache.get_many([1, 2, 3]) == ({1: "a", 3: "c"}, [2])
+
+    now[0] += 11
+    assert cache.get(1) is None
+    assert len(cache) == 1
+
+
+def test_ttl_cache_rejects_invalid_size():
+    """Non-positive sizes are rejected"""
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0)
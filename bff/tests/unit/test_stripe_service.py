@@ -0,0 +1,158 @@
+"""
+Unit tests for StripeService
+
+Tests non-blocking Stripe access:
+- SDK calls run on the bounded Stripe thread pool
+- Account status is served from cache and refreshed by webhooks
+- Webhooks are de-duplicated on event id and retried by the worker
+"""
+import threading
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.driver import Driver
+from app.services import stripe_service
+from app.services.stripe_service import StripeService
+from app.workers import stripe_webhook_worker
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock()
+    session.commit = AsyncMock()
+    return session
+
+
+@pytest.fixture
+def stripe_cache(monkeypatch):
+    """Patch the Redis-backed Stripe helpers"""
+    helpers = SimpleNamespace(
+        get_stripe_status=AsyncMock(return_value=None),
+        store_stripe_status=AsyncMock(),
+        claim_stripe_event=AsyncMock(return_value=True),
+        release_stripe_event=AsyncMock(),
+        push_stripe_webhook=AsyncMock(),
+    )
+    for name, mock in vars(helpers).items():
+        monkeypatch.setattr(stripe_service.cache, name, mock)
+    monkeypatch.setattr(stripe_service.settings, "stripe_secret_key", "sk_test")
+    return helpers
+
+
+def _driver(**overrides):
+    values = {"id": 7, "phone": "5557", "stripe_account_id": "acct_1", "stripe_status": "onboarding"}
+    values.update(overrides)
+    return Driver(**values)
+
+
+def _account(details_submitted=True, payouts_enabled=True, currently_due=None):
+    return SimpleNamespace(
+        details_submitted=details_submitted,
+        payouts_enabled=payouts_enabled,
+        requirements=SimpleNamespace(currently_due=currently_due or [])
+    )
+
+
+@pytest.mark.asyncio
+async def test_stripe_calls_run_on_stripe_pool():
+    """Blocking SDK calls never run on the event loop thread"""
+    thread_name = await stripe_service.run_stripe_call(lambda: threading.current_thread().name)
+
+    assert thread_name.startswith("stripe")
+
+
+@pytest.mark.asyncio
+async def test_status_served_from_cache(mock_session, stripe_cache, monkeypatch):
+    """A cached status is returned without calling Stripe"""
+    cached = {"stripe_status": "verified", "stripe_payouts_enabled": True}
+    stripe_cache.get_stripe_status.return_value = cached
+    retrieve = MagicMock()
+    monkeypatch.setattr(stripe_service.stripe.Account, "retrieve", retrieve)
+
+    status = await StripeService(mock_session).get_account_status(_driver())
+
+    assert status == cached
+    retrieve.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_status_cache_miss_fetches_and_caches(mock_session, stripe_cache, monkeypatch):
+    """On a miss Stripe is asked once and the result cached"""
+    monkeypatch.setattr(
+        stripe_service.stripe.Account, "retrieve",
+        MagicMock(return_value=_account(payouts_enabled=False, currently_due=["external_account"]))
+    )
+    driver = _driver()
+
+    status = await StripeService(mock_session).get_account_status(driver)
+
+    assert status["stripe_status"] == "restricted"
+    assert status["requirements_due"] == ["external_account"]
+    assert driver.stripe_status == "restricted"
+    mock_session.commit.assert_awaited_once()
+    stripe_cache.store_stripe_status.assert_awaited_once()
+    assert stripe_cache.store_stripe_status.call_args[0][1] == status
+
+
+@pytest.mark.asyncio
+async def test_webhook_updates_driver_and_cache(mock_session, stripe_cache):
+    """account.updated refreshes both the driver row and the status cache"""
+    driver = _driver()
+    result = MagicMock()
+    result.scalars.return_value.first.return_value = driver
+    mock_session.execute.return_value = result
+
+    handled = await StripeService(mock_session).handle_webhook_event({
+        "type": "account.updated",
+        "data": {"object": {"id": "acct_1", "details_submitted": True, "payouts_enabled": True}}
+    })
+
+    assert handled is True
+    assert driver.stripe_status == "verified"
+    assert driver.stripe_connected_at is not None
+    cached = stripe_cache.store_stripe_status.call_args[0][1]
+    assert cached["can_receive_payouts"] is True
+
+
+@pytest.mark.asyncio
+async def test_duplicate_webhook_not_queued(stripe_cache):
+    """A redelivered event id is acknowledged but not queued again"""
+    stripe_cache.claim_stripe_event.return_value = False
+
+    queued = await stripe_service.enqueue_webhook_event({"id": "evt_1", "type": "account.updated"})
+
+    assert queued is False
+    stripe_cache.push_stripe_webhook.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_enqueue_failure_releases_event_id(stripe_cache):
+    """If queueing fails the id is released so Stripe's retry can be accepted"""
+    stripe_cache.push_stripe_webhook.side_effect = ConnectionError("redis down")
+
+    with pytest.raises(ConnectionError):
+        await stripe_service.enqueue_webhook_event({"id": "evt_1", "type": "account.updated"})
+
+    stripe_cache.release_stripe_event.assert_awaited_once_with("evt_1")
+
+
+@pytest.mark.asyncio
+async def test_worker_dead_letters_after_max_attempts(stripe_cache, monkeypatch):
+    """Events failing on their last attempt go to the dead-letter list"""
+    monkeypatch.setattr(stripe_webhook_worker, "AsyncSessionLocal", MagicMock(side_effect=RuntimeError("db down")))
+    monkeypatch.setattr(stripe_webhook_worker.get_settings(), "stripe_webhook_max_attempts", 3)
+
+    processed = await stripe_webhook_worker.process_webhook_envelope(
+        {"id": "evt_1", "attempts": 2, "event": {"type": "account.updated"}}
+    )
+
+    assert processed is False
+    envelope = stripe_cache.push_stripe_webhook.call_args[0][0]
+    assert envelope["attempts"] == 3
+    assert stripe_cache.push_stripe_webhook.call_args.kwargs == {"dead_letter": True}
@@ -0,0 +1,197 @@
+"""
+Unit tests for upload_service
+
+Tests streaming photo uploads:
+- Chunks are streamed into the photo store
+- Size limit and image type are enforced while streaming
+- Uploaded files are claimed by the confirm endpoints
+- Base64 photos are still accepted
+- Identical bytes are stored once
+"""
+import base64
+
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.driver import Driver
+from app.models.order import UploadedFile
+from app.schemas.prepare_goods import ConfirmPickupRequest
+from app.services import photo_storage, upload_service
+from app.services.photo_storage import LocalPhotoStore
+
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    """Store uploads in a temporary directory"""
+    photo_storage.set_photo_store(LocalPhotoStore(tmp_path, "/deliveries/photos"))
+    yield tmp_path
+    photo_storage.set_photo_store(None)
+
+
+def _stored_files(root):
+    return [path for path in root.rglob("*") if path.is_file() and ".staging" not in path.parts]
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock()
+    session.commit = AsyncMock()
+    session.add = MagicMock()
+    return session
+
+
+async def _chunks(data: bytes, size: int = 16):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def _driver():
+    return Driver(id=7, name="Dan", phone="5557")
+
+
+@pytest.mark.asyncio
+async def test_stream_to_store_writes_file(upload_dir):
+    """Chunks end up in one file named after the sniffed type"""
+    photo = await upload_service.stream_to_store(_chunks(PNG), "123")
+
+    key = photo_storage.content_key(photo.sha256, "png")
+    assert photo.file_name == "123.png"
+    assert photo.file_type == "image/png"
+    assert photo.file_size == len(PNG)
+    assert photo.file_url == f"/deliveries/photos/{key}"
+    assert (upload_dir / key).read_bytes() == PNG
+    assert _stored_files(upload_dir) == [upload_dir / key]
+    assert not list((upload_dir / ".staging").iterdir())
+
+
+@pytest.mark.asyncio
+async def test_stream_to_store_stops_at_size_limit(upload_dir):
+    """Oversized streams are rejected mid-stream and leave nothing behind"""
+    consumed = []
+
+    async def endless():
+        while True:
+            consumed.append(1)
+            yield JPEG
+
+    with pytest.raises(HTTPException) as exc_info:
+        await upload_service.stream_to_store(endless(), "123", max_size=500)
+
+    assert exc_info.value.status_code == 413
+    assert len(consumed) == 5
+    assert _stored_files(upload_dir) == []
+    assert not list((upload_dir / ".staging").iterdir())
+
+
+@pytest.mark.asyncio
+async def test_stream_to_store_rejects_non_image(upload_dir):
+    """Non JPEG/PNG bodies are rejected"""
+    with pytest.raises(HTTPException) as exc_info:
+        await upload_service.stream_to_store(_chunks(b"GIF89a" + b"\x00" * 50), "123")
+
+    assert exc_info.value.status_code == 400
+    assert _stored_files(upload_dir) == []
+
+
+@pytest.mark.asyncio
+async def test_upload_rejects_declared_oversize_before_reading(upload_dir, mock_session):
+    """A Content-Length over the limit is rejected without reading the body"""
+    body = MagicMock()
+
+    with pytest.raises(HTTPException) as exc_info:
+        await upload_service.upload_photo_stream(
+            mock_session, body, _driver(), content_length=upload_service.MAX_FILE_SIZE + 1
+        )
+
+    assert exc_info.value.status_code == 413
+    body.__aiter__.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_upload_creates_unlinked_file(upload_dir, mock_session):
+    """Uploads are recorded without a business entity"""
+    uploaded_file = await upload_service.upload_photo_stream(
+        mock_session, _chunks(JPEG), _driver(), content_type="image/jpeg"
+    )
+
+    assert uploaded_file.biz_type is None
+    assert uploaded_file.biz_id is None
+    assert uploaded_file.uploader_id == 7
+    assert uploaded_file.file_name == f"{uploaded_file.id}.jpeg"
+    mock_session.add.assert_called_once_with(uploaded_file)
+    mock_session.commit.assert_awaited_once()
+
+
+def _lookup(mock_session, uploaded_file):
+    result = MagicMock()
+    result.scalars.return_value.first.return_value = uploaded_file
+    mock_session.execute.return_value = result
+
+
+@pytest.mark.asyncio
+async def test_claim_links_file(mock_session):
+    """Claiming sets the business entity"""
+    uploaded_file = UploadedFile(id=1, uploader_id=7, biz_type=None, biz_id=None)
+    _lookup(mock_session, uploaded_file)
+
+    claimed = await upload_service.claim_uploaded_file(mock_session, 1, 7, "prepare_good", 42)
+
+    assert claimed is uploaded_file
+    assert (uploaded_file.biz_type, uploaded_file.biz_id) == ("prepare_good", 42)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("uploaded_file, status_code", [
+    (None, 404),
+    (UploadedFile(id=1, uploader_id=8, biz_type=None, biz_id=None), 403),
+    (UploadedFile(id=1, uploader_id=7, biz_type="prepare_good", biz_id=41), 409),
+])
+async def test_claim_rejects(mock_session, uploaded_file, status_code):
+    """Missing, foreign and already attached uploads cannot be claimed"""
+    _lookup(mock_session, uploaded_file)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await upload_service.claim_uploaded_file(mock_session, 1, 7, "prepare_good", 42)
+
+    assert exc_info.value.status_code == status_code
+
+
+@pytest.mark.asyncio
+async def test_attach_base64_photo(upload_dir, mock_session):
+    """The base64 compatibility path saves and links the photo"""
+    data_url = "data:image/png;base64," + base64.b64encode(PNG).decode()
+
+    uploaded_file = await upload_service.attach_photo(
+        mock_session, _driver(), "prepare_good", 42, "PG1_1", photo=data_url
+    )
+
+    assert uploaded_file.file_name == "PG1_1.png"
+    assert uploaded_file.biz_id == 42
+    assert _stored_files(upload_dir)[0].read_bytes() == PNG
+
+
+@pytest.mark.asyncio
+async def test_same_bytes_stored_once(upload_dir):
+    """Retried uploads of the same photo reuse the stored file"""
+    first = await upload_service.stream_to_store(_chunks(JPEG), "1")
+    second = await upload_service.stream_to_store(_chunks(JPEG, size=7), "2")
+
+    assert first.file_url == second.file_url
+    assert len(_stored_files(upload_dir)) == 1
+
+
+def test_confirm_request_requires_one_photo():
+    """Confirm requests take either photo or photoFileId"""
+    assert ConfirmPickupRequest(photoFileId="123").photo_file_id == 123
+    with pytest.raises(ValueError):
+        ConfirmPickupRequest()
+    with pytest.raises(ValueError):
+        ConfirmPickupRequest(photo="abc", photoFileId=1)
@@ -0,0 +1,113 @@
+"""
+Unit tests for warehouse_scan_service
+
+Tests the warehouse batch receive/ship:
+- One locked read, one UPDATE and one multi-row INSERT per batch
+- Per-scan results: ok, already_done, invalid_status, not_found
+- Packages expand to their orders; repeated scans apply once
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.dialects import mysql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services import warehouse_scan_service
+
+
+def _order(order_id, order_sn, shipping_status):
+    return SimpleNamespace(
+        id=order_id, order_sn=order_sn, order_status=1, shipping_status=shipping_status, shipping_type=0
+    )
+
+
+def _rows(rows):
+    result = MagicMock()
+    result.all.return_value = rows
+    return result
+
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@pytest.fixture
+def mock_session():
+    """Create mock async session"""
+    session = AsyncMock(spec=AsyncSession)
+    session.execute = AsyncMock()
+    session.commit = AsyncMock()
+    return session
+
+
+@pytest.fixture(autouse=True)
+def detail_cache(monkeypatch):
+    """Replace package detail invalidation (Redis)"""
+    invalidate = AsyncMock()
+    monkeypatch.setattr(warehouse_scan_service.package_detail_service, "invalidate_orders", invalidate)
+    return invalidate
+
+
+@pytest.mark.asyncio
+async def test_receive_batch_results(mock_session, detail_cache):
+    """Valid orders are applied in bulk; every scan gets its own result"""
+    mock_session.execute.side_effect = [
+        _rows([_order(1, "ORD1", 3), _order(2, "ORD2", 4), _order(3, "ORD3", 2)]),
+        MagicMock(),
+        MagicMock(),
+    ]
+
+    response = await warehouse_scan_service.apply_batch(
+        mock_session, "receive", warehouse_staff_id=20, order_sns=["ORD1", "ORD2", "ORD3", "ORD9", "ORD1"]
+    )
+
+    assert response.applied == 1
+    assert [(item.scanned_sn, item.result) for item in response.items] == [
+        ("ORD1", "ok"), ("ORD2", "already_done"), ("ORD3", "invalid_status"), ("ORD9", "not_found"), ("ORD1", "ok")
+    ]
+    assert "FOR UPDATE" in _sql(mock_session.execute.call_args_list[0].args[0])
+    update = _sql(mock_session.execute.call_args_list[1].args[0])
+    assert "shipping_status=4" in update
+    assert "tigu_order.id IN (1)" in update
+    insert = mock_session.execute.call_args_list[2].args[0].compile(dialect=mysql.dialect())
+    assert insert.params["action_type_m0"] == 3
+    assert "order_id_m1" not in insert.params
+    mock_session.commit.assert_awaited_once()
+    detail_cache.assert_awaited_once_with([1])
+
+
+@pytest.mark.asyncio
+async def test_ship_batch_expands_packages(mock_session):
+    """A scanned package stands for all of its orders"""
+    mock_session.execute.side_effect = [
+        _rows([("PREP1", 1), ("PREP1", 2)]),
+        _rows([_order(1, "ORD1", 4), _order(2, "ORD2", 4)]),
+        MagicMock(),
+        MagicMock(),
+    ]
+
+    response = await warehouse_scan_service.apply_batch(
+        mock_session, "ship", warehouse_staff_id=20, prepare_sns=["PREP1", "PREP9"]
+    )
+
+    assert response.applied == 2
+    assert [(item.scanned_sn, item.order_sn, item.result) for item in response.items] == [
+        ("PREP1", "ORD1", "ok"), ("PREP1", "ORD2", "ok"), ("PREP9", None, "not_found")
+    ]
+    assert "warehouse_shipping_time" in _sql(mock_session.execute.call_args_list[2].args[0])
+
+
+@pytest.mark.asyncio
+async def test_nothing_to_apply_skips_writes(mock_session, detail_cache):
+    """Batches with no valid transition only read"""
+    mock_session.execute.side_effect = [_rows([_order(1, "ORD1", 5)])]
+
+    response = await warehouse_scan_service.apply_batch(
+        mock_session, "ship", warehouse_staff_id=20, order_sns=["ORD1"]
+    )
+
+    assert response.applied == 0
+    assert response.items[0].result == "already_done"
+    assert mock_session.execute.await_count == 1
+    detail_cache.assert_not_awaited()
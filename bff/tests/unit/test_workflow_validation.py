@@ -3,6 +3,7 @@ Unit tests for workflow validation middleware.
 
 Tests validation of:
 - Status transitions
+- Warehouse receive/ship transitions
 - Workflow configurations
 - Business rules
 - Photo evidence requirements
@@ -69,6 +70,23 @@ class TestStatusTransitionValidation:
             WorkflowValidator.validate_status_transition(5, 1)
 
 
+class TestWarehouseTransitionValidation:
+    """Tests for warehouse receive/ship transitions of orders"""
+
+    def test_receive_after_driver_arrival(self):
+        """3 (司机送达仓库) → 4 (仓库已收货)"""
+        assert WorkflowValidator.validate_warehouse_transition(3, 4) is True
+
+    def test_ship_after_receive(self):
+        """4 (仓库已收货) → 5 (司机配送用户)"""
+        assert WorkflowValidator.validate_warehouse_transition(4, 5) is True
+
+    def test_ship_before_receive(self):
+        """Orders cannot be shipped before the warehouse received them"""
+        with pytest.raises(WorkflowValidationError, match="3 → 5"):
+            WorkflowValidator.validate_warehouse_transition(3, 5)
+
+
 class TestWorkflowConfigurationValidation:
     """Tests for workflow configuration validation"""
 
@@ -66,6 +66,18 @@ export interface DashboardStats {
   completed_orders: number;
   completion_rate: number;
   average_delivery_time?: number;
+  computed_at?: string | null;
+}
+
+export interface DashboardPoint {
+  hour: string;
+  total_drivers: number;
+  active_drivers: number;
+  total_orders: number;
+  pending_orders: number;
+  in_transit_orders: number;
+  completed_orders: number;
+  completion_rate: number;
 }
 
 export interface DriverPerformance {
@@ -106,6 +118,12 @@ export interface DispatchDriver {
   is_available: boolean;
 }
 
+export interface NearbyDriver extends DispatchDriver {
+  distance_km: number;
+  latitude: number;
+  longitude: number;
+}
+
 export interface AdminWarehouseSnapshot {
   id: number;
   name: string;
@@ -165,6 +183,13 @@ export async function getDashboardStats() {
   return data;
 }
 
+export async function getDashboardHourly(hours = 24) {
+  const { data } = await adminClient.get<DashboardPoint[]>('/admin/dashboard/hourly', {
+    params: { hours }
+  });
+  return data;
+}
+
 // Driver management
 export async function getAllDrivers(params?: {
   skip?: number;
@@ -226,22 +251,73 @@ export async function dispatchOrders(dispatches: OrderDispatch[]) {
   await adminClient.post('/admin/orders/dispatch', dispatches);
 }
 
+export interface AutoDispatchResult {
+  dry_run: boolean;
+  package_count: number;
+  driver_count: number;
+  assigned_count: number;
+  written_count: number;
+  assignments: Array<{
+    prepare_sn: string;
+    driver_id: number;
+    driver_name: string;
+    distance_km: number;
+  }>;
+  unassigned: string[];
+  solve_time_ms: number;
+}
+
+export async function autoDispatchPackages(options?: {
+  dry_run?: boolean;
+  max_distance_km?: number;
+  limit?: number;
+}) {
+  const { data } = await adminClient.post<AutoDispatchResult>('/admin/orders/dispatch/auto', options ?? {});
+  return data;
+}
+
 export async function getDispatchDrivers() {
   const { data } = await adminClient.get<DispatchDriver[]>('/admin/dispatch/drivers');
   return data;
 }
 
-export async function getAdminOrders(params?: {
+export async function getNearestDrivers(params: {
+  target_type?: 'shop' | 'warehouse' | 'mark';
+  target_id?: number | string;
+  latitude?: number;
+  longitude?: number;
+  limit?: number;
+  radius_km?: number;
+}) {
+  const { data } = await adminClient.get<NearbyDriver[]>('/admin/dispatch/drivers/nearest', { params });
+  return data;
+}
+
+export interface AdminOrdersQuery {
   status?: number;
   driver_id?: number;
   unassigned?: boolean;
   search?: string;
   limit?: number;
-}) {
+  // X-Next-Cursor of the previous page
+  cursor?: string;
+}
+
+export interface CursorPage<T> {
+  items: T[];
+  nextCursor: string | null;
+}
+
+export async function getAdminOrders(params?: AdminOrdersQuery) {
   const { data } = await adminClient.get<AdminOrderSummary[]>('/admin/orders', { params });
   return data;
 }
 
+export async function getAdminOrdersPage(params?: AdminOrdersQuery): Promise<CursorPage<AdminOrderSummary>> {
+  const response = await adminClient.get<AdminOrderSummary[]>('/admin/orders', { params });
+  return { items: response.data, nextCursor: response.headers['x-next-cursor'] ?? null };
+}
+
 // Performance monitoring interfaces
 export interface DriverPerformanceMetrics {
   driver_id: number;
@@ -385,7 +461,8 @@ export async function logDriverAction(params: {
 export interface AdminUploadedFile {
   id: number;
   fileName: string;
-  fileUrl: string;
+  fileUrl: string;  // Thumbnail unless another photoSize is requested
+  originalUrl: string | null;
   fileType: string;
   fileSize: number;
   uploaderName: string | null;
@@ -5,17 +5,40 @@ const client = axios.create({
   timeout: 10000
 });
 
+const MUTATING_METHODS = ['post', 'put', 'patch', 'delete'];
+const retriedKeys = new Set<string>();
+
+function newIdempotencyKey() {
+  if (typeof crypto !== 'undefined' && 'randomUUID' in crypto) {
+    return crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 client.interceptors.request.use(config => {
   const token = localStorage.getItem('delivery_token');
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+  // Kept on the config, so a retry of this request reuses the key and the
+  // server replays the first response instead of applying it twice
+  if (MUTATING_METHODS.includes((config.method ?? 'get').toLowerCase()) && !config.headers['Idempotency-Key']) {
+    config.headers['Idempotency-Key'] = newIdempotencyKey();
+  }
   return config;
 });
 
 client.interceptors.response.use(
   response => response,
   error => {
+    // Timed out or connection dropped: the request may have been applied,
+    // retry once with the same Idempotency-Key
+    const config = error.config;
+    const key = config?.headers?.['Idempotency-Key'];
+    if (!error.response && key && !retriedKeys.has(key)) {
+      retriedKeys.add(key);
+      return client.request(config).finally(() => retriedKeys.delete(key));
+    }
     if (error.response?.status === 401) {
       localStorage.removeItem('delivery_token');
       localStorage.removeItem('user_phone');
@@ -37,7 +37,9 @@ export interface RoutePlanDto {
     eta: string;
     latitude?: number;
     longitude?: number;
+    distanceFromPreviousKm?: number;
   }>;
+  totalDistanceKm?: number;
 }
 
 export async function fetchOrderBySn(orderSn: string) {
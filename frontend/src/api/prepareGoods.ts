@@ -25,7 +25,8 @@ export interface PrepareGoodsDto {
 export interface UploadedFileDto {
   id: number;
   fileName: string;
-  fileUrl: string;
+  fileUrl: string;  // Thumbnail unless another photoSize is requested
+  originalUrl: string | null;
   fileType: string;
   fileSize: number;
   uploaderName: string | null;
@@ -188,6 +189,26 @@ export async function pickupPackage(prepareSn: string) {
   await client.post(`/prepare-goods/${prepareSn}/pickup`);
 }
 
+export interface UploadedPhotoDto {
+  id: string;  // String to preserve bigint precision
+  fileUrl: string;
+  fileType: string;
+  fileSize: number;
+}
+
+/**
+ * Upload a photo (data URL) as a raw binary body.
+ * Returns the uploaded file id to pass as photoFileId.
+ */
+export async function uploadPhoto(dataUrl: string) {
+  const blob = await (await fetch(dataUrl)).blob();
+  const { data } = await client.post<UploadedPhotoDto>('/uploads/photos', blob, {
+    headers: { 'Content-Type': blob.type || 'image/jpeg' },
+    timeout: 60000
+  });
+  return data;
+}
+
 /**
  * Confirm pickup with photo proof
  */
@@ -196,8 +217,9 @@ export async function confirmPickup(
   photo: string,
   notes?: string
 ) {
+  const uploaded = await uploadPhoto(photo);
   await client.post(`/prepare-goods/${prepareSn}/confirm-pickup`, {
-    photo,
+    photoFileId: uploaded.id,
     notes
   });
 }
@@ -210,8 +232,45 @@ export async function confirmDelivery(
   photo: string,
   notes?: string
 ) {
+  const uploaded = await uploadPhoto(photo);
   await client.post(`/prepare-goods/${prepareSn}/confirm-delivery`, {
-    photo,
+    photoFileId: uploaded.id,
     notes
   });
 }
+
+export type DriverSyncActionType =
+  | 'claim'
+  | 'confirm_pickup'
+  | 'confirm_delivery'
+  | 'arrive_warehouse'
+  | 'location';
+
+export interface DriverSyncAction {
+  idempotencyKey: string;
+  type: DriverSyncActionType;
+  prepareSn?: string;
+  orderSn?: string;
+  photoFileId?: string;
+  photoIds?: string[];
+  latitude?: number;
+  longitude?: number;
+}
+
+export interface DriverSyncOutcome {
+  idempotencyKey: string;
+  type: DriverSyncActionType;
+  result: 'applied' | 'failed' | 'superseded' | 'pending';
+  statusCode: number;
+  detail?: string | null;
+  replayed: boolean;
+}
+
+/**
+ * Send actions queued while offline, oldest first; one outcome per action.
+ * Re-sending the same idempotencyKey never applies an action twice.
+ */
+export async function syncDriverActions(actions: DriverSyncAction[]) {
+  const { data } = await client.post<{ outcomes: DriverSyncOutcome[] }>('/driver/sync', { actions });
+  return data.outcomes;
+}
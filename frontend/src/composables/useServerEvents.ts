@@ -0,0 +1,115 @@
+import { ref, onUnmounted } from 'vue';
+
+// Server-push events from GET /api/events/stream (Server-Sent Events).
+// One EventSource is shared by every component and closed when the last
+// subscriber unmounts. The browser reconnects on its own; the server sends
+// `packages.changed` on every (re)connect so subscribers can refetch.
+
+export type ServerEventType =
+  | 'packages.changed'
+  | 'package.available'
+  | 'package.unavailable'
+  | 'package.assigned'
+  | 'package.updated'
+  | 'order.assigned'
+  | 'notification';
+
+export interface ServerEvent<T = Record<string, any>> {
+  type: ServerEventType;
+  data: T;
+  ts: string;
+}
+
+type Handler = (event: ServerEvent) => void;
+
+const EVENT_TYPES: ServerEventType[] = [
+  'packages.changed',
+  'package.available',
+  'package.unavailable',
+  'package.assigned',
+  'package.updated',
+  'order.assigned',
+  'notification'
+];
+
+const handlers = new Map<ServerEventType, Set<Handler>>();
+export const serverEventsConnected = ref(false);
+let source: EventSource | null = null;
+let subscriberCount = 0;
+
+function dispatch(message: MessageEvent) {
+  let event: ServerEvent;
+  try {
+    event = JSON.parse(message.data);
+  } catch {
+    return;
+  }
+  handlers.get(event.type)?.forEach(handler => {
+    try {
+      handler(event);
+    } catch (err) {
+      console.error(`Error handling ${event.type} event:`, err);
+    }
+  });
+}
+
+function open() {
+  const token = localStorage.getItem('delivery_token');
+  if (source || !token || typeof EventSource === 'undefined') return;
+
+  source = new EventSource(`/api/events/stream?token=${encodeURIComponent(token)}`);
+  source.onopen = () => {
+    serverEventsConnected.value = true;
+  };
+  source.onerror = () => {
+    // EventSource retries by itself unless the server rejected the stream
+    serverEventsConnected.value = false;
+    if (source?.readyState === EventSource.CLOSED) {
+      close();
+    }
+  };
+  EVENT_TYPES.forEach(type => source?.addEventListener(type, dispatch as EventListener));
+}
+
+function close() {
+  source?.close();
+  source = null;
+  serverEventsConnected.value = false;
+}
+
+// Subscribe outside components (e.g. Pinia stores); returns an unsubscribe function
+export function subscribeServerEvents(types: ServerEventType | ServerEventType[], handler: Handler) {
+  const typeList = Array.isArray(types) ? types : [types];
+  typeList.forEach(type => {
+    if (!handlers.has(type)) handlers.set(type, new Set());
+    handlers.get(type)!.add(handler);
+  });
+  subscriberCount += 1;
+  open();
+
+  let active = true;
+  return () => {
+    if (!active) return;
+    active = false;
+    typeList.forEach(type => handlers.get(type)?.delete(handler));
+    subscriberCount -= 1;
+    if (subscriberCount === 0) {
+      close();
+    }
+  };
+}
+
+export function useServerEvents() {
+  const unsubscribers: Array<() => void> = [];
+
+  const on = (types: ServerEventType | ServerEventType[], handler: Handler) => {
+    unsubscribers.push(subscribeServerEvents(types, handler));
+  };
+
+  onUnmounted(() => {
+    unsubscribers.forEach(unsubscribe => unsubscribe());
+    unsubscribers.length = 0;
+  });
+
+  return { connected: serverEventsConnected, on };
+}
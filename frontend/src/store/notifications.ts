@@ -2,6 +2,7 @@ import { defineStore } from 'pinia';
 import { ref, computed, watch } from 'vue';
 import supabase, { type Notification, type NotificationType } from '@/lib/supabase';
 import { useOrdersStore } from '@/store/orders';
+import { serverEventsConnected, subscribeServerEvents, type ServerEvent } from '@/composables/useServerEvents';
 
 export const useNotificationStore = defineStore('notifications', () => {
   // State
@@ -11,9 +12,10 @@ export const useNotificationStore = defineStore('notifications', () => {
   const isConnected = ref(false);
   const lastFetchedAt = ref<Date | null>(null);
 
-  // Private - polling interval
+  // Private - pushed over the server event stream; polling only while it is down
   let pollingInterval: ReturnType<typeof setInterval> | null = null;
-  const POLLING_INTERVAL_MS = 30000; // Poll every 30 seconds
+  let unsubscribeEvents: (() => void) | null = null;
+  const POLLING_INTERVAL_MS = 30000; // Fallback poll every 30 seconds
 
   // Computed
   const unreadCount = computed(() =>
@@ -203,56 +205,90 @@ export const useNotificationStore = defineStore('notifications', () => {
     }
   }
 
+  function handleNotificationEvent(event: ServerEvent) {
+    const notification = event.data as Notification;
+    if (!notification?.id || notifications.value.some(n => n.id === notification.id)) return;
+
+    notifications.value = [notification, ...notifications.value];
+    showNotificationAlert(notification);
+    if (notification.priority === 'urgent' || notification.priority === 'high') {
+      playNotificationSound();
+    }
+  }
+
+  function handleStreamConnected(event: ServerEvent) {
+    // Catch up on anything pushed while the stream was disconnected
+    if (event.data?.reason === 'connected') {
+      fetchNotifications();
+    }
+  }
+
+  async function pollNotifications() {
+    const ordersStore = useOrdersStore();
+    if (!ordersStore.currentUserPhone) return;
+
+    const previousCount = notifications.value.filter(n => !n.is_read).length;
+    await fetchNotifications();
+    const newCount = notifications.value.filter(n => !n.is_read).length;
+
+    // If we have new unread notifications, show alert for the newest one
+    if (newCount > previousCount && notifications.value.length > 0) {
+      const newestNotification = notifications.value[0];
+      if (!newestNotification.is_read) {
+        showNotificationAlert(newestNotification);
+        if (newestNotification.priority === 'urgent' || newestNotification.priority === 'high') {
+          playNotificationSound();
+        }
+      }
+    }
+  }
+
+  function updateFallbackPolling() {
+    if (pollingInterval) {
+      clearInterval(pollingInterval);
+      pollingInterval = null;
+    }
+    if (unsubscribeEvents && !serverEventsConnected.value) {
+      pollingInterval = setInterval(pollNotifications, POLLING_INTERVAL_MS);
+    }
+  }
+
   function startPolling() {
     const ordersStore = useOrdersStore();
     const driverPhone = ordersStore.currentUserPhone;
 
     if (!driverPhone) {
-      console.warn('No driver phone available for polling');
+      console.warn('No driver phone available for notifications');
       return;
     }
 
-    // Stop existing polling
+    // Stop existing subscription
     stopPolling();
 
-    // Mark as connected (polling mode)
     isConnected.value = true;
 
     // Initial fetch
     fetchNotifications();
 
-    // Start polling interval
-    pollingInterval = setInterval(async () => {
-      const currentPhone = ordersStore.currentUserPhone;
-      if (currentPhone) {
-        const previousCount = notifications.value.filter(n => !n.is_read).length;
-        await fetchNotifications();
-        const newCount = notifications.value.filter(n => !n.is_read).length;
-        
-        // If we have new unread notifications, show alert for the newest one
-        if (newCount > previousCount && notifications.value.length > 0) {
-          const newestNotification = notifications.value[0];
-          if (!newestNotification.is_read) {
-            showNotificationAlert(newestNotification);
-            if (newestNotification.priority === 'urgent' || newestNotification.priority === 'high') {
-              playNotificationSound();
-            }
-          }
-        }
-      }
-    }, POLLING_INTERVAL_MS);
+    const unsubscribers = [
+      subscribeServerEvents('notification', handleNotificationEvent),
+      subscribeServerEvents('packages.changed', handleStreamConnected)
+    ];
+    unsubscribeEvents = () => unsubscribers.forEach(unsubscribe => unsubscribe());
+    updateFallbackPolling();
 
-    console.log('Notification polling started');
+    console.log('Notification updates started');
   }
 
   function stopPolling() {
-    if (pollingInterval) {
-      clearInterval(pollingInterval);
-      pollingInterval = null;
-    }
+    unsubscribeEvents?.();
+    unsubscribeEvents = null;
+    updateFallbackPolling();
     isConnected.value = false;
   }
 
+  watch(serverEventsConnected, updateFallbackPolling);
+
   // Keep subscribeToRealtime as alias for startPolling for backward compatibility
   function subscribeToRealtime() {
     startPolling();